@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+asof_context.py
+
+Point-in-time ("as-of") read context for backtesting the projection engine.
+
+A backtest over historical dates used to call calculate_daily_projection() per
+player per game against the live database, so every date paid the full HTTP
+cost (10-20+ minutes for a month) and saw today's data: player_season_stats
+holds full-season totals, the "last N games" helpers cut nhl_games at
+date.today(), and player_directory has the current roster.
+
+AsOfContext loads a season once - nhl_games, the season's player_game_stats,
+raw_shots for the season's games and the backtest players, and the static
+lookup tables - and builds cumulative (prefix-sum) arrays by date over
+player_game_stats stat columns and raw_shots xG per player. For any date D,
+view(D) returns a ProjectionContext whose answers only reflect games played
+before D:
+
+    - player_season_stats is synthesized from the prefix sums at D (same
+      aggregation as build_player_season_stats), one searchsorted per date
+    - nhl_games / player_game_stats / raw_shots queries get a game_date < D
+      cutoff; lookups pinned to a game_id or to a game_date still see the
+      scheduled game, with its final score and status masked
+    - player_directory team_abbrev is the player's team as of D
+    - projection_cache is empty and all writes are dropped
+
+Each date's slate is evaluated from memory by projection_kernel.project_slate,
+and dates are independent, so run_dates() spreads them over a process pool
+(the loaded context is inherited over fork, or pickled once per worker).
+
+Tables without history stay current-snapshot: league_averages,
+player_talent_metrics, goalie_gsax*, the previous season's
+player_season_stats (complete before the backtest season starts anyway).
+
+Usage:
+    ctx = AsOfContext.load(db, season, player_ids)
+    for as_of, rows in run_dates(ctx, dates, scoring_settings, workers=8):
+        ...
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from supabase_rest import SupabaseRest, Filter
+from projection_context import (
+    RAW_SHOT_COLUMNS,
+    RECENT_GAMES_WINDOW,
+    ProjectionContext,
+    _Table,
+    fetch_all,
+    fetch_all_in,
+)
+from projection_kernel import project_slate
+from projection_workers import init_projection_worker, worker_db
+from team_context import build_team_context
+import calculate_daily_projections as cdp
+
+
+# player_game_stats columns summed into the as-of player_season_stats rows
+# (build_player_season_stats aggregates the same way; games_played counts rows)
+SEASON_SUM_COLUMNS = (
+    "icetime_seconds", "nhl_toi_seconds",
+    "goals", "primary_assists", "secondary_assists", "points", "shots_on_goal",
+    "hits", "blocks", "pim", "ppp", "shp", "plus_minus",
+    "nhl_goals", "nhl_assists", "nhl_points", "nhl_shots_on_goal", "nhl_hits", "nhl_blocks", "nhl_pim",
+    "goalie_gp", "wins", "saves", "shots_faced", "goals_against", "shutouts",
+    "nhl_wins", "nhl_losses", "nhl_ot_losses", "nhl_saves", "nhl_shots_faced", "nhl_goals_against", "nhl_shutouts",
+)
+
+# Tables whose rows carry a game_date the cutoff can be applied to
+CUTOFF_TABLES = ("nhl_games", "player_game_stats", "raw_shots")
+# ... and which of them have that column in the database (raw_shots only gets
+# game_date in memory, so uncovered raw_shots queries fall through uncut)
+DB_CUTOFF_TABLES = ("nhl_games", "player_game_stats")
+
+# nhl_games outcome columns hidden for games on or after the as-of date
+GAME_RESULT_COLUMNS = ("home_score", "away_score")
+SCHEDULED_STATUS = "scheduled"
+
+
+def _day(value: Any) -> Optional[str]:
+    """YYYY-MM-DD of a date / ISO date or timestamp string."""
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)[:10]
+
+
+class AsOfView(ProjectionContext):
+    """
+    Read-only ProjectionContext of an AsOfContext cut at one date.
+
+    Built by AsOfContext.view(); pass it as `db` to the projection functions.
+    """
+
+    def __init__(self, source: "AsOfContext", as_of: date):
+        super().__init__(source.db, as_of, source.season)
+        self.cutoff = as_of.isoformat()
+        self.uncut = 0
+        self.tables = dict(source.tables)
+        self.tables["nhl_games"] = source.games_table(as_of)
+        self.tables["player_season_stats"] = source.season_stats_table(as_of)
+        self.tables["player_directory"] = source.directory_table(as_of)
+        cache = _Table("projection_cache")
+        cache.add_coverage(projection_date=[self.cutoff])
+        self.tables["projection_cache"] = cache
+
+    def _needs_cutoff(self, table: str, filters: List[Filter]) -> bool:
+        if table not in CUTOFF_TABLES:
+            return False
+        if table == "nhl_games":
+            # Schedule lookups (the slate's own games) are not leaks; results are masked
+            for col, op, _ in filters:
+                if (col == "game_id" and op in ("eq", "in")) or (col == "game_date" and op == "eq"):
+                    return False
+        return True
+
+    def select(self, table: str, select: str = "*", filters: Optional[List[Filter]] = None, order: Optional[str] = None,
+               limit: Optional[int] = None, offset: Optional[int] = None) -> List[dict]:
+        filters = list(filters or [])
+        if self._needs_cutoff(table, filters):
+            cut = filters + [("game_date", "lt", self.cutoff)]
+            loaded = self.tables.get(table)
+            if table in DB_CUTOFF_TABLES or (loaded is not None and loaded.covers(select, cut)):
+                filters = cut
+            else:
+                self.uncut += 1
+        return super().select(table, select=select, filters=filters, order=order, limit=limit, offset=offset)
+
+    # A backtest never writes: projection_cache rows, team context, etc. are dropped
+
+    def upsert(self, table: str, rows, on_conflict: str) -> None:
+        return None
+
+    def update(self, table: str, values: dict, filters: List[Filter]) -> None:
+        return None
+
+    def delete(self, table: str, filters: List[Filter]) -> None:
+        return None
+
+    def flush(self) -> int:
+        return 0
+
+
+class AsOfContext:
+    """
+    One season of projection inputs, answerable as of any date in the season.
+
+    Build it with AsOfContext.load(); get per-date read contexts with view().
+    """
+
+    def __init__(self, db: Optional[SupabaseRest], season: int):
+        self.db = db
+        self.season = season
+        # Static tables shared by every view (raw_shots / player_game_stats rows carry game_date)
+        self.tables: Dict[str, _Table] = {}
+        self.games: List[Dict[str, Any]] = []
+        self.directory: List[Dict[str, Any]] = []
+        self.prev_season_stats: List[Dict[str, Any]] = []
+        self.game_stats: Dict[int, List[Dict[str, Any]]] = {}
+        # Prefix sums: dates[i] is the i-th distinct game date; cumulative[i] are
+        # the per-player totals over games strictly before dates[i]
+        self.dates = np.asarray([], dtype="U10")
+        self.player_ids: List[int] = []
+        self.cumulative = np.zeros((1, 0, len(SEASON_SUM_COLUMNS) + 1))
+        self.xg_cumulative = np.zeros((1, 0))
+        # player_id -> (sorted days, pgs rows) for the as-of team / position / is_goalie
+        self.history: Dict[int, Tuple[List[str], List[Dict[str, Any]]]] = {}
+
+    def __getstate__(self):
+        # Shipped to spawn workers without the client; init_asof_worker() attaches one
+        state = dict(self.__dict__)
+        state["db"] = None
+        return state
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def load(
+        cls,
+        db: SupabaseRest,
+        season: int,
+        player_ids: Optional[Iterable[int]] = None,
+        verbose: bool = True,
+    ) -> "AsOfContext":
+        """
+        Load a season and build the prefix sums.
+
+        Args:
+            db: Supabase client used for the bulk loads and for fall-through queries
+            season: Season year (the previous season is loaded for blended baselines)
+            player_ids: Players whose career raw_shots are preloaded for the
+                        finishing-talent multiplier (default: everyone who
+                        played in the season)
+            verbose: Print a one-line summary per table
+
+        Returns:
+            Loaded AsOfContext
+        """
+        ctx = cls(db, season)
+        seasons = [season, season - 1]
+        start_requests = getattr(db, "request_count", 0)
+
+        def load_table(name, rows_fn, coverage=()):
+            try:
+                rows = rows_fn()
+            except Exception as e:
+                if verbose:
+                    print(f"   ⚠️  {name}: not preloaded ({e})")
+                return None
+            table = _Table(name)
+            table.add_rows(rows)
+            for alternative in coverage:
+                table.add_coverage(**alternative)
+            ctx.tables[name] = table
+            if verbose:
+                print(f"   {name}: {len(table.rows)} rows")
+            return table
+
+        load_table(
+            "player_talent_metrics",
+            lambda: fetch_all(db, "player_talent_metrics", filters=[("season", "eq", season)]),
+            coverage=[{"season": [season]}],
+        )
+        load_table(
+            "league_averages",
+            lambda: fetch_all(db, "league_averages", filters=[("season", "in", seasons)]),
+            coverage=[{"season": seasons}],
+        )
+        load_table("goalie_gsax_primary", lambda: fetch_all(db, "goalie_gsax_primary"))
+        load_table("goalie_gsax", lambda: fetch_all(db, "goalie_gsax"))
+        load_table("team_mapping_config", lambda: fetch_all(db, "team_mapping_config"))
+        load_table("leagues", lambda: fetch_all(db, "leagues"))
+
+        # Per-view tables: kept as rows, rebuilt (cut / masked / synthesized) by view()
+        ctx.directory = fetch_all(db, "player_directory", filters=[("season", "eq", season)])
+        ctx.prev_season_stats = fetch_all(db, "player_season_stats", filters=[("season", "eq", season - 1)])
+        ctx.games = fetch_all(db, "nhl_games", filters=[("season", "in", seasons)])
+        game_days = {int(g["game_id"]): _day(g.get("game_date")) for g in ctx.games if g.get("game_id")}
+        if verbose:
+            print(f"   player_directory: {len(ctx.directory)} rows")
+            print(f"   player_season_stats ({season - 1}): {len(ctx.prev_season_stats)} rows")
+            print(f"   nhl_games: {len(ctx.games)} rows")
+
+        # The season's player_game_stats, plus the previous season's final
+        # window that the blended (current/previous) team xGA helpers scan
+        season_ids = sorted(int(g["game_id"]) for g in ctx.games
+                            if g.get("game_id") and int(g.get("season") or 0) == season)
+        prev_games = sorted(
+            (g for g in ctx.games if g.get("game_id") and int(g.get("season") or 0) == season - 1),
+            key=lambda g: _day(g.get("game_date")) or "", reverse=True
+        )
+        prev_ids = [int(g["game_id"]) for g in prev_games[:RECENT_GAMES_WINDOW]]
+
+        season_rows: List[Dict[str, Any]] = []
+        for page in db.iter_select("player_game_stats", select="*", filters=[("season", "eq", season)],
+                                   key=("game_id", "player_id"), streams=4):
+            season_rows.extend(page)
+        prev_rows = fetch_all_in(db, "player_game_stats", "game_id", prev_ids) if prev_ids else []
+        for row in season_rows + prev_rows:
+            row["game_date"] = _day(row.get("game_date")) or game_days.get(int(row.get("game_id") or 0))
+        pgs = _Table("player_game_stats", primary_key=("season", "game_id", "player_id"))
+        pgs.add_rows(season_rows + prev_rows)
+        pgs.add_coverage(game_id=season_ids + prev_ids)
+        ctx.tables["player_game_stats"] = pgs
+        for row in season_rows:
+            ctx.game_stats.setdefault(int(row["game_id"]), []).append(row)
+        if verbose:
+            print(f"   player_game_stats: {len(season_rows)} rows (+{len(prev_rows)} from {len(prev_ids)} {season - 1} games)")
+
+        # raw_shots for the same games, and the backtest players' career shots;
+        # each shot is tagged with its game's date for the cutoff
+        shooter_ids = sorted({int(p) for p in (player_ids or [])} or {int(r["player_id"]) for r in season_rows})
+        shots = _Table("raw_shots", RAW_SHOT_COLUMNS + ",game_date", primary_key=("id",))
+        game_shots = fetch_all_in(db, "raw_shots", "game_id", season_ids + prev_ids, select=RAW_SHOT_COLUMNS)
+        player_shots = fetch_all_in(db, "raw_shots", "player_id", shooter_ids, select=RAW_SHOT_COLUMNS)
+        unknown = sorted({int(s["game_id"]) for s in player_shots if s.get("game_id") and int(s["game_id"]) not in game_days})
+        if unknown:
+            for g in fetch_all_in(db, "nhl_games", "game_id", unknown, select="game_id,game_date"):
+                game_days[int(g["game_id"])] = _day(g.get("game_date"))
+        for shot in game_shots + player_shots:
+            shot["game_date"] = game_days.get(int(shot.get("game_id") or 0))
+        shots.add_rows(game_shots + player_shots)
+        shots.add_coverage(game_id=season_ids + prev_ids)
+        shots.add_coverage(player_id=shooter_ids)
+        ctx.tables["raw_shots"] = shots
+        if verbose:
+            print(f"   raw_shots: {len(shots.rows)} rows ({len(season_ids) + len(prev_ids)} games, {len(shooter_ids)} shooters)")
+
+        season_games = set(season_ids)
+        ctx._build_prefix_sums(season_rows, [s for s in game_shots if int(s.get("game_id") or 0) in season_games])
+
+        if verbose:
+            used = getattr(db, "request_count", 0) - start_requests
+            print(f"   As-of context: {len(ctx.dates)} game dates, {len(ctx.player_ids)} players, {used} requests")
+        return ctx
+
+    def _build_prefix_sums(self, rows: List[Dict[str, Any]], shots: List[Dict[str, Any]]) -> None:
+        """Cumulative per-player totals by game date over player_game_stats rows and raw_shots xG."""
+        rows = [r for r in rows if r.get("game_date") and r.get("player_id") is not None]
+        self.dates = np.asarray(sorted({r["game_date"] for r in rows}), dtype="U10")
+        self.player_ids = sorted({int(r["player_id"]) for r in rows})
+        column = {pid: i for i, pid in enumerate(self.player_ids)}
+
+        # Slot i + 1 holds date i, so cumulative[i] = games before dates[i]
+        day_idx = np.searchsorted(self.dates, [r["game_date"] for r in rows], side="right")
+        player_idx = np.asarray([column[int(r["player_id"])] for r in rows], dtype=np.int64)
+        values = np.asarray(
+            [[1.0] + [float(r.get(c) or 0) for c in SEASON_SUM_COLUMNS] for r in rows], dtype=np.float64
+        ).reshape(len(rows), len(SEASON_SUM_COLUMNS) + 1)
+        per_day = np.zeros((len(self.dates) + 1, len(self.player_ids), values.shape[1]))
+        np.add.at(per_day, (day_idx, player_idx), values)
+        self.cumulative = np.cumsum(per_day, axis=0)
+
+        # x_goals: shooting_talent_adjusted_xg, else xg_value (as build_player_season_stats)
+        shots = [s for s in shots if s.get("game_date") and s.get("player_id") is not None
+                 and int(s["player_id"]) in column]
+        xg_per_day = np.zeros((len(self.dates) + 1, len(self.player_ids)))
+        if shots:
+            np.add.at(
+                xg_per_day,
+                (np.searchsorted(self.dates, [s["game_date"] for s in shots], side="right"),
+                 np.asarray([column[int(s["player_id"])] for s in shots], dtype=np.int64)),
+                np.asarray([
+                    float(s["shooting_talent_adjusted_xg"]) if s.get("shooting_talent_adjusted_xg") is not None
+                    else float(s.get("xg_value") or 0) for s in shots
+                ])
+            )
+        self.xg_cumulative = np.cumsum(xg_per_day, axis=0)
+
+        self.history = {}
+        for row in sorted(rows, key=lambda r: r["game_date"]):
+            days, history = self.history.setdefault(int(row["player_id"]), ([], []))
+            days.append(row["game_date"])
+            history.append(row)
+
+    # ------------------------------------------------------------------
+    # As-of tables
+    # ------------------------------------------------------------------
+
+    def season_stats_as_of(self, as_of: date) -> List[Dict[str, Any]]:
+        """
+        player_season_stats rows for the season over games strictly before as_of.
+
+        Returns:
+            One row per player with at least one game before as_of
+        """
+        i = int(np.searchsorted(self.dates, as_of.isoformat(), side="left"))
+        totals = self.cumulative[i]
+        x_goals = self.xg_cumulative[i]
+        cutoff = as_of.isoformat()
+        rows = []
+        for p in np.flatnonzero(totals[:, 0] > 0):
+            player_id = self.player_ids[p]
+            days, history = self.history[player_id]
+            played = bisect_left(days, cutoff)
+            latest = history[played - 1]
+            row = {
+                "season": self.season,
+                "player_id": player_id,
+                "team_abbrev": latest.get("team_abbrev"),
+                "position_code": latest.get("position_code"),
+                "is_goalie": any(bool(h.get("is_goalie")) for h in history[:played]),
+                "games_played": int(totals[p, 0]),
+                "x_goals": float(x_goals[p]),
+            }
+            for j, col in enumerate(SEASON_SUM_COLUMNS, 1):
+                row[col] = int(round(totals[p, j]))
+            row["save_pct"] = row["saves"] / row["shots_faced"] if row["shots_faced"] > 0 else None
+            row["nhl_save_pct"] = row["nhl_saves"] / row["nhl_shots_faced"] if row["nhl_shots_faced"] > 0 else None
+            rows.append(row)
+        return rows
+
+    def season_stats_table(self, as_of: date) -> _Table:
+        table = _Table("player_season_stats")
+        table.add_rows(self.prev_season_stats)
+        table.add_rows(self.season_stats_as_of(as_of))
+        table.add_coverage(season=[self.season, self.season - 1])
+        return table
+
+    def games_table(self, as_of: date) -> _Table:
+        """nhl_games with the outcome of games on or after as_of masked."""
+        cutoff = as_of.isoformat()
+        rows = []
+        for game in self.games:
+            if (_day(game.get("game_date")) or "") >= cutoff:
+                game = dict(game)
+                for col in GAME_RESULT_COLUMNS:
+                    if col in game:
+                        game[col] = None
+                if "status" in game:
+                    game["status"] = SCHEDULED_STATUS
+            rows.append(game)
+        table = _Table("nhl_games")
+        table.add_rows(rows)
+        seasons = sorted({g.get("season") for g in self.games if g.get("season") is not None})
+        table.add_coverage(season=seasons or [self.season, self.season - 1])
+        table.add_coverage(game_id=[g.get("game_id") for g in self.games])
+        return table
+
+    def directory_table(self, as_of: date) -> _Table:
+        """player_directory with team_abbrev as of as_of (latest game on or before it)."""
+        cutoff = as_of.isoformat()
+        rows = []
+        for entry in self.directory:
+            days, history = self.history.get(int(entry.get("player_id") or 0), ([], []))
+            i = bisect_right(days, cutoff)
+            if i and history[i - 1].get("team_abbrev"):
+                entry = dict(entry, team_abbrev=history[i - 1]["team_abbrev"])
+            rows.append(entry)
+        table = _Table("player_directory")
+        table.add_rows(rows)
+        table.add_coverage(season=[self.season])
+        return table
+
+    def view(self, as_of: date) -> AsOfView:
+        """Read context that only sees games before as_of."""
+        return AsOfView(self, as_of)
+
+    def slate(self, as_of: date) -> List[Dict[str, Any]]:
+        """player_game_stats rows of the season's games played on as_of (the backtest slate and its actuals)."""
+        cutoff = as_of.isoformat()
+        rows = []
+        for game in self.games:
+            if int(game.get("season") or 0) == self.season and _day(game.get("game_date")) == cutoff:
+                rows.extend(self.game_stats.get(int(game["game_id"]), []))
+        return rows
+
+    def game_dates(self, start_date: date, end_date: date) -> List[date]:
+        """Dates in [start_date, end_date] with player_game_stats rows."""
+        return [
+            date.fromisoformat(d) for d in self.dates.tolist()
+            if start_date.isoformat() <= d <= end_date.isoformat()
+        ]
+
+
+# ----------------------------------------------------------------------
+# Evaluating dates
+# ----------------------------------------------------------------------
+
+_worker_context: Optional[AsOfContext] = None
+
+
+def project_date(
+    ctx: AsOfContext,
+    as_of: date,
+    scoring_settings: Dict[str, Any]
+) -> List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+    """
+    Project one date's slate as of that date.
+
+    Args:
+        ctx: Loaded AsOfContext
+        as_of: Slate date
+        scoring_settings: League scoring settings
+
+    Returns:
+        (player_game_stats row, projection or None) per player who played that day
+    """
+    view = ctx.view(as_of)
+    season = ctx.season
+    # Baselines depend on season-to-date goalie totals; the team table on the date
+    cdp._baseline_cache.pop(season, None)
+    cdp.set_team_context(season, build_team_context(view, as_of, season, verbose=False))
+    try:
+        slate = [r for r in ctx.slate(as_of) if r.get("player_id")]
+        tasks = [(int(r["player_id"]), int(r["game_id"]), as_of) for r in slate]
+        projections = project_slate(view, tasks, season, scoring_settings) if tasks else []
+    finally:
+        cdp.clear_team_context(season)
+        cdp._baseline_cache.pop(season, None)
+    return list(zip(slate, projections))
+
+
+def init_asof_worker(ctx: Optional[AsOfContext] = None) -> None:
+    """Pool initializer: the pooled client for fall-through queries, plus the context (spawn)."""
+    global _worker_context
+    init_projection_worker(None)
+    if ctx is not None:
+        _worker_context = ctx
+    if _worker_context is not None:
+        _worker_context.db = worker_db()
+
+
+def _project_date_task(as_of: date, scoring_settings: Dict[str, Any]):
+    return as_of, project_date(_worker_context, as_of, scoring_settings)
+
+
+def run_dates(
+    ctx: AsOfContext,
+    dates: Sequence[date],
+    scoring_settings: Dict[str, Any],
+    workers: Optional[int] = None
+) -> Iterator[Tuple[date, List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]]]:
+    """
+    project_date() for every date, spread over a process pool.
+
+    Args:
+        ctx: Loaded AsOfContext
+        dates: Slate dates
+        scoring_settings: League scoring settings
+        workers: Processes (default: CPU count; 1 = run in this process)
+
+    Yields:
+        (date, project_date() result) in completion order
+    """
+    global _worker_context
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(dates) <= 1:
+        for as_of in dates:
+            yield as_of, project_date(ctx, as_of, scoring_settings)
+        return
+
+    # Under fork the children inherit the loaded context; otherwise it is
+    # pickled once per worker through initargs
+    _worker_context = ctx
+    initargs = (None,) if multiprocessing.get_start_method(allow_none=False) == "fork" else (ctx,)
+    with ProcessPoolExecutor(max_workers=min(workers, len(dates)), initializer=init_asof_worker,
+                             initargs=initargs) as pool:
+        futures = [pool.submit(_project_date_task, as_of, scoring_settings) for as_of in dates]
+        for future in as_completed(futures):
+            yield future.result()
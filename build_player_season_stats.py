@@ -51,19 +51,12 @@ def _now_iso() -> str:
 
 
 def fetch_all_player_game_stats(db: SupabaseRest, season: int) -> List[dict]:
-  # Paginated pull to get all rows
+  # Keyset-paginated pull to get all rows (PK within a season is game_id, player_id)
   all_rows = []
-  offset = 0
-  page_size = 1000
-  while True:
-    page = db.select("player_game_stats", select="*", filters=[("season", "eq", season)], limit=page_size, offset=offset)
-    if not page:
-      break
+  for page in db.iter_select("player_game_stats", select="*", filters=[("season", "eq", season)],
+                             key=("game_id", "player_id"), streams=4):
     all_rows.extend(page)
-    if len(page) < page_size:
-      break
-    offset += page_size
-    if offset % 5000 == 0:
+    if len(all_rows) % 5000 < len(page):
       print(f"[build_player_season_stats] Fetched {len(all_rows)} rows so far...")
   return all_rows
 
@@ -77,8 +70,6 @@ def try_fetch_xg_totals(db: SupabaseRest, season: int) -> Dict[int, Dict[str, fl
   import time
   try:
     out: Dict[int, Dict[str, float]] = {}
-    batch_size = 1000  # PostgREST max limit
-    offset = 0
     shot_count = 0
     last_progress_time = time.time()
     use_talent_adjusted = False
@@ -105,12 +96,13 @@ def try_fetch_xg_totals(db: SupabaseRest, season: int) -> Dict[int, Dict[str, fl
         # Last resort: try old column names
         select_cols = "player_id,xg,xa"
     
-    # Fetch all rows with pagination
+    # Stream all rows with keyset pagination over parallel id ranges
+    pages = db.iter_select("raw_shots", select=select_cols, key="id", streams=4)
     while True:
       try:
-        rows = db.select("raw_shots", select=select_cols, limit=batch_size, offset=offset)
+        rows = next(pages, None)
       except Exception as e:
-        print(f"[build_player_season_stats] Warning: Could not fetch xG/xA batch at offset {offset}: {e}")
+        print(f"[build_player_season_stats] Warning: Could not fetch xG/xA batch after {shot_count:,} shots: {e}")
         break
       
       if not rows:
@@ -149,12 +141,6 @@ def try_fetch_xg_totals(db: SupabaseRest, season: int) -> Dict[int, Dict[str, fl
       if current_time - last_progress_time >= 15:
         print(f"  [PROGRESS] Scanned {shot_count:,} shots, enriched {len(out)} players...")
         last_progress_time = current_time
-      
-      # Check if we got fewer rows than batch_size (last page)
-      if len(rows) < batch_size:
-        break
-      
-      offset += batch_size
     
     print(f"[build_player_season_stats] Enriched xG/xA for {len(out)} players from {shot_count:,} shots")
     return out
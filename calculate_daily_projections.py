@@ -49,21 +49,34 @@ if not SUPABASE_URL or not SUPABASE_KEY:
     raise RuntimeError("Missing VITE_SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY in environment.")
 
 DEFAULT_SEASON = int(os.getenv("CITRUS_DEFAULT_SEASON", "2025"))
+TEAM_CONTEXT_LAST_N_GAMES = 10  # Window the DDR helpers use for team xGA / shots-for
 
 
 def supabase_client() -> SupabaseRest:
     return SupabaseRest(SUPABASE_URL, SUPABASE_KEY)
 
 
+# Module-level cache of league_averages rows per (position, season); these are
+# fixed for a run and were re-read for every player
+_league_averages_cache: Dict[Tuple[str, int], Optional[Dict[str, Any]]] = {}
+
+
 def get_league_averages(db: SupabaseRest, position: str, season: int) -> Optional[Dict[str, float]]:
     """
     Fetch league averages for a position from league_averages table.
     
+    Cached per (position, season) in _league_averages_cache; callers get a copy
+    (get_hybrid_league_averages() fills defaults into it).
+    
     Returns:
         Dict with avg_ppg, avg_goals_per_game, avg_assists_per_game, avg_sog_per_game, avg_blocks_per_game,
         replacement_fpts_per_60, std_dev_fpts_per_60, and other replacement/std_dev columns
         or None if not found
     """
+    if (position, season) in _league_averages_cache:
+        cached = _league_averages_cache[(position, season)]
+        return dict(cached) if cached is not None else None
+    
     try:
         results = db.select(
             "league_averages",
@@ -72,9 +85,10 @@ def get_league_averages(db: SupabaseRest, position: str, season: int) -> Optiona
             limit=1
         )
         
+        averages = None
         if results and len(results) > 0:
             avg = results[0]
-            return {
+            averages = {
                 "avg_ppg": float(avg.get("avg_ppg", 0)),
                 "avg_goals_per_game": float(avg.get("avg_goals_per_game", 0)),
                 "avg_assists_per_game": float(avg.get("avg_assists_per_game", 0)),
@@ -95,6 +109,8 @@ def get_league_averages(db: SupabaseRest, position: str, season: int) -> Optiona
                 "std_dev_sog_per_game": avg.get("std_dev_sog_per_game"),
                 "std_dev_blocks_per_game": avg.get("std_dev_blocks_per_game"),
             }
+        _league_averages_cache[(position, season)] = averages
+        return dict(averages) if averages is not None else None
     except Exception as e:
         print(f"⚠️  Warning: Could not fetch league averages for {position}: {e}")
     
@@ -317,6 +333,59 @@ def get_latest_baselines(db: SupabaseRest, season: int) -> Dict[str, float]:
     return fallback
 
 
+# Per-slate team context built once by team_context.build_team_context():
+# {season: {team_abbrev: row}}. The team-level DDR helpers below answer from
+# it instead of recomputing the same opponent numbers for every player.
+_team_context_cache: Dict[int, Dict[str, Dict[str, Any]]] = {}
+
+
+def set_team_context(season: int, teams: Dict[str, Dict[str, Any]]) -> None:
+    """Register a team context table (see team_context.py) for the season."""
+    _team_context_cache[season] = dict(teams)
+
+
+def clear_team_context(season: Optional[int] = None) -> None:
+    """Drop the registered team context (one season or all)."""
+    if season is None:
+        _team_context_cache.clear()
+    else:
+        _team_context_cache.pop(season, None)
+
+
+def get_team_context(team: str, season: int) -> Optional[Dict[str, Any]]:
+    """Registered team context row for a team, or None to compute it on demand."""
+    return _team_context_cache.get(season, {}).get(team)
+
+
+def combine_ddr(
+    opponent_xga_per_60: Optional[float],
+    goalie_sv_pct: Optional[float],
+    opponent_shots_for: Optional[float],
+    league_avg_xga_per_60: float,
+    league_avg_sv_pct: float,
+    league_avg_shots_for: float
+) -> Tuple[float, float, float, float]:
+    """
+    DDR = Team_Defense x Goalie x Offense, capped to [0.7, 1.3].
+
+    Missing components count as 1.0 (same as get_opponent_strength()).
+
+    Returns:
+        (capped DDR, team_multiplier, goalie_multiplier, offense_multiplier)
+    """
+    team_multiplier = 1.0
+    if opponent_xga_per_60 and opponent_xga_per_60 != 0:
+        team_multiplier = opponent_xga_per_60 / league_avg_xga_per_60
+    goalie_multiplier = 1.0
+    if goalie_sv_pct and goalie_sv_pct != 0:
+        goalie_multiplier = league_avg_sv_pct / goalie_sv_pct
+    offense_multiplier = 1.0
+    if opponent_shots_for and league_avg_shots_for > 0:
+        offense_multiplier = opponent_shots_for / league_avg_shots_for
+    ddr = team_multiplier * goalie_multiplier * offense_multiplier
+    return max(0.7, min(1.3, ddr)), team_multiplier, goalie_multiplier, offense_multiplier
+
+
 def calculate_bayesian_weight(games_played: int) -> float:
     """
     Calculate Bayesian shrinkage weight based on games played.
@@ -383,6 +452,55 @@ def calculate_xga_shrinkage(
     return shrunk_xga
 
 
+def get_hybrid_league_averages(db: SupabaseRest, position: str, season: int) -> Dict[str, float]:
+    """
+    League per-game averages used as the shrinkage target in calculate_hybrid_base().
+    
+    Wraps get_league_averages() and fills PPP/SHP/Hits/PIM with position-specific
+    defaults when the league_averages row is missing or not yet populated.
+    
+    Returns:
+        Dict with avg_<stat>_per_game for all 8 skater stats
+    """
+    league_avg = get_league_averages(db, position, season)
+    if not league_avg:
+        print(f"⚠️  No league averages found for position {position}, using defaults")
+        league_avg = {
+            "avg_goals_per_game": 0.0,
+            "avg_assists_per_game": 0.0,
+            "avg_sog_per_game": 0.0,
+            "avg_blocks_per_game": 0.0
+        }
+    
+    # Use league averages for all 8 stats (now that they're in the table)
+    # Fallback to defaults only if league_averages table doesn't have the data yet
+    # Position-specific defaults for PPP and Hits (used only if league avg is 0 or missing)
+    if position == "D":
+        default_ppp = 0.10
+        default_hits = 1.5
+    else:
+        default_ppp = 0.15
+        default_hits = 1.0
+    
+    # Use league average if available, otherwise fallback to defaults
+    league_avg.setdefault("avg_ppp_per_game", default_ppp)
+    league_avg.setdefault("avg_shp_per_game", 0.02)
+    league_avg.setdefault("avg_hits_per_game", default_hits)
+    league_avg.setdefault("avg_pim_per_game", 0.5)
+    
+    # If league average is 0 (not yet populated), use defaults
+    if league_avg.get("avg_ppp_per_game", 0) == 0:
+        league_avg["avg_ppp_per_game"] = default_ppp
+    if league_avg.get("avg_shp_per_game", 0) == 0:
+        league_avg["avg_shp_per_game"] = 0.02
+    if league_avg.get("avg_hits_per_game", 0) == 0:
+        league_avg["avg_hits_per_game"] = default_hits
+    if league_avg.get("avg_pim_per_game", 0) == 0:
+        league_avg["avg_pim_per_game"] = 0.5
+    
+    return league_avg
+
+
 def calculate_hybrid_base(
     db: SupabaseRest,
     player_id: int,
@@ -436,20 +554,8 @@ def calculate_hybrid_base(
             "pim": float(stats.get("pim", 0)) / gp,
         }
     
-    # Get league averages
-    league_avg = get_league_averages(db, position, season)
-    if not league_avg:
-        print(f"⚠️  No league averages found for position {position}, using defaults")
-        league_avg = {
-            "avg_goals_per_game": 0.0,
-            "avg_assists_per_game": 0.0,
-            "avg_sog_per_game": 0.0,
-            "avg_blocks_per_game": 0.0
-        }
-    
-    # Use league averages for all 8 stats (now that they're in the table)
-    # Fallback to defaults only if league_averages table doesn't have the data yet
-    # Position-specific defaults for PPP and Hits (used only if league avg is 0 or missing)
+    # Get league averages (with position-specific fallbacks for unpopulated columns)
+    league_avg = get_hybrid_league_averages(db, position, season)
     if position == "D":
         default_ppp = 0.10
         default_hits = 1.5
@@ -457,22 +563,6 @@ def calculate_hybrid_base(
         default_ppp = 0.15
         default_hits = 1.0
     
-    # Use league average if available, otherwise fallback to defaults
-    league_avg.setdefault("avg_ppp_per_game", default_ppp)
-    league_avg.setdefault("avg_shp_per_game", 0.02)
-    league_avg.setdefault("avg_hits_per_game", default_hits)
-    league_avg.setdefault("avg_pim_per_game", 0.5)
-    
-    # If league average is 0 (not yet populated), use defaults
-    if league_avg.get("avg_ppp_per_game", 0) == 0:
-        league_avg["avg_ppp_per_game"] = default_ppp
-    if league_avg.get("avg_shp_per_game", 0) == 0:
-        league_avg["avg_shp_per_game"] = 0.02
-    if league_avg.get("avg_hits_per_game", 0) == 0:
-        league_avg["avg_hits_per_game"] = default_hits
-    if league_avg.get("avg_pim_per_game", 0) == 0:
-        league_avg["avg_pim_per_game"] = 0.5
-    
     # Calculate weight (same for all stats)
     weight = calculate_bayesian_weight(games_played)
     
@@ -593,6 +683,10 @@ def get_opposing_goalie_save_pct(
     Returns:
         Save percentage as decimal (e.g., 0.930) or None if unavailable
     """
+    team_ctx = get_team_context(opponent_team, season)
+    if team_ctx is not None and not debug:
+        return team_ctx["goalie_sv_pct"]
+
     try:
         if debug:
             print(f"  [DDR Debug] Getting goalie SV% for opponent: {opponent_team}")
@@ -680,6 +774,10 @@ def get_team_xga_per_60(
     Returns:
         xGA per 60 minutes (e.g., 2.3) or None if unavailable
     """
+    team_ctx = get_team_context(team, season)
+    if team_ctx is not None and last_n_games == TEAM_CONTEXT_LAST_N_GAMES and not debug:
+        return team_ctx["xga_per_60"]
+
     try:
         # Use canonical team code for cache lookups (ensures ARI/UTA continuity)
         canonical_team = get_canonical_team_code(db, team)
@@ -889,6 +987,10 @@ def get_opponent_shots_for_per_60(
     Returns:
         Shots for per 60 minutes (e.g., 32.5) or None if unavailable
     """
+    team_ctx = get_team_context(opponent_team, season)
+    if team_ctx is not None and last_n_games == TEAM_CONTEXT_LAST_N_GAMES and not debug:
+        return team_ctx["shots_for_per_60"]
+
     try:
         if debug:
             print(f"  [Goalie Projection] Calculating shots for/60 for opponent: {opponent_team}")
@@ -1141,6 +1243,14 @@ def get_opponent_strength(
     Returns:
         Multiplier (typically 0.7 to 1.3)
     """
+    team_ctx = get_team_context(opponent_team, season)
+    if team_ctx is not None and not debug:
+        league_avg_shots_for = get_latest_baselines(db, season).get("league_avg_shots_for_per_60", 30.0)
+        return combine_ddr(
+            team_ctx["xga_per_60"], team_ctx["goalie_sv_pct"], team_ctx["shots_for_per_60"],
+            league_avg_xga_per_60, league_avg_sv_pct, league_avg_shots_for
+        )[0]
+
     try:
         if debug:
             print(f"\n[DDR Debug] Calculating DDR for opponent: {opponent_team}")
@@ -1368,13 +1478,17 @@ def get_opponent_offensive_context(
         return {"finishing_ratio": 1.0, "hd_rate": 5.0}  # Defaults on error
 
 
-def check_back_to_back(db: SupabaseRest, team: str, game_date: date) -> float:
+def check_back_to_back(db: SupabaseRest, team: str, game_date: date, season: int = DEFAULT_SEASON) -> float:
     """
     Check if team is playing back-to-back games.
     
     Returns:
         0.95 if B2B (5% penalty), 1.0 otherwise
     """
+    team_ctx = get_team_context(team, season)
+    if team_ctx is not None and team_ctx.get("context_date") == game_date.isoformat():
+        return team_ctx["b2b_penalty"]
+
     try:
         # Get previous game date for this team
         previous_games = db.select(
@@ -1382,7 +1496,7 @@ def check_back_to_back(db: SupabaseRest, team: str, game_date: date) -> float:
             select="game_date",
             filters=[
                 ("game_date", "lt", game_date.isoformat()),
-                ("season", "eq", DEFAULT_SEASON)
+                ("season", "eq", season)
             ],
             order="game_date.desc",
             limit=10
@@ -1598,7 +1712,7 @@ def calculate_goalie_projection(
             win_probability = 0.5  # Default to 50% if unavailable
         
         # Apply B2B penalty to win probability
-        b2b_penalty = check_back_to_back(db, goalie_team, game_date)
+        b2b_penalty = check_back_to_back(db, goalie_team, game_date, season)
         if b2b_penalty < 1.0:
             # If B2B, previous night's starter is unlikely to start → reduce win prob
             win_probability *= 0.85  # 15% reduction for B2B
@@ -1931,7 +2045,7 @@ def calculate_skater_physical_projection(
     game_info = game_info_list[0] if game_info_list else {"home_team": "", "away_team": ""}
     
     # Get B2B and home/away adjustments
-    b2b_penalty = check_back_to_back(db, player_team, game_date)
+    b2b_penalty = check_back_to_back(db, player_team, game_date, season)
     home_away_adjustment = get_home_away_adjustment(player_team, game_info)
     
     # Apply adjustments to physical stats
@@ -2897,7 +3011,7 @@ def calculate_daily_projection(
             LEAGUE_AVG_XGA_PER_60, LEAGUE_AVG_SV_PCT, debug=debug_ddr
         )
         
-        b2b_penalty = check_back_to_back(db, player_team, game_date)
+        b2b_penalty = check_back_to_back(db, player_team, game_date, season)
         home_away_adjustment = get_home_away_adjustment(player_team, game)
         
         # Apply adjustments in correct order
@@ -16,8 +16,9 @@ Features:
 
 import os
 import sys
+import time
 import datetime as dt
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 from decimal import Decimal
 
 from dotenv import load_dotenv
@@ -716,6 +717,205 @@ def update_active_matchup_scores(
         return {"updated": 0, "failed": 0, "total": 0, "error": str(e)}
 
 
+MATCHUP_INDEX_TTL = int(os.getenv("CITRUS_MATCHUP_INDEX_TTL", "900"))  # Seconds before rosters are re-read
+PLAYER_ID_BATCH_SIZE = 200  # player_ids per `in` filter
+
+
+class MatchupIndex:
+    """
+    Cached player -> active matchup lookup for incremental live scoring.
+
+    Built from one read each of matchups, draft_picks, leagues and
+    player_directory, then reused across live polls until it is older than
+    ttl_seconds (rosters only move via drafts, trades and waivers).
+
+    Each entry in by_player is (league_id, team_id, matchup_id); a player can
+    appear once per league they are rostered in.
+    """
+
+    def __init__(self, ttl_seconds: int = MATCHUP_INDEX_TTL):
+        self.ttl_seconds = ttl_seconds
+        self.built_at = 0.0
+        self.matchups: Dict[str, Dict[str, Any]] = {}
+        self.by_player: Dict[int, List[Tuple[str, str, str]]] = {}
+        self.scoring_settings: Dict[str, Dict[str, Any]] = {}
+        self.goalies: Set[int] = set()
+
+    def is_stale(self) -> bool:
+        return time.time() - self.built_at > self.ttl_seconds
+
+    def refresh(self, db: SupabaseRest) -> "MatchupIndex":
+        """Rebuild the index from the active matchups and their rosters."""
+        matchups = get_active_matchups(db)
+        self.matchups = {m["id"]: m for m in matchups}
+        self.by_player = {}
+        self.scoring_settings = {}
+        self.goalies = set()
+
+        # (league_id, team_id) -> matchup_id
+        team_matchup: Dict[Tuple[str, str], str] = {}
+        for m in matchups:
+            team_matchup[(m["league_id"], m["team1_id"])] = m["id"]
+            if m.get("team2_id"):
+                team_matchup[(m["league_id"], m["team2_id"])] = m["id"]
+
+        league_ids = sorted({m["league_id"] for m in matchups})
+        if league_ids:
+            picks = db.select_all(
+                "draft_picks",
+                select="id,league_id,team_id,player_id",
+                filters=[("league_id", "in", league_ids), ("deleted_at", "is", "null")]
+            )
+            for pick in picks:
+                matchup_id = team_matchup.get((pick.get("league_id"), pick.get("team_id")))
+                pid = _safe_int(pick.get("player_id"))
+                if matchup_id and pid:
+                    self.by_player.setdefault(pid, []).append((pick["league_id"], pick["team_id"], matchup_id))
+
+            for league_id in league_ids:
+                self.scoring_settings[league_id] = load_league_scoring_settings(db, league_id)
+
+        player_ids = sorted(self.by_player)
+        for i in range(0, len(player_ids), PLAYER_ID_BATCH_SIZE):
+            rows = db.select(
+                "player_directory",
+                select="player_id,position_code,is_goalie",
+                filters=[
+                    ("season", "eq", DEFAULT_SEASON),
+                    ("player_id", "in", player_ids[i:i + PLAYER_ID_BATCH_SIZE])
+                ]
+            ) or []
+            for row in rows:
+                position = (row.get("position_code", "") or "").upper()
+                if row.get("is_goalie") or "G" in position:
+                    self.goalies.add(_safe_int(row.get("player_id")))
+
+        self.built_at = time.time()
+        print(f"[MatchupIndex] {len(self.matchups)} active matchups, {len(self.by_player)} rostered players")
+        return self
+
+    def ensure_fresh(self, db: SupabaseRest) -> "MatchupIndex":
+        if self.is_stale():
+            self.refresh(db)
+        return self
+
+    def affected(self, player_ids: Iterable[int]) -> Dict[str, Dict[str, Set[int]]]:
+        """
+        Group changed players by the matchup and fantasy team that roster them.
+
+        Returns:
+            {matchup_id: {team_id: {player_id, ...}}} (unrostered players are dropped)
+        """
+        grouped: Dict[str, Dict[str, Set[int]]] = {}
+        for pid in player_ids:
+            for _league_id, team_id, matchup_id in self.by_player.get(_safe_int(pid), []):
+                grouped.setdefault(matchup_id, {}).setdefault(team_id, set()).add(_safe_int(pid))
+        return grouped
+
+
+_matchup_index: Optional[MatchupIndex] = None
+
+
+def get_matchup_index() -> MatchupIndex:
+    """Process-wide MatchupIndex shared by the live polling loop."""
+    global _matchup_index
+    if _matchup_index is None:
+        _matchup_index = MatchupIndex()
+    return _matchup_index
+
+
+def update_matchup_scores_for_players(
+    db: SupabaseRest,
+    player_ids: Iterable[int],
+    index: Optional[MatchupIndex] = None
+) -> Dict[str, Any]:
+    """
+    Incrementally rescore only the matchups that roster the given players.
+
+    For each affected matchup the changed players' fantasy_matchup_lines are
+    recomputed and upserted (points and stats_breakdown only - games remaining
+    and live flags stay with the full calculate_matchup_scores pass), and the
+    affected teams' totals are re-read from calculate_matchup_total_score, the
+    same per-team calculation update_all_matchup_scores uses. Untouched
+    matchups and leagues cost nothing, so a live poll scales with the players
+    whose scored stats moved rather than with the number of leagues.
+
+    Args:
+        db: Supabase client
+        player_ids: Players whose scored stats changed since the last refresh
+        index: MatchupIndex to use (default: the shared process-wide index)
+
+    Returns:
+        Dictionary with update statistics (same shape as update_active_matchup_scores)
+    """
+    index = (index or get_matchup_index()).ensure_fresh(db)
+    grouped = index.affected(player_ids)
+    if not grouped:
+        return {"updated": 0, "failed": 0, "total": 0, "results": []}
+
+    # One stats fetch per scoring week, covering every changed player in it
+    by_week: Dict[Tuple[str, str], Set[int]] = {}
+    for matchup_id, teams in grouped.items():
+        m = index.matchups[matchup_id]
+        week = (m["week_start_date"], m["week_end_date"])
+        for pids in teams.values():
+            by_week.setdefault(week, set()).update(pids)
+    week_stats = {
+        week: fetch_player_matchup_stats(db, sorted(pids), week[0], week[1])
+        for week, pids in by_week.items()
+    }
+
+    results: List[Dict[str, Any]] = []
+    for matchup_id, teams in grouped.items():
+        m = index.matchups[matchup_id]
+        scoring_settings = index.scoring_settings.get(m["league_id"]) or _get_default_scoring_settings()
+        player_stats = week_stats[(m["week_start_date"], m["week_end_date"])]
+        try:
+            now = _now_iso()
+            player_lines = []
+            for team_id, pids in teams.items():
+                for pid in sorted(pids):
+                    total_points, breakdown = calculate_fantasy_points(
+                        player_stats.get(pid, {}), scoring_settings, pid in index.goalies
+                    )
+                    player_lines.append({
+                        "matchup_id": matchup_id,
+                        "player_id": pid,
+                        "team_id": team_id,
+                        "total_points": total_points,
+                        "stats_breakdown": build_stats_breakdown(player_stats.get(pid, {}), breakdown),
+                        "updated_at": now
+                    })
+            upsert_matchup_lines(db, matchup_id, player_lines)
+
+            scores: Dict[str, Any] = {}
+            for column in ("team1", "team2"):
+                team_id = m.get(f"{column}_id")
+                if team_id and team_id in teams:
+                    total = db.rpc("calculate_matchup_total_score", {
+                        "p_matchup_id": matchup_id,
+                        "p_team_id": team_id,
+                        "p_week_start": m["week_start_date"],
+                        "p_week_end": m["week_end_date"]
+                    })
+                    scores[f"{column}_score"] = _safe_float(total)
+            db.update("matchups", {**scores, "updated_at": now}, filters=[("id", "eq", matchup_id)])
+            results.append({"matchup_id": matchup_id, **scores, "players": len(player_lines), "updated": True})
+        except Exception as e:
+            print(f"[WARNING] Incremental update failed for matchup {matchup_id}: {e}")
+            results.append({"matchup_id": matchup_id, "updated": False, "error": str(e)})
+
+    updated_count = sum(1 for r in results if r["updated"])
+    print(f"[update_matchup_scores_for_players] {updated_count}/{len(results)} matchups rescored "
+          f"for {sum(len(p) for t in grouped.values() for p in t.values())} changed player line(s)")
+    return {
+        "updated": updated_count,
+        "failed": len(results) - updated_count,
+        "total": len(results),
+        "results": results
+    }
+
+
 def calculate_matchup_scores(
     db: SupabaseRest,
     matchup_id: Optional[str] = None,
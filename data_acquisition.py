@@ -7,6 +7,7 @@ import datetime
 from dotenv import load_dotenv # Used to load your .env file
 from supabase import create_client, Client
 from src.utils.citrus_request import citrus_request
+from pbp_events import decode_game
 
 # Set UTF-8 encoding for stdout to handle Unicode characters on Windows
 import sys
@@ -19,7 +20,6 @@ if sys.stdout.encoding != 'utf-8':
         sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
 # data_acquisition.py (continued)
-import joblib # Tool for loading saved ML models
 import math # For calculating distance/angle
 import numpy as np
 
@@ -44,107 +44,35 @@ except ImportError:
             return angle, distance
         return None, None 
 
-# --- CRITICAL: LOAD THE TRAINED MODEL ---
-# Suppress sklearn version warnings for loaded models (models saved with older sklearn version)
-import warnings
-# Suppress InconsistentVersionWarning from sklearn when loading models
-warnings.filterwarnings('ignore', message='.*Trying to unpickle.*', category=UserWarning)
+# --- TRAINED MODELS ---
+# The xG / xA / rebound models and the feature encoders are owned by the process's
+# inference service (xg_inference.py) and loaded on first use, not at import.
+from xg_inference import get_inference_service, get_shot_models
 
-# Verify model files exist before attempting to load
-def _verify_model_files():
-    """Verify critical model files exist, provide helpful error if not."""
-    import os
-    # Models are now stored in models/ folder
-    model_dir = os.path.join(os.path.dirname(__file__), 'models')
-    critical_files = ['xg_model_moneypuck.joblib', 'xg_model.joblib']
-    missing = [f for f in critical_files if not os.path.exists(os.path.join(model_dir, f))]
-    if len(missing) == len(critical_files):
-        print("=" * 80)
-        print("ERROR: xG MODEL FILES NOT FOUND")
-        print("=" * 80)
-        print(f"Required model files are missing from {model_dir}")
-        print()
-        print("=" * 80)
-        return False
-    return True
+# Old module-level names, resolved lazily (from data_acquisition import SHOT_TYPE_ENCODER, ...)
+_LAZY_MODEL_ATTRS = {
+    'XG_MODEL': 'xg_model',
+    'MODEL_FEATURES': 'xg_features',
+    'USE_MONEYPUCK_MODEL': 'use_moneypuck',
+    'XA_MODEL': 'xa_model',
+    'XA_MODEL_FEATURES': 'xa_features',
+    'REBOUND_MODEL': 'rebound_model',
+    'REBOUND_MODEL_FEATURES': 'rebound_features',
+    'LAST_EVENT_CATEGORY_ENCODER': 'last_event_category_encoder',
+    'SHOT_TYPE_ENCODER': 'shot_type_encoder',
+    'PASS_ZONE_ENCODER': 'pass_zone_encoder',
+}
+
+def __getattr__(name):
+    if name in _LAZY_MODEL_ATTRS:
+        return getattr(get_shot_models(), _LAZY_MODEL_ATTRS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Helper to get model path
 def _model_path(filename):
     """Get the full path to a model file."""
-    import os
     return os.path.join(os.path.dirname(__file__), 'models', filename)
 
-# Verify files before loading
-if not _verify_model_files():
-    print("ERROR: Cannot proceed without model files. Exiting.")
-    exit(1)
-
-# Try to load MoneyPuck-aligned model first, fallback to old model
-try:
-    # Try MoneyPuck-aligned model (new, recommended)
-    try:
-        XG_MODEL = joblib.load(_model_path('xg_model_moneypuck.joblib'))
-        MODEL_FEATURES = joblib.load(_model_path('model_features_moneypuck.joblib'))
-        print("[OK] Loaded MoneyPuck-aligned xG model")
-        USE_MONEYPUCK_MODEL = True
-    except FileNotFoundError:
-        # Fallback to old model
-        XG_MODEL = joblib.load(_model_path('xg_model.joblib'))
-        try:
-            MODEL_FEATURES = joblib.load(_model_path('model_features.joblib'))
-        except FileNotFoundError:
-            # Fallback to default if feature list not found
-            MODEL_FEATURES = ['distance', 'angle', 'is_rebound', 'shot_type_encoded', 'is_power_play', 'score_differential',
-                             'is_slot_shot',
-                             'has_pass_before_shot', 'pass_lateral_distance', 'pass_to_net_distance',
-                             'pass_zone_encoded', 'pass_immediacy_score', 'goalie_movement_score', 'pass_quality_score']
-        print("[WARNING] Using old xG model. Consider retraining with MoneyPuck targets.")
-        USE_MONEYPUCK_MODEL = False
-    
-    # Load the last_event_category encoder (for MoneyPuck model)
-    try:
-        LAST_EVENT_CATEGORY_ENCODER = joblib.load(_model_path('last_event_category_encoder.joblib'))
-    except FileNotFoundError:
-        print("WARNING: last_event_category_encoder.joblib not found. Will encode on-the-fly if needed.")
-        LAST_EVENT_CATEGORY_ENCODER = None
-    
-    # Load the shot type encoder
-    try:
-        SHOT_TYPE_ENCODER = joblib.load(_model_path('shot_type_encoder.joblib'))
-    except FileNotFoundError:
-        print("WARNING: shot_type_encoder.joblib not found. Shot type encoding may fail.")
-        SHOT_TYPE_ENCODER = None
-    
-    # Load the pass zone encoder
-    try:
-        PASS_ZONE_ENCODER = joblib.load(_model_path('pass_zone_encoder.joblib'))
-    except FileNotFoundError:
-        print("WARNING: pass_zone_encoder.joblib not found. Pass zone encoding may fail.")
-        PASS_ZONE_ENCODER = None
-    
-    # Load the xA (Expected Assists) model
-    try:
-        XA_MODEL = joblib.load(_model_path('xa_model.joblib'))
-        XA_MODEL_FEATURES = joblib.load(_model_path('xa_model_features.joblib'))
-        print("xA model loaded successfully.")
-    except FileNotFoundError:
-        print("WARNING: xa_model.joblib not found. Expected Assists calculation will be skipped.")
-        XA_MODEL = None
-        XA_MODEL_FEATURES = None
-    
-    # Load the Rebound model (for Expected Rebounds)
-    try:
-        REBOUND_MODEL = joblib.load(_model_path('rebound_model.joblib'))
-        REBOUND_MODEL_FEATURES = joblib.load(_model_path('rebound_model_features.joblib'))
-        print("[OK] Rebound model loaded successfully.")
-    except FileNotFoundError:
-        print("WARNING: rebound_model.joblib not found. Expected Rebounds calculation will be skipped.")
-        REBOUND_MODEL = None
-        REBOUND_MODEL_FEATURES = None
-except FileNotFoundError:
-    print("ERROR: No xG model found! Please run retrain_xg_with_moneypuck.py first!")
-    exit()
-
 # Define the center of the net coordinates for calculation (in standard NHL coordinates)
 NET_X, NET_Y = 89, 0
 
@@ -972,6 +900,10 @@ def get_fresh_supabase_client():
 MAX_429_RETRIES = 5
 BASE_429_DELAY = 2  # Start with a 2-second delay for 429
 
+# --- CONSTANTS FOR PIPELINED PBP INGESTION ---
+PBP_FETCH_WORKERS = int(os.getenv("CITRUS_PBP_FETCH_WORKERS", "8"))  # Concurrent PBP fetches (citrus_request rotates proxies per request)
+PBP_PREFETCH_DEPTH = int(os.getenv("CITRUS_PBP_PREFETCH_DEPTH", "32"))  # Max fetched-but-unprocessed games held in memory
+
 
 def _extract_shots_from_game(raw_data, game_id, db_client):
     """
@@ -987,6 +919,7 @@ def _extract_shots_from_game(raw_data, game_id, db_client):
         List of shot record dictionaries
     """
     all_shot_data = []
+    models = get_shot_models()  # Feature encoders
     
     try:
         # Initialize tracking variables (same as scrape_pbp_and_process)
@@ -1001,23 +934,32 @@ def _extract_shots_from_game(raw_data, game_id, db_client):
             'period': None
         }
         
+        # Clock, type, coordinates and situation come from the shared columnar decode
+        # (one parse per game); only shot events read their details dict
+        plays = raw_data.get('plays', [])
+        events = decode_game(raw_data, game_id)
+        type_codes = events.type_code.tolist()
+        x_coords = events.x.tolist()
+        y_coords = events.y.tolist()
+        periods = events.period.tolist()
+        clock_seconds = events.seconds.astype(int).tolist()
+        situation_known = (events.situation_code >= 0).tolist()
+        
         # Process all plays in the game (extract logic from lines 1031-2219)
-        for play in raw_data.get('plays', []):
-            type_code = play.get('typeCode')
-            details = play.get('details', {})
+        for play_index, play in enumerate(plays):
+            type_code = type_codes[play_index]
             
-            # Get current event coordinates and time
-            current_x = details.get('xCoord') if details else None
-            current_y = details.get('yCoord') if details else None
-            current_time_in_period = play.get('timeInPeriod', '')
-            current_period = play.get('periodDescriptor', {}).get('number')
-            current_time_seconds = parse_time_to_seconds(current_time_in_period)
+            # Get current event coordinates (NaN when missing) and time
+            current_x = x_coords[play_index]
+            current_y = y_coords[play_index]
+            current_period = periods[play_index]
+            current_time_seconds = clock_seconds[play_index]
             
             is_shot_event = type_code in [505, 506, 507]
             
             if not is_shot_event:
                 # Update state for non-shot events
-                if current_x is not None and current_y is not None and current_time_seconds is not None:
+                if not math.isnan(current_x) and not math.isnan(current_y):
                     if current_x < 0:
                         current_x = -current_x
                         current_y = -current_y if current_y else None
@@ -1029,6 +971,7 @@ def _extract_shots_from_game(raw_data, game_id, db_client):
                 continue
             
             # Process shot event (extract all the feature calculation logic)
+            details = play.get('details', {})
             if not details:
                 continue
             
@@ -1157,13 +1100,13 @@ def _extract_shots_from_game(raw_data, game_id, db_client):
                 zone_relative_distance = 1.0
             
             # Encode pass_zone
-            if PASS_ZONE_ENCODER:
+            if models.pass_zone_encoder:
                 try:
-                    if pass_zone in PASS_ZONE_ENCODER.classes_:
-                        pass_zone_encoded = PASS_ZONE_ENCODER.transform([pass_zone])[0]
+                    if pass_zone in models.pass_zone_encoder.classes_:
+                        pass_zone_encoded = models.pass_zone_encoder.transform([pass_zone])[0]
                     else:
-                        if 'no_pass' in PASS_ZONE_ENCODER.classes_:
-                            pass_zone_encoded = PASS_ZONE_ENCODER.transform(['no_pass'])[0]
+                        if 'no_pass' in models.pass_zone_encoder.classes_:
+                            pass_zone_encoded = models.pass_zone_encoder.transform(['no_pass'])[0]
                         else:
                             pass_zone_encoded = 0
                 except:
@@ -1186,13 +1129,13 @@ def _extract_shots_from_game(raw_data, game_id, db_client):
             }
             shot_type_standard = shot_type_mapping.get(shot_type_raw_lower, 'wrist')
             
-            if SHOT_TYPE_ENCODER:
+            if models.shot_type_encoder:
                 try:
-                    if shot_type_standard in SHOT_TYPE_ENCODER.classes_:
-                        shot_type_encoded = SHOT_TYPE_ENCODER.transform([shot_type_standard])[0]
+                    if shot_type_standard in models.shot_type_encoder.classes_:
+                        shot_type_encoded = models.shot_type_encoder.transform([shot_type_standard])[0]
                     else:
-                        if 'wrist' in SHOT_TYPE_ENCODER.classes_:
-                            shot_type_encoded = SHOT_TYPE_ENCODER.transform(['wrist'])[0]
+                        if 'wrist' in models.shot_type_encoder.classes_:
+                            shot_type_encoded = models.shot_type_encoder.transform(['wrist'])[0]
                         else:
                             shot_type_encoded = 0
                 except:
@@ -1204,37 +1147,18 @@ def _extract_shots_from_game(raw_data, game_id, db_client):
             situation_code_raw = play.get('situationCode', '')
             situation_code_str = str(situation_code_raw) if situation_code_raw else ''
             
-            # Parse situation code (simplified version)
+            # Skater counts from the decoded situationCode. This path has always read
+            # the second digit as "home" and the third as "away" (1541 -> 5/4); the
+            # trained models depend on it, so keep that orientation. Unknown codes are 5v5.
             home_skaters = 5
             away_skaters = 5
             is_empty_net = False
             home_empty_net = False
             away_empty_net = False
             
-            if situation_code_str:
-                if '-' in situation_code_str or 'v' in situation_code_str or 'V' in situation_code_str:
-                    parts = situation_code_str.replace('v', '-').replace('V', '-').split('-')
-                    if len(parts) >= 2:
-                        try:
-                            home_skaters = int(parts[0])
-                            away_skaters = int(parts[1])
-                        except ValueError:
-                            pass
-                else:
-                    try:
-                        code_int = int(situation_code_str)
-                        code_str = str(code_int)
-                        if len(code_str) == 3:
-                            home_skaters = int(code_str[0])
-                            away_skaters = int(code_str[1])
-                        elif len(code_str) == 4:
-                            home_skaters = int(code_str[1])
-                            away_skaters = int(code_str[2])
-                        elif len(code_str) == 2:
-                            home_skaters = int(code_str[0])
-                            away_skaters = int(code_str[1])
-                    except (ValueError, IndexError):
-                        pass
+            if situation_known[play_index]:
+                home_skaters = int(events.away_skaters[play_index])
+                away_skaters = int(events.home_skaters[play_index])
             
             if home_skaters == 6:
                 is_empty_net = True
@@ -1313,7 +1237,7 @@ def _extract_shots_from_game(raw_data, game_id, db_client):
                     (shot_coord_y - last_event_y)**2
                 )
                 
-                shot_time_seconds = parse_time_to_seconds(time_in_period)
+                shot_time_seconds = current_time_seconds
                 if (last_event_period == period_number and 
                     last_event_time is not None and
                     shot_time_seconds is not None and 
@@ -1394,9 +1318,8 @@ def _extract_shots_from_game(raw_data, game_id, db_client):
             shot_play_continued_in_zone = False
             shot_play_continued_outside_zone = False
             
-            play_index = raw_data.get('plays', []).index(play) if play in raw_data.get('plays', []) else -1
-            if play_index >= 0 and play_index < len(raw_data.get('plays', [])) - 1:
-                next_play = raw_data.get('plays', [])[play_index + 1]
+            if play_index < len(plays) - 1:
+                next_play = plays[play_index + 1]
                 next_type_code = next_play.get('typeCode')
                 next_details = next_play.get('details', {})
                 if next_type_code == 517 and time_since_last_event and time_since_last_event < 2.0:
@@ -1905,6 +1828,8 @@ def process_single_game(game_id, rate_limit_flag=None):
     import random
     import time
     
+    models = get_shot_models()
+    
     # 1. Initialize process-safe Supabase client
     db_client = get_fresh_supabase_client()
     
@@ -1998,11 +1923,11 @@ def process_single_game(game_id, rate_limit_flag=None):
             print(f"Game {game_id}: Warning - error applying calculated features: {e}")
         
         # Prepare features for xG prediction (same logic as scrape_pbp_and_process)
-        if USE_MONEYPUCK_MODEL and 'last_event_category_encoded' in MODEL_FEATURES:
+        if models.use_moneypuck and 'last_event_category_encoded' in models.xg_features:
             if 'last_event_category' in df_shots.columns and 'last_event_category_encoded' not in df_shots.columns:
                 from sklearn.preprocessing import LabelEncoder
-                if LAST_EVENT_CATEGORY_ENCODER is not None:
-                    df_shots['last_event_category_encoded'] = LAST_EVENT_CATEGORY_ENCODER.transform(
+                if models.last_event_category_encoder is not None:
+                    df_shots['last_event_category_encoded'] = models.last_event_category_encoder.transform(
                         df_shots['last_event_category'].fillna('unknown').astype(str)
                     )
                 else:
@@ -2020,7 +1945,7 @@ def process_single_game(game_id, rate_limit_flag=None):
             df_shots['speed_from_last_event_log'] = np.log1p(speed_series)
         
         # Ensure all required features exist
-        for feature in MODEL_FEATURES:
+        for feature in models.xg_features:
             if feature not in df_shots.columns:
                 if feature in ['home_empty_net', 'away_empty_net', 'is_empty_net', 
                               'has_pass_before_shot', 'is_rebound', 'is_slot_shot', 'is_power_play']:
@@ -2043,10 +1968,10 @@ def process_single_game(game_id, rate_limit_flag=None):
                     df_shots[feature] = 0
         
         # Select features and predict xG
-        X_predict = df_shots[MODEL_FEATURES].copy()
+        X_predict = df_shots[models.xg_features].copy()
         
         # Fill missing values
-        for feature in MODEL_FEATURES:
+        for feature in models.xg_features:
             if feature in X_predict.columns and X_predict[feature].isna().any():
                 if feature in ['pass_lateral_distance', 'pass_to_net_distance', 'pass_immediacy_score', 
                               'goalie_movement_score', 'pass_quality_score', 'pass_zone_encoded',
@@ -2070,32 +1995,20 @@ def process_single_game(game_id, rate_limit_flag=None):
                     median_val = pd.to_numeric(X_predict[feature], errors='coerce').median()
                     X_predict[feature] = pd.to_numeric(X_predict[feature], errors='coerce').fillna(median_val)
         
-        # Predict xG
-        if USE_MONEYPUCK_MODEL:
-            df_shots['xG_Value'] = XG_MODEL.predict(X_predict)
-            df_shots['xG_Value'] = df_shots['xG_Value'].clip(lower=0.0, upper=0.6)
-        else:
-            raw_xg = XG_MODEL.predict_proba(X_predict)[:, 1]
-            CALIBRATION_FACTOR = 3.5
-            df_shots['xG_Value'] = np.power(raw_xg, CALIBRATION_FACTOR)
-            df_shots['xG_Value'] = df_shots['xG_Value'].clip(upper=0.50)
-            SCALE_FACTOR = 0.19
-            df_shots['xG_Value'] = df_shots['xG_Value'] * SCALE_FACTOR
+        # Predict xG and xA (if model available) on the process's warm inference service
+        from xg_inference import get_inference_service
+        passes_mask = None
+        X_xa_predict = None
+        if models.xa_model and models.xa_features:
+            passes_mask = df_shots['has_pass_before_shot'] == 1
+            if passes_mask.any():
+                X_xa_predict = df_shots.loc[passes_mask, models.xa_features]
         
-        # Predict xA (if model available)
+        scores = get_inference_service().predict(xg_features=X_predict, xa_features=X_xa_predict)
+        df_shots['xG_Value'] = scores['xg']
         df_shots['xA_Value'] = 0.0
-        if XA_MODEL and XA_MODEL_FEATURES:
-            passes_mask = df_shots['has_pass_before_shot'] == 1
-            df_passes = df_shots[passes_mask].copy()
-            if len(df_passes) > 0:
-                X_xa_predict = df_passes[XA_MODEL_FEATURES]
-                raw_xa = XA_MODEL.predict_proba(X_xa_predict)[:, 1]
-                CALIBRATION_FACTOR_XA = 3.5
-                df_passes['xA_Value'] = np.power(raw_xa, CALIBRATION_FACTOR_XA)
-                df_passes['xA_Value'] = df_passes['xA_Value'].clip(upper=0.50)
-                SCALE_FACTOR_XA = 0.15
-                df_passes['xA_Value'] = df_passes['xA_Value'] * SCALE_FACTOR_XA
-                df_shots.loc[passes_mask, 'xA_Value'] = df_passes['xA_Value'].values
+        if scores['xa'] is not None:
+            df_shots.loc[passes_mask, 'xA_Value'] = scores['xa']
         
         # Apply flurry adjustment and other post-processing (simplified)
         try:
@@ -2121,18 +2034,149 @@ def process_single_game(game_id, rate_limit_flag=None):
         return None
 
 
-def scrape_pbp_and_process(date_str='2025-12-07'):
+def fetch_pbp(game_id, max_retries=5, base_delay=1):
+    """
+    Fetch one game's play-by-play JSON with retry/backoff.
+    
+    Safe to call from worker threads: citrus_request keeps a thread-local
+    session and rotates proxies per request.
+    
+    Args:
+        game_id: NHL game ID (e.g., 2025020001)
+        max_retries: Attempts before giving up
+        base_delay: First backoff delay in seconds (doubles per attempt)
+    
+    Returns:
+        Parsed PBP dict, or None if the game could not be fetched.
+    """
+    import time
+    
+    # PBP Endpoint: https://api-web.nhle.com/v1/gamecenter/{game_id}/play-by-play
+    pbp_url = f"{NHL_BASE_URL}/gamecenter/{game_id}/play-by-play"
+    
+    for attempt in range(max_retries):
+        try:
+            response = citrus_request(pbp_url, timeout=15)
+            
+            # Handle rate limiting (429)
+            if response.status_code == 429:
+                if attempt < max_retries - 1:
+                    delay = min(base_delay * (2 ** attempt), 60)  # Cap at 60 seconds
+                    print(f"  [WARNING] Rate limited (429) for game {game_id}. Waiting {delay} seconds...")
+                    time.sleep(delay)
+                    continue
+                print(f"  [ERROR] Rate limited after {max_retries} attempts for game {game_id}. Skipping.")
+                return None
+            
+            response.raise_for_status()
+            return response.json()
+            
+        except requests.exceptions.Timeout:
+            if attempt < max_retries - 1:
+                delay = min(base_delay * (2 ** attempt), 30)
+                print(f"  [WARNING] Timeout for game {game_id} (attempt {attempt + 1}/{max_retries}). Waiting {delay}s...")
+                time.sleep(delay)
+            else:
+                print(f"  [ERROR] Timeout after {max_retries} attempts for game {game_id}. Skipping.")
+        except requests.exceptions.RequestException as e:
+            if attempt < max_retries - 1:
+                delay = min(base_delay * (2 ** attempt), 30)
+                print(f"  [WARNING] Error fetching game {game_id} (attempt {attempt + 1}/{max_retries}): {e}")
+                time.sleep(delay)
+            else:
+                print(f"  [ERROR] Failed to fetch game {game_id} after {max_retries} attempts: {e}")
+    
+    return None
+
+
+def iter_pbp_pipelined(game_ids, workers=PBP_FETCH_WORKERS, depth=PBP_PREFETCH_DEPTH):
+    """
+    Fetch play-by-play for many games concurrently, yielding in input order.
+    
+    A thread pool keeps up to `depth` fetches in flight; the caller featurizes
+    game N while games N+1..N+depth download. A new fetch is only submitted
+    when the caller takes a result, so a slow consumer stalls the fetchers
+    instead of piling PBP payloads up in memory (backpressure).
+    
+    Args:
+        game_ids: Game IDs to fetch
+        workers: Concurrent fetch threads
+        depth: Max games fetched ahead of the consumer
+    
+    Yields:
+        (game_id, raw_data) tuples; raw_data is None if the fetch failed.
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    
+    game_ids = list(game_ids)
+    workers = max(workers, 1)
+    depth = max(depth, workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        next_index = 0
+        while next_index < len(game_ids) or pending:
+            while next_index < len(game_ids) and len(pending) < depth:
+                game_id = game_ids[next_index]
+                pending.append((game_id, executor.submit(fetch_pbp, game_id)))
+                next_index += 1
+            game_id, future = pending.popleft()
+            try:
+                raw_data = future.result()
+            except Exception as e:
+                print(f"  [ERROR] Unexpected error fetching game {game_id}: {e}")
+                raw_data = None
+            yield game_id, raw_data
+
+
+def get_finished_game_ids_for_season(season):
+    """
+    Fetches every finished game_id for a season from nhl_games (for backfills).
+    
+    Args:
+        season: Season start year (e.g., 2025)
+    
+    Returns:
+        Sorted list of game IDs.
+    """
+    game_ids = []
+    offset = 0
+    batch_size = 1000
+    while True:
+        response = supabase.table('nhl_games').select('game_id').eq('season', season).in_(
+            'status', ['final', 'FINAL', 'OFF', 'F']
+        ).order('game_id').range(offset, offset + batch_size - 1).execute()
+        if not response.data:
+            break
+        game_ids.extend(int(game['game_id']) for game in response.data)
+        if len(response.data) < batch_size:
+            break
+        offset += batch_size
+    return sorted(game_ids)
+
+
+def scrape_pbp_and_process(date_str='2025-12-07', game_ids=None, workers=PBP_FETCH_WORKERS):
     """
     Scrapes raw PBP for all finished games and processes data.
     
+    Ingestion is pipelined: PBP payloads are fetched concurrently by
+    iter_pbp_pipelined() while earlier games are featurized, and the xG/xA/rebound
+    models run once over the shots from every game.
+    
     Args:
         date_str: Date to process games for (format: YYYY-MM-DD). Defaults to '2025-12-07'.
+        game_ids: Explicit game IDs to process instead of the date's games (e.g. a season backfill)
+        workers: Concurrent PBP fetches
     """
-    print(f"[DATE] Processing games for date: {date_str}")
-    print("=" * 60)
-    
-    # Try to get games from database first, fallback to API
-    game_ids = get_finished_game_ids_from_db(date_str=date_str)
+    if game_ids is None:
+        print(f"[DATE] Processing games for date: {date_str}")
+        print("=" * 60)
+        
+        # Try to get games from database first, fallback to API
+        game_ids = get_finished_game_ids_from_db(date_str=date_str)
+    else:
+        print(f"[BACKFILL] Processing {len(game_ids)} games")
+        print("=" * 60)
     
     if not game_ids:
         print(f"[WARNING]  No finished games found for {date_str}")
@@ -2141,77 +2185,20 @@ def scrape_pbp_and_process(date_str='2025-12-07'):
     print(f"Found {len(game_ids)} finished games to process")
     print()
     
+    models = get_shot_models()
     all_shot_data = []
     games_processed = 0
     games_failed = 0
 
-    for idx, game_id in enumerate(game_ids, 1):
-        # PBP Endpoint: https://api-web.nhle.com/v1/gamecenter/{game_id}/play-by-play
-        pbp_url = f"{NHL_BASE_URL}/gamecenter/{game_id}/play-by-play"
-        
-        # Retry logic for rate limiting
-        max_retries = 5
-        base_delay = 1  # Start with 1 second for individual game requests
-        raw_data = None
-        
-        for attempt in range(max_retries):
-            try:
-                response = citrus_request(pbp_url, timeout=15)  # Increased timeout
-                
-                # Handle rate limiting (429)
-                if response.status_code == 429:
-                    if attempt < max_retries - 1:
-                        delay = min(base_delay * (2 ** attempt), 60)  # Cap at 60 seconds
-                        print(f"  [WARNING] Rate limited (429) for game {game_id}. Waiting {delay} seconds...")
-                        import time
-                        time.sleep(delay)
-                        continue
-                    else:
-                        print(f"  [ERROR] Rate limited after {max_retries} attempts for game {game_id}. Skipping.")
-                        games_failed += 1
-                        raw_data = None
-                        break
-                
-                response.raise_for_status()
-                raw_data = response.json()
-                break  # Success, exit retry loop
-                
-            except requests.exceptions.Timeout:
-                if attempt < max_retries - 1:
-                    delay = min(base_delay * (2 ** attempt), 30)
-                    print(f"  [WARNING] Timeout for game {game_id} (attempt {attempt + 1}/{max_retries}). Waiting {delay}s...")
-                    import time
-                    time.sleep(delay)
-                else:
-                    print(f"  [ERROR] Timeout after {max_retries} attempts for game {game_id}. Skipping.")
-                    games_failed += 1
-                    raw_data = None
-                    break
-            except requests.exceptions.RequestException as e:
-                if attempt < max_retries - 1:
-                    delay = min(base_delay * (2 ** attempt), 30)
-                    print(f"  [WARNING] Error fetching game {game_id} (attempt {attempt + 1}/{max_retries}): {e}")
-                    import time
-                    time.sleep(delay)
-                else:
-                    print(f"  [ERROR] Failed to fetch game {game_id} after {max_retries} attempts: {e}")
-                    games_failed += 1
-                    raw_data = None
-                    break
-        else:
-            # Exhausted retries
-            print(f"  [ERROR] Exhausted all retries for game {game_id}. Skipping.")
-            games_failed += 1
-            raw_data = None
-        
+    # Goalie names repeat on every shot they face; look each one up once per run
+    goalie_names = {}
+
+    for idx, (game_id, raw_data) in enumerate(iter_pbp_pipelined(game_ids, workers=workers), 1):
         # Skip processing if we couldn't fetch the data
         if raw_data is None:
+            games_failed += 1
             continue
         
-        # Add delay between games to avoid rate limiting
-        import time
-        time.sleep(0.5)  # 500ms delay between games
-        
         try:
             # --- FEATURE ENGINEERING: Extracting Shot Coordinates and Calculating Features ---
             print(f"[{idx}/{len(game_ids)}] Processing Game ID: {game_id}...")
@@ -2507,14 +2494,14 @@ def scrape_pbp_and_process(date_str='2025-12-07'):
                     zone_relative_distance = 1.0  # Default to far (100% of zone)
                 
                 # Encode pass_zone for model (similar to shot_type encoding)
-                if PASS_ZONE_ENCODER:
+                if models.pass_zone_encoder:
                     try:
-                        if pass_zone in PASS_ZONE_ENCODER.classes_:
-                            pass_zone_encoded = PASS_ZONE_ENCODER.transform([pass_zone])[0]
+                        if pass_zone in models.pass_zone_encoder.classes_:
+                            pass_zone_encoded = models.pass_zone_encoder.transform([pass_zone])[0]
                         else:
                             # Default to 'no_pass' if zone not in training data
-                            if 'no_pass' in PASS_ZONE_ENCODER.classes_:
-                                pass_zone_encoded = PASS_ZONE_ENCODER.transform(['no_pass'])[0]
+                            if 'no_pass' in models.pass_zone_encoder.classes_:
+                                pass_zone_encoded = models.pass_zone_encoder.transform(['no_pass'])[0]
                             else:
                                 pass_zone_encoded = 0  # Fallback to first class
                     except Exception as e:
@@ -2570,15 +2557,15 @@ def scrape_pbp_and_process(date_str='2025-12-07'):
                 shot_type_standard = shot_type_mapping.get(shot_type_raw, 'wrist')  # Default to 'wrist' if unknown
                 
                 # Encode shot type using the label encoder
-                if SHOT_TYPE_ENCODER:
+                if models.shot_type_encoder:
                     try:
                         # Handle unknown shot types by defaulting to 'wrist'
-                        if shot_type_standard in SHOT_TYPE_ENCODER.classes_:
-                            shot_type_encoded = SHOT_TYPE_ENCODER.transform([shot_type_standard])[0]
+                        if shot_type_standard in models.shot_type_encoder.classes_:
+                            shot_type_encoded = models.shot_type_encoder.transform([shot_type_standard])[0]
                         else:
                             # Default to 'wrist' if shot type not in training data
-                            if 'wrist' in SHOT_TYPE_ENCODER.classes_:
-                                shot_type_encoded = SHOT_TYPE_ENCODER.transform(['wrist'])[0]
+                            if 'wrist' in models.shot_type_encoder.classes_:
+                                shot_type_encoded = models.shot_type_encoder.transform(['wrist'])[0]
                             else:
                                 shot_type_encoded = 0  # Fallback to first class
                     except Exception as e:
@@ -2872,8 +2859,10 @@ def scrape_pbp_and_process(date_str='2025-12-07'):
                 goalie_id = details.get('goalieInNetId')
                 goalie_name = None
                 
-                # Fetch goalie name from player_names table (fast lookup)
-                if goalie_id:
+                # Fetch goalie name from player_names table (fast lookup, once per goalie)
+                if goalie_id in goalie_names:
+                    goalie_name = goalie_names[goalie_id]
+                elif goalie_id:
                     try:
                         name_response = supabase.table('player_names').select('full_name').eq('player_id', goalie_id).limit(1).execute()
                         if name_response.data:
@@ -2906,6 +2895,7 @@ def scrape_pbp_and_process(date_str='2025-12-07'):
                                         pass  # Don't fail if upsert fails
                         except:
                             pass  # Don't fail if API fetch fails
+                    goalie_names[goalie_id] = goalie_name
                 
                 # PERIOD/TIME CONTEXT
                 period_descriptor = play.get('periodDescriptor', {})
@@ -3379,13 +3369,13 @@ def scrape_pbp_and_process(date_str='2025-12-07'):
 
     # 1. Prepare features for prediction
     # Handle last_event_category encoding if using MoneyPuck model
-    if USE_MONEYPUCK_MODEL and 'last_event_category_encoded' in MODEL_FEATURES:
+    if models.use_moneypuck and 'last_event_category_encoded' in models.xg_features:
         # Need to encode last_event_category if it exists
         if 'last_event_category' in df_shots.columns and 'last_event_category_encoded' not in df_shots.columns:
             from sklearn.preprocessing import LabelEncoder
-            if LAST_EVENT_CATEGORY_ENCODER is not None:
+            if models.last_event_category_encoder is not None:
                 # Use saved encoder
-                df_shots['last_event_category_encoded'] = LAST_EVENT_CATEGORY_ENCODER.transform(
+                df_shots['last_event_category_encoded'] = models.last_event_category_encoder.transform(
                     df_shots['last_event_category'].fillna('unknown').astype(str)
                 )
             else:
@@ -3408,7 +3398,7 @@ def scrape_pbp_and_process(date_str='2025-12-07'):
     
     # Select the exact features the model was trained on
     # First, ensure all required features exist in df_shots
-    for feature in MODEL_FEATURES:
+    for feature in models.xg_features:
         if feature not in df_shots.columns:
             print(f"[WARNING]  Warning: Missing feature '{feature}' in data - creating with default value")
             if feature in ['home_empty_net', 'away_empty_net', 'is_empty_net', 
@@ -3437,10 +3427,10 @@ def scrape_pbp_and_process(date_str='2025-12-07'):
                 df_shots[feature] = 0  # Default to 0 for missing numeric features
     
     # Now select features (all should exist now)
-    X_predict = df_shots[MODEL_FEATURES].copy()
+    X_predict = df_shots[models.xg_features].copy()
     
     # Fill any missing values (NaN handling)
-    for feature in MODEL_FEATURES:
+    for feature in models.xg_features:
         if feature in X_predict.columns and X_predict[feature].isna().any():
             if feature in ['pass_lateral_distance', 'pass_to_net_distance', 'pass_immediacy_score', 
                           'goalie_movement_score', 'pass_quality_score', 'pass_zone_encoded',
@@ -3471,25 +3461,11 @@ def scrape_pbp_and_process(date_str='2025-12-07'):
                 median_val = pd.to_numeric(X_predict[feature], errors='coerce').median()
                 X_predict[feature] = pd.to_numeric(X_predict[feature], errors='coerce').fillna(median_val)
     
-    # 2. Predict xG values
-    if USE_MONEYPUCK_MODEL:
-        # MoneyPuck model is a regression model (XGBRegressor) - use predict()
-        # Model already outputs MoneyPuck-scale xG, no calibration needed
-        df_shots['xG_Value'] = XG_MODEL.predict(X_predict)
-        # Cap at reasonable maximum (MoneyPuck xG rarely exceeds 0.5)
-        df_shots['xG_Value'] = df_shots['xG_Value'].clip(lower=0.0, upper=0.6)
-    else:
-        # Old model is classification (XGBClassifier) - use predict_proba()
-        raw_xg = XG_MODEL.predict_proba(X_predict)[:, 1]
-        # Apply calibration for old model
-        CALIBRATION_FACTOR = 3.5
-        df_shots['xG_Value'] = np.power(raw_xg, CALIBRATION_FACTOR)
-        df_shots['xG_Value'] = df_shots['xG_Value'].clip(upper=0.50)
-        SCALE_FACTOR = 0.19
-        df_shots['xG_Value'] = df_shots['xG_Value'] * SCALE_FACTOR
+    # 2. Predict xG values (calibrated by the inference service)
+    df_shots['xG_Value'] = get_inference_service().predict(xg_features=X_predict)['xg']
     
     # 2.5. Predict Expected Rebounds (rebound probability)
-    if REBOUND_MODEL and REBOUND_MODEL_FEATURES:
+    if models.rebound_model and models.rebound_features:
         try:
             print("  🔧 Predicting rebound probabilities...")
             # Prepare features for rebound model
@@ -3499,7 +3475,7 @@ def scrape_pbp_and_process(date_str='2025-12-07'):
             
             if len(df_rebound_shots) > 0:
                 # Add missing features BEFORE selecting (same approach as test_rebound_model.py)
-                for feature in REBOUND_MODEL_FEATURES:
+                for feature in models.rebound_features:
                     if feature not in df_rebound_shots.columns:
                         # Add missing feature with default value
                         if feature in ['is_power_play', 'is_empty_net', 'is_rebound']:
@@ -3513,10 +3489,10 @@ def scrape_pbp_and_process(date_str='2025-12-07'):
                             df_rebound_shots[feature] = 0.0
                 
                 # Now select features (all should exist now)
-                X_rebound = df_rebound_shots[REBOUND_MODEL_FEATURES].copy()
+                X_rebound = df_rebound_shots[models.rebound_features].copy()
                 
                 # Fill missing values
-                for feature in REBOUND_MODEL_FEATURES:
+                for feature in models.rebound_features:
                     if X_rebound[feature].isna().any():
                         if feature in ['is_power_play', 'is_empty_net', 'is_rebound']:
                             X_rebound[feature] = X_rebound[feature].fillna(0)
@@ -3532,7 +3508,7 @@ def scrape_pbp_and_process(date_str='2025-12-07'):
                         X_rebound[col] = pd.to_numeric(X_rebound[col], errors='coerce').fillna(0)
                 
                 # Predict rebound probability
-                rebound_probs = REBOUND_MODEL.predict_proba(X_rebound)[:, 1]
+                rebound_probs = get_inference_service().predict(rebound_features=X_rebound)['rebound']
                 
                 # Initialize column for all shots
                 df_shots['expected_rebound_probability'] = 0.0
@@ -3647,32 +3623,17 @@ def scrape_pbp_and_process(date_str='2025-12-07'):
     # Only calculate xA for shots that have passes before them
     df_shots['xA_Value'] = 0.0  # Initialize xA column
     
-    if XA_MODEL and XA_MODEL_FEATURES:
+    if models.xa_model and models.xa_features:
         # Filter to only shots with passes
         passes_mask = df_shots['has_pass_before_shot'] == 1
         df_passes = df_shots[passes_mask].copy()
         
         if len(df_passes) > 0:
             # Select xA model features
-            X_xa_predict = df_passes[XA_MODEL_FEATURES]
-            
-            # Predict xA probability
-            # XA_MODEL.predict_proba returns [[Prob of No Goal, Prob of Goal]]
-            # We take the second column [:, 1] because that's the probability of a GOAL (the xA value)
-            raw_xa = XA_MODEL.predict_proba(X_xa_predict)[:, 1]
-            
-            # Calibrate xA values (similar to xG calibration)
-            # xA values should be similar to xG but from pass perspective
-            CALIBRATION_FACTOR_XA = 3.5  # Same as xG
-            df_passes['xA_Value'] = np.power(raw_xa, CALIBRATION_FACTOR_XA)
-            
-            # Cap xA values (similar to xG)
-            df_passes['xA_Value'] = df_passes['xA_Value'].clip(upper=0.50)
+            X_xa_predict = df_passes[models.xa_features]
             
-            # Scale down to match realistic xA ranges
-            # xA should be slightly lower than xG on average (passes are less direct than shots)
-            SCALE_FACTOR_XA = 0.15  # Slightly lower than xG scale factor
-            df_passes['xA_Value'] = df_passes['xA_Value'] * SCALE_FACTOR_XA
+            # Predict calibrated xA (probability of a GOAL from the pass, scaled like xG)
+            df_passes['xA_Value'] = get_inference_service().predict(xa_features=X_xa_predict)['xa']
             
             # Update xA values in main dataframe
             df_shots.loc[passes_mask, 'xA_Value'] = df_passes['xA_Value'].values
@@ -4008,7 +3969,7 @@ def scrape_pbp_and_process(date_str='2025-12-07'):
     
     # 4. Aggregate xA per passer for the final stats table
     # Only aggregate for passes that led to shots (passer_id is not None)
-    if XA_MODEL and XA_MODEL_FEATURES:
+    if models.xa_model and models.xa_features:
         passes_with_xa = df_shots[df_shots['passer_id'].notna() & (df_shots['xA_Value'] > 0)].copy()
         
         if len(passes_with_xa) > 0:
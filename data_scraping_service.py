@@ -25,6 +25,7 @@ from dotenv import load_dotenv
 import requests
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from src.utils.citrus_request import citrus_request
+from live_change_cache import GameFingerprintCache
 
 load_dotenv()
 
@@ -72,6 +73,12 @@ tracker = PerformanceTracker()
 # Game state cache - track which games are finished to avoid re-processing
 game_state_cache = {}  # {game_id: {"state": "FINAL", "last_check": timestamp}}
 
+# Change detection - only write PBP/scoreboard/stat rows that moved since the last poll
+live_fingerprints = GameFingerprintCache()
+
+# Longest a batch call sleeps on a 429 waiting for a proxy to leave cooldown/quarantine
+MAX_BATCH_RATE_LIMIT_WAIT = 60
+
 # Graceful shutdown flag
 shutdown_requested = False
 
@@ -121,6 +128,8 @@ def safe_api_call_batch(urls: List[str], max_retries: int = 3) -> List[Optional[
     """
     Make multiple API calls reusing the same IP (when possible).
     Reduces IP usage from N calls = N IPs to N calls = 1 IP.
+    The proxy is health-weighted (ProxyManager.get_next_proxy); on a 429 or a
+    connection failure the rest of the batch moves to another proxy.
     
     Args:
         urls: List of URLs to fetch
@@ -135,7 +144,7 @@ def safe_api_call_batch(urls: List[str], max_retries: int = 3) -> List[Optional[
     from src.utils.citrus_request import get_proxy_manager
     proxy_manager = get_proxy_manager()
     
-    # Get ONE proxy for all calls in this batch
+    # Get ONE healthy proxy for all calls in this batch
     proxy_url = proxy_manager.get_next_proxy()
     
     if not proxy_url:
@@ -143,23 +152,35 @@ def safe_api_call_batch(urls: List[str], max_retries: int = 3) -> List[Optional[
         logger.warning("[WARN] No proxy available, falling back to individual calls")
         return [safe_api_call(url, max_retries) for url in urls]
     
-    # Use same proxy for all URLs in batch
-    proxies = {"http": proxy_url, "https": proxy_url}
-    proxy_ip = proxy_url.split('@')[1].split(':')[0] if '@' in proxy_url else proxy_url.split(':')[0]
-    
     for url in urls:
         response_data = None
         for attempt in range(max_retries):
+            # Use same proxy for all URLs in batch (until it fails)
+            proxies = {"http": proxy_url, "https": proxy_url}
+            proxy_ip = proxy_url.split('@')[1].split(':')[0] if '@' in proxy_url else proxy_url.split(':')[0]
+            request_start = time.time()
             try:
                 url_display = url if len(url) <= 60 else f"...{url[-57:]}"
                 logger.info(f"[Batch-Call] Requesting {url_display} via {proxy_ip}...")
                 
                 r = requests.get(url, proxies=proxies, timeout=15)
+                proxy_ok = r.status_code < 500 and r.status_code not in (403, 407, 429)
+                proxy_manager.record_result(proxy_url, proxy_ok, time.time() - request_start, r.status_code)
                 
                 if r.status_code == 429:
-                    wait = (attempt + 1) * 10
-                    logger.warning(f"[429-LIMIT] Resting {wait}s...")
-                    time.sleep(wait)
+                    # The proxy is now cooling down: switch instead of resting on it
+                    failed_proxy = proxy_url
+                    proxy_url = proxy_manager.get_next_proxy(exclude=failed_proxy) or failed_proxy
+                    wait_time = proxy_manager.seconds_until_available(proxy_url)
+                    if proxy_url == failed_proxy:
+                        # No other proxy free: back off as before rather than re-hitting the limit
+                        wait_time = max(wait_time, (attempt + 1) * 10)
+                    wait_time = min(wait_time, MAX_BATCH_RATE_LIMIT_WAIT)
+                    if wait_time > 0:
+                        logger.warning(f"[429-LIMIT] {proxy_ip} rate limited, waiting {wait_time:.0f}s...")
+                        time.sleep(wait_time)
+                    else:
+                        logger.warning(f"[429-LIMIT] Rotating off {proxy_ip}...")
                     continue
                     
                 r.raise_for_status()
@@ -168,6 +189,10 @@ def safe_api_call_batch(urls: List[str], max_retries: int = 3) -> List[Optional[
                 break
                 
             except Exception as e:
+                if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+                    # Dead or slow proxy: report it and move the rest of the batch elsewhere
+                    proxy_manager.record_result(proxy_url, False, time.time() - request_start)
+                    proxy_url = proxy_manager.get_next_proxy(exclude=proxy_url) or proxy_url
                 if attempt < max_retries - 1:
                     time.sleep(2)
                 else:
@@ -241,7 +266,7 @@ def process_single_game(game_id: str, game_date: str) -> Dict[str, Any]:
         # 2. Ingest Raw PBP (for xG processing later)
         try:
             from ingest_live_raw_nhl import upsert_raw_game, supabase_client
-            upsert_raw_game(supabase_client(), game_id, game_date, pbp)
+            upsert_raw_game(supabase_client(), game_id, game_date, pbp, fingerprints=live_fingerprints)
             details["raw_ingest"] = True
         except Exception as e:
             logger.warning(f"   [Game {game_id}] Raw ingest error (non-critical): {e}")
@@ -253,7 +278,7 @@ def process_single_game(game_id: str, game_date: str) -> Dict[str, Any]:
                 details["boxscore"] = True
                 try:
                     from scrape_live_nhl_stats import process_game_data_citrus
-                    process_game_data_citrus(game_id, box, pbp)
+                    process_game_data_citrus(game_id, box, pbp, fingerprints=live_fingerprints)
                     details["stats"] = True
                     return {"game_id": game_id, "state": state, "success": True, "details": details}
                 except Exception as e:
@@ -302,6 +327,7 @@ def run_unified_loop() -> Tuple[str, int]:
         if stale_cache_keys:
             for gid in stale_cache_keys:
                 del game_state_cache[gid]
+                live_fingerprints.forget(gid)
             logger.info(f"🗑️ Cleared {len(stale_cache_keys)} stale cache entries")
 
         logger.info(f"📋 Found {len(games)} games in slate. Processing ALL IN PARALLEL...")
@@ -374,12 +400,19 @@ def run_unified_loop() -> Tuple[str, int]:
         tracker.failed_syncs += 1
         return ("ERROR", 0)
 
-    # 3. Matchup Refresh
+    # 3. Matchup Refresh (only the matchups rostering players whose scored stats moved)
+    scored_players = live_fingerprints.take_scored_players()
     try:
-        from calculate_matchup_scores import update_active_matchup_scores
-        update_active_matchup_scores(db)
-        logger.info("🏆 [MATCHUPS] Scoreboard Balanced.")
+        if scored_players:
+            from calculate_matchup_scores import update_matchup_scores_for_players
+            summary = update_matchup_scores_for_players(db, scored_players)
+            if summary["failed"]:
+                live_fingerprints.mark_scored_players(scored_players)  # Retry next cycle
+            logger.info(f"🏆 [MATCHUPS] {summary['updated']} matchup(s) rescored for {len(scored_players)} changed player(s).")
+        else:
+            logger.info("🏆 [MATCHUPS] No scored stat changed - refresh skipped.")
     except Exception as e:
+        live_fingerprints.mark_scored_players(scored_players)  # Retry next cycle
         logger.error(f"[WARN] Matchup update failed (non-critical): {e}")
     
     # 4. Determine game state from results
@@ -418,6 +451,7 @@ def run_unified_loop() -> Tuple[str, int]:
     #   1. Reconcile recent games (catch NHL stat corrections)
     #   2. Re-aggregate season stats from per-game data
     #   3. Update PPP/SHP from Landing Endpoint (authoritative source)
+    #   4. Recompute GAR components for every skater
     # =========================================================================
     
     # 6. DATA RECONCILIATION (00:00-00:03)
@@ -476,6 +510,32 @@ def run_unified_loop() -> Tuple[str, int]:
         except Exception as e:
             logger.error(f"[LANDING] Error: {e}")
 
+    # 9. GAR COMPONENTS (00:10-00:13)
+    # Recompute raw rates, regression and GAR for every skater
+    if now.hour == 0 and 10 <= now.minute < 13:
+        logger.info("[GAR] Recomputing GAR components for all players...")
+        try:
+            import subprocess
+            root = os.path.dirname(os.path.abspath(__file__))
+            result = subprocess.run(
+                [sys.executable, os.path.join("scripts", "utilities", "calculate_gar_regression.py"), "--recompute"],
+                capture_output=True,
+                text=True,
+                cwd=root,
+                env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")]))},
+                timeout=1800  # 30 min timeout
+            )
+            if result.returncode == 0:
+                logger.info("[GAR] Complete.")
+            else:
+                logger.error(f"[GAR] FAILED with code {result.returncode}")
+                if result.stderr:
+                    logger.error(f"  Error: {result.stderr[:500]}")
+        except subprocess.TimeoutExpired:
+            logger.error("[GAR] TIMEOUT after 30 minutes")
+        except Exception as e:
+            logger.error(f"[GAR] Error: {e}")
+
     # Track performance metrics
     tracker.total_syncs += 1
     tracker.last_sync_duration = time.time() - sync_start
@@ -638,18 +638,7 @@ def main() -> int:
     
     # Get all players from player_directory
     print("[fetch_nhl_stats] Fetching players from player_directory...")
-    players = []
-    offset = 0
-    batch_size = 1000
-    
-    while True:
-        batch = db.select("player_directory", select="player_id,full_name", limit=batch_size, offset=offset)
-        if not batch:
-            break
-        players.extend(batch)
-        if len(batch) < batch_size:
-            break
-        offset += batch_size
+    players = db.select_all("player_directory", select="player_id,full_name", key=("season", "player_id"))
     
     print(f"[fetch_nhl_stats] Found {len(players):,} players")
     print()
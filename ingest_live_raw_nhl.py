@@ -22,6 +22,7 @@ from typing import Dict, Optional, Tuple
 import requests
 from dotenv import load_dotenv
 from supabase_rest import SupabaseRest
+from live_change_cache import GameFingerprintCache
 from src.utils.citrus_request import citrus_request
 
 load_dotenv()
@@ -49,7 +50,8 @@ def _now_iso() -> str:
 
 
 def fetch_json(url: str, timeout: int = 15) -> dict:
-  r = citrus_request(url, timeout=timeout)
+  # The poller exists to see state changes: always hit the network
+  r = citrus_request(url, timeout=timeout, cache=False)
   r.raise_for_status()
   return r.json()
 
@@ -129,7 +131,19 @@ def extract_game_state_and_last_updated(pbp_json: dict) -> Tuple[Optional[str],
   return game_state, last_updated, game_date
 
 
-def upsert_raw_game(db: SupabaseRest, game_id: int, game_date: str, pbp_json: dict) -> None:
+def upsert_raw_game(db: SupabaseRest, game_id: int, game_date: str, pbp_json: dict,
+                    fingerprints: Optional[GameFingerprintCache] = None) -> bool:
+  """
+  Store the raw PBP JSON for a game.
+
+  With a fingerprint cache, the write is skipped when the PBP high-water mark
+  (max sortOrder, play count, gameState) has not moved since the last write.
+
+  Returns:
+    True if a row was written
+  """
+  if fingerprints is not None and not fingerprints.pbp_changed(game_id, pbp_json):
+    return False
   db.upsert(
     "raw_nhl_data",
     {
@@ -140,6 +154,9 @@ def upsert_raw_game(db: SupabaseRest, game_id: int, game_date: str, pbp_json: di
     },
     on_conflict="game_id",
   )
+  if fingerprints is not None:
+    fingerprints.mark_pbp(game_id, pbp_json)
+  return True
 
 
 def main() -> int:
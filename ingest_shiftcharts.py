@@ -8,13 +8,20 @@ Source endpoint:
   https://api.nhle.com/stats/rest/en/shiftcharts?cayenneExp=gameId=XXXXXXXXXX
 
 We only persist rows where typeCode == 517 (actual shifts). typeCode == 505 are goal events in this feed.
+
+Backfill mode (--backfill) is for whole seasons: shift charts are fetched with bounded concurrency
+(--workers threads through citrus_request), several games' shifts are coalesced into large upserts
+(--batch-rows), and a per-season watermark (the highest game_id below which every game is stored) is
+persisted after each upsert so a crashed run resumes where it stopped.
 """
 
 import argparse
 import datetime as dt
+import json
 import os
 import time
-from typing import Dict, List, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
 
 import requests
 from dotenv import load_dotenv
@@ -29,6 +36,14 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 
 SHIFTCHARTS_URL = "https://api.nhle.com/stats/rest/en/shiftcharts"
 
+BACKFILL_WORKERS = int(os.getenv("CITRUS_SHIFTCHART_WORKERS", "8"))
+BACKFILL_BATCH_ROWS = int(os.getenv("CITRUS_SHIFTCHART_BATCH_ROWS", "5000"))  # ~6 games per upsert
+BACKFILL_IN_FLIGHT_PER_WORKER = 4  # Fetches submitted ahead per worker (bounds memory held by finished futures)
+WATERMARK_PATH = os.getenv(
+  "CITRUS_SHIFTCHART_WATERMARK",
+  os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "shiftcharts_watermark.json")
+)
+
 
 def supabase_client() -> SupabaseRest:
   return SupabaseRest(SUPABASE_URL, SUPABASE_KEY)
@@ -59,12 +74,44 @@ def fetch_shiftcharts(game_id: int) -> List[dict]:
   return payload.get("data") or []
 
 
-def upsert_shifts(db: SupabaseRest, shifts: List[dict]) -> None:
+def shift_rows_from_chart(rows: List[dict]) -> List[dict]:
+  """player_shifts_official rows from a shiftcharts payload (actual shifts only)."""
+  shift_rows = []
+  for r in rows:
+    # only actual shifts
+    if int(r.get("typeCode") or 0) != 517:
+      continue
+    shift_id = int(r["id"])
+    start_s = mmss_to_seconds(r.get("startTime"))
+    end_s = mmss_to_seconds(r.get("endTime"))
+    dur_s = mmss_to_seconds(r.get("duration")) if r.get("duration") else None
+
+    shift_rows.append(
+      {
+        "shift_id": shift_id,
+        "game_id": int(r.get("gameId")),
+        "player_id": int(r.get("playerId")),
+        "team_id": int(r.get("teamId")),
+        "team_abbrev": r.get("teamAbbrev"),
+        "period": int(r.get("period")),
+        "shift_number": int(r.get("shiftNumber") or 0),
+        "start_time": r.get("startTime"),
+        "end_time": r.get("endTime"),
+        "duration": r.get("duration"),
+        "shift_start_time_seconds": int(start_s),
+        "shift_end_time_seconds": int(end_s),
+        "duration_seconds": int(dur_s) if dur_s is not None else None,
+        "updated_at": _now_iso(),
+      }
+    )
+  return shift_rows
+
+
+def upsert_shifts(db: SupabaseRest, shifts: List[dict], chunk: int = 1000) -> None:
   if not shifts:
     return
-  CHUNK = 1000
-  for i in range(0, len(shifts), CHUNK):
-    db.upsert("player_shifts_official", shifts[i:i + CHUNK], on_conflict="shift_id")
+  for i in range(0, len(shifts), chunk):
+    db.upsert("player_shifts_official", shifts[i:i + chunk], on_conflict="shift_id")
 
 
 def iter_game_ids_from_raw_nhl_data(db: SupabaseRest, season: int, limit: int) -> List[int]:
@@ -98,16 +145,144 @@ def iter_game_ids_from_raw_nhl_data(db: SupabaseRest, season: int, limit: int) -
   return all_game_ids
 
 
+def load_watermark(season: int) -> int:
+  """Highest game_id of `season` below which every game is stored (0 = none)."""
+  if not os.path.exists(WATERMARK_PATH):
+    return 0
+  with open(WATERMARK_PATH, "r", encoding="utf-8") as f:
+    return int((json.load(f).get("seasons") or {}).get(str(season)) or 0)
+
+
+def save_watermark(season: int, game_id: int) -> None:
+  state = {"seasons": {}}
+  if os.path.exists(WATERMARK_PATH):
+    with open(WATERMARK_PATH, "r", encoding="utf-8") as f:
+      state = json.load(f)
+  state.setdefault("seasons", {})[str(season)] = int(game_id)
+  state["updated_at"] = _now_iso()
+  os.makedirs(os.path.dirname(WATERMARK_PATH), exist_ok=True)
+  tmp_path = f"{WATERMARK_PATH}.tmp"
+  with open(tmp_path, "w", encoding="utf-8") as f:
+    json.dump(state, f, indent=2)
+  os.replace(tmp_path, WATERMARK_PATH)
+
+
+def _fetch_game_shifts(db: SupabaseRest, gid: int, skip_existing: bool) -> Tuple[int, str, List[dict]]:
+  """Worker: (game_id, status, shift rows); status is ok / skipped / no_data / error."""
+  try:
+    if skip_existing and db.select("player_shifts_official", select="shift_id", filters=[("game_id", "eq", gid)], limit=1):
+      return gid, "skipped", []
+    shift_rows = shift_rows_from_chart(fetch_shiftcharts(gid))
+    return gid, ("ok" if shift_rows else "no_data"), shift_rows
+  except Exception as e:
+    print(f"[ingest_shiftcharts] ERROR game_id={gid}: {e}")
+    return gid, "error", []
+
+
+def backfill(db: SupabaseRest, season: int, game_ids: List[int], workers: int = BACKFILL_WORKERS,
+             batch_rows: int = BACKFILL_BATCH_ROWS, skip_existing: bool = True) -> Dict[str, int]:
+  """
+  Concurrent season backfill of player_shifts_official.
+  
+  Games at or below the season watermark are skipped. Up to `workers` shift charts are fetched at
+  once; finished games' rows are buffered and upserted together once `batch_rows` accumulate. The
+  watermark only advances over a contiguous run of stored games, so a game that errors, has no shift
+  chart yet (no_data), or is still buffered when the process dies is fetched again on the next run.
+  At most workers * BACKFILL_IN_FLIGHT_PER_WORKER fetches are in flight at a time.
+  
+  Returns: counts per status (ok / skipped / no_data / error)
+  """
+  watermark = load_watermark(season)
+  pending = sorted(g for g in set(game_ids) if g > watermark)
+  print(f"[ingest_shiftcharts] backfill season={season} games={len(pending)} (watermark={watermark or 'none'}) workers={workers}")
+  
+  counts = {"ok": 0, "skipped": 0, "no_data": 0, "error": 0}
+  stored = set()
+  buffer: List[dict] = []
+  buffered_games: List[int] = []
+  next_idx = 0
+  start = time.time()
+  
+  def flush() -> None:
+    nonlocal buffer, buffered_games, next_idx, watermark
+    if buffer:
+      try:
+        upsert_shifts(db, buffer, chunk=batch_rows)
+        stored.update(buffered_games)
+      except Exception as e:
+        counts["ok"] -= len(buffered_games)
+        counts["error"] += len(buffered_games)
+        print(f"[ingest_shiftcharts] ERROR upserting {len(buffer)} shifts for {len(buffered_games)} games: {e}")
+      buffer, buffered_games = [], []
+    while next_idx < len(pending) and pending[next_idx] in stored:
+      next_idx += 1
+    if next_idx and pending[next_idx - 1] > watermark:
+      watermark = pending[next_idx - 1]
+      save_watermark(season, watermark)
+  
+  with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+    queue = iter(pending)
+    in_flight = set()
+    max_in_flight = max(1, workers) * BACKFILL_IN_FLIGHT_PER_WORKER
+    done = 0
+    while True:
+      for gid in queue:
+        in_flight.add(pool.submit(_fetch_game_shifts, db, gid, skip_existing))
+        if len(in_flight) >= max_in_flight:
+          break
+      if not in_flight:
+        break
+      # Finished futures leave in_flight here; their rows live on only in the upsert buffer
+      finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+      for future in finished:
+        gid, status, shift_rows = future.result()
+        done += 1
+        counts[status] += 1
+        if shift_rows:
+          buffer.extend(shift_rows)
+          buffered_games.append(gid)
+        elif status == "skipped":
+          stored.add(gid)
+        
+        if len(buffer) >= batch_rows:
+          flush()
+        
+        if done % 25 == 0 or done == len(pending):
+          elapsed = max(time.time() - start, 1e-9)
+          print(f"[ingest_shiftcharts] Progress: {done}/{len(pending)} | {done / elapsed:.2f} games/s | "
+                f"Success: {counts['ok']} | Skipped: {counts['skipped']} | No data: {counts['no_data']} | "
+                f"Errors: {counts['error']} | watermark={watermark}")
+  flush()
+  
+  elapsed = max(time.time() - start, 1e-9)
+  print(f"[ingest_shiftcharts] backfill COMPLETE: {len(pending)} games in {elapsed:.1f}s ({len(pending) / elapsed:.2f} games/s)")
+  return counts
+
+
 def main() -> int:
   ap = argparse.ArgumentParser()
   ap.add_argument("--game-id", type=int, default=None, help="Ingest a single game")
   ap.add_argument("--season", type=int, default=2025, help="Season year prefix used in NHL game_id")
-  ap.add_argument("--limit", type=int, default=200, help="How many games to ingest when using --season (0 = all)")
+  ap.add_argument("--limit", type=int, default=None, help="How many games to ingest when using --season (0 = all; default 200, all with --backfill)")
   ap.add_argument("--sleep", type=float, default=0.2, help="Delay between games to avoid rate limiting")
+  ap.add_argument("--backfill", action="store_true", help="Concurrent season backfill with batched upserts and a resumable watermark")
+  ap.add_argument("--workers", type=int, default=BACKFILL_WORKERS, help="Concurrent fetches in --backfill mode")
+  ap.add_argument("--batch-rows", type=int, default=BACKFILL_BATCH_ROWS, help="Shift rows per upsert in --backfill mode")
+  ap.add_argument("--no-skip-existing", action="store_true", help="--backfill: re-fetch games that already have shifts")
+  ap.add_argument("--reset-watermark", action="store_true", help="--backfill: start the season from the beginning")
   args = ap.parse_args()
 
   db = supabase_client()
-  game_ids = [args.game_id] if args.game_id else iter_game_ids_from_raw_nhl_data(db, args.season, args.limit)
+  if args.backfill and not args.game_id:
+    if args.reset_watermark:
+      save_watermark(args.season, 0)
+    game_ids = iter_game_ids_from_raw_nhl_data(db, args.season, args.limit or 0)
+    counts = backfill(db, args.season, game_ids, workers=args.workers, batch_rows=args.batch_rows,
+                      skip_existing=not args.no_skip_existing)
+    return 1 if counts["error"] else 0
+
+  limit = 200 if args.limit is None else args.limit
+  game_ids = [args.game_id] if args.game_id else iter_game_ids_from_raw_nhl_data(db, args.season, limit)
 
   print(f"[ingest_shiftcharts] ingesting games={len(game_ids)}")
   success_count = 0
@@ -125,35 +300,7 @@ def main() -> int:
           print(f"[ingest_shiftcharts] ({idx}/{len(game_ids)}) game_id={gid} - already has shifts, skipping (skipped: {skip_count})")
         continue
       
-      rows = fetch_shiftcharts(gid)
-      shift_rows = []
-      for r in rows:
-        # only actual shifts
-        if int(r.get("typeCode") or 0) != 517:
-          continue
-        shift_id = int(r["id"])
-        start_s = mmss_to_seconds(r.get("startTime"))
-        end_s = mmss_to_seconds(r.get("endTime"))
-        dur_s = mmss_to_seconds(r.get("duration")) if r.get("duration") else None
-
-        shift_rows.append(
-          {
-            "shift_id": shift_id,
-            "game_id": int(r.get("gameId")),
-            "player_id": int(r.get("playerId")),
-            "team_id": int(r.get("teamId")),
-            "team_abbrev": r.get("teamAbbrev"),
-            "period": int(r.get("period")),
-            "shift_number": int(r.get("shiftNumber") or 0),
-            "start_time": r.get("startTime"),
-            "end_time": r.get("endTime"),
-            "duration": r.get("duration"),
-            "shift_start_time_seconds": int(start_s),
-            "shift_end_time_seconds": int(end_s),
-            "duration_seconds": int(dur_s) if dur_s is not None else None,
-            "updated_at": _now_iso(),
-          }
-        )
+      shift_rows = shift_rows_from_chart(fetch_shiftcharts(gid))
 
       if shift_rows:
         upsert_shifts(db, shift_rows)
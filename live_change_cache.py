@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+live_change_cache.py
+
+In-process change detection for the live polling loop.
+
+data_scraping_service polls every live game every ~30s and used to rewrite the
+raw PBP JSON, the nhl_games scoreboard row and every player_game_stats row each
+time, even when nothing had happened since the previous poll (stoppages,
+intermissions, finished games inside the re-check TTL).
+
+GameFingerprintCache remembers, per game:
+    - the PBP high-water mark (max sortOrder, play count, gameState)
+    - a hash of the scoreboard update
+    - a hash of each player's boxscore stat line
+
+so writers only emit what changed. Fingerprints are recorded only after a
+successful write (a failed write is retried next poll) and expire after
+FINGERPRINT_TTL seconds, which forces a periodic full rewrite as a safety net.
+
+It also collects the players whose *scored* stats moved (anything except the
+clock-driven TOI/shift counters) so the matchup refresh only rescores the
+matchups those players are rostered in, and is skipped on quiet polls.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+
+FINGERPRINT_TTL = int(os.getenv("CITRUS_FINGERPRINT_TTL", "600"))  # Seconds before a full rewrite is forced
+
+# Boxscore fields that tick with the game clock but are not fantasy-scored
+CLOCK_FIELDS = frozenset({"nhl_toi_seconds", "nhl_shifts"})
+
+
+def fingerprint(value: Any) -> str:
+    """Stable short hash of a JSON-serializable value."""
+    payload = json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def pbp_high_water_mark(pbp: Dict[str, Any]) -> Tuple[int, int, str]:
+    """(max sortOrder, number of plays, gameState) for a play-by-play payload."""
+    plays = pbp.get("plays") or []
+    max_sort_order = max((int(p.get("sortOrder") or 0) for p in plays), default=0)
+    return max_sort_order, len(plays), str(pbp.get("gameState", "")).upper()
+
+
+class GameFingerprintCache:
+    """Per-game fingerprints of the last successfully written live data."""
+
+    def __init__(self, ttl_seconds: int = FINGERPRINT_TTL):
+        self.ttl_seconds = ttl_seconds
+        self._games: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._scored_players: Set[int] = set()
+
+    def _entry(self, game_id: int) -> Dict[str, Any]:
+        """Fingerprint entry for a game (reset once it is older than the TTL)."""
+        game_id = int(game_id)
+        entry = self._games.get(game_id)
+        if entry is None or time.time() - entry["created_at"] > self.ttl_seconds:
+            entry = {"created_at": time.time(), "pbp": None, "scoreboard": None, "players": {}, "scored": {}}
+            self._games[game_id] = entry
+        return entry
+
+    # --- raw PBP ---------------------------------------------------------
+
+    def pbp_changed(self, game_id: int, pbp: Dict[str, Any]) -> bool:
+        with self._lock:
+            return self._entry(game_id)["pbp"] != pbp_high_water_mark(pbp)
+
+    def mark_pbp(self, game_id: int, pbp: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entry(game_id)["pbp"] = pbp_high_water_mark(pbp)
+
+    # --- nhl_games scoreboard ----------------------------------------------
+
+    def scoreboard_changed(self, game_id: int, update_data: Dict[str, Any]) -> bool:
+        with self._lock:
+            return self._entry(game_id)["scoreboard"] != fingerprint(update_data)
+
+    def mark_scoreboard(self, game_id: int, update_data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entry(game_id)["scoreboard"] = fingerprint(update_data)
+
+    # --- player_game_stats -------------------------------------------------
+
+    def changed_players(
+        self,
+        game_id: int,
+        player_stats: Dict[int, Dict[str, Any]]
+    ) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, Tuple[str, str]]]:
+        """
+        Stat lines that differ from the last written ones.
+
+        Call before the writer mutates the stats dicts; pass the returned
+        hashes to mark_players() once the write succeeded.
+
+        Returns:
+            (changed player_stats subset, {player_id: (line hash, scored-stat hash)})
+        """
+        hashes = {}
+        for player_id, stats in player_stats.items():
+            if not isinstance(stats, dict):
+                continue
+            scored = {k: v for k, v in stats.items() if k not in CLOCK_FIELDS}
+            hashes[int(player_id)] = (fingerprint(stats), fingerprint(scored))
+
+        with self._lock:
+            written = self._entry(game_id)["players"]
+            changed = {
+                player_id: stats for player_id, stats in player_stats.items()
+                if int(player_id) not in hashes or written.get(int(player_id)) != hashes[int(player_id)][0]
+            }
+        changed_ids = {int(player_id) for player_id in changed}
+        return changed, {pid: h for pid, h in hashes.items() if pid in changed_ids}
+
+    def mark_players(self, game_id: int, hashes: Dict[int, Tuple[str, str]]) -> None:
+        with self._lock:
+            entry = self._entry(game_id)
+            for player_id, (line_hash, scored_hash) in hashes.items():
+                entry["players"][player_id] = line_hash
+                if entry["scored"].get(player_id) != scored_hash:
+                    entry["scored"][player_id] = scored_hash
+                    self._scored_players.add(int(player_id))
+
+    # --- matchup refresh gate ----------------------------------------------
+
+    def take_scored_players(self) -> Set[int]:
+        """Players whose scored stats moved since the last call (and reset the set)."""
+        with self._lock:
+            players = self._scored_players
+            self._scored_players = set()
+            return players
+
+    def mark_scored_players(self, player_ids: Iterable[int]) -> None:
+        """Re-queue players for the matchup refresh (e.g. after the refresh itself failed)."""
+        with self._lock:
+            self._scored_players.update(int(pid) for pid in player_ids)
+
+    def forget(self, game_id: Optional[int] = None) -> None:
+        """Drop one game's fingerprints (or all), forcing a full rewrite."""
+        with self._lock:
+            if game_id is None:
+                self._games.clear()
+            else:
+                self._games.pop(int(game_id), None)
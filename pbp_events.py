@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+pbp_events.py
+
+Single-pass columnar decoder for NHL gamecenter play-by-play payloads.
+
+The same raw_nhl_data.raw_json blob used to be walked independently by
+data_acquisition._extract_shots_from_game, the extractor_job stat / power-play /
+TOI passes and calculate_player_toi.process_game_shifts, each re-parsing the
+"MM:SS" clock strings, situationCode digits and details dicts for every play.
+
+decode_game() walks the plays once and returns a PbpEvents table: one NumPy
+array per field, aligned with the payload's plays list (row i is plays[i]):
+
+    period, seconds, game_seconds        clock (game_seconds = (period-1)*1200 + seconds)
+    type_code, type_desc                 event type
+    x, y                                 rink coordinates (NaN when missing)
+    owner_team_id, owner_is_home         event owner (0 / -1 when unknown)
+    situation_code, away_goalie,
+    away_skaters, home_skaters,
+    home_goalie, is_shootout             situationCode "G I i g" digits (-1 when unknown)
+    penalty_minutes                      penaltyMinutes / duration (-1 when missing)
+    home_score, away_score, shot_type,
+    has_details                          details fields read by the shot features
+    players[<json key>]                  player ids per role (0 when missing)
+
+plus derived state (is_goal, is_shot_attempt, power_play_state(), strength_state()).
+
+Tables are cached per game so every consumer in the process shares one decode.
+A cached table is reused only for the same payload object with an unchanged
+high-water mark (see live_change_cache.pbp_high_water_mark), so a re-fetched
+or appended payload is always decoded afresh.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from live_change_cache import pbp_high_water_mark
+
+
+PBP_EVENT_CACHE_SIZE = int(os.getenv("CITRUS_PBP_EVENT_CACHE_SIZE", "16"))  # Decoded games kept per process
+
+PERIOD_SECONDS = 1200.0
+PENALTY_GRACE_SECONDS = 3  # NHL.com counts a PP point up to 3s after the penalty expires
+
+SHOT_ATTEMPT_TYPE_CODES = (505, 506, 507)  # goal, shot-on-goal, missed-shot
+SHOOTOUT_SITUATION_CODES = ("1010", "0101")
+
+# details keys decoded into players[<key>]
+PLAYER_ID_FIELDS = (
+    "scoringPlayerId",
+    "shootingPlayerId",
+    "assist1PlayerId",
+    "assist2PlayerId",
+    "assist3PlayerId",
+    "goalieInNetId",
+    "hittingPlayerId",
+    "hitteePlayerId",
+    "blockingPlayerId",
+    "winningPlayerId",
+    "losingPlayerId",
+    "committedByPlayerId",
+    "committingPlayerId",
+    "penaltyOnPlayerId",
+    "drawnByPlayerId",
+    "playerId",
+)
+
+
+def _to_int(value: Any, default: int) -> int:
+    try:
+        if value is None:
+            return default
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_float(value: Any) -> float:
+    try:
+        if value is None:
+            return np.nan
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def parse_clock(time_str: Any) -> float:
+    """"MM:SS" -> seconds (0.0 when missing or malformed)."""
+    if not time_str or not isinstance(time_str, str):
+        return 0.0
+    parts = time_str.split(":")
+    if len(parts) != 2:
+        return 0.0
+    try:
+        return float(int(parts[0]) * 60 + int(parts[1]))
+    except ValueError:
+        return 0.0
+
+
+def parse_situation(code: Any) -> Tuple[int, int, int, int, int]:
+    """
+    Decode an NHL situationCode.
+
+    The code is "G I i g": away goalie, away skaters, home skaters, home goalie
+    (e.g. "1541" = away 5 skaters, home 4 skaters). A leading away-goalie 0 is
+    often dropped ("541"), so the value is read as an integer and zero-padded.
+
+    Returns:
+        (situation_code, away_goalie, away_skaters, home_skaters, home_goalie);
+        all -1 when the code is missing or not a 3-4 digit number
+    """
+    s = str(code).strip() if code is not None else ""
+    if not s.isdigit():
+        return -1, -1, -1, -1, -1
+    value = int(s)
+    if not 100 <= value <= 9999:
+        return -1, -1, -1, -1, -1
+    return value, value // 1000, value // 100 % 10, value // 10 % 10, value % 10
+
+
+class PbpEvents:
+    """Columnar view of one game's plays (see module docstring for the columns)."""
+
+    def __init__(self, game_id: Optional[int], home_team_id: int, away_team_id: int, columns: Dict[str, Any]):
+        self.game_id = game_id
+        self.home_team_id = home_team_id
+        self.away_team_id = away_team_id
+
+        self.event_id = np.asarray(columns["event_id"], dtype=np.int64)
+        self.sort_order = np.asarray(columns["sort_order"], dtype=np.int64)
+        self.period = np.asarray(columns["period"], dtype=np.int16)
+        self.seconds = np.asarray(columns["seconds"], dtype=np.float64)
+        self.type_code = np.asarray(columns["type_code"], dtype=np.int32)
+        self.type_desc = np.asarray(columns["type_desc"], dtype=object)
+        self.x = np.asarray(columns["x"], dtype=np.float64)
+        self.y = np.asarray(columns["y"], dtype=np.float64)
+        self.owner_team_id = np.asarray(columns["owner_team_id"], dtype=np.int64)
+        self.penalty_minutes = np.asarray(columns["penalty_minutes"], dtype=np.int32)
+        self.is_shootout = np.asarray(columns["is_shootout"], dtype=bool)
+        self.home_score = np.asarray(columns["home_score"], dtype=np.int32)
+        self.away_score = np.asarray(columns["away_score"], dtype=np.int32)
+        self.shot_type = np.asarray(columns["shot_type"], dtype=object)
+        self.has_details = np.asarray(columns["has_details"], dtype=bool)
+
+        situation = np.asarray(columns["situation"], dtype=np.int32).reshape(-1, 5)
+        self.situation_code = situation[:, 0]
+        self.away_goalie = situation[:, 1].astype(np.int8)
+        self.away_skaters = situation[:, 2].astype(np.int8)
+        self.home_skaters = situation[:, 3].astype(np.int8)
+        self.home_goalie = situation[:, 4].astype(np.int8)
+
+        players = np.asarray(columns["players"], dtype=np.int64).reshape(-1, len(PLAYER_ID_FIELDS))
+        self.players = {key: players[:, i] for i, key in enumerate(PLAYER_ID_FIELDS)}
+
+        # Derived state
+        self.game_seconds = (self.period - 1) * PERIOD_SECONDS + self.seconds
+        self.owner_is_home = np.full(len(self.event_id), -1, dtype=np.int8)
+        if home_team_id:
+            self.owner_is_home[self.owner_team_id == home_team_id] = 1
+        if away_team_id:
+            self.owner_is_home[self.owner_team_id == away_team_id] = 0
+        self.is_goal = (self.type_code == 505) | (self.type_desc == "goal")
+        self.is_shot_attempt = np.isin(self.type_code, SHOT_ATTEMPT_TYPE_CODES)
+
+        self._power_play_state: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.event_id)
+
+    def power_play_state(self, grace_seconds: int = PENALTY_GRACE_SECONDS) -> np.ndarray:
+        """
+        Penalty-window power-play state at each event (NHL.com standard).
+
+        A penalty opens a window from the whistle to its expiry plus
+        `grace_seconds` (penaltyMinutes/duration, 2 minutes when missing);
+        events are evaluated at their whole game second.
+
+        Returns:
+            int8 array: 1 = home on the power play, -1 = away on the power play,
+            0 = even (no window, or both teams shorthanded)
+        """
+        cached = self._power_play_state.get(grace_seconds)
+        if cached is not None:
+            return cached
+
+        state = np.zeros(len(self), dtype=np.int8)
+        penalties = (self.type_desc == "penalty") & (self.owner_is_home >= 0)
+        if self.home_team_id and self.away_team_id and penalties.any():
+            start = self.game_seconds[penalties]
+            minutes = self.penalty_minutes[penalties]
+            end = start + np.where(minutes >= 0, minutes, 2) * 60.0 + grace_seconds
+            home_penalized = self.owner_is_home[penalties] == 1
+
+            t = np.floor(self.game_seconds)[:, None]
+            in_window = (start[None, :] <= t) & (t <= end[None, :])
+            away_pp = (in_window & home_penalized[None, :]).any(axis=1)
+            home_pp = (in_window & ~home_penalized[None, :]).any(axis=1)
+            state[home_pp & ~away_pp] = 1
+            state[away_pp & ~home_pp] = -1
+
+        self._power_play_state[grace_seconds] = state
+        return state
+
+    def strength_state(self) -> np.ndarray:
+        """
+        Manpower advantage at each event from its situationCode.
+
+        An empty net's extra attacker does not count (6v5 is even strength,
+        6v4 is still a power play). Events without a situationCode fall back
+        to power_play_state().
+
+        Returns:
+            int8 array: 1 = home on the power play, -1 = away on the power play,
+            0 = even strength
+        """
+        home = self.home_skaters.astype(np.int16) - (self.home_goalie == 0)
+        away = self.away_skaters.astype(np.int16) - (self.away_goalie == 0)
+        state = np.sign(home - away).astype(np.int8)
+        return np.where(self.situation_code >= 0, state, self.power_play_state()).astype(np.int8)
+
+
+def _plays(pbp: Dict[str, Any]) -> List[Dict[str, Any]]:
+    plays = pbp.get("plays") or pbp.get("playByPlay") or []
+    return plays if isinstance(plays, list) else []
+
+
+def decode_plays(pbp: Dict[str, Any], game_id: Optional[int] = None) -> PbpEvents:
+    """Decode a play-by-play payload into a PbpEvents table (uncached)."""
+    home_team_id = _to_int((pbp.get("homeTeam") or {}).get("id"), 0)
+    away_team_id = _to_int((pbp.get("awayTeam") or {}).get("id"), 0)
+
+    columns: Dict[str, list] = {
+        "event_id": [], "sort_order": [], "period": [], "seconds": [],
+        "type_code": [], "type_desc": [], "x": [], "y": [], "owner_team_id": [],
+        "penalty_minutes": [], "is_shootout": [], "situation": [], "players": [],
+        "home_score": [], "away_score": [], "shot_type": [], "has_details": [],
+    }
+    for play in _plays(pbp):
+        details = play.get("details") or {}
+        columns["event_id"].append(_to_int(play.get("eventId"), -1))
+        columns["sort_order"].append(_to_int(play.get("sortOrder") or 0, 0))
+        columns["period"].append(_to_int((play.get("periodDescriptor") or {}).get("number"), 1))
+        columns["seconds"].append(parse_clock(play.get("timeInPeriod")))
+        columns["type_code"].append(_to_int(play.get("typeCode"), -1))
+        columns["type_desc"].append(play.get("typeDescKey") or "")
+        columns["x"].append(_to_float(details.get("xCoord")))
+        columns["y"].append(_to_float(details.get("yCoord")))
+        columns["owner_team_id"].append(_to_int(details.get("eventOwnerTeamId"), 0))
+        columns["penalty_minutes"].append(_to_int(details.get("penaltyMinutes") or details.get("duration"), -1))
+        columns["home_score"].append(_to_int(details.get("homeScore") or 0, 0))
+        columns["away_score"].append(_to_int(details.get("awayScore") or 0, 0))
+        columns["shot_type"].append(details.get("shotType") or "")
+        columns["has_details"].append(bool(details))
+
+        code = play.get("situationCode") or details.get("situationCode")
+        columns["is_shootout"].append(code is not None and str(code).strip() in SHOOTOUT_SITUATION_CODES)
+        columns["situation"].extend(parse_situation(code))
+        columns["players"].extend(_to_int(details.get(key), 0) for key in PLAYER_ID_FIELDS)
+
+    if game_id is None:
+        game_id = _to_int(pbp.get("id") or pbp.get("gameId"), 0) or None
+    return PbpEvents(game_id, home_team_id, away_team_id, columns)
+
+
+_cache: "OrderedDict[int, Tuple[Dict[str, Any], Tuple[int, int, str], PbpEvents]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def decode_game(pbp: Dict[str, Any], game_id: Optional[int] = None) -> PbpEvents:
+    """
+    Cached decode_plays(): consumers handed the same payload share one decode.
+
+    Args:
+        pbp: gamecenter play-by-play payload (raw_nhl_data.raw_json)
+        game_id: NHL game ID (defaults to the payload's id)
+
+    Returns:
+        PbpEvents table aligned with the payload's plays
+    """
+    if game_id is None:
+        game_id = _to_int(pbp.get("id") or pbp.get("gameId"), 0) or None
+    if game_id is None:
+        return decode_plays(pbp)
+
+    game_id = int(game_id)
+    mark = pbp_high_water_mark({"plays": _plays(pbp), "gameState": pbp.get("gameState", "")})
+    with _cache_lock:
+        entry = _cache.get(game_id)
+        if entry is not None and entry[0] is pbp and entry[1] == mark:
+            _cache.move_to_end(game_id)
+            return entry[2]
+
+    events = decode_plays(pbp, game_id)
+    with _cache_lock:
+        _cache[game_id] = (pbp, mark, events)
+        _cache.move_to_end(game_id)
+        while len(_cache) > PBP_EVENT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return events
+
+
+def clear_cache(game_id: Optional[int] = None) -> None:
+    """Drop one game's decoded table (or all)."""
+    with _cache_lock:
+        if game_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(int(game_id), None)
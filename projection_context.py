@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""
+projection_context.py
+
+Bulk-preloaded read context for the daily projection engine.
+
+calculate_daily_projection() and its helpers issue a dozen-plus PostgREST
+round-trips per player (player_directory, player_season_stats, nhl_games,
+league baselines, goalie SV%, team xGA, on-ice xGA, B2B, ...), so a 700-player
+slate costs ~10k HTTP calls. ProjectionContext loads every table those helpers
+read for a date/season in a handful of bulk queries, indexes the rows in memory
+(by player_id, team_abbrev, game_id, ...) and answers the helpers' select()
+calls from memory.
+
+It exposes the same select/upsert/update/delete/rpc surface as SupabaseRest, so
+it can be passed anywhere the projection code expects a `db`:
+
+    ctx = ProjectionContext.load(db, target_date, season, player_ids)
+    projection = calculate_daily_projection(ctx, player_id, game_id, target_date, season, scoring)
+    ctx.flush()  # write buffered projection_cache rows in bulk
+
+Queries the context cannot answer exactly (a table that was not preloaded, a
+column that was not loaded, keys outside the preloaded window, or an operator
+it does not evaluate) fall through to the wrapped client, so the projection
+math is unchanged - only where the rows come from.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from supabase_rest import SupabaseRest, Filter
+
+
+PAGE_SIZE = 1000  # PostgREST max rows per response
+IN_BATCH_SIZE = 100  # Keep "in" filters short enough for URL length limits
+UPSERT_BATCH_SIZE = 500
+
+# Games (per query window) kept in memory for the "last N games" helpers.
+# The helpers look at the 100 most recent league games; the margin covers
+# date ties at the window boundary.
+RECENT_GAMES_WINDOW = 120
+
+# Unique key per table for stable pagination in fetch_all() (primary key, or
+# a unique column where the primary key is a surrogate uuid nobody filters on)
+TABLE_KEYS: Dict[str, Union[str, Tuple[str, ...]]] = {
+    "player_directory": ("season", "player_id"),
+    "player_season_stats": ("season", "player_id"),
+    "player_talent_metrics": ("player_id", "season"),
+    "player_game_stats": ("season", "game_id", "player_id"),
+    "nhl_games": "game_id",
+    "projection_cache": "cache_id",
+    "goalie_gsax_primary": "goalie_id",
+    "goalie_gsax": "goalie_id",
+    "team_mapping_config": "mapping_id",
+}
+
+# Writes to these tables are buffered in memory and flushed in bulk
+DEFERRED_WRITE_TABLES = {"projection_cache": "player_id,game_id,projection_date"}
+
+RAW_SHOT_COLUMNS = (
+    "id,game_id,player_id,team_code,is_home_team,home_team_abbrev,away_team_abbrev,"
+    "is_goal,xg_value,shooting_talent_adjusted_xg,flurry_adjusted_xg"
+)
+PLAYER_GAME_STAT_COLUMNS = (
+    "season,game_id,game_date,player_id,team_abbrev,is_goalie,shots_on_goal,icetime_seconds"
+)
+
+
+def _norm(value: Any) -> Optional[str]:
+    """Normalize a value the way PostgREST compares filter text against a column."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _ordered(value: Any) -> Tuple[int, Any]:
+    """Comparison key for range operators and ordering (numbers numerically, else text)."""
+    if isinstance(value, bool):
+        return (0, int(value))
+    if isinstance(value, (int, float)):
+        return (0, float(value))
+    try:
+        return (0, float(value))
+    except (TypeError, ValueError):
+        return (1, str(value))
+
+
+SUPPORTED_OPS = {"eq", "neq", "in", "gt", "gte", "lt", "lte"}
+
+
+def _predicate(col: str, op: str, val: Any):
+    """Compile one PostgREST filter into a row predicate."""
+    if op == "eq":
+        target = _norm(val)
+        return lambda row: row.get(col) is not None and _norm(row.get(col)) == target
+    if op == "neq":
+        target = _norm(val)
+        return lambda row: row.get(col) is not None and _norm(row.get(col)) != target
+    if op == "in":
+        targets = {_norm(v) for v in val}
+        return lambda row: row.get(col) is not None and _norm(row.get(col)) in targets
+    if op not in SUPPORTED_OPS:
+        raise ValueError(f"Unsupported operator: {op}")
+
+    right = _ordered(val)
+
+    def compare(row: Dict[str, Any]) -> bool:
+        cell = row.get(col)
+        if cell is None:
+            return False
+        left, rhs = _ordered(cell), right
+        if left[0] != rhs[0]:
+            left, rhs = (1, str(cell)), (1, str(val))
+        if op == "gt":
+            return left > rhs
+        if op == "gte":
+            return left >= rhs
+        if op == "lt":
+            return left < rhs
+        return left <= rhs
+
+    return compare
+
+
+class _Table:
+    """
+    Rows of one preloaded table plus a description of what they cover.
+
+    Each entry of `coverage` is one way a query can be answered completely:
+    a {column: loaded keys} mapping whose columns the query must all pin (eq/in)
+    to loaded keys. E.g. nhl_games is complete for season=2025 *or* for any
+    game_id that was loaded; raw_shots only for the recent-games window or the
+    slate's shooters. A table with no coverage entries was loaded in full.
+    """
+
+    INDEXED_COLUMNS = ("player_id", "game_id", "team_abbrev", "goalie_id", "id", "position")
+
+    def __init__(self, name: str, columns: Optional[str] = None, primary_key: Optional[Sequence[str]] = None):
+        self.name = name
+        # None = all columns were loaded ("*")
+        self.columns = {c.strip() for c in columns.split(",")} if columns else None
+        self.primary_key = tuple(primary_key) if primary_key else None
+        self.coverage: List[Dict[str, Set[Optional[str]]]] = []
+        self.rows: List[Dict[str, Any]] = []
+        self._by_pk: Dict[Tuple, int] = {}
+        self._indexes: Dict[str, Dict[Optional[str], List[Dict[str, Any]]]] = {}
+
+    def add_rows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            if self.primary_key:
+                key = tuple(_norm(row.get(c)) for c in self.primary_key)
+                if key in self._by_pk:
+                    self.rows[self._by_pk[key]] = row
+                    continue
+                self._by_pk[key] = len(self.rows)
+            self.rows.append(row)
+        self._indexes.clear()
+
+    def add_coverage(self, **keys: Iterable[Any]) -> None:
+        self.coverage.append({col: {_norm(k) for k in values} for col, values in keys.items()})
+
+    def _index(self, column: str) -> Dict[Optional[str], List[Dict[str, Any]]]:
+        index = self._indexes.get(column)
+        if index is None:
+            index = {}
+            for row in self.rows:
+                index.setdefault(_norm(row.get(column)), []).append(row)
+            self._indexes[column] = index
+        return index
+
+    def covers(self, select: str, filters: List[Filter]) -> bool:
+        if self.columns is not None:
+            wanted = {c.strip() for c in select.split(",") if c.strip()}
+            if "*" in wanted or not wanted.issubset(self.columns):
+                return False
+
+        pinned: Dict[str, Set[Optional[str]]] = {}
+        for col, op, val in filters:
+            if op not in SUPPORTED_OPS:
+                return False
+            # A column that was never loaded reads as None and would match nothing
+            if self.columns is not None and col not in self.columns:
+                return False
+            if op == "eq":
+                pinned[col] = {_norm(val)}
+            elif op == "in":
+                pinned[col] = {_norm(v) for v in val}
+
+        if not self.coverage:
+            return True
+        return any(
+            all(col in pinned and pinned[col].issubset(keys) for col, keys in alternative.items())
+            for alternative in self.coverage
+        )
+
+    def query(
+        self,
+        select: str,
+        filters: List[Filter],
+        order: Optional[str],
+        limit: Optional[int],
+        offset: Optional[int],
+    ) -> List[dict]:
+        candidates: List[Dict[str, Any]] = self.rows
+        for col, op, val in filters:
+            if col in self.INDEXED_COLUMNS and op in ("eq", "in"):
+                index = self._index(col)
+                values = [val] if op == "eq" else list(val)
+                candidates = [row for v in dict.fromkeys(_norm(x) for x in values) for row in index.get(v, [])]
+                break
+
+        predicates = [_predicate(col, op, val) for col, op, val in filters]
+        rows = [row for row in candidates if all(p(row) for p in predicates)]
+
+        if order:
+            # Apply sort keys right-to-left so the first key wins (stable sort).
+            # PostgREST default: NULLs last for asc, first for desc.
+            for term in reversed([t.strip() for t in order.split(",") if t.strip()]):
+                parts = term.split(".")
+                col = parts[0]
+                descending = len(parts) > 1 and parts[1] == "desc"
+                present = [r for r in rows if r.get(col) is not None]
+                missing = [r for r in rows if r.get(col) is None]
+                present.sort(key=lambda r: _ordered(r.get(col)), reverse=descending)
+                rows = missing + present if descending else present + missing
+
+        start = int(offset or 0)
+        rows = rows[start:start + int(limit)] if limit is not None else rows[start:]
+
+        if select.strip() == "*":
+            return [dict(r) for r in rows]
+        cols = [c.strip() for c in select.split(",") if c.strip()]
+        return [{c: r.get(c) for c in cols} for r in rows]
+
+
+def fetch_all(
+    db: SupabaseRest,
+    table: str,
+    select: str = "*",
+    filters: Optional[List[Filter]] = None,
+    order: Optional[str] = None,
+) -> List[dict]:
+    """
+    Fetch every row matching the filters, paginating PAGE_SIZE rows at a time.
+
+    Pages are taken in the table's unique key order (TABLE_KEYS, else "id"):
+    keyset pagination on a SupabaseRest client, otherwise limit/offset with the
+    key appended to `order` so no row is skipped or repeated between pages.
+    """
+    key = TABLE_KEYS.get(table, "id")
+    keys = [key] if isinstance(key, str) else list(key)
+    if order is None and hasattr(db, "select_all"):
+        return db.select_all(table, select=select, filters=filters or [], key=key, page_size=PAGE_SIZE)
+
+    terms = [t.strip() for t in order.split(",") if t.strip()] if order else []
+    ordered = {t.split(".")[0] for t in terms}
+    order = ",".join(terms + [f"{k}.asc" for k in keys if k not in ordered])
+    if select != "*":
+        cols = [c.strip() for c in select.split(",")]
+        select = ",".join(cols + [k for k in keys if k not in cols])
+    rows: List[dict] = []
+    offset = 0
+    while True:
+        page = db.select(table, select=select, filters=filters or [], order=order, limit=PAGE_SIZE, offset=offset)
+        if not page:
+            break
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+    return rows
+
+
+def fetch_all_in(
+    db: SupabaseRest,
+    table: str,
+    column: str,
+    values: Sequence[Any],
+    select: str = "*",
+    filters: Optional[List[Filter]] = None,
+    order: Optional[str] = None,
+) -> List[dict]:
+    """fetch_all() for a large `in` filter, split into IN_BATCH_SIZE chunks."""
+    rows: List[dict] = []
+    values = list(dict.fromkeys(values))
+    for i in range(0, len(values), IN_BATCH_SIZE):
+        batch = values[i:i + IN_BATCH_SIZE]
+        rows.extend(fetch_all(db, table, select=select, filters=[(column, "in", batch)] + list(filters or []), order=order))
+    return rows
+
+
+class ProjectionContext:
+    """
+    In-memory, read-through stand-in for SupabaseRest scoped to one projection slate.
+
+    Build it with ProjectionContext.load(); pass it as `db` to the projection
+    functions; call flush() when done to persist buffered writes.
+    """
+
+    def __init__(self, db: SupabaseRest, target_date: date, season: int):
+        self.db = db
+        self.target_date = target_date
+        self.season = season
+        self.tables: Dict[str, _Table] = {}
+        self.pending_writes: Dict[str, Dict[Tuple, dict]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def load(
+        cls,
+        db: SupabaseRest,
+        target_date: date,
+        season: int,
+        player_ids: Optional[Iterable[int]] = None,
+        verbose: bool = True,
+    ) -> "ProjectionContext":
+        """
+        Bulk-load every table the three projection layers read for a slate.
+
+        Args:
+            db: Supabase client used for the bulk loads and for fall-through queries
+            target_date: Slate date (projection_cache rows are loaded for this date)
+            season: Season year (the previous season is loaded for blended baselines)
+            player_ids: Players on the slate; their career raw_shots are preloaded
+                        for the finishing-talent multiplier
+            verbose: Print a one-line summary per table
+
+        Returns:
+            Loaded ProjectionContext
+        """
+        ctx = cls(db, target_date, season)
+        seasons = [season, season - 1]
+        start_requests = getattr(db, "request_count", 0)
+
+        def load_table(name, rows_fn, coverage=(), primary_key=None):
+            try:
+                rows = rows_fn()
+            except Exception as e:
+                # Table missing or query rejected - leave it to the fall-through path
+                if verbose:
+                    print(f"   ⚠️  {name}: not preloaded ({e})")
+                return None
+            table = _Table(name, primary_key=primary_key)
+            table.add_rows(rows)
+            for alternative in coverage:
+                table.add_coverage(**alternative)
+            ctx.tables[name] = table
+            if verbose:
+                print(f"   {name}: {len(table.rows)} rows")
+            return table
+
+        load_table(
+            "player_directory",
+            lambda: fetch_all(db, "player_directory", filters=[("season", "eq", season)]),
+            coverage=[{"season": [season]}],
+        )
+        load_table(
+            "player_season_stats",
+            lambda: fetch_all(db, "player_season_stats", filters=[("season", "eq", season)]),
+            coverage=[{"season": [season]}],
+        )
+        load_table(
+            "player_talent_metrics",
+            lambda: fetch_all(db, "player_talent_metrics", filters=[("season", "eq", season)]),
+            coverage=[{"season": [season]}],
+        )
+        load_table(
+            "league_averages",
+            lambda: fetch_all(db, "league_averages", filters=[("season", "in", seasons)]),
+            coverage=[{"season": seasons}],
+        )
+        games = load_table(
+            "nhl_games",
+            lambda: fetch_all(db, "nhl_games", filters=[("season", "in", seasons)]),
+            coverage=[{"season": seasons}],
+        )
+        if games is not None:
+            # game_id is unique, so lookups by id are complete for every loaded game
+            games.add_coverage(game_id=[g.get("game_id") for g in games.rows])
+        load_table(
+            "projection_cache",
+            lambda: fetch_all(
+                db, "projection_cache",
+                filters=[("projection_date", "eq", target_date.isoformat()), ("season", "eq", season)]
+            ),
+            coverage=[{"projection_date": [target_date.isoformat()], "season": [season]}],
+            primary_key=("player_id", "game_id", "projection_date"),
+        )
+        load_table("goalie_gsax_primary", lambda: fetch_all(db, "goalie_gsax_primary"))
+        load_table("goalie_gsax", lambda: fetch_all(db, "goalie_gsax"))
+        load_table("team_mapping_config", lambda: fetch_all(db, "team_mapping_config"))
+        load_table("leagues", lambda: fetch_all(db, "leagues"))
+
+        # Recent-games window: the league's most recent games that the
+        # team xGA / shots-for / opponent-context helpers scan.
+        window_ids: Set[int] = set()
+        if games is not None:
+            today = date.today().isoformat()
+            windows = [
+                [("season", "eq", season), ("game_date", "lte", today)],
+                [("season", "eq", season - 1), ("game_date", "lte", today)],
+                [("season", "eq", season)],
+            ]
+            for window_filters in windows:
+                recent = games.query("game_id", window_filters, "game_date.desc", RECENT_GAMES_WINDOW, None)
+                window_ids.update(int(g["game_id"]) for g in recent if g.get("game_id"))
+
+        shots = _Table("raw_shots", RAW_SHOT_COLUMNS, primary_key=("id",))
+        pgs = _Table("player_game_stats", PLAYER_GAME_STAT_COLUMNS, primary_key=("season", "game_id", "player_id"))
+        shooter_ids = sorted({int(p) for p in (player_ids or [])})
+        try:
+            if window_ids:
+                shots.add_rows(fetch_all_in(db, "raw_shots", "game_id", sorted(window_ids), select=RAW_SHOT_COLUMNS))
+                shots.add_coverage(game_id=window_ids)
+                pgs.add_rows(fetch_all_in(db, "player_game_stats", "game_id", sorted(window_ids), select=PLAYER_GAME_STAT_COLUMNS))
+                pgs.add_coverage(game_id=window_ids)
+            if shooter_ids:
+                shots.add_rows(fetch_all_in(db, "raw_shots", "player_id", shooter_ids, select=RAW_SHOT_COLUMNS))
+                shots.add_coverage(player_id=shooter_ids)
+            if shots.coverage:
+                ctx.tables["raw_shots"] = shots
+            if pgs.coverage:
+                ctx.tables["player_game_stats"] = pgs
+            if verbose:
+                print(f"   raw_shots: {len(shots.rows)} rows ({len(window_ids)} recent games, {len(shooter_ids)} shooters)")
+                print(f"   player_game_stats: {len(pgs.rows)} rows")
+        except Exception as e:
+            if verbose:
+                print(f"   ⚠️  raw_shots/player_game_stats: not preloaded ({e})")
+
+        if verbose:
+            used = getattr(db, "request_count", 0) - start_requests
+            print(f"   Context loaded with {used} requests")
+        return ctx
+
+    # ------------------------------------------------------------------
+    # SupabaseRest surface
+    # ------------------------------------------------------------------
+
+    def select(self, table: str, select: str = "*", filters: Optional[List[Filter]] = None, order: Optional[str] = None,
+               limit: Optional[int] = None, offset: Optional[int] = None) -> List[dict]:
+        filters = list(filters or [])
+        loaded = self.tables.get(table)
+        if loaded is not None and loaded.covers(select, filters):
+            self.hits += 1
+            return loaded.query(select, filters, order, limit, offset)
+        self.misses += 1
+        return self.db.select(table, select=select, filters=filters, order=order, limit=limit, offset=offset)
+
+    def upsert(self, table: str, rows: Union[dict, List[dict]], on_conflict: str) -> None:
+        body = rows if isinstance(rows, list) else [rows]
+        if DEFERRED_WRITE_TABLES.get(table) == on_conflict:
+            keys = [c.strip() for c in on_conflict.split(",")]
+            pending = self.pending_writes.setdefault(table, {})
+            for row in body:
+                pending[tuple(_norm(row.get(k)) for k in keys)] = row
+            if table in self.tables:
+                self.tables[table].add_rows(body)
+            return
+        self._invalidate(table)
+        self.db.upsert(table, body, on_conflict=on_conflict)
+
+    def update(self, table: str, values: dict, filters: List[Filter]) -> None:
+        self._invalidate(table)
+        self.db.update(table, values, filters)
+
+    def delete(self, table: str, filters: List[Filter]) -> None:
+        self._invalidate(table)
+        self.db.delete(table, filters)
+
+    def rpc(self, fn: str, payload: dict) -> Any:
+        mapping = self.tables.get("team_mapping_config")
+        if fn == "get_canonical_team_code" and mapping is not None:
+            # Same resolution as the team_mapping_config fallback in
+            # calculate_daily_projections.get_canonical_team_code()
+            team_code = payload.get("p_team_code")
+            for row in mapping.rows:
+                aliases = row.get("aliased_team_codes", [])
+                if isinstance(aliases, list) and team_code in aliases:
+                    return row.get("canonical_team_code", team_code)
+            return team_code
+        return self.db.rpc(fn, payload)
+
+    # ------------------------------------------------------------------
+    # Housekeeping
+    # ------------------------------------------------------------------
+
+    def _invalidate(self, table: str) -> None:
+        """Writes through to a preloaded table make its snapshot stale - stop serving it."""
+        if table in self.tables and table not in DEFERRED_WRITE_TABLES:
+            del self.tables[table]
+
+    def flush(self) -> int:
+        """
+        Write buffered rows (e.g. projection_cache) in UPSERT_BATCH_SIZE batches.
+
+        Returns:
+            Number of rows written
+        """
+        written = 0
+        for table, pending in self.pending_writes.items():
+            rows = list(pending.values())
+            on_conflict = DEFERRED_WRITE_TABLES[table]
+            for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+                batch = rows[i:i + UPSERT_BATCH_SIZE]
+                try:
+                    self.db.upsert(table, batch, on_conflict=on_conflict)
+                    written += len(batch)
+                except Exception as e:
+                    print(f"⚠️  Warning: Could not flush {len(batch)} {table} rows: {e}")
+            pending.clear()
+        return written
+
+    @property
+    def request_count(self) -> int:
+        return getattr(self.db, "request_count", 0)
+
+    def summary(self) -> str:
+        return (
+            f"{self.hits} queries served from memory, {self.misses} fell through, "
+            f"{self.request_count} DB requests total"
+        )
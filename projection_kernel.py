@@ -0,0 +1,631 @@
+#!/usr/bin/env python3
+"""
+projection_kernel.py
+
+Vectorized (NumPy) batch mode for calculate_daily_projection().
+
+The scalar path projects one player-game at a time: hybrid base -> finishing
+multiplier -> opponent DDR x B2B x home/away -> fantasy points -> VOPA. This
+module splits that into two stages:
+
+1. gather_skater_features() - the I/O. Runs the existing lookup helpers
+   (finishing talent, DDR, B2B, on-ice xGA, league averages) once per distinct
+   key - per player, per (opponent, game), per (team, date), per position -
+   and lays the results out as column arrays.
+2. project_skaters() - the math. One vectorized pass over the arrays computes
+   all 8 projected stats, fantasy points and the VOPA components for every
+   row, using the same operations in the same order as the scalar path so the
+   results are bit-for-bit identical.
+
+project_slate() ties the two together and returns records shaped exactly like
+calculate_daily_projection() output. Goalies (and any row whose features
+cannot be gathered) are routed through the scalar path unchanged. Batch mode
+does not write Layer-1 physical projections to projection_cache.
+
+Layer 2 is batched too: score_projections_for_leagues() takes the projected
+stats once and applies every league's scoring weights as a single matrix
+product (player-games x stats . stats x leagues).
+
+Parity against the scalar path is checked with verify_parity() /
+verify_projection_kernel.py.
+"""
+
+import math
+import os
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from supabase_rest import SupabaseRest
+from calculate_daily_projections import (
+    calculate_daily_projection,
+    calculate_finishing_talent,
+    check_back_to_back,
+    get_home_away_adjustment,
+    get_hybrid_league_averages,
+    get_latest_baselines,
+    get_opponent_strength,
+    get_player_on_ice_xga_per_60,
+    get_positional_avg_fantasy_pts_per_60,
+    get_positional_std_dev_fantasy_pts_per_60,
+)
+
+
+# (stat, league_averages key) for the 8 skater stats, in the
+# order calculate_hybrid_base() / calculate_fantasy_points() sum them
+SKATER_STATS = (
+    ("goals", "avg_goals_per_game"),
+    ("assists", "avg_assists_per_game"),
+    ("sog", "avg_sog_per_game"),
+    ("blocks", "avg_blocks_per_game"),
+    ("ppp", "avg_ppp_per_game"),
+    ("shp", "avg_shp_per_game"),
+    ("hits", "avg_hits_per_game"),
+    ("pim", "avg_pim_per_game"),
+)
+
+# Scoring key and default weight per stat (matches calculate_fantasy_points)
+SKATER_SCORING = {
+    "goals": ("goals", 3),
+    "assists": ("assists", 2),
+    "sog": ("shots_on_goal", 0.4),
+    "blocks": ("blocks", 0.5),
+    "ppp": ("power_play_points", 1),
+    "shp": ("short_handed_points", 2),
+    "hits": ("hits", 0.2),
+    "pim": ("penalty_minutes", 0.5),
+}
+
+# Scoring key and default weight per goalie stat (matches calculate_fantasy_points)
+GOALIE_SCORING = {
+    "wins": ("wins", 4),
+    "saves": ("saves", 0.2),
+    "shutouts": ("shutouts", 3),
+    "goals_against": ("goals_against", -1),
+}
+
+SEASON_STATS_COLUMNS = "goals,primary_assists,secondary_assists,shots_on_goal,blocks,ppp,shp,hits,pim,games_played,icetime_seconds"
+
+TOI_MAP = {"C": 17.5, "LW": 16.5, "RW": 16.5, "D": 21.0}
+
+# Feature columns produced by gather_skater_features() and consumed by project_skaters()
+FEATURE_COLUMNS = (
+    "has_stats", "games_played", "icetime_seconds",
+    "goals_total", "assists_total", "sog_total", "blocks_total",
+    "ppp_total", "shp_total", "hits_total", "pim_total",
+    "league_goals", "league_assists", "league_sog", "league_blocks",
+    "league_ppp", "league_shp", "league_hits", "league_pim",
+    "default_toi_minutes", "is_defense",
+    "finishing_multiplier", "opponent_adjustment", "b2b_penalty", "home_away_adjustment",
+    "player_xga_per_60_raw", "league_avg_xga_per_60",
+)
+
+
+def _skater_weights(scoring_settings: Dict[str, Any]) -> Dict[str, float]:
+    skater_scoring = scoring_settings.get("skater", {})
+    return {
+        stat: float(skater_scoring.get(key, default))
+        for stat, (key, default) in SKATER_SCORING.items()
+    }
+
+
+def gather_skater_features(
+    db: SupabaseRest,
+    tasks: Sequence[Tuple[int, int, date]],
+    season: int
+) -> Tuple[Dict[str, np.ndarray], List[Dict[str, Any]], List[int]]:
+    """
+    Run the per-player lookups for a slate and lay the results out as arrays.
+
+    Each helper is called once per distinct key (player, opponent/game,
+    team/date, position), so passing a ProjectionContext as `db` makes this
+    memory-only after the context load.
+
+    Args:
+        db: Supabase client (or ProjectionContext)
+        tasks: (player_id, game_id, game_date) per player-game
+        season: Season year
+
+    Returns:
+        (features, rows, scalar_indexes) where features maps FEATURE_COLUMNS to
+        arrays aligned with rows (one dict of identifiers per skater row), and
+        scalar_indexes lists task indexes that must use the scalar path
+        (goalies, missing directory/game rows, lookup errors).
+    """
+    columns: Dict[str, List[Any]] = {col: [] for col in FEATURE_COLUMNS}
+    rows: List[Dict[str, Any]] = []
+    scalar_indexes: List[int] = []
+
+    baselines = get_latest_baselines(db, season)
+    debug_ddr = os.getenv("DEBUG_DDR", "false").lower() == "true"
+
+    player_cache: Dict[int, Optional[Dict[str, Any]]] = {}
+    position_cache: Dict[str, Dict[str, float]] = {}
+    game_cache: Dict[int, Optional[Dict[str, Any]]] = {}
+    ddr_cache: Dict[Tuple[str, int, date], float] = {}
+    b2b_cache: Dict[Tuple[str, date], float] = {}
+
+    for idx, (player_id, game_id, game_date) in enumerate(tasks):
+        try:
+            if player_id not in player_cache:
+                player_dir = db.select(
+                    "player_directory",
+                    select="position_code,team_abbrev",
+                    filters=[("player_id", "eq", player_id), ("season", "eq", season)],
+                    limit=1
+                )
+                if not player_dir:
+                    player_cache[player_id] = None
+                else:
+                    position = player_dir[0].get("position_code", "C")
+                    player_cache[player_id] = {
+                        "position": position,
+                        "team": player_dir[0].get("team_abbrev", ""),
+                        "is_goalie": position == "G" or position == "Goalie",
+                    }
+            player = player_cache[player_id]
+            if player is None or player["is_goalie"]:
+                scalar_indexes.append(idx)
+                continue
+
+            if game_id not in game_cache:
+                game_info = db.select(
+                    "nhl_games",
+                    select="home_team,away_team",
+                    filters=[("game_id", "eq", game_id)],
+                    limit=1
+                )
+                game_cache[game_id] = game_info[0] if game_info else None
+            game = game_cache[game_id]
+            if game is None:
+                scalar_indexes.append(idx)
+                continue
+
+            position = player["position"]
+            player_team = player["team"]
+            opponent_team = game.get("away_team") if game.get("home_team") == player_team else game.get("home_team")
+
+            # Per-player features (season totals, finishing talent, on-ice xGA), stored on the
+            # player only once all three lookups succeed so a failure is retried by the next task
+            if "season_stats" not in player:
+                stats = db.select(
+                    "player_season_stats",
+                    select=SEASON_STATS_COLUMNS,
+                    filters=[("player_id", "eq", player_id), ("season", "eq", season)],
+                    limit=1
+                )
+                if stats:
+                    row = stats[0]
+                    gp = int(row.get("games_played", 0))
+                    season_stats = {
+                        "has_stats": True,
+                        "games_played": gp,
+                        "icetime_seconds": int(row.get("icetime_seconds", 0)),
+                        "goals_total": float(row.get("goals", 0)),
+                        "assists_total": float(row.get("primary_assists", 0)) + float(row.get("secondary_assists", 0)),
+                        "sog_total": float(row.get("shots_on_goal", 0)),
+                        "blocks_total": float(row.get("blocks", 0)),
+                        "ppp_total": float(row.get("ppp", 0)),
+                        "shp_total": float(row.get("shp", 0)),
+                        "hits_total": float(row.get("hits", 0)),
+                        "pim_total": float(row.get("pim", 0)),
+                    }
+                else:
+                    season_stats = {
+                        "has_stats": False, "games_played": 0, "icetime_seconds": 0,
+                        "goals_total": 0.0, "assists_total": 0.0, "sog_total": 0.0, "blocks_total": 0.0,
+                        "ppp_total": 0.0, "shp_total": 0.0, "hits_total": 0.0, "pim_total": 0.0,
+                    }
+                finishing_multiplier = calculate_finishing_talent(db, player_id, season)
+                xga_raw = get_player_on_ice_xga_per_60(
+                    db, player_id, player_team, season, last_n_games=10, debug=False
+                )
+                player.update(
+                    season_stats=season_stats, finishing_multiplier=finishing_multiplier, xga_raw=xga_raw
+                )
+
+            if position not in position_cache:
+                league_avg = get_hybrid_league_averages(db, position, season)
+                position_cache[position] = {
+                    f"league_{stat}": league_avg.get(avg_key, 0.0)
+                    for stat, avg_key in SKATER_STATS
+                }
+
+            ddr_key = (opponent_team, game_id, game_date)
+            if ddr_key not in ddr_cache:
+                ddr_cache[ddr_key] = get_opponent_strength(
+                    db, opponent_team, game_id, game_date, season,
+                    baselines["league_avg_xga_per_60"], baselines["league_avg_sv_pct"], debug=debug_ddr
+                )
+            b2b_key = (player_team, game_date)
+            if b2b_key not in b2b_cache:
+                b2b_cache[b2b_key] = check_back_to_back(db, player_team, game_date, season)
+        except Exception as e:
+            print(f"⚠️  Warning: Could not gather features for player {player_id}, game {game_id}: {e}")
+            scalar_indexes.append(idx)
+            continue
+
+        for col, value in player["season_stats"].items():
+            columns[col].append(value)
+        for col, value in position_cache[position].items():
+            columns[col].append(value)
+        columns["default_toi_minutes"].append(TOI_MAP.get(position, 18.0))
+        columns["is_defense"].append(position == "D")
+        columns["finishing_multiplier"].append(player["finishing_multiplier"])
+        columns["opponent_adjustment"].append(ddr_cache[ddr_key])
+        columns["b2b_penalty"].append(b2b_cache[b2b_key])
+        columns["home_away_adjustment"].append(get_home_away_adjustment(player_team, game))
+        columns["player_xga_per_60_raw"].append(math.nan if player["xga_raw"] is None else player["xga_raw"])
+        columns["league_avg_xga_per_60"].append(baselines["league_avg_xga_per_60"])
+
+        rows.append({
+            "task_index": idx,
+            "player_id": player_id,
+            "game_id": game_id,
+            "game_date": game_date,
+            "position": position,
+            "model_baselines": {
+                "league_avg_sv_pct": baselines["league_avg_sv_pct"],
+                "league_avg_xga_per_60": baselines["league_avg_xga_per_60"]
+            },
+        })
+
+    features = {col: np.asarray(values, dtype=np.float64) for col, values in columns.items()}
+    features["has_stats"] = np.asarray(columns["has_stats"], dtype=bool)
+    features["is_defense"] = np.asarray(columns["is_defense"], dtype=bool)
+    features["games_played"] = np.asarray(columns["games_played"], dtype=np.int64)
+    features["icetime_seconds"] = np.asarray(columns["icetime_seconds"], dtype=np.int64)
+    return features, rows, scalar_indexes
+
+
+def project_skaters(
+    features: Dict[str, np.ndarray],
+    scoring_settings: Dict[str, Any],
+    replacement_fpts_60: np.ndarray,
+    std_dev_fpts_60: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Vectorized Layer-1 + fantasy points + VOPA for every skater row.
+
+    Mirrors calculate_daily_projection() operation for operation (same
+    association order), so results match the scalar path exactly.
+
+    Args:
+        features: Column arrays from gather_skater_features()
+        scoring_settings: League scoring settings
+        replacement_fpts_60: Positional replacement FPts/60 per row
+        std_dev_fpts_60: Positional FPts/60 standard deviation per row
+
+    Returns:
+        Dict of unrounded output arrays (projected stats, points, VOPA components)
+    """
+    weights = _skater_weights(scoring_settings)
+    gp = features["games_played"]
+    has_stats = features["has_stats"]
+    has_games = has_stats & (gp > 0)
+    safe_gp = np.where(gp > 0, gp, 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Step 1: Hybrid base (Bayesian shrinkage toward league average)
+        weight = np.where(gp < 10, 0.20, np.where(gp >= 30, 0.90, 0.20 + (gp - 10) * 0.035))
+        base = {}
+        for stat, _ in SKATER_STATS:
+            history = np.where(has_games, features[f"{stat}_total"] / safe_gp, 0.0)
+            shrunk = (weight * history) + ((1 - weight) * features[f"league_{stat}"])
+            base[stat] = np.where(has_stats, shrunk, 0.0)
+        base_ppg = base["goals"] * weights["goals"]
+        for stat, _ in SKATER_STATS[1:]:
+            base_ppg = base_ppg + base[stat] * weights[stat]
+        base_ppg = np.where(has_stats, base_ppg, 0.0)
+
+        # Steps 2-3: Talent (goals only) then environment
+        finishing = features["finishing_multiplier"]
+        opponent = features["opponent_adjustment"]
+        b2b = features["b2b_penalty"]
+        home_away = features["home_away_adjustment"]
+        out = {"goals": base["goals"] * finishing * opponent * b2b * home_away}
+        for stat, _ in SKATER_STATS[1:]:
+            out[stat] = base[stat] * opponent * b2b * home_away
+        out["xg"] = np.where(finishing > 0, base["goals"] / finishing, base["goals"])
+
+        total_points = out["goals"] * weights["goals"]
+        for stat, _ in SKATER_STATS[1:]:
+            total_points = total_points + out[stat] * weights[stat]
+
+        # Step 4: VOPA
+        season_toi = (features["icetime_seconds"] / safe_gp) / 60.0
+        toi_minutes = np.where(has_games, season_toi, features["default_toi_minutes"])
+        toi_hours = toi_minutes / 60.0
+        fpts_60 = np.where(toi_hours > 0, total_points / toi_hours, 0.0)
+
+        std_ok = std_dev_fpts_60 > 0
+        offensive_raw = fpts_60 - replacement_fpts_60
+        offensive_z = np.where(std_ok, offensive_raw / std_dev_fpts_60, offensive_raw)
+
+        goal_weight = float(scoring_settings.get("skater", {}).get("goals", 3.0))
+        league_xga = features["league_avg_xga_per_60"]
+        pos_avg_xga = np.where(features["is_defense"], league_xga - 0.25, league_xga)
+
+        xga_raw = features["player_xga_per_60_raw"]
+        has_xga = ~np.isnan(xga_raw)
+        shrink_weight = np.where(gp < 10, 0.50, 0.50 + (gp - 10) * (0.50 / 10))
+        shrunk_xga = (shrink_weight * xga_raw) + ((1 - shrink_weight) * pos_avg_xga)
+        player_xga = np.where(gp >= 20, xga_raw, shrunk_xga)
+
+        xga_suppressed = np.where(has_xga, pos_avg_xga - player_xga, 0.0)
+        defensive_raw = np.where(has_xga, xga_suppressed * goal_weight, 0.0)
+        defensive_z = np.where(std_ok, defensive_raw / std_dev_fpts_60, defensive_raw)
+        defensive_z = np.where(has_xga, defensive_z, 0.0)
+
+        total_vopa = (offensive_z + defensive_z) * toi_hours
+        confidence = np.where(gp > 0, np.minimum(gp / 30.0, 1.0), 0.1)
+
+    out.update({
+        "total_projected_points": total_points,
+        "base_ppg": base_ppg,
+        "shrinkage_weight": weight,
+        "finishing_multiplier": finishing,
+        "opponent_adjustment": opponent,
+        "b2b_penalty": b2b,
+        "home_away_adjustment": home_away,
+        "confidence_score": confidence,
+        "projected_paa": offensive_raw * toi_hours,
+        "offensive_paa_per_60": offensive_raw,
+        "offensive_paa_per_60_z": offensive_z,
+        "on_ice_xga_per_60": np.where(has_xga, player_xga, np.nan),
+        "on_ice_xga_per_60_raw": xga_raw,
+        "xga_suppressed": xga_suppressed,
+        "defensive_value": defensive_raw * toi_hours,
+        "defensive_value_per_60": defensive_raw,
+        "defensive_value_per_60_z": defensive_z,
+        "total_vopa": total_vopa,
+        "position_replacement_fpts_per_60": replacement_fpts_60,
+        "position_std_dev_fpts_per_60": std_dev_fpts_60,
+        "position_avg_xga_per_60": pos_avg_xga,
+        "projected_toi_minutes": toi_minutes,
+    })
+    return out
+
+
+def _optional_round(value: float, digits: int = 3) -> Optional[float]:
+    """round() that maps NaN/0 to None, like the scalar path's `round(x) if x else None`."""
+    if math.isnan(value) or not value:
+        return None
+    return round(value, digits)
+
+
+def to_projection_records(
+    rows: List[Dict[str, Any]],
+    out: Dict[str, np.ndarray],
+    season: int
+) -> List[Dict[str, Any]]:
+    """Materialize project_skaters() arrays as calculate_daily_projection()-shaped dicts."""
+    columns = {key: values.tolist() for key, values in out.items()}
+    records = []
+    for i, row in enumerate(rows):
+        col = lambda key: columns[key][i]
+        records.append({
+            "player_id": row["player_id"],
+            "game_id": row["game_id"],
+            "projection_date": row["game_date"].isoformat(),
+            "projected_goals": round(col("goals"), 3),
+            "projected_assists": round(col("assists"), 3),
+            "projected_sog": round(col("sog"), 3),
+            "projected_blocks": round(col("blocks"), 3),
+            "projected_ppp": round(col("ppp"), 3),
+            "projected_shp": round(col("shp"), 3),
+            "projected_hits": round(col("hits"), 3),
+            "projected_pim": round(col("pim"), 3),
+            "projected_xg": round(col("xg"), 3),
+            "total_projected_points": round(col("total_projected_points"), 3),
+            "base_ppg": round(col("base_ppg"), 3),
+            "shrinkage_weight": round(col("shrinkage_weight"), 3),
+            "finishing_multiplier": round(col("finishing_multiplier"), 3),
+            "opponent_adjustment": round(col("opponent_adjustment"), 3),
+            "b2b_penalty": round(col("b2b_penalty"), 3),
+            "home_away_adjustment": round(col("home_away_adjustment"), 3),
+            "confidence_score": round(col("confidence_score"), 2),
+            "calculation_method": "hybrid_bayesian",
+            "model_baselines": dict(row["model_baselines"]),
+            "projected_paa": round(col("projected_paa"), 3),
+            "projected_paa_per_60": round(col("offensive_paa_per_60"), 3),
+            "on_ice_xga_per_60": _optional_round(col("on_ice_xga_per_60")),
+            "on_ice_xga_per_60_raw": _optional_round(col("on_ice_xga_per_60_raw")),
+            "xga_suppressed": round(col("xga_suppressed"), 3),
+            "defensive_value": round(col("defensive_value"), 3),
+            "defensive_value_per_60": round(col("defensive_value_per_60"), 3),
+            "defensive_value_per_60_z": round(col("defensive_value_per_60_z"), 3),
+            "total_vopa": round(col("total_vopa"), 3),
+            "offensive_paa_per_60": round(col("offensive_paa_per_60"), 3),
+            "offensive_paa_per_60_z": round(col("offensive_paa_per_60_z"), 3),
+            "position_replacement_fpts_per_60": round(col("position_replacement_fpts_per_60"), 3),
+            "position_std_dev_fpts_per_60": round(col("position_std_dev_fpts_per_60"), 3),
+            "position_avg_xga_per_60": round(col("position_avg_xga_per_60"), 3),
+            "projected_toi_minutes": round(col("projected_toi_minutes"), 2),
+            "is_goalie": False,
+            "season": season,
+        })
+    return records
+
+
+def positional_baselines(
+    db: SupabaseRest,
+    rows: List[Dict[str, Any]],
+    season: int,
+    scoring_settings: Dict[str, Any]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Replacement-level FPts/60 and FPts/60 std dev per row (looked up once per position)."""
+    replacement: Dict[str, float] = {}
+    std_dev: Dict[str, float] = {}
+    for position in {row["position"] for row in rows}:
+        replacement[position] = get_positional_avg_fantasy_pts_per_60(
+            db, position, season, scoring_settings, use_replacement_level=True
+        )
+        std_dev[position] = get_positional_std_dev_fantasy_pts_per_60(db, position, season)
+    return (
+        np.asarray([replacement[row["position"]] for row in rows], dtype=np.float64),
+        np.asarray([std_dev[row["position"]] for row in rows], dtype=np.float64),
+    )
+
+
+def project_slate(
+    db: SupabaseRest,
+    tasks: Sequence[Tuple[int, int, date]],
+    season: int,
+    scoring_settings: Dict[str, Any],
+    league_id: Optional[str] = None
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Batch equivalent of calling calculate_daily_projection() for each task.
+
+    Args:
+        db: Supabase client (ideally a preloaded ProjectionContext)
+        tasks: (player_id, game_id, game_date) per player-game
+        season: Season year
+        scoring_settings: League scoring settings
+        league_id: Passed through to the scalar path for goalies
+
+    Returns:
+        One projection dict (or None) per task, in task order
+    """
+    features, rows, scalar_indexes = gather_skater_features(db, tasks, season)
+    results: List[Optional[Dict[str, Any]]] = [None] * len(tasks)
+
+    if rows:
+        replacement, std_dev = positional_baselines(db, rows, season, scoring_settings)
+        out = project_skaters(features, scoring_settings, replacement, std_dev)
+        for row, record in zip(rows, to_projection_records(rows, out, season)):
+            results[row["task_index"]] = record
+
+    for idx in scalar_indexes:
+        player_id, game_id, game_date = tasks[idx]
+        results[idx] = calculate_daily_projection(
+            db, player_id, game_id, game_date, season, scoring_settings, league_id
+        )
+
+    return results
+
+
+def verify_parity(
+    db: SupabaseRest,
+    tasks: Sequence[Tuple[int, int, date]],
+    season: int,
+    scoring_settings: Dict[str, Any],
+    tolerance: float = 1e-9
+) -> List[str]:
+    """
+    Compare project_slate() against the scalar calculate_daily_projection().
+
+    Returns:
+        List of mismatch descriptions (empty when the two paths agree)
+    """
+    batch = project_slate(db, tasks, season, scoring_settings)
+    mismatches = []
+    for (player_id, game_id, game_date), vectorized in zip(tasks, batch):
+        scalar = calculate_daily_projection(db, player_id, game_id, game_date, season, scoring_settings)
+        if (scalar is None) != (vectorized is None):
+            mismatches.append(f"player {player_id} game {game_id}: scalar={scalar is not None} vectorized={vectorized is not None}")
+            continue
+        if scalar is None:
+            continue
+        for key in sorted(set(scalar) | set(vectorized)):
+            a, b = scalar.get(key), vectorized.get(key)
+            if isinstance(a, float) and isinstance(b, float):
+                if abs(a - b) > tolerance:
+                    mismatches.append(f"player {player_id} game {game_id} {key}: scalar={a} vectorized={b}")
+            elif a != b:
+                mismatches.append(f"player {player_id} game {game_id} {key}: scalar={a!r} vectorized={b!r}")
+    return mismatches
+
+
+# ============================================================================
+# LAYER 2: SCORE MANY LEAGUES
+# ============================================================================
+
+def scoring_weight_matrix(
+    league_scoring: Dict[str, Dict[str, Any]],
+    league_ids: Sequence[str],
+    role: str
+) -> np.ndarray:
+    """
+    Stack league scoring settings into a (stats x leagues) weight matrix.
+
+    Args:
+        league_scoring: league_id -> scoring settings
+        league_ids: Column order
+        role: "skater" (SKATER_SCORING rows) or "goalie" (GOALIE_SCORING rows)
+    """
+    scoring_keys = SKATER_SCORING if role == "skater" else GOALIE_SCORING
+    weights = np.zeros((len(scoring_keys), len(league_ids)), dtype=np.float64)
+    for j, league_id in enumerate(league_ids):
+        role_scoring = league_scoring[league_id].get(role, {})
+        for i, (key, default) in enumerate(scoring_keys.values()):
+            weights[i, j] = float(role_scoring.get(key, default))
+    return weights
+
+
+def score_projections_for_leagues(
+    projections: Sequence[Dict[str, Any]],
+    league_scoring: Dict[str, Dict[str, Any]]
+) -> Tuple[List[str], np.ndarray]:
+    """
+    Fantasy points for every projection under every league's scoring.
+
+    Physical stats are read once from the projection dicts (projected_goals,
+    projected_saves, ...) and multiplied by the stacked league weights, so
+    adding a league adds a column rather than re-running Layer 1.
+
+    Args:
+        projections: Projection dicts (calculate_daily_projection() output or
+                     player_projected_stats rows)
+        league_scoring: league_id -> scoring settings
+
+    Returns:
+        (league_ids, points) where points[i, j] is projection i under league j
+    """
+    league_ids = sorted(league_scoring)
+    points = np.zeros((len(projections), len(league_ids)), dtype=np.float64)
+    if not projections or not league_ids:
+        return league_ids, points
+
+    for role, scoring_keys in (("skater", SKATER_SCORING), ("goalie", GOALIE_SCORING)):
+        is_goalie = role == "goalie"
+        idx = [i for i, proj in enumerate(projections) if bool(proj.get("is_goalie")) == is_goalie]
+        if not idx:
+            continue
+        stats = np.asarray(
+            [[float(projections[i].get(f"projected_{stat}") or 0.0) for stat in scoring_keys] for i in idx],
+            dtype=np.float64
+        )
+        points[idx] = stats @ scoring_weight_matrix(league_scoring, league_ids, role)
+
+    return league_ids, points
+
+
+def league_points_rows(
+    projections: Sequence[Dict[str, Any]],
+    league_scoring: Dict[str, Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Flatten score_projections_for_leagues() into league_projected_points rows.
+
+    Rows carry updated_at: the column only has a DEFAULT, so a re-score would
+    otherwise keep the first insert's timestamp.
+    """
+    league_ids, points = score_projections_for_leagues(projections, league_scoring)
+    updated_at = datetime.now(timezone.utc).isoformat()
+    rows = []
+    for proj, league_points in zip(projections, points.tolist()):
+        for league_id, total in zip(league_ids, league_points):
+            rows.append({
+                "league_id": league_id,
+                "player_id": int(proj["player_id"]),
+                "game_id": int(proj["game_id"]),
+                "projection_date": proj["projection_date"],
+                "season": proj.get("season"),
+                "is_goalie": bool(proj.get("is_goalie")),
+                "total_projected_points": round(total, 3),
+                "updated_at": updated_at,
+            })
+    return rows
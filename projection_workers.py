@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+projection_workers.py
+
+Process-pool plumbing for the per-player projection paths
+(run_daily_projections --no-preload, nightly_projection_batch without
+--vectorized).
+
+Those workers used to build a fresh SupabaseRest per *task* - a new
+requests.Session and connection pool, so every task re-did the TLS handshake -
+and re-read the same slate-wide rows (league baselines, positional league
+averages / replacement levels, team DDR context) for every player.
+
+Now:
+    - worker_db() returns one pooled client per process, built by
+      init_projection_worker() (or lazily on first use).
+    - build_slate_state() collects the read-only slate data once in the parent;
+      install_slate_state() seeds the calculate_daily_projections module caches
+      from it.
+    - pool_kwargs() wires both into multiprocessing.Pool / ProcessPoolExecutor.
+      Under the fork start method the parent installs the state before the pool
+      starts and children inherit it copy-on-write (nothing is pickled); under
+      spawn the state is pickled once per worker through initargs, never per task.
+    - Tasks may carry a scoring key instead of the settings dict;
+      worker_scoring_settings() resolves it from the shared state.
+"""
+
+import multiprocessing
+from datetime import date
+from typing import Any, Dict, Iterable, Optional
+
+from supabase_rest import SupabaseRest
+from team_context import prepare_team_context
+import calculate_daily_projections as cdp
+
+
+SKATER_POSITIONS = ("C", "LW", "RW", "D")
+
+_worker_db: Optional[SupabaseRest] = None
+_worker_scoring: Dict[Any, Dict[str, Any]] = {}
+
+
+def worker_db() -> SupabaseRest:
+    """This process's pooled Supabase client (created on first use)."""
+    global _worker_db
+    if _worker_db is None:
+        _worker_db = cdp.supabase_client()
+    return _worker_db
+
+
+def worker_scoring_settings(key: Any) -> Dict[str, Any]:
+    """Scoring settings registered under `key` in the installed slate state."""
+    return _worker_scoring[key]
+
+
+def build_slate_state(
+    db: SupabaseRest,
+    season: int,
+    target_date: Optional[date] = None,
+    scoring: Optional[Dict[Any, Dict[str, Any]]] = None,
+    positions: Iterable[str] = SKATER_POSITIONS
+) -> Dict[str, Any]:
+    """
+    Read the slate-wide, read-only projection inputs once.
+
+    Args:
+        db: Supabase client (or ProjectionContext)
+        season: Season year
+        target_date: Slate date; if given, the team DDR/B2B context is built
+                     (or reused if it is already registered for the season)
+        scoring: {key: scoring_settings} tasks can refer to by key
+        positions: Positions whose league averages / replacement levels are cached
+
+    Returns:
+        Picklable state for install_slate_state()
+    """
+    for position in positions:
+        cdp.get_league_averages(db, position, season)
+    cdp.get_latest_baselines(db, season)
+
+    team_context = cdp._team_context_cache.get(season)
+    if team_context is None and target_date is not None:
+        team_context = prepare_team_context(db, target_date, season)
+
+    return {
+        "season": season,
+        "baselines": dict(cdp._baseline_cache),
+        "league_averages": dict(cdp._league_averages_cache),
+        "team_mapping": dict(cdp._team_mapping_cache),
+        "team_context": {season: team_context} if team_context else {},
+        "scoring": dict(scoring or {}),
+    }
+
+
+def install_slate_state(state: Dict[str, Any]) -> None:
+    """Seed this process's calculate_daily_projections caches from a slate state."""
+    cdp._baseline_cache.update(state.get("baselines", {}))
+    cdp._league_averages_cache.update(state.get("league_averages", {}))
+    cdp._team_mapping_cache.update(state.get("team_mapping", {}))
+    for season, teams in state.get("team_context", {}).items():
+        cdp.set_team_context(season, teams)
+    _worker_scoring.update(state.get("scoring", {}))
+
+
+def init_projection_worker(state: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Pool initializer: one pooled client per process, plus the slate state.
+
+    A client inherited over fork would share the parent's sockets, so a new
+    one is always built here.
+    """
+    global _worker_db
+    _worker_db = cdp.supabase_client()
+    if state is not None:
+        install_slate_state(state)
+
+
+def pool_kwargs(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    initializer/initargs for multiprocessing.Pool or ProcessPoolExecutor.
+
+    Under fork the state is installed in the parent now and inherited by the
+    children; otherwise it is shipped once per worker.
+    """
+    if multiprocessing.get_start_method(allow_none=False) == "fork":
+        install_slate_state(state)
+        return {"initializer": init_projection_worker, "initargs": (None,)}
+    return {"initializer": init_projection_worker, "initargs": (state,)}
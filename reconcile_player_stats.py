@@ -81,7 +81,7 @@ def fetch_boxscore(game_id: int) -> Optional[Dict[int, Dict[str, int]]]:
     url = f"{NHL_API_BASE}/gamecenter/{game_id}/boxscore"
     
     try:
-        response = citrus_request(url, timeout=15)
+        response = citrus_request(url, timeout=15, cache=False)  # Must see NHL stat corrections
         if response.status_code != 200:
             logger.warning(f"[BOXSCORE] Game {game_id}: HTTP {response.status_code}")
             return None
@@ -160,7 +160,8 @@ def process_recently_finished_games(max_age_hours: int = 2) -> Dict[str, int]:
             try:
                 pbp_response = citrus_request(
                     f"https://api-web.nhle.com/v1/gamecenter/{game_id}/play-by-play",
-                    timeout=5
+                    timeout=5,
+                    cache=False  # Polling for the OFF transition
                 )
                 if pbp_response.status_code == 200:
                     pbp_data = pbp_response.json()
@@ -4,10 +4,16 @@ run_daily_projections.py
 
 Citrus Projections 2.0 - Batch Daily Projections with Parallel Processing
 Calculates daily fantasy point projections for all rostered players across all leagues.
-Uses multiprocessing for sub-60-second execution on 600+ players.
+By default every table the projection helpers read is bulk-preloaded into a
+ProjectionContext and the slate is projected in-process from memory; pass
+--no-preload for the legacy per-player multiprocessing path.
+
+Layer 1 runs once per player-game; Layer 2 then scores every projection under
+every league's scoring settings in one matrix product and writes per-league
+totals to league_projected_points.
 
 Usage:
-    python run_daily_projections.py [--date YYYY-MM-DD] [--workers N] [--chunksize N] [--threshold X] [--z-score-threshold X]
+    python run_daily_projections.py [--date YYYY-MM-DD] [--workers N] [--chunksize N] [--threshold X] [--z-score-threshold X] [--no-preload]
 """
 
 import sys
@@ -31,6 +37,10 @@ if sys.stdout.encoding != 'utf-8':
 
 from dotenv import load_dotenv
 from supabase_rest import SupabaseRest
+from projection_context import ProjectionContext, fetch_all_in
+from projection_kernel import league_points_rows
+from team_context import prepare_team_context
+from projection_workers import build_slate_state, pool_kwargs, worker_db, worker_scoring_settings
 
 # Import calculation functions
 from calculate_daily_projections import (
@@ -58,18 +68,38 @@ if not SUPABASE_URL or not SUPABASE_KEY:
     raise RuntimeError("Missing VITE_SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY in environment.")
 
 
+# player_projected_stats columns needed to skip and re-score existing projections
+EXISTING_PROJECTION_COLUMNS = (
+    "player_id,game_id,projection_date,season,is_goalie,"
+    "projected_goals,projected_assists,projected_sog,projected_blocks,"
+    "projected_ppp,projected_shp,projected_hits,projected_pim,"
+    "projected_wins,projected_saves,projected_shutouts,projected_goals_against"
+)
+
+# Scoring for unrostered players (no league) and leagues without settings;
+# one shared dict so every such task has the same scoring key
+DEFAULT_SCORING_SETTINGS = {
+    "skater": {"goals": 3, "assists": 2, "shots_on_goal": 0.4, "blocks": 0.5},
+    "goalie": {"wins": 4, "shutouts": 3, "saves": 0.2, "goals_against": -1}
+}
+
+
 def get_fresh_supabase_client() -> SupabaseRest:
     """Create a fresh Supabase client for process-safe multiprocessing."""
     return SupabaseRest(SUPABASE_URL, SUPABASE_KEY)
 
 
-def get_rostered_players(db: SupabaseRest, target_date: date, season: int) -> List[Tuple[int, int, Optional[str]]]:
+def get_rostered_players(
+    db: SupabaseRest, target_date: date, season: int
+) -> Tuple[List[Tuple[int, int, Optional[str]]], Dict[int, List[str]]]:
     """
     Get all active players who have games on target date (LEFT JOIN approach).
     
     Returns:
-        List of (player_id, game_id, league_id) tuples
-        - league_id is None if player is not rostered (still calculate projection)
+        (players, player_leagues):
+        - players: List of (player_id, game_id, league_id) tuples, one per
+          player-game; league_id is the primary league (None if not rostered)
+        - player_leagues: player_id -> every league the player is rostered in
     """
     # Get all games on target date
     games = db.select(
@@ -79,7 +109,7 @@ def get_rostered_players(db: SupabaseRest, target_date: date, season: int) -> Li
     )
     
     if not games:
-        return []
+        return [], {}
     
     # Get all teams playing on this date
     playing_teams = set()
@@ -107,7 +137,7 @@ def get_rostered_players(db: SupabaseRest, target_date: date, season: int) -> Li
     print(f"   Found {len(all_players)} players", flush=True)
     
     if not all_players:
-        return []
+        return [], {}
     
     # LEFT JOIN with player_season_stats to filter inactive players
     player_ids = [int(p.get("player_id")) for p in all_players if p.get("player_id")]
@@ -145,15 +175,14 @@ def get_rostered_players(db: SupabaseRest, target_date: date, season: int) -> Li
     # OPTIMIZATION: Only fetch picks for active players, not all picks
     print(f"   Fetching draft picks for {len(active_players)} active players...", flush=True)
     active_player_ids_list = [int(p.get("player_id", 0)) for p in active_players if p.get("player_id")]
-    all_picks = db.select(
-        "draft_picks",
-        select="player_id,league_id",
-        filters=[("player_id", "in", active_player_ids_list)] if active_player_ids_list else [],
-        limit=10000
+    all_picks = fetch_all_in(
+        db, "draft_picks", "player_id", active_player_ids_list,
+        select="player_id,league_id"
     )
     print(f"   Found {len(all_picks)} draft picks", flush=True)
     
     player_to_league = {}
+    player_leagues: Dict[int, List[str]] = {}
     for pick in all_picks:
         pid_str = pick.get("player_id")
         if pid_str:
@@ -162,6 +191,8 @@ def get_rostered_players(db: SupabaseRest, target_date: date, season: int) -> Li
                 league_id = pick.get("league_id")
                 if league_id:
                     player_to_league[pid] = league_id
+                    if league_id not in player_leagues.setdefault(pid, []):
+                        player_leagues[pid].append(league_id)
             except (ValueError, TypeError):
                 continue
     
@@ -187,14 +218,14 @@ def get_rostered_players(db: SupabaseRest, target_date: date, season: int) -> Li
         result.append((player_id, game_id, league_id))
     
     # Remove duplicates (same player, same game, different leagues)
-    # If player is in multiple leagues, use first league_id found
+    # Layer 1 runs once per player-game; every league is scored in the Layer 2 fan-out
     unique_players = {}
     for player_id, game_id, league_id in result:
         key = (player_id, game_id)
         if key not in unique_players:
             unique_players[key] = league_id
     
-    return [(pid, gid, lid) for (pid, gid), lid in unique_players.items()]
+    return [(pid, gid, lid) for (pid, gid), lid in unique_players.items()], player_leagues
 
 
 def get_league_scoring_settings(db: SupabaseRest, league_id: str) -> Dict[str, Any]:
@@ -246,13 +277,20 @@ def get_league_scoring_settings(db: SupabaseRest, league_id: str) -> Dict[str, A
         }
 
 
-def calculate_player_projection_worker(args: Tuple[int, int, date, int, Dict[str, Any]]) -> Dict[str, Any]:
+def calculate_player_projection_worker(
+    args: Tuple[int, int, date, int, Dict[str, Any]],
+    db: Optional[Any] = None
+) -> Dict[str, Any]:
     """
     Worker function for multiprocessing pool.
-    Each worker creates its own database connection (process-safe).
+    Each worker process reuses one pooled database connection (process-safe),
+    set up by projection_workers.init_projection_worker().
     
     Args:
-        args: (player_id, game_id, game_date, season, scoring_settings)
+        args: (player_id, game_id, game_date, season, scoring_settings), where
+              scoring_settings may also be a key into the worker's slate state
+        db: Optional preloaded ProjectionContext (in-process mode); the
+            process's pooled client is used when omitted
     
     Returns:
         Dict with 'success', 'player_id', 'game_id', and either 'projection' or 'error'
@@ -260,8 +298,11 @@ def calculate_player_projection_worker(args: Tuple[int, int, date, int, Dict[str
     player_id, game_id, game_date, season, scoring_settings = args
     
     try:
-        # Create fresh database connection for this worker
-        db = get_fresh_supabase_client()
+        # Reuse this process's pooled connection
+        if db is None:
+            db = worker_db()
+        if not isinstance(scoring_settings, dict):
+            scoring_settings = worker_scoring_settings(scoring_settings)
         
         # Calculate projection
         projection = calculate_daily_projection(
@@ -643,6 +684,44 @@ def batch_upsert_projections(db: SupabaseRest, projections: List[Dict[str, Any]]
     return total_upserted
 
 
+def fan_out_league_points(
+    db: SupabaseRest,
+    projections: List[Dict[str, Any]],
+    league_scoring: Dict[str, Dict[str, Any]],
+    batch_size: int = 500
+) -> int:
+    """
+    Layer 2 fan-out: score every projection under every league and upsert to
+    league_projected_points.
+    
+    Physical stats come from the projections as-is (no Layer 1 re-run); the
+    per-league totals are one matrix product in projection_kernel.
+    
+    Args:
+        db: Supabase client
+        projections: Projection dicts or player_projected_stats rows
+        league_scoring: league_id -> scoring settings
+        batch_size: Rows per upsert request
+    
+    Returns:
+        Number of league rows upserted
+    """
+    rows = league_points_rows(projections, league_scoring)
+    upserted = 0
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        try:
+            db.upsert(
+                "league_projected_points",
+                batch,
+                on_conflict="league_id,player_id,game_id,projection_date"
+            )
+            upserted += len(batch)
+        except Exception as e:
+            print(f"⚠️  Error upserting league points batch {i//batch_size + 1}: {e}")
+    return upserted
+
+
 def populate_gp_last_10_metric(db: SupabaseRest, season: int) -> int:
     """
     Pre-calculate GP_Last_10 metric for all players.
@@ -716,6 +795,11 @@ def main():
         default=35.0,
         help="Rejection threshold for impossible projections (default: 35.0 points)"
     )
+    parser.add_argument(
+        "--no-preload",
+        action="store_true",
+        help="Skip the bulk-preloaded projection context and query per player (legacy path)"
+    )
     
     args = parser.parse_args()
     
@@ -760,7 +844,7 @@ def main():
     print("📋 Step 1: Fetching rostered players...")
     print("   (This may take a moment...)")
     sys.stdout.flush()
-    rostered_players = get_rostered_players(db, target_date, args.season)
+    rostered_players, player_leagues = get_rostered_players(db, target_date, args.season)
     
     if not rostered_players:
         print(f"⚠️  No rostered players found with games on {target_date}")
@@ -770,41 +854,55 @@ def main():
     print()
     sys.stdout.flush()
     
-    # Step 2: Group by league to get scoring settings
+    # Step 1b: Bulk-preload everything the projection helpers read
+    ctx = None
+    if not args.no_preload:
+        print("📋 Step 1b: Preloading projection context...")
+        sys.stdout.flush()
+        ctx = ProjectionContext.load(
+            db, target_date, args.season,
+            player_ids=[player_id for player_id, _, _ in rostered_players]
+        )
+        print()
+    
+    # Step 1c: Team-level DDR / B2B context, computed once per team instead of per player
+    print("📋 Step 1c: Building team context...")
+    sys.stdout.flush()
+    prepare_team_context(ctx or db, target_date, args.season, store_db=db)
+    print()
+    
+    # Step 2: Group by league to get scoring settings (every league any player is rostered in)
     print("📋 Step 2: Loading league scoring settings...")
     league_scoring = {}
-    unique_leagues = set(league_id for _, _, league_id in rostered_players if league_id is not None)
+    unique_leagues = set(league_id for leagues in player_leagues.values() for league_id in leagues)
+    unique_leagues.update(league_id for _, _, league_id in rostered_players if league_id is not None)
 
     for league_id in unique_leagues:
-        league_scoring[league_id] = get_league_scoring_settings(db, league_id)
+        league_scoring[league_id] = get_league_scoring_settings(ctx or db, league_id)
     
     print(f"   Loaded scoring settings for {len(unique_leagues)} leagues")
     print()
     
     # Step 3: Check existing projections and skip them
+    # Physical stats are kept so existing rows can still be fanned out to new leagues
     print("📋 Step 3: Checking existing projections...")
     existing_projections = set()
-    offset = 0
-    while True:
-        batch = db.select(
-            "player_projected_stats",
-            select="player_id,game_id",
-            filters=[("projection_date", "eq", target_date.isoformat())],
-            limit=1000,
-            offset=offset
-        )
-        if not batch:
-            break
+    existing_rows = []
+    for batch in db.iter_select(
+        "player_projected_stats",
+        select=EXISTING_PROJECTION_COLUMNS,
+        filters=[("projection_date", "eq", target_date.isoformat())],
+        key=("player_id", "game_id")
+    ):
+        existing_rows.extend(batch)
         for proj in batch:
             existing_projections.add((int(proj.get("player_id", 0)), int(proj.get("game_id", 0))))
-        if len(batch) < 1000:
-            break
-        offset += 1000
     print(f"   Found {len(existing_projections)} existing projections", flush=True)
     
     # Step 4: Prepare worker arguments (skip existing)
     print("📋 Step 4: Preparing worker tasks...")
     worker_args = []
+    scoring_keys = []  # Per task: league_id, or None for DEFAULT_SCORING_SETTINGS
     skipped = 0
     for player_id, game_id, league_id in rostered_players:
         # Skip if projection already exists
@@ -813,22 +911,19 @@ def main():
             continue
         # Use league scoring if available, otherwise use defaults
         # league_id can be None for unrostered players - use defaults
-        scoring_settings = league_scoring.get(league_id) if league_id else {
-            "skater": {"goals": 3, "assists": 2, "shots_on_goal": 0.4, "blocks": 0.5},
-            "goalie": {"wins": 4, "shutouts": 3, "saves": 0.2, "goals_against": -1}
-        }
-        if not scoring_settings:
-            scoring_settings = {
-                "skater": {"goals": 3, "assists": 2, "shots_on_goal": 0.4, "blocks": 0.5},
-                "goalie": {"wins": 4, "shutouts": 3, "saves": 0.2, "goals_against": -1}
-            }
-        worker_args.append((player_id, game_id, target_date, args.season, scoring_settings))
+        scoring_settings = league_scoring.get(league_id) if league_id else None
+        scoring_key = league_id if scoring_settings else None
+        worker_args.append((player_id, game_id, target_date, args.season, scoring_settings or DEFAULT_SCORING_SETTINGS))
+        scoring_keys.append(scoring_key)
     
     print(f"   Prepared {len(worker_args)} calculation tasks (skipped {skipped} existing)", flush=True)
     print()
     
     if len(worker_args) == 0:
         print("✅ All projections already exist! Nothing to calculate.")
+        if league_scoring and existing_rows:
+            league_rows = fan_out_league_points(db, existing_rows, league_scoring)
+            print(f"   ✓ Upserted {league_rows} league point rows ({len(league_scoring)} leagues)")
         return
     
     # Step 5: Process in parallel or single-threaded
@@ -836,10 +931,14 @@ def main():
     start_time = time.time()
     results = []
     
-    # OPTIMIZATION: Use single-threaded mode for small batches to avoid Windows multiprocessing issues
-    if len(worker_args) < 100:
-        print(f"   Small batch detected ({len(worker_args)} players) - using single-threaded mode")
-        print("   (This avoids Windows multiprocessing overhead for small jobs)")
+    # OPTIMIZATION: Use single-threaded mode for small batches to avoid Windows multiprocessing issues.
+    # With a preloaded context every lookup is in memory, so one process is fastest.
+    if ctx is not None or len(worker_args) < 100:
+        if ctx is not None:
+            print(f"   Preloaded context ({len(worker_args)} players) - computing in-process")
+        else:
+            print(f"   Small batch detected ({len(worker_args)} players) - using single-threaded mode")
+            print("   (This avoids Windows multiprocessing overhead for small jobs)")
         sys.stdout.flush()
         try:
             last_progress_time = time.time()
@@ -858,7 +957,7 @@ def main():
                     print(f"   [{elapsed:.0f}s] {pct:5.1f}% | {idx}/{len(worker_args)} players | Rate: {rate:.1f}/s | ETA: {remaining:.0f}s", flush=True)
                     last_progress_time = current_time
                 
-                result = calculate_player_projection_worker(worker_task)
+                result = calculate_player_projection_worker(worker_task, db=ctx)
                 results.append(result)
                 
                 # Add error handling per player to continue on failures
@@ -875,8 +974,14 @@ def main():
         print(f"   Progress will be shown every 10 seconds...")
         sys.stdout.flush()
         try:
+            # Slate-wide inputs are read once here and shared with every worker;
+            # tasks carry a scoring key instead of the settings dict
+            scoring_by_key = {key: task[4] for task, key in zip(worker_args, scoring_keys)}
+            pool_args = [task[:4] + (key,) for task, key in zip(worker_args, scoring_keys)]
+            slate_state = build_slate_state(db, args.season, target_date, scoring=scoring_by_key)
+            
             # Use imap_unordered for progress tracking
-            with multiprocessing.Pool(max_workers) as pool:
+            with multiprocessing.Pool(max_workers, **pool_kwargs(slate_state)) as pool:
                 results = []
                 completed = 0
                 last_progress_time = time.time()
@@ -885,7 +990,7 @@ def main():
                 # Use imap_unordered to get results as they complete
                 for result in pool.imap_unordered(
                     calculate_player_projection_worker,
-                    worker_args,
+                    pool_args,
                     chunksize=args.chunksize
                 ):
                     results.append(result)
@@ -910,6 +1015,12 @@ def main():
             traceback.print_exc()
             sys.exit(1)
     
+    if ctx is not None:
+        flushed = ctx.flush()
+        if flushed:
+            print(f"   Flushed {flushed} projection_cache rows")
+        print(f"   {ctx.summary()}")
+    
     elapsed_time = time.time() - start_time
     print(f"   Completed in {elapsed_time:.2f} seconds")
     print()
@@ -1037,6 +1148,15 @@ def main():
         print(f"   ✓ Upserted {upserted} projections to player_projected_stats in {upsert_elapsed:.1f}s")
         print()
     
+    # Step 8: Layer 2 fan-out - score new and existing projections under every league
+    league_rows = 0
+    if league_scoring:
+        print("📋 Step 8: Scoring projections for every league...")
+        fan_out_start = time.time()
+        league_rows = fan_out_league_points(db, projections_to_upsert + existing_rows, league_scoring)
+        print(f"   ✓ Upserted {league_rows} league point rows ({len(league_scoring)} leagues) in {time.time() - fan_out_start:.1f}s")
+        print()
+    
     # Final Summary
     print("=" * 80)
     print("BATCH PROCESSING COMPLETE")
@@ -1050,6 +1170,7 @@ def main():
         print(f"⚠️  Manual Review Needed: {len(review_projections)}")
         print(f"❌ Rejected: {len(rejected_projections)}")
     print(f"Projections Upserted: {len(projections_to_upsert)}")
+    print(f"League Point Rows: {league_rows}")
     if args.reject_outliers and rejected_projections and rejected_log_path:
         print(f"📄 Rejected projections log: {rejected_log_path}")
     print("=" * 80)
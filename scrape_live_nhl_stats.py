@@ -11,6 +11,7 @@ import datetime as dt
 from typing import Dict, List, Optional
 from dotenv import load_dotenv
 from supabase_rest import SupabaseRest
+from live_change_cache import GameFingerprintCache
 import requests
 
 load_dotenv()
@@ -27,10 +28,14 @@ def supabase_client() -> SupabaseRest:
     return SupabaseRest(SUPABASE_URL, SUPABASE_KEY)
 
 # --- THE UNIFIED PROCESSOR (INJECTED DATA) ---
-def process_game_data_citrus(game_id: int, boxscore: dict, pbp_data: Optional[dict] = None):
+def process_game_data_citrus(game_id: int, boxscore: dict, pbp_data: Optional[dict] = None,
+                             fingerprints: Optional[GameFingerprintCache] = None):
     """
     Accepts raw JSON and reconciles it into the 8-stat model.
     No internal API calls to prevent 429s.
+    
+    With a fingerprint cache (live loop), only the scoreboard and player stat
+    lines that changed since the last successful write are sent.
     """
     db = supabase_client()
     
@@ -39,7 +44,7 @@ def process_game_data_citrus(game_id: int, boxscore: dict, pbp_data: Optional[di
         boxscore["periodDescriptor"] = pbp_data.get("periodDescriptor", {})
         boxscore["clock"] = pbp_data.get("clock", {})
     
-    update_game_scores_in_nhl_games(db, game_id, boxscore)
+    update_game_scores_in_nhl_games(db, game_id, boxscore, fingerprints=fingerprints)
 
     # 2. Extract 8-Stats
     from scrape_per_game_nhl_stats import (
@@ -51,6 +56,12 @@ def process_game_data_citrus(game_id: int, boxscore: dict, pbp_data: Optional[di
     if not player_stats:
         return False
 
+    line_hashes = None
+    if fingerprints is not None:
+        player_stats, line_hashes = fingerprints.changed_players(game_id, player_stats)
+        if not player_stats:
+            return True  # No stat line moved since the last poll
+
     # 3. Write to player_game_stats
     game_info = boxscore.get("gameInfo", {})
     start_time_utc = game_info.get("startTimeUTC", "")
@@ -59,17 +70,21 @@ def process_game_data_citrus(game_id: int, boxscore: dict, pbp_data: Optional[di
     except:
         game_date = dt.date.today()
 
-    update_player_game_stats_nhl_columns(
+    result = update_player_game_stats_nhl_columns(
         db=db,
         game_id=game_id,
         game_date=game_date,
         player_stats=player_stats,
         season=DEFAULT_SEASON
     )
+    # Only remember what was written; a partial failure rewrites the game next poll
+    if fingerprints is not None and result.get("skipped", 0) == 0:
+        fingerprints.mark_players(game_id, line_hashes)
     return True
 
 # --- HELPER FUNCTIONS ---
-def update_game_scores_in_nhl_games(db: SupabaseRest, game_id: int, boxscore: dict) -> bool:
+def update_game_scores_in_nhl_games(db: SupabaseRest, game_id: int, boxscore: dict,
+                                    fingerprints: Optional[GameFingerprintCache] = None) -> bool:
     """
     Update game scores, period, and clock time in nhl_games table.
     
@@ -79,6 +94,9 @@ def update_game_scores_in_nhl_games(db: SupabaseRest, game_id: int, boxscore: di
     - Clock time comes from clock.timeRemaining (e.g., "12:45")
     
     This enables real-time display in the UI: "2nd 12:45"
+    
+    With a fingerprint cache, the row is only written when the update differs
+    from the last one written for this game.
     """
     try:
         home_score = boxscore.get("homeTeam", {}).get("score")
@@ -117,7 +135,12 @@ def update_game_scores_in_nhl_games(db: SupabaseRest, game_id: int, boxscore: di
         if status == "final":
             update_data["period_time"] = None  # Clear clock for finished games
         
+        if fingerprints is not None and not fingerprints.scoreboard_changed(game_id, update_data):
+            return True
+        
         db.update("nhl_games", update_data, filters=[("game_id", "eq", game_id)])
+        if fingerprints is not None:
+            fingerprints.mark_scoreboard(game_id, update_data)
         return True
     except Exception as e:
         logger.error(f"Score update failed for {game_id}: {e}")
@@ -400,6 +400,7 @@ def get_games_for_week(db: SupabaseRest, week_start: date, week_end: date) -> Li
             ("game_date", "gte", week_start.isoformat()),
             ("game_date", "lte", week_end.isoformat())
         ],
+        key="game_id",
         max_records=100000  # Large limit for full season scraping
     )
     
@@ -407,28 +408,19 @@ def get_games_for_week(db: SupabaseRest, week_start: date, week_end: date) -> Li
     return all_games or []
 
 
-def _paginate_select(db: SupabaseRest, table: str, select: str, filters: list, max_records: int = 100000) -> list:
-    """Paginate through all records to bypass the 1000 record API limit."""
+def _paginate_select(db: SupabaseRest, table: str, select: str, filters: list, key, max_records: int = 100000) -> list:
+    """Keyset-paginate through all records to bypass the 1000 record API limit."""
     all_records = []
-    offset = 0
-    batch_size = 1000
-    
-    while len(all_records) < max_records:
-        try:
-            batch = db.select(table, select=select, filters=filters, limit=batch_size, offset=offset)
-            if not batch:
-                break
+    try:
+        for batch in db.iter_select(table, select=select, filters=filters, key=key):
             all_records.extend(batch)
-            if len(batch) < batch_size:
-                # Got fewer records than requested - we've reached the end
+            if len(all_records) >= max_records:
                 break
-            offset += batch_size
-            if offset % 5000 == 0:
+            if len(all_records) % 5000 == 0:
                 print(f"    [PAGINATION] Fetched {len(all_records)} records so far...")
-        except Exception as e:
-            print(f"  [ERROR] Pagination error at offset {offset}: {e}")
-            print(f"  [ERROR] Returning {len(all_records)} records fetched so far")
-            break
+    except Exception as e:
+        print(f"  [ERROR] Pagination error after {len(all_records)} records: {e}")
+        print(f"  [ERROR] Returning {len(all_records)} records fetched so far")
     
     return all_records
 
@@ -454,6 +446,7 @@ def get_games_missing_goalies(db: SupabaseRest, week_start: date, week_end: date
             ("is_goalie", "eq", False),
             ("game_date", "gte", week_start_str)
         ],
+        key=("game_id", "player_id"),
         max_records=50000
     )
     
@@ -480,6 +473,7 @@ def get_games_missing_goalies(db: SupabaseRest, week_start: date, week_end: date
             ("is_goalie", "eq", True),
             ("game_date", "gte", week_start_str)
         ],
+        key=("game_id", "player_id"),
         max_records=50000
     )
     game_ids_with_goalies = set(g.get("game_id") for g in (goalie_games or []) if g.get("game_date", "") <= week_end_str)
@@ -524,12 +518,122 @@ def get_games_missing_goalies(db: SupabaseRest, week_start: date, week_end: date
         return games or []
 
 
+# nhl_* fields every boxscore stat row should carry
+REQUIRED_NHL_FIELDS = ["nhl_goals", "nhl_assists", "nhl_points", "nhl_shots_on_goal",
+                       "nhl_hits", "nhl_blocks", "nhl_toi_seconds"]
+
+
+def _goalie_game_record(
+    season: int,
+    game_id: int,
+    player_id: int,
+    game_date: date,
+    team_abbrev: str,
+    stats: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Full player_game_stats row for a goalie that has no record yet."""
+    now = datetime.now().isoformat()
+    return {
+        # Primary keys
+        "season": season,
+        "game_id": game_id,
+        "player_id": player_id,
+        
+        # Game context
+        "game_date": game_date.isoformat() if isinstance(game_date, date) else game_date,
+        "team_abbrev": team_abbrev,
+        
+        # Position identifiers
+        "position_code": "G",
+        "is_goalie": True,
+        
+        # =============================================
+        # NHL official stats (nhl_* columns)
+        # These are the source of truth for fantasy
+        # =============================================
+        **stats,
+        
+        # =============================================
+        # Legacy columns (for compatibility/fallback)
+        # Mirror the nhl_* values to original columns
+        # =============================================
+        "goalie_gp": 1,
+        "wins": stats.get("nhl_wins", 0),
+        "saves": stats.get("nhl_saves", 0),
+        "shots_faced": stats.get("nhl_shots_faced", 0),
+        "goals_against": stats.get("nhl_goals_against", 0),
+        "shutouts": stats.get("nhl_shutouts", 0),
+        
+        # Zero out skater stats for goalies
+        "goals": 0,
+        "primary_assists": 0,
+        "secondary_assists": 0,
+        "points": 0,
+        "shots_on_goal": 0,
+        "hits": 0,
+        "blocks": 0,
+        "pim": 0,
+        "ppp": 0,
+        "shp": 0,
+        "plus_minus": 0,
+        "icetime_seconds": stats.get("nhl_toi_seconds", 0),
+        
+        # Timestamps
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+def _skater_game_record(
+    season: int,
+    game_id: int,
+    player_id: int,
+    game_date: date,
+    team_abbrev: str,
+    position_code: str,
+    stats: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Full player_game_stats row for a skater that has no record yet (live games)."""
+    now = datetime.now().isoformat()
+    return {
+        "season": season,
+        "game_id": game_id,
+        "player_id": player_id,
+        "game_date": game_date.isoformat() if isinstance(game_date, date) else game_date,
+        "team_abbrev": team_abbrev,
+        "is_goalie": False,
+        "position_code": position_code,
+        
+        # NHL official stats (from boxscore)
+        **stats,
+        
+        # Default non-NHL stats to 0 (will be populated by extractor_job if needed)
+        "goals": 0,
+        "primary_assists": 0,
+        "secondary_assists": 0,
+        "points": 0,
+        "shots_on_goal": 0,
+        "hits": 0,
+        "blocks": 0,
+        "pim": 0,
+        "ppp": 0,
+        "shp": 0,
+        "plus_minus": 0,
+        "icetime_seconds": stats.get("nhl_toi_seconds", 0),
+        
+        # Timestamps
+        "created_at": now,
+        "updated_at": now
+    }
+
+
 def update_player_game_stats_nhl_columns(
     db: SupabaseRest,
     game_id: int,
     game_date: date,
     player_stats: Dict[int, Dict[str, Any]],
-    season: int
+    season: int,
+    bulk: bool = True
 ) -> Dict[str, int]:
     """
     Update player_game_stats.nhl_* columns for all players in the game.
@@ -540,17 +644,25 @@ def update_player_game_stats_nhl_columns(
     This ensures goalies and skaters both use official NHL boxscore data for
     public-facing stats (matchups, player cards, fantasy scoring).
     
+    Args:
+        bulk: One existence query and one upsert per row shape for the whole game
+              (~3 requests) instead of a select + update/insert per player (~80).
+              Set False for the original per-player path.
+    
     Returns dict with counts: {updated, created, skipped}
     """
-    updated_count = 0
-    created_count = 0
-    skipped_count = 0
-    
     # Validate that we have stats to process
     if not player_stats:
         print(f"    [WARNING] No player stats extracted for game {game_id}")
         return {"updated": 0, "created": 0, "skipped": 0}
     
+    if bulk:
+        return _bulk_update_player_game_stats(db, game_id, game_date, player_stats, season)
+    
+    updated_count = 0
+    created_count = 0
+    skipped_count = 0
+    
     # Processing {len(player_stats)} players for game {game_id} (logging disabled for cleaner output)
 
     for player_id, stats in player_stats.items():
@@ -582,9 +694,7 @@ def update_player_game_stats_nhl_columns(
             # UPDATE existing record (skaters and goalies)
             # =============================================
             # Validate that stats dict contains required nhl_* fields
-            required_fields = ["nhl_goals", "nhl_assists", "nhl_points", "nhl_shots_on_goal", 
-                             "nhl_hits", "nhl_blocks", "nhl_toi_seconds"]
-            missing_fields = [f for f in required_fields if f not in stats]
+            missing_fields = [f for f in REQUIRED_NHL_FIELDS if f not in stats]
             if missing_fields:
                 print(f"    [WARNING] Player {player_id} missing required fields: {missing_fields}")
             
@@ -615,57 +725,7 @@ def update_player_game_stats_nhl_columns(
             # This is the key fix: goalies get their records
             # from the same NHL boxscore source as skaters
             # =============================================
-            
-            # Build the complete goalie record
-            goalie_record = {
-                # Primary keys
-                "season": season,
-                "game_id": game_id,
-                "player_id": player_id,
-                
-                # Game context
-                "game_date": game_date.isoformat() if isinstance(game_date, date) else game_date,
-                "team_abbrev": team_abbrev,
-                
-                # Position identifiers
-                "position_code": "G",
-                "is_goalie": True,
-                
-                # =============================================
-                # NHL official stats (nhl_* columns)
-                # These are the source of truth for fantasy
-                # =============================================
-                **stats,
-                
-                # =============================================
-                # Legacy columns (for compatibility/fallback)
-                # Mirror the nhl_* values to original columns
-                # =============================================
-                "goalie_gp": 1,
-                "wins": stats.get("nhl_wins", 0),
-                "saves": stats.get("nhl_saves", 0),
-                "shots_faced": stats.get("nhl_shots_faced", 0),
-                "goals_against": stats.get("nhl_goals_against", 0),
-                "shutouts": stats.get("nhl_shutouts", 0),
-                
-                # Zero out skater stats for goalies
-                "goals": 0,
-                "primary_assists": 0,
-                "secondary_assists": 0,
-                "points": 0,
-                "shots_on_goal": 0,
-                "hits": 0,
-                "blocks": 0,
-                "pim": 0,
-                "ppp": 0,
-                "shp": 0,
-                "plus_minus": 0,
-                "icetime_seconds": stats.get("nhl_toi_seconds", 0),
-                
-                # Timestamps
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat()
-            }
+            goalie_record = _goalie_game_record(season, game_id, player_id, game_date, team_abbrev, stats)
             
             try:
                 db.upsert("player_game_stats", goalie_record, on_conflict="season,game_id,player_id")
@@ -680,36 +740,9 @@ def update_player_game_stats_nhl_columns(
         else:
             # Skater without existing record - CREATE it for live games
             # This ensures live games have stats even if extractor_job hasn't run yet
-            skater_record = {
-                "season": season,
-                "game_id": game_id,
-                "player_id": player_id,
-                "game_date": game_date.isoformat(),
-                "team_abbrev": team_abbrev,
-                "is_goalie": False,
-                "position_code": position_code,
-                
-                # NHL official stats (from boxscore)
-                **stats,
-                
-                # Default non-NHL stats to 0 (will be populated by extractor_job if needed)
-                "goals": 0,
-                "primary_assists": 0,
-                "secondary_assists": 0,
-                "points": 0,
-                "shots_on_goal": 0,
-                "hits": 0,
-                "blocks": 0,
-                "pim": 0,
-                "ppp": 0,
-                "shp": 0,
-                "plus_minus": 0,
-                "icetime_seconds": stats.get("nhl_toi_seconds", 0),
-                
-                # Timestamps
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat()
-            }
+            skater_record = _skater_game_record(
+                season, game_id, player_id, game_date, team_abbrev, position_code, stats
+            )
             
             try:
                 db.upsert("player_game_stats", skater_record, on_conflict="season,game_id,player_id")
@@ -730,6 +763,110 @@ def update_player_game_stats_nhl_columns(
     }
 
 
+def _bulk_update_player_game_stats(
+    db: SupabaseRest,
+    game_id: int,
+    game_date: date,
+    player_stats: Dict[int, Dict[str, Any]],
+    season: int
+) -> Dict[str, int]:
+    """
+    Bulk path for update_player_game_stats_nhl_columns().
+    
+    Existing rows are written as upserts that carry only the key columns, the
+    row's current team_abbrev/game_date and the nhl_* stats, so the conflict
+    update touches the same columns the per-player update did. Missing goalies
+    and skaters get the same full records as the per-player path.
+    
+    PostgREST requires every object in a bulk upsert to have the same keys, so
+    rows are grouped by shape (usually skater updates, goalie updates, creates).
+    If a group's upsert fails, its rows are retried one by one so a single bad
+    row is skipped instead of the whole game.
+    """
+    skipped_count = 0
+    player_ids = [pid for pid, stats in player_stats.items() if isinstance(stats, dict)]
+    
+    # One existence query for every player in the game
+    existing_rows = db.select(
+        "player_game_stats",
+        select="player_id,team_abbrev,game_date,is_goalie",
+        filters=[
+            ("season", "eq", season),
+            ("game_id", "eq", game_id),
+            ("player_id", "in", player_ids)
+        ]
+    ) if player_ids else []
+    existing = {int(row["player_id"]): row for row in existing_rows}
+    
+    # Row shape -> [(player_id, "updated"|"created", row)]
+    groups: Dict[tuple, List[tuple]] = {}
+    for player_id, stats in player_stats.items():
+        # Validate stats dict
+        if not isinstance(stats, dict):
+            print(f"    [ERROR] Player {player_id} has invalid stats dict (type: {type(stats)})")
+            skipped_count += 1
+            continue
+        
+        # Extract metadata (these are NOT stored as columns, just used for logic)
+        is_goalie = stats.pop("_is_goalie", False)
+        team_abbrev = stats.pop("_team_abbrev", "")
+        position_code = stats.pop("_position_code", "F")
+        
+        current = existing.get(int(player_id))
+        if current is not None:
+            # UPDATE existing record (skaters and goalies)
+            missing_fields = [f for f in REQUIRED_NHL_FIELDS if f not in stats]
+            if missing_fields:
+                print(f"    [WARNING] Player {player_id} missing required fields: {missing_fields}")
+            row = {
+                "season": season,
+                "game_id": game_id,
+                "player_id": player_id,
+                "team_abbrev": current.get("team_abbrev"),
+                "game_date": current.get("game_date"),
+                **stats,
+                "updated_at": datetime.now().isoformat()
+            }
+            kind = "updated"
+        elif is_goalie:
+            # CREATE new record for GOALIES (same NHL boxscore source as skaters)
+            row = _goalie_game_record(season, game_id, player_id, game_date, team_abbrev, stats)
+            kind = "created"
+            print(f"    [OK] Creating goalie record for player {player_id}: W={stats.get('nhl_wins', 0)}, "
+                  f"Saves={stats.get('nhl_saves', 0)}, GA={stats.get('nhl_goals_against', 0)}, "
+                  f"TOI={stats.get('nhl_toi_seconds', 0)}s")
+        else:
+            # Skater without existing record - CREATE it for live games
+            row = _skater_game_record(season, game_id, player_id, game_date, team_abbrev, position_code, stats)
+            kind = "created"
+        groups.setdefault(tuple(sorted(row)), []).append((player_id, kind, row))
+    
+    counts = {"updated": 0, "created": 0}
+    for entries in groups.values():
+        try:
+            db.upsert("player_game_stats", [row for _, _, row in entries], on_conflict="season,game_id,player_id")
+            for _, kind, _ in entries:
+                counts[kind] += 1
+        except Exception as e:
+            print(f"    [WARNING] Bulk upsert of {len(entries)} rows failed for game {game_id}, retrying per player: {e}")
+            for player_id, kind, row in entries:
+                try:
+                    db.upsert("player_game_stats", row, on_conflict="season,game_id,player_id")
+                    counts[kind] += 1
+                except Exception as row_error:
+                    print(f"    [ERROR] Failed to write player {player_id}: {row_error}")
+                    skipped_count += 1
+    
+    if counts["updated"] + counts["created"] > 0:
+        print(f"    [✓] Game {game_id}: {counts['updated']} updated, {counts['created']} created, {skipped_count} skipped")
+    
+    return {
+        "updated": counts["updated"],
+        "created": counts["created"],
+        "skipped": skipped_count
+    }
+
+
 def main():
     print("=" * 80)
     print("SCRAPE PER-GAME NHL STATS")
@@ -9,12 +9,18 @@ Calculates projections for ALL players, ALL remaining games
 Target runtime: 15-30 minutes for ~15,000 projections
 
 Usage:
-    python scripts/nightly_projection_batch.py [--season 2025] [--workers 16]
+    python scripts/nightly_projection_batch.py [--season 2025] [--workers 16] [--vectorized] [--recompute-all]
+    
+Each projection row stores an input_fingerprint (player season stats, opponent
+DDR multipliers to two decimals, scoring settings, injury status); a run
+recomputes only the (player, game) pairs whose fingerprint changed since the
+last run.
     
 Architecture:
     Phase 1: Data Loading (single queries, cached in memory)
     Phase 2: Matchup Difficulty Calculation (32 teams)
-    Phase 3: Per-Game Projections (parallel processing)
+    Phase 3: Per-Game Projections for changed inputs (parallel processing,
+             or one vectorized pass over a preloaded context with --vectorized)
     Phase 4: Bulk Upsert (batched writes)
     Phase 5: ROS Aggregates (sum projections by player)
     Phase 6: Matchup Difficulty Table Update
@@ -51,6 +57,11 @@ from calculate_daily_projections import (
     get_league_averages,
     DEFAULT_SEASON
 )
+from projection_context import ProjectionContext
+from projection_kernel import project_slate
+from team_context import prepare_team_context
+from live_change_cache import fingerprint
+from projection_workers import build_slate_state, pool_kwargs, worker_db, worker_scoring_settings
 
 load_dotenv()
 
@@ -77,6 +88,26 @@ UPSERT_BATCH_SIZE = 500
 FETCH_BATCH_SIZE = 1000
 DEFAULT_SEASON = 2025
 
+# Bump to force every projection to be recomputed after a model change
+PROJECTION_INPUTS_VERSION = 1
+
+# Opponent team context that enters the fingerprint: the DDR and its three
+# multipliers, rounded so nightly drift in the rolling windows below this
+# precision does not trigger a recompute
+CONTEXT_FINGERPRINT_FIELDS = ("team_multiplier", "goalie_multiplier", "offense_multiplier", "ddr")
+CONTEXT_FINGERPRINT_DECIMALS = 2
+
+# Bookkeeping columns left out of the talent / league-average fingerprints so
+# a rerun of the upstream job that writes identical values does not recompute
+FINGERPRINT_IGNORED_COLUMNS = ("id", "created_at", "updated_at", "last_updated")
+
+# Stored projection columns summed by the ROS aggregates
+ROS_INPUT_COLUMNS = (
+    "player_id,game_id,season,input_fingerprint,total_projected_points,projected_goals,"
+    "projected_assists,projected_sog,projected_blocks,projected_ppp,projected_shp,projected_hits,"
+    "projected_pim,projected_wins,projected_saves,projected_shutouts"
+)
+
 # Team ID to abbreviation mapping (NHL standard)
 TEAM_ABBREV_MAP = {
     1: "NJD", 2: "NYI", 3: "NYR", 4: "PHI", 5: "PIT", 6: "BOS", 7: "BUF", 8: "MTL",
@@ -183,7 +214,7 @@ def fetch_player_stats(db: SupabaseRest, season: int) -> Dict[int, Dict]:
         # Use actual column names from player_season_stats table
         stats = db.select(
             "player_season_stats",
-            select="player_id,games_played,goals,primary_assists,secondary_assists,shots_on_goal,blocks,hits,pim,ppp,shp",
+            select="player_id,games_played,goals,primary_assists,secondary_assists,shots_on_goal,blocks,hits,pim,ppp,shp,goalie_gp,save_pct",
             filters=[("season", "eq", season)],
             limit=FETCH_BATCH_SIZE,
             offset=offset
@@ -204,6 +235,49 @@ def fetch_player_stats(db: SupabaseRest, season: int) -> Dict[int, Dict]:
     return all_stats
 
 
+def fetch_talent_metrics(db: SupabaseRest, season: int) -> Dict[int, Dict]:
+    """
+    Fetch player_talent_metrics rows (finishing talent, IR eligibility) for the season.
+    
+    Returns: {player_id: row}
+    """
+    print("  Fetching player talent metrics...")
+    rows = db.select_all(
+        "player_talent_metrics",
+        filters=[("season", "eq", season)],
+        key=("player_id", "season"),
+        page_size=FETCH_BATCH_SIZE
+    )
+    print(f"  Loaded talent metrics for {len(rows)} players")
+    return {int(r["player_id"]): r for r in rows}
+
+
+def fetch_league_averages(db: SupabaseRest, season: int) -> Dict[str, List[Dict]]:
+    """
+    Fetch league_averages (baselines, VOPA replacement level and std dev) for
+    the season and the previous one, which the blended baselines read.
+    
+    Returns: {position: [rows ordered by season]}
+    """
+    rows = db.select(
+        "league_averages",
+        filters=[("season", "in", [season, season - 1])],
+        order="position.asc,season.asc"
+    )
+    by_position: Dict[str, List[Dict]] = defaultdict(list)
+    for r in rows:
+        by_position[r.get("position", "")].append(r)
+    print(f"  Loaded league averages for {len(by_position)} positions")
+    return dict(by_position)
+
+
+def _fingerprint_row(row: Optional[Dict]) -> Optional[Dict]:
+    """row without FINGERPRINT_IGNORED_COLUMNS."""
+    if row is None:
+        return None
+    return {k: v for k, v in row.items() if k not in FINGERPRINT_IGNORED_COLUMNS}
+
+
 def fetch_team_defense_stats(db: SupabaseRest, season: int) -> Dict[str, Dict]:
     """
     Fetch team defensive statistics for matchup difficulty calculation.
@@ -329,6 +403,32 @@ def fetch_scoring_settings(db: SupabaseRest) -> Dict[str, Any]:
     }
 
 
+def fetch_existing_projections(db: SupabaseRest, season: int) -> Dict[Tuple[int, int], Dict]:
+    """
+    Fetch stored projections with their input fingerprints and ROS columns.
+    
+    Returns: {(player_id, game_id): row} (NULL columns dropped)
+    """
+    existing = {}
+    
+    print("  Checking for existing projections...")
+    
+    # Keyset pages (ordered by the primary key) so no row is skipped or repeated
+    for batch in db.iter_select(
+        "player_projected_stats",
+        select=ROS_INPUT_COLUMNS,
+        filters=[("season", "eq", season)],
+        key=("player_id", "game_id", "projection_date"),
+        page_size=FETCH_BATCH_SIZE
+    ):
+        for proj in batch:
+            key = (int(proj.get("player_id", 0)), int(proj.get("game_id", 0)))
+            existing[key] = {k: v for k, v in proj.items() if v is not None}
+    
+    print(f"  Found {len(existing)} existing projections")
+    return existing
+
+
 # ============================================================================
 # PHASE 2: MATCHUP DIFFICULTY CALCULATION
 # ============================================================================
@@ -374,6 +474,62 @@ def calculate_matchup_difficulty(team_defense: Dict[str, Dict]) -> Dict[Tuple[st
     return matchup_ratings
 
 
+def assign_input_fingerprints(
+    worker_tasks: List[Tuple],
+    player_stats: Dict[int, Dict],
+    team_context: Dict[str, Dict],
+    scoring_settings: Dict[str, Any],
+    talent_metrics: Dict[int, Dict],
+    league_averages: Dict[str, List[Dict]],
+    player_positions: Dict[int, str]
+) -> None:
+    """
+    Store each task's input fingerprint in its game_info["input_fingerprint"].
+    
+    The fingerprint covers what changes from night to night: the player's
+    season stats and talent metrics rows, the league averages for the
+    player's position (baselines, VOPA replacement level and std dev), the
+    opponent's DDR and its multipliers (rounded to CONTEXT_FINGERPRINT_DECIMALS),
+    the scoring settings and the player's injury status. Game facts
+    (opponent, home/away, date and thus back-to-backs) are part of the
+    (player, game) key already.
+    """
+    scoring_hash = fingerprint(scoring_settings)
+    player_hashes: Dict[int, str] = {}
+    position_hashes: Dict[str, str] = {}
+    opponent_hashes: Dict[str, str] = {}
+    
+    for player_id, game_id, game_date, season, _, game_info in worker_tasks:
+        if player_id not in player_hashes:
+            position = player_positions.get(player_id, "")
+            if position not in position_hashes:
+                position_hashes[position] = fingerprint(
+                    [_fingerprint_row(r) for r in league_averages.get(position, [])]
+                )
+            player_hashes[player_id] = fingerprint([
+                player_stats.get(player_id),
+                _fingerprint_row(talent_metrics.get(player_id)),
+                position_hashes[position],
+            ])
+        opponent = game_info.get("opponent_abbrev", "")
+        if opponent not in opponent_hashes:
+            row = team_context.get(opponent, {})
+            opponent_hashes[opponent] = fingerprint({
+                "context": [
+                    round(row[f], CONTEXT_FINGERPRINT_DECIMALS) if row.get(f) is not None else None
+                    for f in CONTEXT_FINGERPRINT_FIELDS
+                ],
+                "matchup_difficulty": game_info.get("matchup_difficulty"),
+            })
+        game_info["input_fingerprint"] = fingerprint([
+            PROJECTION_INPUTS_VERSION,
+            player_hashes[player_id],
+            opponent_hashes[opponent],
+            scoring_hash,
+            game_info.get("injury_status"),
+        ])
+
+
 # ============================================================================
 # PHASE 3: PROJECTION CALCULATION (WORKER)
 # ============================================================================
@@ -383,13 +539,17 @@ def calculate_projection_worker(args: Tuple) -> Optional[Dict]:
     Worker function for parallel projection calculation.
     
     Args is a tuple of: (player_id, game_id, game_date_str, season, scoring_settings, game_info)
+    where scoring_settings may also be a key into the worker's slate state.
+    Uses the process's pooled client (see projection_workers).
     
     Returns projection dict or None on error.
     """
     player_id, game_id, game_date_str, season, scoring_settings, game_info = args
     
     try:
-        db = get_db()
+        db = worker_db()
+        if not isinstance(scoring_settings, dict):
+            scoring_settings = worker_scoring_settings(scoring_settings)
         game_date = date.fromisoformat(game_date_str)
         
         # Calculate projection using existing core function
@@ -400,22 +560,68 @@ def calculate_projection_worker(args: Tuple) -> Optional[Dict]:
         if not projection:
             return None
         
-        # Add game context
-        projection["game_id"] = game_id
-        projection["projection_date"] = game_date_str
-        projection["opponent_team_id"] = game_info.get("opponent_team_id")
-        projection["opponent_abbrev"] = game_info.get("opponent_abbrev", "")
-        projection["is_home_game"] = game_info.get("is_home_game", False)
-        projection["game_start_time"] = game_info.get("game_start_time")
-        projection["matchup_difficulty"] = game_info.get("matchup_difficulty", 1.0)
-        
-        return projection
+        return add_game_context(projection, game_id, game_date_str, game_info)
         
     except Exception as e:
         # Don't print every error - too noisy for batch processing
         return None
 
 
+def add_game_context(projection: Dict, game_id: int, game_date_str: str, game_info: Dict) -> Dict:
+    """Attach schedule/matchup fields from the worker task to a projection."""
+    projection["game_id"] = game_id
+    projection["projection_date"] = game_date_str
+    projection["opponent_team_id"] = game_info.get("opponent_team_id")
+    projection["opponent_abbrev"] = game_info.get("opponent_abbrev", "")
+    projection["is_home_game"] = game_info.get("is_home_game", False)
+    projection["game_start_time"] = game_info.get("game_start_time")
+    projection["matchup_difficulty"] = game_info.get("matchup_difficulty", 1.0)
+    projection["input_fingerprint"] = game_info.get("input_fingerprint")
+    return projection
+
+
+def calculate_projections_vectorized(
+    db: SupabaseRest,
+    worker_tasks: List[Tuple],
+    season: int,
+    team_context: Optional[Dict[str, Dict]] = None
+) -> List[Dict]:
+    """
+    Project every task in one vectorized pass over a bulk-preloaded context.
+    
+    Lookups run once per distinct player / opponent-game / team-date against
+    memory, then projection_kernel computes all rows at once. Output matches
+    calculate_projection_worker() row for row.
+    
+    team_context is the already registered context for the slate (built from
+    the preloaded context when None).
+    """
+    ctx = ProjectionContext.load(
+        db, date.today(), season,
+        player_ids=sorted({task[0] for task in worker_tasks})
+    )
+    if team_context is None:
+        prepare_team_context(ctx, date.today(), season, store_db=db)
+    
+    # Tasks share one scoring dict per run, but group defensively (by content)
+    by_scoring: Dict[str, List[Tuple]] = defaultdict(list)
+    for task in worker_tasks:
+        by_scoring[fingerprint(task[4])].append(task)
+    
+    projections = []
+    for tasks in by_scoring.values():
+        scoring_settings = tasks[0][4]
+        slate = [(task[0], task[1], date.fromisoformat(task[2])) for task in tasks]
+        results = project_slate(ctx, slate, season, scoring_settings)
+        for task, projection in zip(tasks, results):
+            if projection:
+                projections.append(add_game_context(projection, task[1], task[2], task[5]))
+    
+    ctx.flush()
+    print(f"  {ctx.summary()}")
+    return projections
+
+
 # ============================================================================
 # PHASE 4: BULK UPSERT
 # ============================================================================
@@ -442,7 +648,8 @@ def bulk_upsert_projections(db: SupabaseRest, projections: List[Dict]) -> int:
         'matchup_difficulty', 'injury_status', 'game_start_time',
         # Goalie columns
         'projected_wins', 'projected_saves', 'projected_shutouts', 'projected_goals_against',
-        'projected_gaa', 'projected_save_pct', 'projected_gp', 'starter_confirmed', 'is_goalie'
+        'projected_gaa', 'projected_save_pct', 'projected_gp', 'starter_confirmed', 'is_goalie',
+        'input_fingerprint'
     }
     
     # Default values for columns with NOT NULL constraints (use 0 instead of None)
@@ -712,6 +919,10 @@ def main():
     parser.add_argument("--season", type=int, default=DEFAULT_SEASON, help="Season year")
     parser.add_argument("--workers", type=int, default=16, help="Number of parallel workers")
     parser.add_argument("--dry-run", action="store_true", help="Calculate but don't save")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="Preload inputs and project all games in one vectorized pass")
+    parser.add_argument("--recompute-all", action="store_true",
+                        help="Recompute every projection, ignoring stored input fingerprints")
     args = parser.parse_args()
     
     start_time = time.time()
@@ -738,6 +949,8 @@ def main():
     schedule = fetch_remaining_schedule(db, args.season)
     players = fetch_all_players(db, args.season)
     player_stats = fetch_player_stats(db, args.season)
+    talent_metrics = fetch_talent_metrics(db, args.season)
+    league_averages = fetch_league_averages(db, args.season)
     team_defense = fetch_team_defense_stats(db, args.season)
     injuries = fetch_injury_report(db)
     scoring_settings = fetch_scoring_settings(db)
@@ -842,42 +1055,36 @@ def main():
     
     print(f"  Created {len(worker_tasks)} projection tasks")
     
-    # Check for existing projections and skip them
-    print(f"  Checking for existing projections...")
-    existing_projections = set()
-    offset = 0
-    while True:
-        batch = db.select(
-            "player_projected_stats",
-            select="player_id,game_id",
-            filters=[("season", "eq", args.season)],
-            limit=1000,
-            offset=offset
-        )
-        if not batch:
-            break
-        for proj in batch:
-            existing_projections.add((int(proj.get("player_id", 0)), int(proj.get("game_id", 0))))
-        if len(batch) < 1000:
-            break
-        offset += 1000
-    
-    print(f"  Found {len(existing_projections)} existing projections")
-    
-    # Filter out existing projections
+    # Recompute only projections whose inputs changed since the last run
+    # Registered for the projection helpers too, so the slate state and the
+    # vectorized pass reuse it instead of rebuilding it
+    print("  Building team context for input fingerprints...")
+    team_context = prepare_team_context(db, date.today(), args.season)
+    player_positions = {p["player_id"]: p.get("position_code", "") for p in players}
+    assign_input_fingerprints(
+        worker_tasks, player_stats, team_context, scoring_settings,
+        talent_metrics, league_averages, player_positions
+    )
+    existing_projections = fetch_existing_projections(db, args.season)
+    
+    all_task_keys = {(int(task[0]), int(task[1])) for task in worker_tasks}
     original_count = len(worker_tasks)
-    worker_tasks = [
-        task for task in worker_tasks
-        if (task[0], task[1]) not in existing_projections
-    ]
+    new_count = sum(1 for key in all_task_keys if key not in existing_projections)
+    if not args.recompute_all:
+        worker_tasks = [
+            task for task in worker_tasks
+            if existing_projections.get((int(task[0]), int(task[1])), {}).get("input_fingerprint")
+            != task[5]["input_fingerprint"]
+        ]
     skipped_count = original_count - len(worker_tasks)
-    print(f"  Filtered to {len(worker_tasks)} new projection tasks (skipped {skipped_count} existing)")
+    print(f"  Filtered to {len(worker_tasks)} projection tasks "
+          f"({new_count} new, {len(worker_tasks) - new_count} changed inputs, {skipped_count} unchanged)")
     
     if len(worker_tasks) == 0:
-        print(f"  ✅ All projections already exist! Nothing to calculate.")
+        print(f"  ✅ All projections are up to date! Nothing to calculate.")
         print()
         print("=" * 80)
-        print("BATCH COMPLETE - NO NEW PROJECTIONS NEEDED")
+        print("BATCH COMPLETE - NO PROJECTION INPUTS CHANGED")
         print("=" * 80)
         return
     
@@ -886,13 +1093,25 @@ def main():
     completed = 0
     last_progress_time = time.time()
     
-    if len(worker_tasks) > 100:
+    if args.vectorized:
+        print("  Processing vectorized over a preloaded context...")
+        projections = calculate_projections_vectorized(db, worker_tasks, args.season, team_context)
+        completed = len(worker_tasks)
+    elif len(worker_tasks) > 100:
         # Use multiprocessing for large batches
         print(f"  Processing with {args.workers} workers...")
         print(f"  Progress updates every 60 seconds...\n")
         
-        with ProcessPoolExecutor(max_workers=args.workers) as executor:
-            futures = {executor.submit(calculate_projection_worker, task): task for task in worker_tasks}
+        # Slate-wide inputs are read once and shared with every worker;
+        # tasks carry a scoring key instead of the settings dict
+        scoring_keys = [fingerprint(task[4]) for task in worker_tasks]
+        scoring_by_key = {key: task[4] for task, key in zip(worker_tasks, scoring_keys)}
+        slate_state = build_slate_state(db, args.season, date.today(), scoring=scoring_by_key)
+        with ProcessPoolExecutor(max_workers=args.workers, **pool_kwargs(slate_state)) as executor:
+            futures = {
+                executor.submit(calculate_projection_worker, task[:4] + (key,) + task[5:]): task
+                for task, key in zip(worker_tasks, scoring_keys)
+            }
             
             for future in as_completed(futures):
                 try:
@@ -957,7 +1176,11 @@ def main():
     print("-" * 40)
     
     phase5_start = time.time()
-    ros_projections = calculate_ros_aggregates(projections, players)
+    # Unchanged stored projections plus this run's, over the remaining schedule
+    ros_inputs = {key: row for key, row in existing_projections.items() if key in all_task_keys}
+    for proj in projections:
+        ros_inputs[(int(proj["player_id"]), int(proj["game_id"]))] = proj
+    ros_projections = calculate_ros_aggregates(list(ros_inputs.values()), players)
     ros_upserted = bulk_upsert_ros(db, ros_projections)
     phase5_elapsed = time.time() - phase5_start
     
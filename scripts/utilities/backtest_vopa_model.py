@@ -5,12 +5,18 @@ backtest_vopa_model.py
 Sprint 4: Backtesting Framework for VOPA Model
 Verifies model accuracy by testing projections against historical games.
 
+Projections are evaluated from a point-in-time context (asof_context.py):
+the season is loaded once, each date only sees games played before it, and
+dates are projected in parallel. --live runs the original per-player queries
+against the live database instead.
+
 Usage:
-    python backtest_vopa_model.py [start_date] [end_date] [season]
+    python backtest_vopa_model.py [start_date] [end_date] [season] [--workers N] [--live]
     
     Default start_date: 30 days ago
     Default end_date: today
     Default season: 2025
+    Default workers: CPU count
 """
 
 from dotenv import load_dotenv
@@ -35,6 +41,7 @@ from calculate_daily_projections import (
     calculate_fantasy_points,
     rank_players_by_vopa
 )
+from asof_context import AsOfContext, run_dates
 
 load_dotenv()
 SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
@@ -116,6 +123,42 @@ def get_completed_games(
         return []
 
 
+def actual_fantasy_points_from_stats(
+    stats: Dict[str, Any],
+    scoring_settings: Dict[str, Any],
+    is_goalie: bool = False
+) -> Tuple[float, Optional[int]]:
+    """
+    Score one player_game_stats row.
+    
+    Returns:
+        Tuple of (actual fantasy points, actual win outcome (0 or 1 for goalies, None for skaters))
+    """
+    # Calculate fantasy points using the same function as projections
+    if is_goalie or stats.get("is_goalie"):
+        goalie_stats = {
+            "wins": int(stats.get("wins") or 0),
+            "shutouts": int(stats.get("shutouts") or 0),
+            "saves": int(stats.get("saves") or 0),
+            "goals_against": int(stats.get("goals_against") or 0)
+        }
+        actual_points = calculate_fantasy_points(goalie_stats, scoring_settings, is_goalie=True)
+        actual_win = int(stats.get("wins") or 0)  # 0 or 1
+        return actual_points, actual_win
+    skater_stats = {
+        "goals": int(stats.get("goals") or 0),
+        "assists": int(stats.get("assists") or 0),
+        "sog": int(stats.get("shots_on_goal") or 0),
+        "blocks": int(stats.get("blocks") or 0),
+        "ppp": int(stats.get("ppp") or 0),
+        "shp": int(stats.get("shp") or 0),
+        "hits": int(stats.get("hits") or 0),
+        "pim": int(stats.get("pim") or 0)
+    }
+    actual_points = calculate_fantasy_points(skater_stats, scoring_settings, is_goalie=False)
+    return actual_points, None
+
+
 def get_actual_fantasy_points(
     db: SupabaseRest,
     player_id: int,
@@ -143,77 +186,31 @@ def get_actual_fantasy_points(
         if not game_stats or len(game_stats) == 0:
             return None, None
         
-        stats = game_stats[0]
-        
-        # Calculate fantasy points using the same function as projections
-        if is_goalie or stats.get("is_goalie"):
-            goalie_stats = {
-                "wins": int(stats.get("wins", 0)),
-                "shutouts": int(stats.get("shutouts", 0)),
-                "saves": int(stats.get("saves", 0)),
-                "goals_against": int(stats.get("goals_against", 0))
-            }
-            actual_points = calculate_fantasy_points(goalie_stats, scoring_settings, is_goalie=True)
-            actual_win = int(stats.get("wins", 0))  # 0 or 1
-            return actual_points, actual_win
-        else:
-            skater_stats = {
-                "goals": int(stats.get("goals", 0)),
-                "assists": int(stats.get("assists", 0)),
-                "sog": int(stats.get("shots_on_goal", 0)),
-                "blocks": int(stats.get("blocks", 0)),
-                "ppp": int(stats.get("ppp", 0)),
-                "shp": int(stats.get("shp", 0)),
-                "hits": int(stats.get("hits", 0)),
-                "pim": int(stats.get("pim", 0))
-            }
-            actual_points = calculate_fantasy_points(skater_stats, scoring_settings, is_goalie=False)
-            return actual_points, None
+        return actual_fantasy_points_from_stats(game_stats[0], scoring_settings, is_goalie=is_goalie)
     except Exception as e:
         return None, None
 
 
-def backtest_vopa_model(
+def collect_live_results(
     db: SupabaseRest,
-    start_date: date,
-    end_date: date,
+    games: List[Dict[str, Any]],
     season: int,
     scoring_settings: Dict[str, Any]
-) -> Dict[str, Any]:
+) -> Tuple[List[Dict[str, Any]], int]:
     """
-    Backtest VOPA model against historical games.
+    Project and score each game's players one at a time against the live database.
+    
+    Slow (several requests per player) and not point-in-time: season stats
+    and the recent-games helpers see today's data. Kept for comparison with
+    collect_asof_results().
     
     Returns:
-        Dict with accuracy metrics, correlations, and top performers
+        Tuple of (per-player results, number of games with valid projections)
     """
-    print(f"\n{'='*80}")
-    print(f"VOPA MODEL BACKTESTING")
-    print(f"{'='*80}")
-    print(f"Date Range: {start_date.isoformat()} to {end_date.isoformat()}")
-    print(f"Season: {season}")
-    print(f"{'='*80}\n")
-    
-    # Get completed games
-    games = get_completed_games(db, start_date, end_date, season)
-    print(f"Found {len(games)} completed games to analyze")
-    print(f"\nNOTE: We are NOT re-scraping data. We're just:")
-    print(f"  1. Reading existing game data from database")
-    print(f"  2. Calculating projections for each player")
-    print(f"  3. Comparing projections vs actual results")
-    print(f"\nThis will process {len(games)} games (may take 10-20 minutes)...\n")
-    sys.stdout.flush()
-    
-    if len(games) == 0:
-        return {
-            "error": "No completed games found in date range",
-            "games_analyzed": 0
-        }
-    
-    # Collect projections and actuals
     all_projections = []
     all_results = []
+    games_processed = 0
     
-    import time
     start_time = time.time()
     
     for idx, game in enumerate(games, 1):
@@ -326,6 +323,132 @@ def backtest_vopa_model(
             all_projections.extend(ranked)
             games_processed += 1
     
+    return all_results, games_processed
+
+
+def collect_asof_results(
+    db: SupabaseRest,
+    games: List[Dict[str, Any]],
+    start_date: date,
+    end_date: date,
+    season: int,
+    scoring_settings: Dict[str, Any],
+    workers: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Project and score every game from a point-in-time AsOfContext.
+    
+    The season is loaded once; each date's slate is projected from memory
+    with only the games before that date visible, and dates run in parallel.
+    
+    Args:
+        workers: Processes for the per-date evaluation (default: CPU count)
+    
+    Returns:
+        Tuple of (per-player results, number of games with valid projections)
+    """
+    game_ids = {int(g["game_id"]) for g in games if g.get("game_id")}
+    
+    print("Loading as-of context...")
+    load_start = time.time()
+    ctx = AsOfContext.load(db, season)
+    print(f"Loaded in {time.time() - load_start:.1f}s\n")
+    positions = {int(d["player_id"]): d.get("position_code") for d in ctx.directory if d.get("player_id")}
+    
+    dates = ctx.game_dates(start_date, end_date)
+    all_results = []
+    games_with_projections = set()
+    start_time = time.time()
+    
+    for done, (as_of, rows) in enumerate(run_dates(ctx, dates, scoring_settings, workers=workers), 1):
+        for stats, projection in rows:
+            game_id = int(stats["game_id"])
+            if game_id not in game_ids or not projection:
+                continue
+            
+            player_id = int(stats["player_id"])
+            is_goalie = bool(stats.get("is_goalie"))
+            actual_points, actual_win = actual_fantasy_points_from_stats(stats, scoring_settings, is_goalie=is_goalie)
+            
+            projected_win_prob = None
+            if is_goalie:
+                projected_win_prob = max(0.0, min(1.0, projection.get("projected_wins", 0.0)))
+            
+            all_results.append({
+                "player_id": player_id,
+                "game_id": game_id,
+                "game_date": as_of.isoformat(),
+                "projected_points": projection.get("total_projected_points", 0.0),
+                "actual_points": actual_points,
+                "projected_vopa": projection.get("total_vopa", 0.0),
+                "is_goalie": is_goalie,
+                "position": positions.get(player_id) or "Unknown",
+                "projected_win_prob": projected_win_prob,
+                "actual_win": actual_win
+            })
+            games_with_projections.add(game_id)
+        
+        elapsed = time.time() - start_time
+        print(f"[{done:4d}/{len(dates)}] {as_of.isoformat()} - {len(all_results)} projections so far | {elapsed:.0f}s elapsed")
+        sys.stdout.flush()
+    
+    return all_results, len(games_with_projections)
+
+
+def backtest_vopa_model(
+    db: SupabaseRest,
+    start_date: date,
+    end_date: date,
+    season: int,
+    scoring_settings: Dict[str, Any],
+    use_asof: bool = True,
+    workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Backtest VOPA model against historical games.
+    
+    Args:
+        use_asof: Evaluate from a point-in-time AsOfContext (fast, no look-ahead);
+                  False runs the original per-player queries against the live database
+        workers: Processes for the as-of evaluation (default: CPU count)
+    
+    Returns:
+        Dict with accuracy metrics, correlations, and top performers
+    """
+    print(f"\n{'='*80}")
+    print(f"VOPA MODEL BACKTESTING")
+    print(f"{'='*80}")
+    print(f"Date Range: {start_date.isoformat()} to {end_date.isoformat()}")
+    print(f"Season: {season}")
+    print(f"{'='*80}\n")
+    
+    # Get completed games
+    games = get_completed_games(db, start_date, end_date, season)
+    print(f"Found {len(games)} completed games to analyze")
+    print(f"\nNOTE: We are NOT re-scraping data. We're just:")
+    print(f"  1. Reading existing game data from database")
+    print(f"  2. Calculating projections for each player")
+    print(f"  3. Comparing projections vs actual results")
+    if use_asof:
+        print(f"\nThis will process {len(games)} games from a point-in-time context (season loaded once)...\n")
+    else:
+        print(f"\nThis will process {len(games)} games (may take 10-20 minutes)...\n")
+    sys.stdout.flush()
+    
+    if len(games) == 0:
+        return {
+            "error": "No completed games found in date range",
+            "games_analyzed": 0
+        }
+    
+    # Collect projections and actuals
+    if use_asof:
+        all_results, games_processed = collect_asof_results(
+            db, games, start_date, end_date, season, scoring_settings, workers=workers
+        )
+    else:
+        all_results, games_processed = collect_live_results(db, games, season, scoring_settings)
+    
     print(f"\n  Completed processing {len(games)} games ({games_processed} with valid projections)\n")
     
     if len(all_results) == 0:
@@ -583,26 +706,40 @@ def main():
     """Main execution function."""
     db = supabase_client()
     
-    # Parse command line arguments
-    if len(sys.argv) > 1:
+    # Parse command line arguments (flags first, then the positional dates/season)
+    argv = list(sys.argv)
+    use_asof = "--live" not in argv
+    if "--live" in argv:
+        argv.remove("--live")
+    workers = None
+    if "--workers" in argv:
+        i = argv.index("--workers")
+        try:
+            workers = int(argv[i + 1])
+        except (IndexError, ValueError):
+            print("❌ Error: --workers expects a number")
+            sys.exit(1)
+        del argv[i:i + 2]
+    
+    if len(argv) > 1:
         try:
-            start_date = datetime.fromisoformat(sys.argv[1]).date()
+            start_date = datetime.fromisoformat(argv[1]).date()
         except:
             start_date = date.today() - timedelta(days=30)
     else:
         start_date = date.today() - timedelta(days=30)
     
-    if len(sys.argv) > 2:
+    if len(argv) > 2:
         try:
-            end_date = datetime.fromisoformat(sys.argv[2]).date()
+            end_date = datetime.fromisoformat(argv[2]).date()
         except:
             end_date = date.today()
     else:
         end_date = date.today()
     
-    if len(sys.argv) > 3:
+    if len(argv) > 3:
         try:
-            season = int(sys.argv[3])
+            season = int(argv[3])
         except:
             season = 2025
     else:
@@ -611,7 +748,7 @@ def main():
     scoring_settings = get_default_scoring_settings()
     
     # Run backtest
-    results = backtest_vopa_model(db, start_date, end_date, season, scoring_settings)
+    results = backtest_vopa_model(db, start_date, end_date, season, scoring_settings, use_asof=use_asof, workers=workers)
     
     if "error" in results:
         print(f"\n❌ Error: {results['error']}")
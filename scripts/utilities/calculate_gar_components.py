@@ -25,6 +25,7 @@ import numpy as np
 import os
 from dotenv import load_dotenv
 from supabase_rest import SupabaseRest
+from snapshot_store import load_shots
 from datetime import datetime
 from typing import Dict, Optional
 
@@ -48,10 +49,13 @@ SITUATION_PP = "PP"
 SITUATION_PK = "PK"
 
 
-def load_shots_data():
+def load_shots_data(season: Optional[int] = None):
     """
     Load shots data from raw_shots table.
     
+    Args:
+        season: Only this season's shots (None = every season)
+    
     Returns:
         DataFrame with columns: player_id, game_id, period, shooting_talent_adjusted_xg,
         flurry_adjusted_xg, xg_value, is_goal, is_empty_net, home_skaters_on_ice,
@@ -61,39 +65,22 @@ def load_shots_data():
     print("LOADING SHOTS DATA")
     print("=" * 80)
     
-    print("Loading from Supabase raw_shots table...")
-    print("(Using pagination to fetch all records)")
+    print("Loading raw_shots from the local snapshot (delta-synced from Supabase)...")
     
     try:
-        all_shots = []
-        offset = 0
-        batch_size = 1000
-        
-        while True:
-            batch = supabase.select(
-                'raw_shots',
-                select='id, player_id, game_id, period, time_remaining_seconds, shooting_talent_adjusted_xg, flurry_adjusted_xg, xg_value, is_goal, is_empty_net, home_skaters_on_ice, away_skaters_on_ice, team_code, is_home_team, goalie_id',
-                limit=batch_size,
-                offset=offset
-            )
-            
-            if not batch or len(batch) == 0:
-                break
-            
-            all_shots.extend(batch)
-            
-            if len(batch) < batch_size:
-                break  # Last batch
-            
-            offset += batch_size
-            print(f"  Fetched {len(all_shots):,} records so far...")
+        df = load_shots(
+            columns=['id', 'player_id', 'game_id', 'period', 'time_remaining_seconds', 'shooting_talent_adjusted_xg',
+                     'flurry_adjusted_xg', 'xg_value', 'is_goal', 'is_empty_net', 'home_skaters_on_ice',
+                     'away_skaters_on_ice', 'team_code', 'is_home_team', 'goalie_id'],
+            season=season,
+            db=supabase
+        )
+        print(f"  Loaded {len(df):,} records")
         
-        if len(all_shots) == 0:
+        if len(df) == 0:
             print("WARNING: No data found in database (0 rows returned)")
             return None
         
-        df = pd.DataFrame(all_shots)
-        
         # Convert types
         df['player_id'] = pd.to_numeric(df['player_id'], errors='coerce')
         df['game_id'] = pd.to_numeric(df['game_id'], errors='coerce')
@@ -128,7 +115,7 @@ def load_shots_data():
         df['xgf_value'] = df['xgf_value'].clip(lower=0.0)
         
         # Identify situation for each shot
-        df['situation'] = df.apply(identify_situation_from_shot, axis=1)
+        df['situation'] = identify_situations(df)
         
         print(f"Loaded {len(df):,} shots from database")
         print(f"   Unique players: {df['player_id'].nunique():,}")
@@ -147,49 +134,42 @@ def load_shots_data():
         return None
 
 
-def identify_situation_from_shot(row):
+def identify_situations(df):
     """
-    Identify game situation from shot row.
+    Identify the game situation of every shot from its skater counts.
+    
+    Empty-net shots and equal strength (5v5, 4v4, 3v3) are "5v5"; otherwise the
+    shooting team is on the power play ("PP") if it has more skaters than the
+    opponent and on the penalty kill ("PK") if it has fewer.
     
     Args:
-        row: DataFrame row with home_skaters_on_ice, away_skaters_on_ice, is_empty_net, is_home_team
+        df: DataFrame with home_skaters_on_ice, away_skaters_on_ice, is_empty_net, is_home_team
     
     Returns:
-        Situation string: "5v5", "PP", or "PK"
+        Series of situation strings aligned with df
     """
-    home_skaters = row.get('home_skaters_on_ice', 5)
-    away_skaters = row.get('away_skaters_on_ice', 5)
-    is_empty_net = row.get('is_empty_net', False)
-    is_home_team = row.get('is_home_team', False)
-    
-    # Empty net situations
-    if is_empty_net:
-        return SITUATION_5V5
-    
-    # Even strength
-    if home_skaters == 5 and away_skaters == 5:
-        return SITUATION_5V5
-    
-    # Determine if shooting team has man advantage (PP) or disadvantage (PK)
-    if is_home_team:
-        if home_skaters > away_skaters:
-            return SITUATION_PP  # Home team on power play
-        elif home_skaters < away_skaters:
-            return SITUATION_PK  # Home team on penalty kill
-    else:
-        if away_skaters > home_skaters:
-            return SITUATION_PP  # Away team on power play
-        elif away_skaters < home_skaters:
-            return SITUATION_PK  # Away team on penalty kill
-    
-    # Default to 5v5
-    return SITUATION_5V5
+    home_skaters = df['home_skaters_on_ice'].to_numpy(dtype=float)
+    away_skaters = df['away_skaters_on_ice'].to_numpy(dtype=float)
+    is_home_team = df['is_home_team'].to_numpy(dtype=bool)
+    is_empty_net = df['is_empty_net'].to_numpy(dtype=bool)
+    
+    # Skater advantage from the shooting team's point of view
+    advantage = np.where(is_home_team, home_skaters - away_skaters, away_skaters - home_skaters)
+    situation = np.select(
+        [is_empty_net, advantage > 0, advantage < 0],
+        [SITUATION_5V5, SITUATION_PP, SITUATION_PK],
+        default=SITUATION_5V5
+    )
+    return pd.Series(situation, index=df.index)
 
 
-def load_toi_data():
+def load_toi_data(season: Optional[int] = None):
     """
     Load TOI data from player_toi_by_situation table.
     
+    Args:
+        season: Only this season's games (None = every season)
+    
     Returns:
         DataFrame with columns: player_id, game_id, situation, toi_seconds
     """
@@ -200,28 +180,18 @@ def load_toi_data():
     print("Loading from Supabase player_toi_by_situation table...")
     
     try:
-        all_toi = []
-        offset = 0
-        batch_size = 1000
+        # NHL game IDs start with the season year (2025020001)
+        filters = []
+        if season is not None:
+            filters = [('game_id', 'gte', int(f"{season}000000")), ('game_id', 'lt', int(f"{season + 1}000000"))]
         
-        while True:
-            batch = supabase.select(
-                'player_toi_by_situation',
-                select='player_id, game_id, situation, toi_seconds',
-                limit=batch_size,
-                offset=offset
-            )
-            
-            if not batch or len(batch) == 0:
-                break
-            
-            all_toi.extend(batch)
-            
-            if len(batch) < batch_size:
-                break  # Last batch
-            
-            offset += batch_size
-            print(f"  Fetched {len(all_toi):,} records so far...")
+        # Keyset pagination on the table's unique key (offset paging rescans every page)
+        all_toi = supabase.select_all(
+            'player_toi_by_situation',
+            select='player_id,game_id,situation,toi_seconds',
+            filters=filters,
+            key=('player_id', 'game_id', 'situation')
+        )
         
         if len(all_toi) == 0:
             print("WARNING: No TOI data found. Run calculate_player_toi.py first.")
@@ -260,6 +230,9 @@ def calculate_component_rates(df_shots, df_toi):
     """
     Calculate raw component rates for each player.
     
+    Shots and TOI are each pivoted once to a (player x situation) table;
+    rates are computed on the aligned arrays.
+    
     Args:
         df_shots: DataFrame with shot data
         df_toi: DataFrame with TOI data
@@ -275,124 +248,43 @@ def calculate_component_rates(df_shots, df_toi):
     # For now, we'll use shooter's xG as proxy for on-ice xGF
     # TODO: Enhance with full on-ice tracking when shifts are available
     
-    print("Aggregating shots by player and situation...")
+    print("Aggregating shots and TOI by player and situation...")
     
     # Filter out empty-net shots
-    df_shots_filtered = df_shots[~df_shots['is_empty_net']].copy()
-    
-    # Aggregate xGF by player and situation (using shooter's xG as proxy)
-    shot_aggregates = df_shots_filtered.groupby(['player_id', 'situation']).agg(
-        total_xgf=('xgf_value', 'sum'),
-        shot_count=('player_id', 'count')
-    ).reset_index()
-    
-    # Aggregate TOI by player and situation
-    toi_aggregates = df_toi.groupby(['player_id', 'situation']).agg(
-        total_toi_minutes=('toi_minutes', 'sum')
-    ).reset_index()
-    
-    # Merge shots and TOI
-    merged = pd.merge(
-        shot_aggregates,
-        toi_aggregates,
-        on=['player_id', 'situation'],
-        how='outer'
-    )
+    df_shots_filtered = df_shots[~df_shots['is_empty_net']]
     
-    # Fill missing values
-    merged['total_xgf'] = merged['total_xgf'].fillna(0.0)
-    merged['shot_count'] = merged['shot_count'].fillna(0)
-    merged['total_toi_minutes'] = merged['total_toi_minutes'].fillna(0.0)
+    # xGF by player and situation (using shooter's xG as proxy)
+    xgf = df_shots_filtered.groupby(['player_id', 'situation'])['xgf_value'].sum().unstack(fill_value=0.0)
     
-    # Calculate rates per 60 minutes
-    # Rate = (Total xGF / Total TOI minutes) × 60
-    merged['rate_per_60'] = np.where(
-        merged['total_toi_minutes'] > 0,
-        (merged['total_xgf'] / merged['total_toi_minutes']) * 60.0,
-        0.0
-    )
+    # TOI by player and situation (situations without a component, e.g. EN, still count toward the total)
+    toi = df_toi.groupby(['player_id', 'situation'])['toi_minutes'].sum().unstack(fill_value=0.0)
     
-    # Pivot to get one row per player with columns for each situation
-    component_rates = merged.pivot_table(
-        index='player_id',
-        columns='situation',
-        values='rate_per_60',
-        aggfunc='sum',
-        fill_value=0.0
-    ).reset_index()
-    
-    # Rename columns
-    if SITUATION_5V5 in component_rates.columns:
-        component_rates['evo_rate_raw'] = component_rates[SITUATION_5V5]
-    else:
-        component_rates['evo_rate_raw'] = 0.0
-    
-    if SITUATION_PP in component_rates.columns:
-        component_rates['ppo_rate_raw'] = component_rates[SITUATION_PP]
-    else:
-        component_rates['ppo_rate_raw'] = 0.0
-    
-    # For EVD and PPD, we need shots AGAINST the player's team
-    # This requires knowing which team each player is on
-    # For now, we'll calculate a simplified version
-    # TODO: Enhance with team tracking and on-ice xGA calculation
-    
-    # Placeholder for EVD and PPD (will be calculated when on-ice tracking is available)
-    component_rates['evd_rate_raw'] = 0.0  # TODO: Calculate from shots against
-    component_rates['ppd_rate_raw'] = 0.0  # TODO: Calculate from shots against
-    
-    # Penalty component (placeholder - requires penalty event data)
-    component_rates['penalty_component_raw'] = 0.0  # TODO: Calculate from penalty events
-    
-    # Get total TOI for each player
-    player_toi = df_toi.groupby('player_id').agg(
-        toi_5v5_minutes=('toi_minutes', lambda x: x[df_toi.loc[x.index, 'situation'] == SITUATION_5V5].sum() if SITUATION_5V5 in df_toi.loc[x.index, 'situation'].values else 0.0),
-        toi_pp_minutes=('toi_minutes', lambda x: x[df_toi.loc[x.index, 'situation'] == SITUATION_PP].sum() if SITUATION_PP in df_toi.loc[x.index, 'situation'].values else 0.0),
-        toi_pk_minutes=('toi_minutes', lambda x: x[df_toi.loc[x.index, 'situation'] == SITUATION_PK].sum() if SITUATION_PK in df_toi.loc[x.index, 'situation'].values else 0.0),
-        toi_total_minutes=('toi_minutes', 'sum')
-    ).reset_index()
-    
-    # Better approach: filter by situation first
-    toi_5v5 = df_toi[df_toi['situation'] == SITUATION_5V5].groupby('player_id')['toi_minutes'].sum().reset_index()
-    toi_5v5.columns = ['player_id', 'toi_5v5_minutes']
-    
-    toi_pp = df_toi[df_toi['situation'] == SITUATION_PP].groupby('player_id')['toi_minutes'].sum().reset_index()
-    toi_pp.columns = ['player_id', 'toi_pp_minutes']
-    
-    toi_pk = df_toi[df_toi['situation'] == SITUATION_PK].groupby('player_id')['toi_minutes'].sum().reset_index()
-    toi_pk.columns = ['player_id', 'toi_pk_minutes']
-    
-    toi_total = df_toi.groupby('player_id')['toi_minutes'].sum().reset_index()
-    toi_total.columns = ['player_id', 'toi_total_minutes']
-    
-    # Merge all TOI data
-    player_toi = component_rates[['player_id']].merge(toi_5v5, on='player_id', how='left')
-    player_toi = player_toi.merge(toi_pp, on='player_id', how='left')
-    player_toi = player_toi.merge(toi_pk, on='player_id', how='left')
-    player_toi = player_toi.merge(toi_total, on='player_id', how='left')
-    
-    # Fill missing values
-    player_toi['toi_5v5_minutes'] = player_toi['toi_5v5_minutes'].fillna(0.0)
-    player_toi['toi_pp_minutes'] = player_toi['toi_pp_minutes'].fillna(0.0)
-    player_toi['toi_pk_minutes'] = player_toi['toi_pk_minutes'].fillna(0.0)
-    player_toi['toi_total_minutes'] = player_toi['toi_total_minutes'].fillna(0.0)
-    
-    # Merge TOI data into component rates
-    component_rates = component_rates.merge(player_toi, on='player_id', how='left')
-    
-    # Fill missing TOI values
-    component_rates['toi_5v5_minutes'] = component_rates['toi_5v5_minutes'].fillna(0.0)
-    component_rates['toi_pp_minutes'] = component_rates['toi_pp_minutes'].fillna(0.0)
-    component_rates['toi_pk_minutes'] = component_rates['toi_pk_minutes'].fillna(0.0)
-    component_rates['toi_total_minutes'] = component_rates['toi_total_minutes'].fillna(0.0)
-    
-    # Clean up pivot columns
-    if SITUATION_5V5 in component_rates.columns:
-        component_rates = component_rates.drop(columns=[SITUATION_5V5])
-    if SITUATION_PP in component_rates.columns:
-        component_rates = component_rates.drop(columns=[SITUATION_PP])
-    if SITUATION_PK in component_rates.columns:
-        component_rates = component_rates.drop(columns=[SITUATION_PK])
+    # One row per player seen in either source, one column per situation
+    players = xgf.index.union(toi.index)
+    situations = [SITUATION_5V5, SITUATION_PP, SITUATION_PK]
+    toi_total = toi.sum(axis=1).reindex(players, fill_value=0.0).to_numpy()
+    xgf = xgf.reindex(index=players, columns=situations, fill_value=0.0).to_numpy()
+    toi = toi.reindex(index=players, columns=situations, fill_value=0.0).to_numpy()
+    
+    # Rate = (Total xGF / Total TOI minutes) × 60
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = np.where(toi > 0, xgf / toi * 60.0, 0.0)
+    
+    component_rates = pd.DataFrame({
+        'player_id': players.to_numpy(),
+        'evo_rate_raw': rates[:, 0],
+        'ppo_rate_raw': rates[:, 1],
+        # For EVD and PPD, we need shots AGAINST the player's team
+        # TODO: Enhance with team tracking and on-ice xGA calculation
+        'evd_rate_raw': 0.0,
+        'ppd_rate_raw': 0.0,
+        # Penalty component (placeholder - requires penalty event data)
+        'penalty_component_raw': 0.0,
+        'toi_5v5_minutes': toi[:, 0],
+        'toi_pp_minutes': toi[:, 1],
+        'toi_pk_minutes': toi[:, 2],
+        'toi_total_minutes': toi_total,
+    })
     
     print(f"Calculated component rates for {len(component_rates):,} players")
     print(f"   Players with 5v5 TOI: {(component_rates['toi_5v5_minutes'] > 0).sum():,}")
@@ -402,6 +294,31 @@ def calculate_component_rates(df_shots, df_toi):
     return component_rates
 
 
+def compute_component_rates(season: Optional[int] = None):
+    """
+    Load shots and TOI and calculate raw component rates in-process
+    (what main() writes to player_gar_components_raw.csv).
+    
+    Args:
+        season: Only this season's shots and TOI (None = every season)
+    
+    Returns:
+        DataFrame with component rates, or None if shots or TOI are unavailable
+    """
+    df_shots = load_shots_data(season=season)
+    if df_shots is None:
+        print("ERROR: Failed to load shots data")
+        return None
+    
+    df_toi = load_toi_data(season=season)
+    if df_toi is None:
+        print("WARNING: No TOI data available. Component rates will be incomplete.")
+        print("   Run calculate_player_toi.py first to generate TOI data.")
+        return None
+    
+    return calculate_component_rates(df_shots, df_toi)
+
+
 def save_component_rates(df_rates):
     """
     Save component rates to CSV and database.
@@ -431,20 +348,8 @@ def main():
     print("=" * 80)
     print()
     
-    # Load data
-    df_shots = load_shots_data()
-    if df_shots is None:
-        print("ERROR: Failed to load shots data")
-        return
-    
-    df_toi = load_toi_data()
-    if df_toi is None:
-        print("WARNING: No TOI data available. Component rates will be incomplete.")
-        print("   Run calculate_player_toi.py first to generate TOI data.")
-        return
-    
-    # Calculate component rates
-    df_rates = calculate_component_rates(df_shots, df_toi)
+    # Load data and calculate component rates
+    df_rates = compute_component_rates()
     
     if df_rates is None or len(df_rates) == 0:
         print("ERROR: Failed to calculate component rates")
@@ -10,6 +10,14 @@ This script:
 4. Calculates final GAR values (Above Replacement)
 5. Stores results in player_gar_components table
 
+Every step works on whole columns (one array expression per component), so the
+full league is recomputed in seconds; the nightly pipeline runs it with
+--recompute to rebuild the raw rates from raw_shots / player_toi_by_situation
+instead of reading player_gar_components_raw.csv.
+
+Usage:
+    python calculate_gar_regression.py [--season 2025] [--recompute]
+
 Component-Specific Stabilization Thresholds:
 - EVO/EVD: C = 500 TOI minutes (stabilizes faster - more common situations)
 - PPO: C = 100 TOI minutes (stabilizes slower - less common, high variance)
@@ -20,10 +28,11 @@ Component-Specific Stabilization Thresholds:
 import pandas as pd
 import numpy as np
 import os
+import argparse
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase_rest import SupabaseRest
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 # Load environment variables
 load_dotenv()
@@ -37,7 +46,7 @@ if not supabase_url or not supabase_key:
     print("   Please ensure VITE_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY are set")
     exit(1)
 
-supabase: Client = create_client(supabase_url, supabase_key)
+supabase = SupabaseRest(supabase_url, supabase_key)
 
 # Component-specific stabilization thresholds (in TOI minutes)
 STABILIZATION_THRESHOLDS = {
@@ -51,10 +60,38 @@ STABILIZATION_THRESHOLDS = {
 # Replacement level percentile (configurable, default 75th)
 REPLACEMENT_LEVEL_PERCENTILE = 75.0
 
+# Per component: (key, label, TOI column, raw rate column, regressed column, GAR/60 column,
+#                 higher_is_better, unit)
+COMPONENTS = [
+    ('evo', 'EVO', 'toi_5v5_minutes', 'evo_rate_raw', 'evo_rate_regressed', 'evo_gar_per_60', True, 'xGF/60'),
+    ('evd', 'EVD', 'toi_5v5_minutes', 'evd_rate_raw', 'evd_rate_regressed', 'evd_gar_per_60', False, 'xGA/60'),
+    ('ppo', 'PPO', 'toi_pp_minutes', 'ppo_rate_raw', 'ppo_rate_regressed', 'ppo_gar_per_60', True, 'xGF/60'),
+    ('ppd', 'PPD', 'toi_pk_minutes', 'ppd_rate_raw', 'ppd_rate_regressed', 'ppd_gar_per_60', False, 'xGA/60'),
+    ('penalty', 'Penalty', 'toi_total_minutes', 'penalty_component_raw', 'penalty_component_regressed',
+     'penalty_gar_per_60', True, '(drawn - taken)/60'),
+]
+
+# player_gar_components columns written besides player_id / season
+STORED_COLUMNS = (
+    [raw for _, _, _, raw, _, _, _, _ in COMPONENTS] +
+    [regressed for _, _, _, _, regressed, _, _, _ in COMPONENTS] +
+    ['rp_evo_rate', 'rp_evd_rate', 'rp_ppo_rate', 'rp_ppd_rate', 'rp_penalty_rate'] +
+    ['toi_5v5_minutes', 'toi_pp_minutes', 'toi_pk_minutes', 'toi_total_minutes'] +
+    [gar for _, _, _, _, _, gar, _, _ in COMPONENTS] +
+    ['total_gar_per_60']
+)
+UPSERT_CHUNK_SIZE = 1000
+
 
-def load_raw_component_rates():
+def load_raw_component_rates(recompute: bool = False, season: Optional[int] = None):
     """
-    Load raw component rates from CSV or calculate from database.
+    Load raw component rates from CSV, or calculate them from the database.
+    
+    Args:
+        recompute: Ignore player_gar_components_raw.csv and recompute from
+            raw_shots / player_toi_by_situation (nightly runs)
+        season: Restrict the recomputed rates to this season's shots and TOI
+            (None = every season; the CSV is used as written)
     
     Returns:
         DataFrame with player_id, component rates, and TOI data
@@ -65,18 +102,16 @@ def load_raw_component_rates():
     
     # Try loading from CSV first
     csv_file = 'player_gar_components_raw.csv'
-    if os.path.exists(csv_file):
+    if not recompute and os.path.exists(csv_file):
         print(f"Loading from {csv_file}...")
         df = pd.read_csv(csv_file)
         print(f"Loaded {len(df):,} players from CSV")
         return df
     
-    # If CSV doesn't exist, try to load from database
-    print("CSV not found. Attempting to load from database...")
-    print("(Note: Run calculate_gar_components.py first to generate raw rates)")
-    
-    # For now, return None - user should run calculate_gar_components.py first
-    return None
+    if not recompute:
+        print("CSV not found. Calculating from database...")
+    from calculate_gar_components import compute_component_rates
+    return compute_component_rates(season=season)
 
 
 def calculate_replacement_level_rates(df_rates):
@@ -98,69 +133,16 @@ def calculate_replacement_level_rates(df_rates):
     
     rp_rates = {}
     
-    # Filter players with sufficient TOI for each component
-    # Use total TOI as weight for percentile calculation
-    
-    # EVO replacement level (75th percentile of EVO rate, weighted by 5v5 TOI)
-    evo_players = df_rates[df_rates['toi_5v5_minutes'] > 0].copy()
-    if len(evo_players) > 0:
-        # Weight by TOI for percentile calculation
-        rp_rates['evo'] = np.percentile(
-            evo_players['evo_rate_raw'],
-            REPLACEMENT_LEVEL_PERCENTILE
-        )
-        print(f"   EVO Replacement Level: {rp_rates['evo']:.4f} xGF/60")
-    else:
-        rp_rates['evo'] = 0.0
-        print("   WARNING: No players with 5v5 TOI for EVO replacement level")
-    
-    # EVD replacement level (75th percentile of EVD rate, weighted by 5v5 TOI)
-    evd_players = df_rates[df_rates['toi_5v5_minutes'] > 0].copy()
-    if len(evd_players) > 0:
-        rp_rates['evd'] = np.percentile(
-            evd_players['evd_rate_raw'],
-            REPLACEMENT_LEVEL_PERCENTILE
-        )
-        print(f"   EVD Replacement Level: {rp_rates['evd']:.4f} xGA/60")
-    else:
-        rp_rates['evd'] = 0.0
-        print("   WARNING: No players with 5v5 TOI for EVD replacement level")
-    
-    # PPO replacement level (75th percentile of PPO rate, weighted by PP TOI)
-    ppo_players = df_rates[df_rates['toi_pp_minutes'] > 0].copy()
-    if len(ppo_players) > 0:
-        rp_rates['ppo'] = np.percentile(
-            ppo_players['ppo_rate_raw'],
-            REPLACEMENT_LEVEL_PERCENTILE
-        )
-        print(f"   PPO Replacement Level: {rp_rates['ppo']:.4f} xGF/60")
-    else:
-        rp_rates['ppo'] = 0.0
-        print("   WARNING: No players with PP TOI for PPO replacement level")
-    
-    # PPD replacement level (75th percentile of PPD rate, weighted by PK TOI)
-    ppd_players = df_rates[df_rates['toi_pk_minutes'] > 0].copy()
-    if len(ppd_players) > 0:
-        rp_rates['ppd'] = np.percentile(
-            ppd_players['ppd_rate_raw'],
-            REPLACEMENT_LEVEL_PERCENTILE
-        )
-        print(f"   PPD Replacement Level: {rp_rates['ppd']:.4f} xGA/60")
-    else:
-        rp_rates['ppd'] = 0.0
-        print("   WARNING: No players with PK TOI for PPD replacement level")
-    
-    # Penalty replacement level (75th percentile of Penalty component, weighted by total TOI)
-    penalty_players = df_rates[df_rates['toi_total_minutes'] > 0].copy()
-    if len(penalty_players) > 0:
-        rp_rates['penalty'] = np.percentile(
-            penalty_players['penalty_component_raw'],
-            REPLACEMENT_LEVEL_PERCENTILE
-        )
-        print(f"   Penalty Replacement Level: {rp_rates['penalty']:.4f} (drawn - taken)/60")
-    else:
-        rp_rates['penalty'] = 0.0
-        print("   WARNING: No players with TOI for Penalty replacement level")
+    # Each component's replacement level is the percentile of its rate over
+    # players with TOI in the component's situation
+    for key, label, toi_col, raw_col, _, _, _, unit in COMPONENTS:
+        has_toi = df_rates[toi_col].to_numpy() > 0
+        if has_toi.any():
+            rp_rates[key] = float(np.percentile(df_rates[raw_col].to_numpy()[has_toi], REPLACEMENT_LEVEL_PERCENTILE))
+            print(f"   {label} Replacement Level: {rp_rates[key]:.4f} {unit}")
+        else:
+            rp_rates[key] = 0.0
+            print(f"   WARNING: No players with {toi_col} for {label} replacement level")
     
     return rp_rates
 
@@ -190,50 +172,15 @@ def apply_bayesian_regression(df_rates, rp_rates):
     
     df = df_rates.copy()
     
-    # EVO regression
-    c_evo = STABILIZATION_THRESHOLDS['evo']
-    df['evo_rate_regressed'] = np.where(
-        df['toi_5v5_minutes'] > 0,
-        (df['toi_5v5_minutes'] / (df['toi_5v5_minutes'] + c_evo)) * df['evo_rate_raw'] +
-        (c_evo / (df['toi_5v5_minutes'] + c_evo)) * rp_rates['evo'],
-        rp_rates['evo']  # Default to replacement level if no TOI
-    )
-    
-    # EVD regression
-    c_evd = STABILIZATION_THRESHOLDS['evd']
-    df['evd_rate_regressed'] = np.where(
-        df['toi_5v5_minutes'] > 0,
-        (df['toi_5v5_minutes'] / (df['toi_5v5_minutes'] + c_evd)) * df['evd_rate_raw'] +
-        (c_evd / (df['toi_5v5_minutes'] + c_evd)) * rp_rates['evd'],
-        rp_rates['evd']  # Default to replacement level if no TOI
-    )
-    
-    # PPO regression
-    c_ppo = STABILIZATION_THRESHOLDS['ppo']
-    df['ppo_rate_regressed'] = np.where(
-        df['toi_pp_minutes'] > 0,
-        (df['toi_pp_minutes'] / (df['toi_pp_minutes'] + c_ppo)) * df['ppo_rate_raw'] +
-        (c_ppo / (df['toi_pp_minutes'] + c_ppo)) * rp_rates['ppo'],
-        rp_rates['ppo']  # Default to replacement level if no TOI
-    )
-    
-    # PPD regression
-    c_ppd = STABILIZATION_THRESHOLDS['ppd']
-    df['ppd_rate_regressed'] = np.where(
-        df['toi_pk_minutes'] > 0,
-        (df['toi_pk_minutes'] / (df['toi_pk_minutes'] + c_ppd)) * df['ppd_rate_raw'] +
-        (c_ppd / (df['toi_pk_minutes'] + c_ppd)) * rp_rates['ppd'],
-        rp_rates['ppd']  # Default to replacement level if no TOI
-    )
-    
-    # Penalty regression
-    c_penalty = STABILIZATION_THRESHOLDS['penalty']
-    df['penalty_component_regressed'] = np.where(
-        df['toi_total_minutes'] > 0,
-        (df['toi_total_minutes'] / (df['toi_total_minutes'] + c_penalty)) * df['penalty_component_raw'] +
-        (c_penalty / (df['toi_total_minutes'] + c_penalty)) * rp_rates['penalty'],
-        rp_rates['penalty']  # Default to replacement level if no TOI
-    )
+    for key, _, toi_col, raw_col, regressed_col, _, _, _ in COMPONENTS:
+        c = STABILIZATION_THRESHOLDS[key]
+        toi = df[toi_col].to_numpy(dtype=float)
+        raw = df[raw_col].to_numpy(dtype=float)
+        df[regressed_col] = np.where(
+            toi > 0,
+            (toi / (toi + c)) * raw + (c / (toi + c)) * rp_rates[key],
+            rp_rates[key]  # Default to replacement level if no TOI
+        )
     
     print(f"Applied Bayesian regression to {len(df):,} players")
     
@@ -261,23 +208,15 @@ def calculate_final_gar_values(df_rates, rp_rates):
     
     df = df_rates.copy()
     
-    # Calculate GAR per 60 minutes for each component
-    # GAR_per_60 = Regressed_Rate - RP_Rate
-    
-    df['evo_gar_per_60'] = df['evo_rate_regressed'] - rp_rates['evo']
-    df['evd_gar_per_60'] = rp_rates['evd'] - df['evd_rate_regressed']  # Inverted (lower is better)
-    df['ppo_gar_per_60'] = df['ppo_rate_regressed'] - rp_rates['ppo']
-    df['ppd_gar_per_60'] = rp_rates['ppd'] - df['ppd_rate_regressed']  # Inverted (lower is better)
-    df['penalty_gar_per_60'] = df['penalty_component_regressed'] - rp_rates['penalty']
+    # GAR_per_60 = Regressed_Rate - RP_Rate (inverted for xGA components: lower is better)
+    total = np.zeros(len(df))
+    for key, _, _, _, regressed_col, gar_col, higher_is_better, _ in COMPONENTS:
+        regressed = df[regressed_col].to_numpy(dtype=float)
+        df[gar_col] = regressed - rp_rates[key] if higher_is_better else rp_rates[key] - regressed
+        total = total + df[gar_col].to_numpy()
     
     # Total GAR per 60 = sum of all components
-    df['total_gar_per_60'] = (
-        df['evo_gar_per_60'] +
-        df['evd_gar_per_60'] +
-        df['ppo_gar_per_60'] +
-        df['ppd_gar_per_60'] +
-        df['penalty_gar_per_60']
-    )
+    df['total_gar_per_60'] = total
     
     print(f"Calculated GAR values for {len(df):,} players")
     print(f"   Average Total GAR/60: {df['total_gar_per_60'].mean():.4f}")
@@ -286,78 +225,50 @@ def calculate_final_gar_values(df_rates, rp_rates):
     return df
 
 
+def gar_component_records(df_gar, rp_rates, season: int) -> List[dict]:
+    """
+    player_gar_components rows for every player (NaN -> None).
+    
+    Args:
+        df_gar: DataFrame with all GAR component data
+        rp_rates: Dictionary with replacement level rates
+        season: Season year
+    
+    Returns:
+        List of upsert payloads (on_conflict player_id,season)
+    """
+    values = df_gar.reindex(columns=STORED_COLUMNS).astype(float)
+    for key in rp_rates:
+        values[f'rp_{key}_rate'] = float(rp_rates[key])
+    values = values.astype(object).where(values.notna(), None)
+    values.insert(0, 'season', season)
+    values.insert(0, 'player_id', df_gar['player_id'].astype(np.int64).to_numpy())
+    return values.to_dict('records')
+
+
 def store_gar_components(df_gar, rp_rates, season: int = 2025):
     """
     Store GAR components in database.
     
     Args:
         df_gar: DataFrame with all GAR component data
+        rp_rates: Dictionary with replacement level rates
         season: Season year (default: 2025)
     """
     print("\n" + "=" * 80)
     print("STORING GAR COMPONENTS IN DATABASE")
     print("=" * 80)
     
-    # Prepare data for database
-    records = []
-    
-    for _, row in df_gar.iterrows():
-        record = {
-            'player_id': int(row['player_id']),
-            'season': season,
-            # Raw rates
-            'evo_rate_raw': float(row['evo_rate_raw']) if pd.notna(row['evo_rate_raw']) else None,
-            'evd_rate_raw': float(row['evd_rate_raw']) if pd.notna(row['evd_rate_raw']) else None,
-            'ppo_rate_raw': float(row['ppo_rate_raw']) if pd.notna(row['ppo_rate_raw']) else None,
-            'ppd_rate_raw': float(row['ppd_rate_raw']) if pd.notna(row['ppd_rate_raw']) else None,
-            'penalty_component_raw': float(row['penalty_component_raw']) if pd.notna(row['penalty_component_raw']) else None,
-            # Regressed rates
-            'evo_rate_regressed': float(row['evo_rate_regressed']) if pd.notna(row['evo_rate_regressed']) else None,
-            'evd_rate_regressed': float(row['evd_rate_regressed']) if pd.notna(row['evd_rate_regressed']) else None,
-            'ppo_rate_regressed': float(row['ppo_rate_regressed']) if pd.notna(row['ppo_rate_regressed']) else None,
-            'ppd_rate_regressed': float(row['ppd_rate_regressed']) if pd.notna(row['ppd_rate_regressed']) else None,
-            'penalty_component_regressed': float(row['penalty_component_regressed']) if pd.notna(row['penalty_component_regressed']) else None,
-            # Replacement level rates (same for all players)
-            'rp_evo_rate': float(row.get('rp_evo_rate', 0.0)) if pd.notna(row.get('rp_evo_rate', 0.0)) else None,
-            'rp_evd_rate': float(row.get('rp_evd_rate', 0.0)) if pd.notna(row.get('rp_evd_rate', 0.0)) else None,
-            'rp_ppo_rate': float(row.get('rp_ppo_rate', 0.0)) if pd.notna(row.get('rp_ppo_rate', 0.0)) else None,
-            'rp_ppd_rate': float(row.get('rp_ppd_rate', 0.0)) if pd.notna(row.get('rp_ppd_rate', 0.0)) else None,
-            'rp_penalty_rate': float(row.get('rp_penalty_rate', 0.0)) if pd.notna(row.get('rp_penalty_rate', 0.0)) else None,
-            # TOI data
-            'toi_5v5_minutes': float(row['toi_5v5_minutes']) if pd.notna(row['toi_5v5_minutes']) else None,
-            'toi_pp_minutes': float(row['toi_pp_minutes']) if pd.notna(row['toi_pp_minutes']) else None,
-            'toi_pk_minutes': float(row['toi_pk_minutes']) if pd.notna(row['toi_pk_minutes']) else None,
-            'toi_total_minutes': float(row['toi_total_minutes']) if pd.notna(row['toi_total_minutes']) else None,
-            # Final GAR values
-            'evo_gar_per_60': float(row['evo_gar_per_60']) if pd.notna(row['evo_gar_per_60']) else None,
-            'evd_gar_per_60': float(row['evd_gar_per_60']) if pd.notna(row['evd_gar_per_60']) else None,
-            'ppo_gar_per_60': float(row['ppo_gar_per_60']) if pd.notna(row['ppo_gar_per_60']) else None,
-            'ppd_gar_per_60': float(row['ppd_gar_per_60']) if pd.notna(row['ppd_gar_per_60']) else None,
-            'penalty_gar_per_60': float(row['penalty_gar_per_60']) if pd.notna(row['penalty_gar_per_60']) else None,
-            'total_gar_per_60': float(row['total_gar_per_60']) if pd.notna(row['total_gar_per_60']) else None,
-        }
-        records.append(record)
-    
-    # Add replacement level rates to all records
-    for record in records:
-        record['rp_evo_rate'] = rp_rates['evo']
-        record['rp_evd_rate'] = rp_rates['evd']
-        record['rp_ppo_rate'] = rp_rates['ppo']
-        record['rp_ppd_rate'] = rp_rates['ppd']
-        record['rp_penalty_rate'] = rp_rates['penalty']
+    records = gar_component_records(df_gar, rp_rates, season)
     
     # Batch upsert
     print(f"Upserting {len(records):,} records...")
     
     try:
-        chunk_size = 1000
-        for i in range(0, len(records), chunk_size):
-            chunk = records[i:i + chunk_size]
-            result = supabase.table('player_gar_components').upsert(
-                chunk,
-                on_conflict='player_id,season'
-            ).execute()
-            print(f"  Upserted records {i+1}-{min(i+chunk_size, len(records))}")
+        for i in range(0, len(records), UPSERT_CHUNK_SIZE):
+            chunk = records[i:i + UPSERT_CHUNK_SIZE]
+            supabase.upsert('player_gar_components', chunk, on_conflict='player_id,season')
+            print(f"  Upserted records {i+1}-{min(i+UPSERT_CHUNK_SIZE, len(records))}")
         
         print(f"Successfully stored {len(records):,} GAR component records")
         
@@ -391,9 +302,13 @@ def save_to_csv(df_gar, rp_rates):
     print(f"Saved replacement levels to {rp_file}")
 
 
-def main():
+def main(season: int = 2025, recompute: bool = False):
     """
     Main function to apply regression and calculate final GAR values.
+    
+    Args:
+        season: Season year the rates are recomputed for (with recompute) and stored with
+        recompute: Recompute raw component rates from the database (see load_raw_component_rates)
     """
     print("=" * 80)
     print("CALCULATE GAR REGRESSION AND FINAL VALUES")
@@ -401,11 +316,11 @@ def main():
     print()
     
     # Load raw component rates
-    df_rates = load_raw_component_rates()
+    df_rates = load_raw_component_rates(recompute=recompute, season=season)
     if df_rates is None:
         print("ERROR: Failed to load raw component rates")
         print("   Please run calculate_gar_components.py first")
-        return
+        return 1
     
     # Calculate replacement level rates
     rp_rates = calculate_replacement_level_rates(df_rates)
@@ -417,24 +332,26 @@ def main():
     df_gar = calculate_final_gar_values(df_regressed, rp_rates)
     
     # Add replacement level rates to dataframe for storage
-    df_gar['rp_evo_rate'] = rp_rates['evo']
-    df_gar['rp_evd_rate'] = rp_rates['evd']
-    df_gar['rp_ppo_rate'] = rp_rates['ppo']
-    df_gar['rp_ppd_rate'] = rp_rates['ppd']
-    df_gar['rp_penalty_rate'] = rp_rates['penalty']
+    for key, rate in rp_rates.items():
+        df_gar[f'rp_{key}_rate'] = rate
     
     # Save to CSV
     save_to_csv(df_gar, rp_rates)
     
     # Store in database
-    store_gar_components(df_gar, rp_rates, season=2025)
+    store_gar_components(df_gar, rp_rates, season=season)
     
     print()
     print("=" * 80)
     print("COMPLETE")
     print("=" * 80)
+    return 0
 
 
 if __name__ == "__main__":
-    main()
-
+    parser = argparse.ArgumentParser(description="Bayesian-regressed GAR components -> player_gar_components")
+    parser.add_argument("--season", type=int, default=int(os.getenv("CITRUS_DEFAULT_SEASON", "2025")))
+    parser.add_argument("--recompute", action="store_true",
+                        help="Recompute raw component rates from the database instead of the CSV")
+    args = parser.parse_args()
+    exit(main(season=args.season, recompute=args.recompute))
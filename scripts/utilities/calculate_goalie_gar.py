@@ -37,6 +37,14 @@ if not supabase_url or not supabase_key:
 
 supabase = SupabaseRest(supabase_url, supabase_key)
 
+# G-GAR configurations stored in goalie_gar (see calculate_combined_gar_all_configs)
+GAR_CONFIG_COLUMNS = [
+    'total_gar_w30_raw', 'total_gar_w30_c5000', 'total_gar_w30_c10000',
+    'total_gar_w10_c5000', 'total_gar_w10_c10000', 'total_gar_w5_c5000', 'total_gar_w5_c10000',
+]
+# Columns of the original goalie_gar schema
+BASELINE_COLUMNS = ['goalie_id', 'rebound_control_score', 'primary_gsax_score', 'total_gar', 'calculated_at']
+
 
 def load_rebound_control():
     """Load rebound control component data with regressed values."""
@@ -331,37 +339,19 @@ def store_gar_results_all_configs(gar_df):
     print("STORING G-GAR RESULTS (ALL CONFIGURATIONS)")
     print("=" * 80)
     
-    # Prepare records with all configurations
-    records = []
-    for _, row in gar_df.iterrows():
-        record = {
-            'goalie_id': int(row['goalie_id']),
-            'rebound_control_score': float(row['rebound_control_score']) if pd.notna(row.get('rebound_control_score')) else None,
-            'primary_gsax_score': float(row['primary_gsax_score']) if pd.notna(row.get('primary_gsax_score')) else None,
-            # Store baseline (for backward compatibility)
-            'total_gar': float(row['total_gar_w30_raw']) if pd.notna(row.get('total_gar_w30_raw')) else None,
-            # Store all configurations (may not exist in older DB schemas)
-            'total_gar_w30_raw': float(row['total_gar_w30_raw']) if pd.notna(row.get('total_gar_w30_raw')) else None,
-            'total_gar_w30_c5000': float(row['total_gar_w30_c5000']) if pd.notna(row.get('total_gar_w30_c5000')) else None,
-            'total_gar_w30_c10000': float(row['total_gar_w30_c10000']) if pd.notna(row.get('total_gar_w30_c10000')) else None,
-            'total_gar_w10_c5000': float(row['total_gar_w10_c5000']) if pd.notna(row.get('total_gar_w10_c5000')) else None,
-            'total_gar_w10_c10000': float(row['total_gar_w10_c10000']) if pd.notna(row.get('total_gar_w10_c10000')) else None,
-            'total_gar_w5_c5000': float(row['total_gar_w5_c5000']) if pd.notna(row.get('total_gar_w5_c5000')) else None,
-            'total_gar_w5_c10000': float(row['total_gar_w5_c10000']) if pd.notna(row.get('total_gar_w5_c10000')) else None,
-            'calculated_at': datetime.now().isoformat()
-        }
-        records.append(record)
-
+    # Prepare records with all configurations (columnar; NaN -> None)
+    calculated_at = datetime.now().isoformat()
+    values = gar_df.reindex(columns=['rebound_control_score', 'primary_gsax_score'] + GAR_CONFIG_COLUMNS).astype(float)
+    # Store baseline as total_gar (for backward compatibility)
+    values.insert(2, 'total_gar', values['total_gar_w30_raw'])
+    values = values.astype(object).where(values.notna(), None)
+    values.insert(0, 'goalie_id', gar_df['goalie_id'].astype(np.int64).to_numpy())
+    values['calculated_at'] = calculated_at
+    
+    # All configurations (may not exist in older DB schemas)
+    records = values.to_dict('records')
     # Baseline-only fallback records (compatible with the original goalie_gar schema)
-    baseline_records = []
-    for _, row in gar_df.iterrows():
-        baseline_records.append({
-            'goalie_id': int(row['goalie_id']),
-            'rebound_control_score': float(row['rebound_control_score']) if pd.notna(row.get('rebound_control_score')) else None,
-            'primary_gsax_score': float(row['primary_gsax_score']) if pd.notna(row.get('primary_gsax_score')) else None,
-            'total_gar': float(row['total_gar_w30_raw']) if pd.notna(row.get('total_gar_w30_raw')) else None,
-            'calculated_at': datetime.now().isoformat()
-        })
+    baseline_records = values[BASELINE_COLUMNS].to_dict('records')
     
     # Upsert in batches
     batch_size = 100
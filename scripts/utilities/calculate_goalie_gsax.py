@@ -17,6 +17,7 @@ import numpy as np
 import os
 from dotenv import load_dotenv
 from supabase_rest import SupabaseRest
+from snapshot_store import load_shots
 from datetime import datetime
 
 # Load environment variables
@@ -49,39 +50,20 @@ def load_historical_shots_data():
     print("LOADING HISTORICAL SHOTS DATA")
     print("=" * 80)
     
-    print("Loading from Supabase raw_shots table...")
-    print("(Using pagination to fetch all records)")
+    print("Loading raw_shots from the local snapshot (delta-synced from Supabase)...")
     
     try:
-        all_shots = []
-        offset = 0
-        batch_size = 1000
-        
-        while True:
-            batch = supabase.select(
-                'raw_shots',
-                select='goalie_id, goalie_name, is_goal, shooting_talent_adjusted_xg, flurry_adjusted_xg, xg_value, is_empty_net, game_id, period, distance, angle, is_power_play, shot_type',
-                limit=batch_size,
-                offset=offset
-            )
-            
-            if not batch or len(batch) == 0:
-                break
-            
-            all_shots.extend(batch)
-            
-            if len(batch) < batch_size:
-                break  # Last batch
-            
-            offset += batch_size
-            print(f"  Fetched {len(all_shots):,} records so far...")
+        df = load_shots(
+            columns=['goalie_id', 'goalie_name', 'is_goal', 'shooting_talent_adjusted_xg', 'flurry_adjusted_xg',
+                     'xg_value', 'is_empty_net', 'game_id', 'period', 'distance', 'angle', 'is_power_play', 'shot_type'],
+            db=supabase
+        )
+        print(f"  Loaded {len(df):,} records")
         
-        if len(all_shots) == 0:
+        if len(df) == 0:
             print("WARNING: No data found in database (0 rows returned)")
             return None
         
-        df = pd.DataFrame(all_shots)
-        
         # Convert types
         df['goalie_id'] = pd.to_numeric(df['goalie_id'], errors='coerce')
         df['is_goal'] = pd.to_numeric(df['is_goal'], errors='coerce').fillna(0).astype(int)
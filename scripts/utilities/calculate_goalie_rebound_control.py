@@ -17,6 +17,8 @@ from datetime import datetime
 import os
 from dotenv import load_dotenv
 from supabase import create_client, Client
+from supabase_rest import SupabaseRest
+from snapshot_store import load_shots
 
 # Load environment variables
 load_dotenv()
@@ -45,39 +47,21 @@ def load_shots_with_rebound_data():
     print("LOADING SHOTS DATA FOR REBOUND TRACKING")
     print("=" * 80)
     
-    print("Loading from Supabase raw_shots table...")
-    print("(Using pagination to fetch all records)")
+    print("Loading raw_shots from the local snapshot (delta-synced from Supabase)...")
     
     try:
-        all_shots = []
-        offset = 0
-        batch_size = 1000
+        df = load_shots(
+            columns=['goalie_id', 'game_id', 'period', 'time_remaining_seconds',
+                     'is_goal', 'shot_was_on_goal', 'shot_goalie_froze', 'shot_generated_rebound',
+                     'time_since_last_event', 'is_rebound', 'team_code', 'event_owner_team_id',
+                     'is_empty_net', 'time_in_period', 'sort_order'],
+            db=SupabaseRest(supabase_url, supabase_key)
+        )
         
-        while True:
-            response = supabase.table('raw_shots').select(
-                'goalie_id, game_id, period, time_remaining_seconds, '
-                'is_goal, shot_was_on_goal, shot_goalie_froze, shot_generated_rebound, '
-                'time_since_last_event, is_rebound, team_code, event_owner_team_id, '
-                'is_empty_net, time_in_period, sort_order'
-            ).range(offset, offset + batch_size - 1).execute()
-            
-            if not response.data or len(response.data) == 0:
-                break
-            
-            all_shots.extend(response.data)
-            
-            if len(response.data) < batch_size:
-                break
-            
-            offset += batch_size
-            print(f"  Fetched {len(all_shots):,} records so far...")
-        
-        if len(all_shots) == 0:
+        if len(df) == 0:
             print("WARNING: No data found in database")
             return None
         
-        df = pd.DataFrame(all_shots)
-        
         # Convert types
         df['goalie_id'] = pd.to_numeric(df['goalie_id'], errors='coerce')
         df['game_id'] = pd.to_numeric(df['game_id'], errors='coerce')
@@ -114,12 +98,27 @@ def load_shots_with_rebound_data():
         return None
 
 
+# A shot is a rebound if the same team shoots again within REBOUND_WINDOW_SECONDS
+# of a save, looking at most LOOKAHEAD_SHOTS shots ahead in the same game/period
+REBOUND_WINDOW_SECONDS = 2.0
+LOOKAHEAD_SHOTS = 9
+
+# Bayesian prior strengths (in effective saves) for the regressed AdjRP variants
+PRIOR_C5000 = 5000  # Strong prior
+PRIOR_C10000 = 10000  # Extreme prior
+
+
 def identify_saves_and_rebounds(df):
     """
     Identify saves and track rebounds within 2 seconds.
     
+    Shots are put in game/period/clock order once; for each lookahead distance
+    k the whole table is compared with itself shifted by k rows, and each save
+    is matched to the first later shot (same game, period and shooting team,
+    0-2 seconds later). No per-group Python loop.
+    
     Args:
-        df: DataFrame with shots data, sorted by game/period/time
+        df: DataFrame with shots data
         
     Returns:
         DataFrame with rebound tracking information
@@ -134,41 +133,55 @@ def identify_saves_and_rebounds(df):
     saves_count = df['is_save'].sum()
     print(f"   Identified {saves_count:,} saves")
     
-    # Track rebounds: shots within 2 seconds of a save by the same team
-    df['rebound_after_save'] = False
-    df['seconds_after_save'] = None
-    
-    # Group by game and period for proper sequencing
-    rebound_count = 0
-    
-    for (game_id, period), group in df.groupby(['game_id', 'period']):
-        group = group.sort_values('time_remaining_seconds', ascending=False).reset_index(drop=True)
-        
-        for idx, row in group.iterrows():
-            if row['is_save']:
-                # Look ahead for shots within 2 seconds by the same team
-                save_time = row['time_remaining_seconds']
-                save_team = row.get('event_owner_team_id') or row.get('team_code')
-                
-                # Check next shots in sequence
-                for next_idx in range(idx + 1, min(idx + 10, len(group))):  # Check up to 10 shots ahead
-                    next_row = group.iloc[next_idx]
-                    next_time = next_row['time_remaining_seconds']
-                    next_team = next_row.get('event_owner_team_id') or next_row.get('team_code')
-                    
-                    # Calculate time difference (accounting for period boundaries)
-                    if next_row['period'] == row['period']:
-                        time_diff = save_time - next_time
-                    else:
-                        # Different period, skip
-                        break
-                    
-                    # Check if within 2 seconds and same team
-                    if time_diff <= 2.0 and time_diff >= 0 and next_team == save_team:
-                        df.loc[group.index[next_idx], 'rebound_after_save'] = True
-                        df.loc[group.index[next_idx], 'seconds_after_save'] = time_diff
-                        rebound_count += 1
-                        break  # Only count first rebound after save
+    # Shot sequence: game, period, clock counting down (sort_order breaks ties)
+    sort_cols = ['game_id', 'period', 'time_remaining_seconds']
+    ascending = [True, True, False]
+    if 'sort_order' in df.columns:
+        sort_cols.append('sort_order')
+        ascending.append(True)
+    order = df.sort_values(sort_cols, ascending=ascending, kind='mergesort').index
+    seq = df.loc[order]
+    
+    # Group id per (game, period); shots without a period never match
+    group = seq.groupby(['game_id', 'period'], sort=False).ngroup().to_numpy()
+    time_remaining = seq['time_remaining_seconds'].to_numpy(dtype=float)
+    is_save = seq['is_save'].to_numpy(dtype=bool)
+    
+    # Shooting team: event owner, else team_code
+    team = seq['event_owner_team_id'] if 'event_owner_team_id' in seq.columns else pd.Series(np.nan, index=seq.index)
+    if 'team_code' in seq.columns:
+        team = team.where(team.notna() & (team != 0) & (team != ''), seq['team_code'])
+    team = team.astype(str).where(team.notna(), None).to_numpy(dtype=object)
+    
+    n = len(seq)
+    rebound_row = np.full(n, -1, dtype=np.int64)  # first matching shot per save
+    for k in range(1, LOOKAHEAD_SHOTS + 1):
+        if k >= n:
+            break
+        pending = is_save[:-k] & (rebound_row[:-k] < 0) & (group[:-k] >= 0)
+        time_diff = time_remaining[:-k] - time_remaining[k:]
+        match = (
+            pending
+            & (group[k:] == group[:-k])
+            & (time_diff >= 0) & (time_diff <= REBOUND_WINDOW_SECONDS)
+            & (team[k:] == team[:-k]) & (team[:-k] != None)
+        )
+        hits = np.flatnonzero(match)
+        rebound_row[hits] = hits + k
+    
+    saves_idx = np.flatnonzero(rebound_row >= 0)
+    rebound_idx = rebound_row[saves_idx]
+    rebound_count = len(saves_idx)
+    
+    # A shot following several saves keeps the gap to the latest one
+    rebound_after_save = np.zeros(n, dtype=bool)
+    rebound_after_save[rebound_idx] = True
+    seconds_after_save = np.full(n, np.nan)
+    last = len(rebound_idx) - 1 - np.unique(rebound_idx[::-1], return_index=True)[1]
+    seconds_after_save[rebound_idx[last]] = time_remaining[saves_idx[last]] - time_remaining[rebound_idx[last]]
+    
+    df['rebound_after_save'] = pd.Series(rebound_after_save, index=order).reindex(df.index)
+    df['seconds_after_save'] = pd.Series(seconds_after_save, index=order).reindex(df.index)
     
     print(f"   Identified {rebound_count:,} rebounds within 2 seconds of saves")
     
@@ -195,39 +208,24 @@ def calculate_rebound_control(df):
     print("=" * 80)
     
     # Aggregate by goalie
-    goalie_stats = []
-    
-    for goalie_id, group in df.groupby('goalie_id'):
-        total_saves = group['is_save'].sum()
-        puck_freezes = group['shot_goalie_froze'].sum()
-        rebound_shots = group['rebound_after_save'].sum()
-        
-        # Calculate denominator: saves minus freezes
-        effective_saves = total_saves - puck_freezes
-        
-        # Calculate Raw AdjRP
-        if effective_saves > 0:
-            adj_rebound_pct = rebound_shots / effective_saves
-        else:
-            adj_rebound_pct = None
-        
-        # Calculate per-60 rate (for normalization)
-        if total_saves > 0:
-            rebound_shots_per_60_saves = (rebound_shots / total_saves) * 60
-        else:
-            rebound_shots_per_60_saves = None
-        
-        goalie_stats.append({
-            'goalie_id': int(goalie_id),
-            'total_saves': int(total_saves),
-            'puck_freezes': int(puck_freezes),
-            'rebound_shots_allowed': int(rebound_shots),
-            'effective_saves': int(effective_saves),
-            'adj_rebound_pct': adj_rebound_pct,
-            'rebound_shots_per_60_saves': rebound_shots_per_60_saves
-        })
-    
-    result_df = pd.DataFrame(goalie_stats)
+    result_df = df.groupby('goalie_id').agg(
+        total_saves=('is_save', 'sum'),
+        puck_freezes=('shot_goalie_froze', 'sum'),
+        rebound_shots_allowed=('rebound_after_save', 'sum'),
+    ).reset_index()
+    result_df['goalie_id'] = result_df['goalie_id'].astype(int)
+    for col in ('total_saves', 'puck_freezes', 'rebound_shots_allowed'):
+        result_df[col] = result_df[col].astype(int)
+    
+    # Calculate denominator: saves minus freezes
+    result_df['effective_saves'] = result_df['total_saves'] - result_df['puck_freezes']
+    effective = result_df['effective_saves']
+    
+    # Calculate Raw AdjRP and the per-60 rate (for normalization)
+    result_df['adj_rebound_pct'] = (result_df['rebound_shots_allowed'] / effective).where(effective > 0)
+    result_df['rebound_shots_per_60_saves'] = (
+        result_df['rebound_shots_allowed'] / result_df['total_saves'] * 60
+    ).where(result_df['total_saves'] > 0)
     
     print(f"\nCalculated rebound control for {len(result_df):,} goalies")
     print(f"   Total saves: {result_df['total_saves'].sum():,}")
@@ -254,25 +252,16 @@ def calculate_rebound_control(df):
     print(f"   - Prior strength C=10,000 saves (Test 2)")
     print(f"   - Regression target: League Mean AdjRP = {league_mean_adjrp:.6f}")
     
-    C1 = 5000  # Strong prior
-    C2 = 10000  # Extreme prior
-    
     result_df['league_mean_adjrp'] = league_mean_adjrp
-    result_df['regressed_adjrp_c5000'] = None
-    result_df['regressed_adjrp_c10000'] = None
-    
-    for idx, row in result_df.iterrows():
-        if row['adj_rebound_pct'] is not None and row['effective_saves'] > 0:
-            S = row['effective_saves']
-            raw_adjrp = row['adj_rebound_pct']
-            
-            # Regression with C=5,000
-            regressed_c5000 = (S / (S + C1)) * raw_adjrp + (C1 / (S + C1)) * league_mean_adjrp
-            result_df.loc[idx, 'regressed_adjrp_c5000'] = regressed_c5000
-            
-            # Regression with C=10,000
-            regressed_c10000 = (S / (S + C2)) * raw_adjrp + (C2 / (S + C2)) * league_mean_adjrp
-            result_df.loc[idx, 'regressed_adjrp_c10000'] = regressed_c10000
+    
+    S = effective.where(effective > 0)
+    raw_adjrp = result_df['adj_rebound_pct']
+    result_df['regressed_adjrp_c5000'] = (
+        (S / (S + PRIOR_C5000)) * raw_adjrp + (PRIOR_C5000 / (S + PRIOR_C5000)) * league_mean_adjrp
+    )
+    result_df['regressed_adjrp_c10000'] = (
+        (S / (S + PRIOR_C10000)) * raw_adjrp + (PRIOR_C10000 / (S + PRIOR_C10000)) * league_mean_adjrp
+    )
     
     # Report regressed statistics
     valid_regressed_c5000 = result_df[result_df['regressed_adjrp_c5000'].notna()]
@@ -11,7 +11,9 @@ This script:
 5. Stores results in player_toi_by_situation and player_shifts tables
 
 Note: This is a foundational script for GAR calculations. It requires access to
-play-by-play data with shift/line change information.
+play-by-play data with shift/line change information. Games with official shift
+charts (player_shifts_official) are better served by shift_toi.py, which uses the
+real on-ice intervals instead of inferring shifts from event participation.
 """
 
 import pandas as pd
@@ -25,6 +27,7 @@ from typing import Dict, List, Set, Optional, Tuple
 import time
 import sys
 from src.utils.citrus_request import citrus_request
+from pbp_events import PbpEvents, decode_game
 
 # Load environment variables
 load_dotenv()
@@ -49,86 +52,24 @@ SITUATION_PP = "PP"  # Power Play
 SITUATION_PK = "PK"  # Penalty Kill
 
 
-def parse_time_to_seconds(time_str: str) -> float:
+def situation_skaters(events: PbpEvents) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    Parse time string (MM:SS) to seconds.
+    Skater counts per event as this script has always read them.
     
-    Args:
-        time_str: Time string in format "MM:SS" or "M:SS"
-    
-    Returns:
-        Time in seconds as float
-    """
-    if not time_str or time_str == '':
-        return 0.0
-    
-    try:
-        parts = time_str.split(':')
-        if len(parts) == 2:
-            minutes = int(parts[0])
-            seconds = int(parts[1])
-            return minutes * 60.0 + seconds
-        return 0.0
-    except (ValueError, IndexError):
-        return 0.0
-
-
-def parse_situation_code(situation_code: str, event_owner_team_id: int, 
-                         home_team_id: int) -> Tuple[int, int, bool]:
-    """
-    Parse situation_code to extract skaters on ice.
+    The numeric situationCode is read with the second digit as "home" and the
+    third as "away" (1541 -> 5 "home", 4 "away"); unknown codes count as 5v5.
+    Kept as-is so stored shifts/TOI stay comparable with earlier runs.
     
     Args:
-        situation_code: Situation code from NHL API (e.g., "5-4", "5v4", "1551")
-        event_owner_team_id: Team ID that owns the event
-        home_team_id: Home team ID
+        events: Decoded play-by-play table
     
     Returns:
-        Tuple of (home_skaters, away_skaters, is_empty_net)
+        Tuple of (home_skaters, away_skaters, is_empty_net) arrays
     """
-    home_skaters = 5
-    away_skaters = 5
-    is_empty_net = False
-    
-    if not situation_code or situation_code == '':
-        return home_skaters, away_skaters, is_empty_net
-    
-    situation_str = str(situation_code).strip()
-    
-    # Try parsing as string first (format: "5-4" or "5v4")
-    if '-' in situation_str or 'v' in situation_str or 'V' in situation_str:
-        parts = situation_str.replace('v', '-').replace('V', '-').split('-')
-        if len(parts) >= 2:
-            try:
-                home_skaters = int(parts[0])
-                away_skaters = int(parts[1])
-            except ValueError:
-                pass
-    else:
-        # Parse numeric format (e.g., 1551, 541, 641)
-        try:
-            code_int = int(situation_str)
-            code_str = str(code_int)
-            
-            if len(code_str) == 3:
-                # 3-digit: ABC -> A=home, B=away
-                home_skaters = int(code_str[0])
-                away_skaters = int(code_str[1])
-            elif len(code_str) == 4:
-                # 4-digit: ABCD -> B=home, C=away (digits 1-2)
-                home_skaters = int(code_str[1])
-                away_skaters = int(code_str[2])
-            elif len(code_str) == 2:
-                # 2-digit: AB -> A=home, B=away
-                home_skaters = int(code_str[0])
-                away_skaters = int(code_str[1])
-        except (ValueError, IndexError):
-            pass
-    
-    # Check for empty net (either team has 6 skaters)
-    if home_skaters == 6 or away_skaters == 6:
-        is_empty_net = True
-    
+    known = events.situation_code >= 0
+    home_skaters = np.where(known, events.away_skaters, 5)
+    away_skaters = np.where(known, events.home_skaters, 5)
+    is_empty_net = (home_skaters == 6) | (away_skaters == 6)
     return home_skaters, away_skaters, is_empty_net
 
 
@@ -288,99 +229,49 @@ class ShiftTracker:
         return self.completed_shifts
 
 
-def extract_players_from_event(play: Dict, home_team_id: int, away_team_id: int) -> Dict[int, int]:
+# (details key, player is on the event owner's team) in the order players are credited
+EVENT_PLAYER_ROLES = (
+    ('scoringPlayerId', True),
+    ('shootingPlayerId', True),
+    ('assist1PlayerId', True),
+    ('assist2PlayerId', True),
+    ('assist3PlayerId', True),
+    ('committingPlayerId', True),
+    ('drawnByPlayerId', False),   # drew the penalty: opposite of the committing team
+    ('goalieInNetId', False),     # goalie defends against the event owner
+    ('hittingPlayerId', True),
+    ('hitteePlayerId', False),
+)
+
+
+def extract_players_from_events(events: PbpEvents, home_team_id: int, away_team_id: int) -> List[Dict[int, int]]:
     """
-    Extract player IDs and their team IDs from a play event.
+    Extract player IDs and their team IDs from every play event.
     
     Args:
-        play: Play event dictionary
+        events: Decoded play-by-play table
         home_team_id: Home team ID
         away_team_id: Away team ID
     
     Returns:
-        Dictionary mapping player_id -> team_id
+        One dictionary per event mapping player_id -> team_id
     """
-    players = {}
-    details = play.get('details', {})
-    
-    # Extract players from various event fields
-    # Shooter/scorer
-    if 'scoringPlayerId' in details:
-        player_id = details['scoringPlayerId']
-        team_id = details.get('eventOwnerTeamId')
-        if player_id and team_id:
-            players[player_id] = team_id
-    
-    if 'shootingPlayerId' in details:
-        player_id = details['shootingPlayerId']
-        team_id = details.get('eventOwnerTeamId')
-        if player_id and team_id:
-            players[player_id] = team_id
-    
-    # Assist players
-    for i in range(1, 4):  # Up to 3 assists
-        assist_key = f'assist{i}PlayerId'
-        if assist_key in details:
-            player_id = details[assist_key]
-            team_id = details.get('eventOwnerTeamId')
-            if player_id and team_id:
-                players[player_id] = team_id
-    
-    # Penalty players
-    if 'committingPlayerId' in details:
-        player_id = details['committingPlayerId']
-        # Committing player is on the team that committed the penalty
-        # This might need to be inferred from context, but for now use eventOwnerTeamId
-        team_id = details.get('eventOwnerTeamId')
-        if player_id and team_id:
-            players[player_id] = team_id
-    
-    if 'drawnByPlayerId' in details:
-        player_id = details['drawnByPlayerId']
-        # Drawn by player is on the team that drew the penalty (opposite of committing team)
-        event_owner = details.get('eventOwnerTeamId')
-        if event_owner:
-            if event_owner == home_team_id:
-                team_id = away_team_id
-            else:
-                team_id = home_team_id
-            if player_id and team_id:
-                players[player_id] = team_id
-    
-    # Goalie (save) - goalie is on the defending team
-    if 'goalieInNetId' in details:
-        player_id = details['goalieInNetId']
-        # Goalie is on the team that was defending (opposite of event owner for shots/goals)
-        event_owner = details.get('eventOwnerTeamId')
-        if event_owner:
-            if event_owner == home_team_id:
-                team_id = away_team_id  # Away goalie defending
-            else:
-                team_id = home_team_id  # Home goalie defending
-            if player_id and team_id:
-                players[player_id] = team_id
-    
-    # Hit players - need to infer team from event context
-    if 'hittingPlayerId' in details:
-        player_id = details['hittingPlayerId']
-        # Hitting player is typically on the event owner team
-        team_id = details.get('eventOwnerTeamId')
-        if player_id and team_id:
-            players[player_id] = team_id
-    
-    if 'hitteePlayerId' in details:
-        player_id = details['hitteePlayerId']
-        # Hittee is on the opposite team
-        event_owner = details.get('eventOwnerTeamId')
+    owners = events.owner_team_id.tolist()
+    roles = [(events.players[key].tolist(), on_owner_team) for key, on_owner_team in EVENT_PLAYER_ROLES]
+    
+    event_players = []
+    for i, event_owner in enumerate(owners):
+        players = {}
         if event_owner:
-            if event_owner == home_team_id:
-                team_id = away_team_id
-            else:
-                team_id = home_team_id
-            if player_id and team_id:
-                players[player_id] = team_id
+            opponent = away_team_id if event_owner == home_team_id else home_team_id
+            for player_ids, on_owner_team in roles:
+                player_id = player_ids[i]
+                team_id = event_owner if on_owner_team else opponent
+                if player_id and team_id:
+                    players[player_id] = team_id
+        event_players.append(players)
     
-    return players
+    return event_players
 
 
 def process_game_shifts(game_id: int) -> Tuple[List[Dict], List[Dict]]:
@@ -435,7 +326,7 @@ def process_game_shifts(game_id: int) -> Tuple[List[Dict], List[Dict]]:
     # Track last appearance time for each player (to detect shift ends)
     last_appearance: Dict[Tuple[int, int], float] = {}  # {(player_id, period): time}
     
-    # Process plays
+    # Process plays (decoded once into columns; shared with other PBP consumers)
     plays = raw_data.get('plays', [])
     print(f"  Processing {len(plays)} plays...")
     sys.stdout.flush()
@@ -445,6 +336,15 @@ def process_game_shifts(game_id: int) -> Tuple[List[Dict], List[Dict]]:
         print(f"  WARNING: Game {game_id} has {len(plays)} plays (excessive, likely corrupted). Skipping.")
         return [], []
     
+    events = decode_game(raw_data, game_id)
+    home_skaters, away_skaters, is_empty_net = situation_skaters(events)
+    owners = events.owner_team_id.tolist()
+    situations = [
+        identify_situation(home, away, empty_net, owner, home_team_id)
+        for home, away, empty_net, owner in zip(home_skaters.tolist(), away_skaters.tolist(), is_empty_net.tolist(), owners)
+    ]
+    event_players_by_play = extract_players_from_events(events, home_team_id, away_team_id)
+    
     # Track previous period and time for period transitions
     prev_period = 0
     prev_time = 0.0
@@ -453,19 +353,16 @@ def process_game_shifts(game_id: int) -> Tuple[List[Dict], List[Dict]]:
     play_count = 0
     last_progress_print = 0
     
-    for play in plays:
+    for type_code, period, time_seconds, situation, event_players in zip(
+        events.type_code.tolist(), events.period.tolist(), events.seconds.tolist(),
+        situations, event_players_by_play
+    ):
         play_count += 1
         # Print progress every 1000 plays for large games
         if len(plays) > 2000 and play_count - last_progress_print >= 1000:
             print(f"    Progress: {play_count}/{len(plays)} plays...")
             sys.stdout.flush()
             last_progress_print = play_count
-        type_code = play.get('typeCode')
-        details = play.get('details', {})
-        period_desc = play.get('periodDescriptor', {})
-        period = period_desc.get('number', 1)
-        time_str = play.get('timeInPeriod', '')
-        time_seconds = parse_time_to_seconds(time_str)
         
         # Detect period start - start all shifts
         if period != prev_period and prev_period > 0:
@@ -473,18 +370,6 @@ def process_game_shifts(game_id: int) -> Tuple[List[Dict], List[Dict]]:
             tracker.end_all_shifts_period(prev_period, 1200.0)  # 20 minutes
             last_appearance.clear()  # Reset for new period
         
-        # Parse situation
-        situation_code = str(play.get('situationCode', ''))
-        event_owner_team_id = details.get('eventOwnerTeamId')
-        home_skaters, away_skaters, is_empty_net = parse_situation_code(
-            situation_code, event_owner_team_id, home_team_id
-        )
-        
-        situation = identify_situation(
-            home_skaters, away_skaters, is_empty_net,
-            event_owner_team_id, home_team_id
-        )
-        
         # Update situation if changed
         if period in tracker.current_situation:
             if tracker.current_situation[period] != situation:
@@ -492,9 +377,6 @@ def process_game_shifts(game_id: int) -> Tuple[List[Dict], List[Dict]]:
         else:
             tracker.current_situation[period] = situation
         
-        # Extract players from this event
-        event_players = extract_players_from_event(play, home_team_id, away_team_id)
-        
         # For each player in the event, start/continue their shift
         for player_id, team_id in event_players.items():
             key = (player_id, period)
@@ -15,6 +15,8 @@ from scipy import stats
 import os
 from dotenv import load_dotenv
 from supabase import create_client, Client
+from supabase_rest import SupabaseRest
+from snapshot_store import load_shots
 import joblib
 
 # Load environment variables
@@ -50,37 +52,18 @@ def load_historical_shooting_data(source='database'):
     print("=" * 80)
     
     if source == 'database':
-        print("Loading from Supabase raw_shots table...")
-        print("(Using pagination to fetch all records, not just the first 1000)")
+        print("Loading raw_shots from the local snapshot (delta-synced from Supabase)...")
         try:
-            # Load all shots from database with pagination
-            all_shots = []
-            offset = 0
-            batch_size = 1000
+            df = load_shots(
+                columns=['player_id', 'is_goal', 'xg_value'],
+                db=SupabaseRest(supabase_url, supabase_key)
+            )
             
-            while True:
-                response = supabase.table('raw_shots').select(
-                    'player_id, is_goal, xg_value'
-                ).range(offset, offset + batch_size - 1).execute()
-                
-                if not response.data or len(response.data) == 0:
-                    break
-                
-                all_shots.extend(response.data)
-                
-                if len(response.data) < batch_size:
-                    break  # Last batch - we've fetched all records
-                
-                offset += batch_size
-                print(f"  Fetched {len(all_shots):,} records so far...")
-            
-            if len(all_shots) == 0:
+            if len(df) == 0:
                 print("⚠️  No data found in database (0 rows returned)")
                 print("   Trying CSV file...")
                 return load_historical_shooting_data(source='csv')
             
-            df = pd.DataFrame(all_shots)
-            
             # Convert types
             df['player_id'] = pd.to_numeric(df['player_id'], errors='coerce')
             df['is_goal'] = pd.to_numeric(df['is_goal'], errors='coerce').fillna(0).astype(int)
@@ -5,9 +5,10 @@ Enhanced flurry adjustment that BOOSTS flurry shots (user's insight).
 Flurries create chaos and defensive breakdowns, making them MORE dangerous.
 """
 
-import pandas as pd
 import numpy as np
 
+from feature_calculations import parse_period_clock_seconds, flurry_segments
+
 def calculate_enhanced_flurry_xg(df_shots, xg_column='xG_Value', game_id_col='game_id',
                                  team_code_col='team_code', period_col='period',
                                  time_in_period_col='time_in_period',
@@ -36,77 +37,33 @@ def calculate_enhanced_flurry_xg(df_shots, xg_column='xG_Value', game_id_col='ga
     """
     df = df_shots.copy()
     
-    def parse_time_to_seconds(time_str):
-        """Convert time string (MM:SS) to total seconds."""
-        if pd.isna(time_str) or not time_str or ':' not in str(time_str):
-            return 0
-        try:
-            parts = str(time_str).split(':')
-            minutes = int(parts[0])
-            seconds = int(parts[1])
-            return minutes * 60 + seconds
-        except (ValueError, IndexError):
-            return 0
-    
     # Initialize
     df['flurry_adjusted_xg'] = df[xg_column].copy()  # Start with regular xG
     df['is_in_flurry'] = 0
     df['flurry_position'] = 0  # 1 = first shot, 2 = second, etc.
     
     # Convert time to seconds
-    df['_time_seconds'] = df[time_in_period_col].apply(parse_time_to_seconds)
+    df['_time_seconds'] = parse_period_clock_seconds(df[time_in_period_col])
     
     # Sort by game, period, and time
     df = df.sort_values(by=[game_id_col, period_col, '_time_seconds']).reset_index(drop=True)
     
-    # Group by game, team, and period
-    for (game_id, team_code, period), group in df.groupby([game_id_col, team_code_col, period_col]):
-        if len(group) < 2:
-            continue  # Need at least 2 shots for a flurry
-        
-        # Identify flurries (consecutive shots within 3 seconds)
-        flurry_sequence = []
-        for i in range(len(group)):
-            current_idx = group.index[i]
-            current_time = group.loc[current_idx, '_time_seconds']
-            
-            if not flurry_sequence:
-                # Start new potential flurry
-                flurry_sequence = [{'idx': current_idx, 'time': current_time, 'xg': group.loc[current_idx, xg_column]}]
-                continue
-            
-            last_shot = flurry_sequence[-1]
-            time_diff = current_time - last_shot['time']
-            
-            if 0 < time_diff <= 3.0:  # Continue flurry
-                flurry_sequence.append({
-                    'idx': current_idx,
-                    'time': current_time,
-                    'xg': group.loc[current_idx, xg_column]
-                })
-            else:  # Flurry ended, process it
-                if len(flurry_sequence) > 1:  # Actual flurry (2+ shots)
-                    # Apply flurry boost to subsequent shots
-                    for j, shot in enumerate(flurry_sequence):
-                        df.loc[shot['idx'], 'is_in_flurry'] = 1
-                        df.loc[shot['idx'], 'flurry_position'] = j + 1
-                        
-                        if j > 0:  # Boost subsequent shots
-                            boosted_xg = shot['xg'] * flurry_boost_factor
-                            df.loc[shot['idx'], 'flurry_adjusted_xg'] = min(boosted_xg, 0.95)  # Cap at 95%
-                
-                # Start new flurry
-                flurry_sequence = [{'idx': current_idx, 'time': current_time, 'xg': group.loc[current_idx, xg_column]}]
-        
-        # Process last flurry if exists
-        if len(flurry_sequence) > 1:
-            for j, shot in enumerate(flurry_sequence):
-                df.loc[shot['idx'], 'is_in_flurry'] = 1
-                df.loc[shot['idx'], 'flurry_position'] = j + 1
-                
-                if j > 0:  # Boost subsequent shots
-                    boosted_xg = shot['xg'] * flurry_boost_factor
-                    df.loc[shot['idx'], 'flurry_adjusted_xg'] = min(boosted_xg, 0.95)
+    # Flurries: consecutive shots of a (game, team, period) within 3 seconds.
+    # A stable sort by group keeps the time order from above inside each group.
+    group_codes = df.groupby([game_id_col, team_code_col, period_col], sort=False).ngroup().to_numpy()
+    rows = np.flatnonzero(group_codes >= 0)
+    rows = rows[np.argsort(group_codes[rows], kind='stable')]
+    segment, position = flurry_segments(group_codes[rows], df['_time_seconds'].to_numpy()[rows])
+    
+    in_flurry = np.bincount(segment)[segment] > 1
+    flurry_rows = rows[in_flurry]
+    df.loc[flurry_rows, 'is_in_flurry'] = 1
+    df.loc[flurry_rows, 'flurry_position'] = position[in_flurry] + 1
+    
+    # Boost subsequent shots (cap at 95%)
+    boosted_rows = rows[in_flurry & (position > 0)]
+    boosted_xg = df.loc[boosted_rows, xg_column].to_numpy() * flurry_boost_factor
+    df.loc[boosted_rows, 'flurry_adjusted_xg'] = np.minimum(boosted_xg, 0.95)
     
     # Clean up
     df = df.drop(columns=['_time_seconds'])
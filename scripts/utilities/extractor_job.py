@@ -8,7 +8,10 @@ public.player_game_stats and public.player_directory.
 Principles:
 - No staging reliance.
 - Season totals (GP/PTS/SOG) are derived from play-by-play events, not raw_shots (coords can be missing).
-- PPP/SHP uses situationCode parsing (4-digit format: G I i g).
+- PPP/SHP uses penalty power-play windows; shootout goals (situationCode 1010/0101) are excluded.
+- Plays are decoded once per game by pbp_events.decode_game and shared by the stat and TOI passes.
+- Official shifts are loaded once per batch; shift_toi computes TOI totals and TOI by situation
+  (player_toi_by_situation, read by the GAR components).
 - CRITICAL: All games MUST have shifts - validates player_shifts (computed) first, then player_shifts_official (official).
 - Mark raw_nhl_data.stats_extracted=true when game is final (OFF, FINAL, F/SO, OVER).
 
@@ -22,8 +25,11 @@ import time
 import datetime as dt
 from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 from dotenv import load_dotenv
 from supabase_rest import SupabaseRest
+from pbp_events import decode_game
+from shift_toi import load_official_shifts, compute_situation_toi, shift_toi_totals, toi_records
 
 load_dotenv()
 SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
@@ -53,59 +59,6 @@ def _safe_int(v: Any, default: int = 0) -> int:
     return default
 
 
-def _parse_situation_code(code: Any) -> Tuple[Optional[int], Optional[int], bool]:
-  """
-  Parse NHL situationCode to extract skater counts.
-  
-  Format: 4-digit code "G I i g" where:
-    G = Goalie on ice for away team (1 or 0)
-    I = Skaters on ice for away team
-    i = Skaters on ice for home team
-    g = Goalie on ice for home team
-  
-  Example: '1541' means Away has 5 skaters, Home has 4 skaters.
-  
-  Returns: (home_skaters, away_skaters, is_shootout)
-  """
-  if code is None:
-    return None, None, False
-  s = str(code).strip()
-  
-  # Check for shootout codes (1010, 0101) - ignore for PPP/SHG
-  if s in ("1010", "0101"):
-    return None, None, True
-  
-  if len(s) >= 4:
-    # Format: G I i g (4 digits)
-    # Position 0: G (away goalie)
-    # Position 1: I (away skaters)
-    # Position 2: i (home skaters)
-    # Position 3: g (home goalie)
-    away_skaters = _safe_int(s[1], 0)  # Position 1 = away skaters
-    home_skaters = _safe_int(s[2], 0)  # Position 2 = home skaters
-    return home_skaters, away_skaters, False
-  elif len(s) == 3:
-    # 3-digit fallback: assume format is I i (away, home)
-    away_skaters = _safe_int(s[0], 0)
-    home_skaters = _safe_int(s[1], 0)
-    return home_skaters, away_skaters, False
-  # fallback: unknown format
-  return None, None, False
-
-
-def _is_goal_play(play: dict) -> bool:
-  # NHL PBP: play["typeCode"] == 505 for GOAL in gamecenter API
-  return str(play.get("typeCode")) == "505" or (play.get("typeDescKey") == "goal")
-
-
-def _is_shot_play(play: dict) -> bool:
-  # SOG shot-type events include "shot-on-goal" (usually 507?) and goals are also SOG.
-  # We'll count SOG as: GOAL or play typeDescKey == "shot-on-goal"
-  if _is_goal_play(play):
-    return True
-  return play.get("typeDescKey") == "shot-on-goal"
-
-
 def _get_players_from_play(play: dict) -> List[dict]:
   # In NHL API, play["details"] often includes "players" list; sometimes "scoringPlayerId", etc.
   details = play.get("details") or {}
@@ -129,118 +82,6 @@ def _extract_team_abbrevs(pbp: dict) -> Tuple[Optional[str], Optional[str]]:
   return home, away
 
 
-def _parse_time_to_seconds(time_str: str) -> float:
-  """
-  Parse time string like "14:32" or "1:23" to seconds.
-  Returns 0.0 if invalid.
-  """
-  if not time_str or not isinstance(time_str, str):
-    return 0.0
-  try:
-    parts = time_str.split(":")
-    if len(parts) == 2:
-      minutes = int(parts[0])
-      seconds = int(parts[1])
-      return float(minutes * 60 + seconds)
-  except Exception:
-    pass
-  return 0.0
-
-
-def _track_power_play_windows(pbp: dict) -> Dict[int, str]:
-  """
-  Build timeline of power play windows from penalty events.
-  
-  Returns: Dict mapping game_time_seconds -> situation string
-    - "HOME_PP" = home team on power play
-    - "AWAY_PP" = away team on power play
-    - "HOME_PK" = home team penalty killing (away on PP)
-    - "AWAY_PK" = away team penalty killing (home on PP)
-    - "EVEN" = even strength (default)
-  
-  Uses 3-second grace period after penalty expiration (NHL.com standard).
-  """
-  home_team_id = _safe_int((pbp.get("homeTeam") or {}).get("id"), 0)
-  away_team_id = _safe_int((pbp.get("awayTeam") or {}).get("id"), 0)
-  
-  if not home_team_id or not away_team_id:
-    return {}
-  
-  plays = pbp.get("plays") or []
-  if not isinstance(plays, list):
-    return {}
-  
-  # Track active penalties: {team_id: [(start_time, end_time, period)]}
-  active_penalties: Dict[int, List[Tuple[float, float, int]]] = {home_team_id: [], away_team_id: []}
-  
-  # Process all plays to find penalties
-  for play in plays:
-    if play.get("typeDescKey") != "penalty":
-      continue
-    
-    details = play.get("details") or {}
-    period_desc = play.get("periodDescriptor") or {}
-    period = _safe_int(period_desc.get("number"), 1)
-    time_str = play.get("timeInPeriod", "")
-    time_seconds = _parse_time_to_seconds(time_str)
-    
-    # Calculate game time in seconds (period 1 = 0-1200, period 2 = 1200-2400, etc.)
-    game_time = (period - 1) * 1200.0 + time_seconds
-    
-    # Get penalized team
-    penalized_team_id = _safe_int(details.get("eventOwnerTeamId"), 0)
-    if not penalized_team_id or penalized_team_id not in (home_team_id, away_team_id):
-      continue
-    
-    # Get penalty duration
-    penalty_minutes = _safe_int(details.get("penaltyMinutes") or details.get("duration"), 2)
-    penalty_seconds = penalty_minutes * 60
-    
-    # Calculate end time
-    end_time = game_time + penalty_seconds
-    
-    # Add to active penalties
-    if penalized_team_id not in active_penalties:
-      active_penalties[penalized_team_id] = []
-    active_penalties[penalized_team_id].append((game_time, end_time, period))
-  
-  # Build timeline: for each second, determine situation
-  # We'll create a sparse map - only store non-EVEN situations
-  timeline: Dict[int, str] = {}
-  
-  # Find max game time
-  max_time = 0
-  for penalties in active_penalties.values():
-    for start, end, period in penalties:
-      max_time = max(max_time, int(end) + 3)  # +3 for grace period
-  
-  # For each second, check if any team is on PP
-  for game_time_int in range(0, int(max_time) + 1):
-    home_pp = False
-    away_pp = False
-    
-    # Check home team penalties (away gets PP)
-    for start, end, period in active_penalties.get(home_team_id, []):
-      if start <= game_time_int <= (end + 3):  # 3-second grace period
-        away_pp = True
-        break
-    
-    # Check away team penalties (home gets PP)
-    for start, end, period in active_penalties.get(away_team_id, []):
-      if start <= game_time_int <= (end + 3):  # 3-second grace period
-        home_pp = True
-        break
-    
-    # Determine situation
-    if home_pp and not away_pp:
-      timeline[game_time_int] = "HOME_PP"
-    elif away_pp and not home_pp:
-      timeline[game_time_int] = "AWAY_PP"
-    # If both or neither, it's even strength (don't store, default)
-  
-  return timeline
-
-
 def _compute_toi_from_pbp(pbp: dict, game_id: int) -> Dict[int, int]:
   """
   Compute TOI directly from play-by-play data by tracking player participation.
@@ -252,8 +93,8 @@ def _compute_toi_from_pbp(pbp: dict, game_id: int) -> Dict[int, int]:
   
   Returns: Dict mapping player_id -> total_toi_seconds
   """
-  plays = pbp.get("plays") or []
-  if not isinstance(plays, list):
+  events = decode_game(pbp, game_id)
+  if not len(events):
     return {}
   
   # Track last appearance time per player per period: {(player_id, period): last_time}
@@ -262,20 +103,24 @@ def _compute_toi_from_pbp(pbp: dict, game_id: int) -> Dict[int, int]:
   # Track TOI per player: {player_id: total_seconds}
   toi_by_player: Dict[int, int] = {}
   
-  # Track current period
-  current_period = 1
   prev_period = 0
   
+  # Players credited per event: goals/assists, shots, hits, blocks, faceoffs (both players), penalties
+  penalized = np.where(events.players["committedByPlayerId"] != 0, events.players["committedByPlayerId"], events.players["penaltyOnPlayerId"])
+  participants = np.stack([
+    events.players["scoringPlayerId"],
+    events.players["assist1PlayerId"],
+    events.players["assist2PlayerId"],
+    events.players["shootingPlayerId"],
+    events.players["hittingPlayerId"],
+    events.players["blockingPlayerId"],
+    events.players["winningPlayerId"],
+    events.players["losingPlayerId"],
+    penalized,
+  ], axis=1).tolist()
+  
   # Process all plays chronologically
-  for play in plays:
-    period_desc = play.get("periodDescriptor") or {}
-    period = _safe_int(period_desc.get("number"), 1)
-    time_str = play.get("timeInPeriod", "")
-    time_seconds = _parse_time_to_seconds(time_str)
-    
-    # Calculate game time in seconds
-    game_time = (period - 1) * 1200.0 + time_seconds
-    
+  for period, game_time, players_in_play in zip(events.period.tolist(), events.game_seconds.tolist(), participants):
     # Handle period transitions
     if period != prev_period and prev_period > 0:
       # End all shifts from previous period at period end (20 minutes = 1200 seconds)
@@ -287,55 +132,11 @@ def _compute_toi_from_pbp(pbp: dict, game_id: int) -> Dict[int, int]:
             toi_by_player[pid] = 0
           toi_by_player[pid] += int(duration)
       last_appearance.clear()
-      current_period = period
     
     prev_period = period
     
-    # Extract all players involved in this play
-    details = play.get("details") or {}
-    players_in_play = set()
-    
-    # Goals/assists
-    scoring_pid = _safe_int(details.get("scoringPlayerId"), 0)
-    assist1_pid = _safe_int(details.get("assist1PlayerId"), 0)
-    assist2_pid = _safe_int(details.get("assist2PlayerId"), 0)
-    if scoring_pid:
-      players_in_play.add(scoring_pid)
-    if assist1_pid:
-      players_in_play.add(assist1_pid)
-    if assist2_pid:
-      players_in_play.add(assist2_pid)
-    
-    # Shots
-    shooter_pid = _safe_int(details.get("shootingPlayerId"), 0)
-    if shooter_pid:
-      players_in_play.add(shooter_pid)
-    
-    # Hits
-    hitting_pid = _safe_int(details.get("hittingPlayerId"), 0)
-    if hitting_pid:
-      players_in_play.add(hitting_pid)
-    
-    # Blocks
-    blocking_pid = _safe_int(details.get("blockingPlayerId"), 0)
-    if blocking_pid:
-      players_in_play.add(blocking_pid)
-    
-    # Faceoffs (both players)
-    faceoff_win_pid = _safe_int(details.get("winningPlayerId"), 0)
-    faceoff_lose_pid = _safe_int(details.get("losingPlayerId"), 0)
-    if faceoff_win_pid:
-      players_in_play.add(faceoff_win_pid)
-    if faceoff_lose_pid:
-      players_in_play.add(faceoff_lose_pid)
-    
-    # Penalties
-    penalty_pid = _safe_int(details.get("committedByPlayerId") or details.get("penaltyOnPlayerId"), 0)
-    if penalty_pid:
-      players_in_play.add(penalty_pid)
-    
     # For each player in this play, update their shift
-    for pid in players_in_play:
+    for pid in set(players_in_play):
       if not pid:
         continue
       
@@ -404,12 +205,10 @@ def _aggregate_player_stats_from_pbp(pbp: dict, season: int) -> Dict[int, dict]:
   home_team_id = _safe_int((pbp.get("homeTeam") or {}).get("id"), 0)
   away_team_id = _safe_int((pbp.get("awayTeam") or {}).get("id"), 0)
 
-  plays = pbp.get("plays") or pbp.get("playByPlay") or []
-  if not isinstance(plays, list):
-    plays = []
+  events = decode_game(pbp, game_id or None)
 
-  # Build power play window timeline (NHL.com standard - window-based, not snapshot)
-  pp_windows = _track_power_play_windows(pbp)
+  # Power play window state per event (NHL.com standard - window-based, not snapshot)
+  pp_state = events.power_play_state()
 
   acc: Dict[int, dict] = {}
 
@@ -445,52 +244,48 @@ def _aggregate_player_stats_from_pbp(pbp: dict, season: int) -> Dict[int, dict]:
       }
     return acc[pid]
 
-  for play in plays:
-    details = play.get("details") or {}
+  # SOG = goals + "shot-on-goal" events; hits = typeCode 504 or "hit"; blocks = typeCode 509 or "blocked-shot"
+  is_goal = events.is_goal
+  is_sog = is_goal | (events.type_desc == "shot-on-goal")
+  is_penalty = events.type_desc == "penalty"
+  is_hit = (events.type_code == 504) | (events.type_desc == "hit")
+  is_block = (events.type_code == 509) | (events.type_desc == "blocked-shot")
 
+  players = events.players
+  shooter = np.where(players["shootingPlayerId"] != 0, players["shootingPlayerId"], players["scoringPlayerId"])
+  offender = np.where(players["committedByPlayerId"] != 0, players["committedByPlayerId"], players["penaltyOnPlayerId"])
+
+  for i in np.flatnonzero(is_sog | is_penalty | is_hit | is_block).tolist():
     # SOG
-    if _is_shot_play(play):
-      shooter = details.get("shootingPlayerId") or details.get("scoringPlayerId")
-      pid = _safe_int(shooter, 0)
+    if is_sog[i]:
+      pid = int(shooter[i])
       if pid:
         ensure(pid)["shots_on_goal"] += 1
 
     # Goals / assists / PPP/SHP (using power play window tracking - NHL.com standard)
-    if _is_goal_play(play):
-      scoring_pid = _safe_int(details.get("scoringPlayerId"), 0)
-      assist1_pid = _safe_int(details.get("assist1PlayerId"), 0)
-      assist2_pid = _safe_int(details.get("assist2PlayerId"), 0)
-
-      # Check if shootout (skip PPP/SHP for shootout)
-      sc = play.get("situationCode") or details.get("situationCode")
-      _, _, is_shootout = _parse_situation_code(sc)
+    if is_goal[i]:
+      scoring_pid = int(players["scoringPlayerId"][i])
+      assist1_pid = int(players["assist1PlayerId"][i])
+      assist2_pid = int(players["assist2PlayerId"][i])
 
       is_pp = False
       is_sh = False
 
-      if not is_shootout:
-        # Calculate game time for this goal
-        period_desc = play.get("periodDescriptor") or {}
-        period = _safe_int(period_desc.get("number"), 1)
-        time_str = play.get("timeInPeriod", "")
-        time_seconds = _parse_time_to_seconds(time_str)
-        game_time = int((period - 1) * 1200.0 + time_seconds)
-        
-        # Check power play window timeline (NHL.com standard - window-based)
-        situation = pp_windows.get(game_time)
-        
+      # Skip PPP/SHP for shootout goals
+      if not events.is_shootout[i]:
         # Determine scoring team
-        scoring_team_id = _safe_int(details.get("eventOwnerTeamId"), 0)
+        scoring_team_id = int(events.owner_team_id[i])
         is_home_scoring = (scoring_team_id == home_team_id) if scoring_team_id and home_team_id else None
         
-        # Check if goal occurred during power play window
-        if situation == "HOME_PP" and is_home_scoring is True:
+        # Check if goal occurred during power play window (1 = home PP, -1 = away PP)
+        situation = pp_state[i]
+        if situation == 1 and is_home_scoring is True:
           is_pp = True
-        elif situation == "AWAY_PP" and is_home_scoring is False:
+        elif situation == -1 and is_home_scoring is False:
           is_pp = True
-        elif situation == "HOME_PP" and is_home_scoring is False:
+        elif situation == 1 and is_home_scoring is False:
           is_sh = True  # Away team scored while home on PP (away is SH)
-        elif situation == "AWAY_PP" and is_home_scoring is True:
+        elif situation == -1 and is_home_scoring is True:
           is_sh = True  # Home team scored while away on PP (home is SH)
 
       if scoring_pid:
@@ -518,22 +313,20 @@ def _aggregate_player_stats_from_pbp(pbp: dict, season: int) -> Dict[int, dict]:
           ensure(assist2_pid)["shp"] += 1
 
     # Penalties -> PIM
-    if play.get("typeDescKey") == "penalty":
-      # Try penaltyMinutes first, then duration (NHL API uses duration)
-      minutes = _safe_int(details.get("penaltyMinutes") or details.get("duration"), 0)
-      offender = _safe_int(details.get("committedByPlayerId") or details.get("penaltyOnPlayerId"), 0)
-      if offender and minutes:
-        ensure(offender)["pim"] += minutes
-
-    # Hits -> typeCode 504 or typeDescKey "hit"
-    if str(play.get("typeCode")) == "504" or play.get("typeDescKey") == "hit":
-      hitting_pid = _safe_int(details.get("hittingPlayerId"), 0)
+    if is_penalty[i]:
+      # penaltyMinutes first, then duration (NHL API uses duration)
+      minutes = max(int(events.penalty_minutes[i]), 0)
+      pid = int(offender[i])
+      if pid and minutes:
+        ensure(pid)["pim"] += minutes
+
+    if is_hit[i]:
+      hitting_pid = int(players["hittingPlayerId"][i])
       if hitting_pid:
         ensure(hitting_pid)["hits"] += 1
 
-    # Blocks -> typeCode 509 or typeDescKey "blocked-shot"
-    if str(play.get("typeCode")) == "509" or play.get("typeDescKey") == "blocked-shot":
-      blocking_pid = _safe_int(details.get("blockingPlayerId"), 0)
+    if is_block[i]:
+      blocking_pid = int(players["blockingPlayerId"][i])
       if blocking_pid:
         ensure(blocking_pid)["blocks"] += 1
 
@@ -545,12 +338,15 @@ def _aggregate_player_stats_from_pbp(pbp: dict, season: int) -> Dict[int, dict]:
   return acc
 
 
-def _compute_toi_from_shifts(db: SupabaseRest, game_id: int, pbp: Optional[dict] = None) -> Dict[int, int]:
+def _compute_toi_from_shifts(db: SupabaseRest, game_id: int, pbp: Optional[dict] = None,
+                             official_toi: Optional[Dict[int, int]] = None) -> Dict[int, int]:
   """
   Compute TOI (Time On Ice) in seconds for each player in a game.
   
   Priority (best to worst):
-  1. player_shifts_official (official NHL shifts - MOST ACCURATE, 21.76 min/game for top players)
+  1. player_shifts_official (official NHL shifts - MOST ACCURATE, 21.76 min/game for top players);
+     `official_toi` is this game's total from the batch preload (_load_batch_shift_toi), which
+     saves the per-game query
   2. player_toi_by_situation (pre-computed by calculate_player_toi.py)
   3. player_shifts (computed shifts from calculate_player_toi.py)
   4. Direct PBP calculation (LAST RESORT - incomplete, only tracks event participants, ~16 min/game)
@@ -563,6 +359,8 @@ def _compute_toi_from_shifts(db: SupabaseRest, game_id: int, pbp: Optional[dict]
   Returns empty dict if all methods fail (graceful degradation).
   """
   toi_by_player: Dict[int, int] = {}
+  if official_toi:
+    return dict(official_toi)
   
   try:
     # Priority 1: Try official NHL shifts (MOST ACCURATE - 21.76 min/game for top players)
@@ -655,7 +453,8 @@ def _compute_toi_from_shifts(db: SupabaseRest, game_id: int, pbp: Optional[dict]
     return {}
 
 
-def _upsert_player_game_stats(db: SupabaseRest, rows: List[dict], game_id: int, pbp: Optional[dict] = None) -> None:
+def _upsert_player_game_stats(db: SupabaseRest, rows: List[dict], game_id: int, pbp: Optional[dict] = None,
+                              official_toi: Optional[Dict[int, int]] = None) -> None:
   """
   Upsert player_game_stats rows and populate TOI from PBP or shifts (if available).
   TOI is optional - if PBP/shifts don't exist, TOI remains 0 but other stats are still saved.
@@ -664,7 +463,7 @@ def _upsert_player_game_stats(db: SupabaseRest, rows: List[dict], game_id: int,
     return
   
   # Compute TOI from PBP (preferred) or shifts for this game (graceful degradation if missing)
-  toi_by_player = _compute_toi_from_shifts(db, game_id, pbp)
+  toi_by_player = _compute_toi_from_shifts(db, game_id, pbp, official_toi)
   
   # Add TOI to rows (if available)
   for row in rows:
@@ -718,6 +517,33 @@ def _validate_game_has_shifts(db: SupabaseRest, game_id: int) -> bool:
   return len(shifts) > 0 if shifts else False
 
 
+def _load_batch_shift_toi(db: SupabaseRest, games: List[dict]) -> Dict[int, Dict[int, int]]:
+  """
+  Load official shifts for a whole batch in one pass and run the shift-chart TOI engine.
+  
+  Writes TOI by situation (5v5/PP/PK/EN) to player_toi_by_situation for the GAR components
+  and returns per-game totals for player_game_stats.icetime_seconds.
+  
+  Returns: {game_id: {player_id: icetime_seconds}} for games with official shifts
+  ({} on failure - the per-game fallback chain then applies).
+  """
+  try:
+    pbp_by_game = {_safe_int(g.get("game_id"), 0): g.get("raw_json") for g in games}
+    pbp_by_game = {gid: pbp for gid, pbp in pbp_by_game.items() if gid and pbp}
+    shifts = load_official_shifts(db, [_safe_int(g.get("game_id"), 0) for g in games if g.get("game_id")])
+    if shifts.empty:
+      return {}
+    
+    events_by_game = {gid: decode_game(pbp, gid) for gid, pbp in pbp_by_game.items()}
+    records = toi_records(compute_situation_toi(shifts, events_by_game))
+    for i in range(0, len(records), 1000):
+      db.upsert("player_toi_by_situation", records[i:i + 1000], on_conflict="player_id,game_id,situation")
+    return shift_toi_totals(shifts)
+  except Exception as e:
+    print(f"[extractor_job] Warning: Could not load batch shift TOI: {e}")
+    return {}
+
+
 def _get_unextracted_games(db: SupabaseRest, limit: int) -> List[dict]:
   return db.select(
     "raw_nhl_data",
@@ -761,6 +587,7 @@ def main() -> int:
         continue
       
       print(f"[extractor_job] Found {len(games)} unextracted games")
+      official_toi = _load_batch_shift_toi(db, games)
 
       processed_count = 0
       last_progress_time = time.time()
@@ -771,7 +598,7 @@ def main() -> int:
           continue
         
         # Check if shifts exist (soft check - don't fail if missing)
-        has_shifts = _validate_game_has_shifts(db, game_id)
+        has_shifts = bool(official_toi.get(game_id)) or _validate_game_has_shifts(db, game_id)
         if not has_shifts:
           print(f"[extractor_job] Warning: Game {game_id} has no shifts - will extract PPP/SHP/hits/blocks but TOI will be 0")
         
@@ -780,7 +607,7 @@ def main() -> int:
 
         rows_map = _aggregate_player_stats_from_pbp(pbp, DEFAULT_SEASON)
         rows = list(rows_map.values())
-        _upsert_player_game_stats(db, rows, game_id, pbp)
+        _upsert_player_game_stats(db, rows, game_id, pbp, official_toi.get(game_id))
 
         processed_count += 1
         print(f"[extractor_job] upserted player_game_stats game_id={game_id} players={len(rows)} state={state} has_shifts={has_shifts}")
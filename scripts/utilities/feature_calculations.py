@@ -6,6 +6,8 @@ These functions take raw extracted data and compute additional features.
 """
 
 import math
+import os
+from datetime import datetime
 import pandas as pd
 import numpy as np
 from scipy import stats
@@ -24,6 +26,21 @@ ARENA_ADJUSTMENTS = {
 _SCHUCKERS_CDFS = {}
 _SCHUCKERS_LEAGUE_CDF = None
 
+# Persisted arena-adjustment table (the same CDFs, built offline by
+# build_arena_adjustment_table() and loaded lazily at ingest time).
+# Bump ARENA_ADJUSTMENT_VERSION when the way the CDFs are built changes;
+# tables with another version are ignored until rebuilt.
+ARENA_ADJUSTMENT_VERSION = 1
+ARENA_ADJUSTMENT_PATH = os.getenv(
+    "CITRUS_ARENA_ADJUSTMENT_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                 "models", "arena_adjustment.joblib")
+)
+_ARENA_TABLE = None
+_ARENA_TABLE_LOADED = False
+NET_X = 89
+NET_Y = 0
+
 def calculate_schuckers_adjusted_coordinates(x, y, shot_type, is_home_team, team_abbrev=None, 
                                              all_shots_df=None, rink_key=None):
     """
@@ -101,6 +118,144 @@ def calculate_schuckers_adjusted_coordinates(x, y, shot_type, is_home_team, team
     return adjusted_x, adjusted_y, adjusted_distance
 
 
+class ArenaAdjustmentTable:
+    """
+    Schuckers/Curro rink and league distance CDFs, versioned and persistable.
+    
+    adjust() maps every shot through its rink CDF to the league CDF in one
+    vectorized pass (one np.searchsorted per rink present in the batch), with
+    the same quantile rule as calculate_schuckers_adjusted_coordinates().
+    """
+    
+    def __init__(self, league_cdf, rink_cdfs, version=ARENA_ADJUSTMENT_VERSION,
+                 built_at=None, shot_count=None):
+        self.league_cdf = np.asarray(league_cdf, dtype=float)
+        self.rink_cdfs = {key: np.asarray(cdf, dtype=float) for key, cdf in rink_cdfs.items()}
+        self.version = version
+        self.built_at = built_at or datetime.now().isoformat()
+        self.shot_count = int(shot_count if shot_count is not None else len(self.league_cdf))
+    
+    @classmethod
+    def from_shots(cls, df, shot_type_col='shot_type', is_home_col='is_home_team',
+                   x_col='shot_x', y_col='shot_y', home_team_abbrev_col='home_team_abbrev'):
+        """
+        Build the CDFs from away-team shots (see build_schuckers_cdfs).
+        
+        Returns:
+            ArenaAdjustmentTable, or None if there are no away shots
+        """
+        away_shots = df[df[is_home_col] == 0]
+        if len(away_shots) == 0:
+            print("Warning: No away team shots found for Schuckers adjustment")
+            return None
+        
+        distances = np.sqrt((NET_X - pd.to_numeric(away_shots[x_col], errors='coerce').to_numpy(dtype=float))**2 +
+                            (NET_Y - pd.to_numeric(away_shots[y_col], errors='coerce').to_numpy(dtype=float))**2)
+        # Shots without coordinates would turn every percentile lookup into NaN
+        located = ~np.isnan(distances)
+        away_shots = away_shots[located]
+        distances = distances[located]
+        
+        rink_cdfs = {}
+        if home_team_abbrev_col in away_shots.columns:
+            rink_keys = rink_key_series(away_shots[home_team_abbrev_col], away_shots.get(shot_type_col))
+            for rink_key, idx in pd.Series(np.arange(len(away_shots))).groupby(rink_keys.to_numpy()).groups.items():
+                rink_cdfs[rink_key] = np.sort(distances[np.asarray(idx)])
+        else:
+            print(f"Warning: {home_team_abbrev_col} column not found. Cannot build rink-specific CDFs.")
+        
+        return cls(np.sort(distances), rink_cdfs, shot_count=len(away_shots))
+    
+    def save(self, path=None):
+        """Persist the table (joblib, like the other models/ artifacts)."""
+        import joblib
+        path = path or ARENA_ADJUSTMENT_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump({
+            'version': self.version,
+            'built_at': self.built_at,
+            'shot_count': self.shot_count,
+            'league_cdf': self.league_cdf,
+            'rink_cdfs': self.rink_cdfs,
+        }, path)
+    
+    @classmethod
+    def load(cls, path=None):
+        """
+        Load a persisted table.
+        
+        Returns:
+            ArenaAdjustmentTable, or None if the file is missing or has another version
+        """
+        path = path or ARENA_ADJUSTMENT_PATH
+        if not os.path.exists(path):
+            return None
+        import joblib
+        data = joblib.load(path)
+        if data.get('version') != ARENA_ADJUSTMENT_VERSION:
+            print(f"Warning: Arena adjustment table {path} is version {data.get('version')}, "
+                  f"expected {ARENA_ADJUSTMENT_VERSION} - rebuild it; shots are left unadjusted")
+            return None
+        return cls(data['league_cdf'], data['rink_cdfs'], version=data['version'],
+                   built_at=data.get('built_at'), shot_count=data.get('shot_count'))
+    
+    def adjust(self, x, y, rink_keys):
+        """
+        Arena-adjust shot coordinates.
+        
+        Args:
+            x, y: Raw coordinate arrays
+            rink_keys: Rink key per shot ('TOR_wrist'); None / unknown keys are not adjusted
+        
+        Returns:
+            Tuple of (adjusted_x, adjusted_y, adjusted_distance) arrays
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        raw_distance = np.sqrt((NET_X - x)**2 + (NET_Y - y)**2)
+        quantile = np.full(len(x), np.nan)
+        
+        codes, uniques = pd.factorize(pd.Series(rink_keys, dtype=object))
+        for code, rink_key in enumerate(uniques):
+            rink_cdf = self.rink_cdfs.get(rink_key)
+            if rink_cdf is None or len(rink_cdf) == 0:
+                continue
+            rows = np.flatnonzero(codes == code)
+            rows = rows[~np.isnan(raw_distance[rows])]
+            quantile[rows] = np.searchsorted(rink_cdf, raw_distance[rows]) / len(rink_cdf)
+        
+        adjusted = ~np.isnan(quantile)
+        adjusted_distance = raw_distance.copy()
+        if adjusted.any() and len(self.league_cdf) > 0:
+            adjusted_distance[adjusted] = np.percentile(self.league_cdf, np.clip(quantile[adjusted], 0.0, 1.0) * 100)
+        else:
+            adjusted[:] = False
+        
+        # Project along the line from the net to the shot, to the adjusted distance
+        with np.errstate(invalid='ignore', divide='ignore'):
+            unit_x = np.where(raw_distance > 0, (x - NET_X) / raw_distance, 0.0)
+            unit_y = np.where(raw_distance > 0, (y - NET_Y) / raw_distance, 0.0)
+        adjusted_x = np.where(adjusted, NET_X + unit_x * adjusted_distance, x)
+        adjusted_y = np.where(adjusted, NET_Y + unit_y * adjusted_distance, y)
+        return adjusted_x, adjusted_y, adjusted_distance
+
+
+def rink_key_series(rink_teams, shot_types=None):
+    """
+    Rink key ('{rink team}_{shot type}') per shot; None where the rink team is unknown.
+    
+    Shot types are lower-cased; missing shot types become 'unknown'.
+    """
+    rink_teams = pd.Series(rink_teams).reset_index(drop=True)
+    if shot_types is None:
+        types = pd.Series('unknown', index=rink_teams.index)
+    else:
+        shot_types = pd.Series(shot_types).reset_index(drop=True)
+        types = shot_types.astype(str).str.lower().where(shot_types.notna(), 'unknown')
+    keys = rink_teams.astype(str) + '_' + types
+    return keys.where(rink_teams.notna(), None)
+
+
 def build_schuckers_cdfs(df, shot_type_col='shot_type', is_home_col='is_home_team', 
                           x_col='shot_x', y_col='shot_y', home_team_abbrev_col='home_team_abbrev'):
     """
@@ -121,49 +276,78 @@ def build_schuckers_cdfs(df, shot_type_col='shot_type', is_home_col='is_home_tea
         home_team_abbrev_col: Column name for home team abbreviation (for rink identification)
     
     Returns:
-        None (updates global _SCHUCKERS_CDFS and _SCHUCKERS_LEAGUE_CDF)
+        ArenaAdjustmentTable (also installed for this process: updates global
+        _SCHUCKERS_CDFS and _SCHUCKERS_LEAGUE_CDF), or None
     """
-    global _SCHUCKERS_CDFS, _SCHUCKERS_LEAGUE_CDF
+    global _SCHUCKERS_LEAGUE_CDF, _ARENA_TABLE, _ARENA_TABLE_LOADED
     
-    NET_X = 89
-    NET_Y = 0
+    table = ArenaAdjustmentTable.from_shots(
+        df, shot_type_col=shot_type_col, is_home_col=is_home_col,
+        x_col=x_col, y_col=y_col, home_team_abbrev_col=home_team_abbrev_col
+    )
+    if table is None:
+        return None
     
-    # Calculate distances for all shots
-    df = df.copy()
-    df['_raw_distance'] = np.sqrt((NET_X - df[x_col])**2 + (NET_Y - df[y_col])**2)
-    
-    # Filter to away team shots only (as per Schuckers/Curro methodology)
-    # We use away shots because they're measured at the home team's rink
-    away_shots = df[df[is_home_col] == 0].copy()
-    
-    if len(away_shots) == 0:
-        print("Warning: No away team shots found for Schuckers adjustment")
-        return
-    
-    # Build league-wide CDF (all away shots across all rinks)
-    _SCHUCKERS_LEAGUE_CDF = np.sort(away_shots['_raw_distance'].values)
-    
-    # Build rink-specific CDFs
-    # Group by rink (home team's arena) and shot type
-    # For away shots, the rink is identified by the home team
-    if home_team_abbrev_col not in away_shots.columns:
-        print(f"Warning: {home_team_abbrev_col} column not found. Cannot build rink-specific CDFs.")
-        return
-    
-    # Fill missing shot types with 'unknown'
-    away_shots[shot_type_col] = away_shots[shot_type_col].fillna('unknown')
-    
-    # Group by home team (rink) and shot type
-    for (home_team, shot_type), group in away_shots.groupby([home_team_abbrev_col, shot_type_col]):
-        if pd.isna(home_team) or pd.isna(shot_type):
-            continue
-        rink_key = f"{home_team}_{shot_type}"
-        distances = group['_raw_distance'].values
-        if len(distances) > 0:
-            _SCHUCKERS_CDFS[rink_key] = np.sort(distances)
+    _SCHUCKERS_LEAGUE_CDF = table.league_cdf
+    _SCHUCKERS_CDFS.update(table.rink_cdfs)
+    _ARENA_TABLE = table
+    _ARENA_TABLE_LOADED = True
     
     print(f"Built Schuckers CDFs: {len(_SCHUCKERS_CDFS)} rink/shot_type combinations")
     print(f"League CDF: {len(_SCHUCKERS_LEAGUE_CDF)} away shots")
+    return table
+
+
+def get_arena_adjustment_table():
+    """
+    The arena-adjustment table for this process: the one built by
+    build_schuckers_cdfs(), else the persisted one (loaded once), else None.
+    """
+    global _SCHUCKERS_LEAGUE_CDF, _ARENA_TABLE, _ARENA_TABLE_LOADED
+    
+    if not _ARENA_TABLE_LOADED:
+        _ARENA_TABLE_LOADED = True
+        try:
+            _ARENA_TABLE = ArenaAdjustmentTable.load()
+        except Exception as e:
+            print(f"Warning: Could not load arena adjustment table: {e}")
+            _ARENA_TABLE = None
+        if _ARENA_TABLE is not None and _SCHUCKERS_LEAGUE_CDF is None:
+            # Keep the scalar calculate_schuckers_adjusted_coordinates() in step
+            _SCHUCKERS_LEAGUE_CDF = _ARENA_TABLE.league_cdf
+            _SCHUCKERS_CDFS.update(_ARENA_TABLE.rink_cdfs)
+    return _ARENA_TABLE
+
+
+def build_arena_adjustment_table(seasons=None, path=None):
+    """
+    Build the arena-adjustment table from the raw_shots snapshot and persist it.
+    
+    Args:
+        seasons: Seasons to include (default: every season in the snapshot)
+        path: Output file (default ARENA_ADJUSTMENT_PATH)
+    
+    Returns:
+        ArenaAdjustmentTable, or None if no shots were found
+    """
+    from snapshot_store import load_shots
+    
+    columns = ['shot_x', 'shot_y', 'shot_type', 'is_home_team', 'home_team_abbrev']
+    if seasons:
+        df = pd.concat([load_shots(columns=columns, season=season) for season in seasons], ignore_index=True)
+    else:
+        df = load_shots(columns=columns)
+    df = df[df['shot_x'].notna() & df['shot_y'].notna()]
+    df['is_home_team'] = pd.to_numeric(df['is_home_team'], errors='coerce')
+    
+    table = build_schuckers_cdfs(df)
+    if table is None:
+        return None
+    path = path or ARENA_ADJUSTMENT_PATH
+    table.save(path)
+    print(f"Saved arena adjustment table v{table.version} ({table.shot_count:,} away shots, "
+          f"{len(table.rink_cdfs)} rink/shot_type CDFs) to {path}")
+    return table
 
 
 def calculate_arena_adjusted_coordinates(x, y, team_abbrev=None, arena_id=None, 
@@ -356,13 +540,16 @@ def calculate_average_rest_difference(shooting_team_toi, defending_team_toi):
     
     return defending_team_toi - shooting_team_toi  # How much more tired defending team is
 
-def apply_calculated_features_to_dataframe(df, build_schuckers_cdfs=False):
+def apply_calculated_features_to_dataframe(df, build_cdfs=False):
     """
     Apply all calculated features to a DataFrame of shot records.
     
+    Arena adjustment uses the persisted arena-adjustment table (see
+    build_arena_adjustment_table); without one, coordinates are left as-is.
+    
     Args:
         df: DataFrame with raw extracted shot data
-        build_schuckers_cdfs: If True, build Schuckers CDFs from this dataframe first
+        build_cdfs: If True, build Schuckers CDFs from this dataframe first
     
     Returns:
         DataFrame with calculated features added
@@ -370,77 +557,44 @@ def apply_calculated_features_to_dataframe(df, build_schuckers_cdfs=False):
     df = df.copy()
     
     # Build Schuckers CDFs if requested (should be done once with large dataset)
-    if build_schuckers_cdfs:
+    if build_cdfs:
         required_cols = ['shot_x', 'shot_y', 'team_code', 'shot_type', 'is_home_team']
         if all(col in df.columns for col in required_cols):
             build_schuckers_cdfs(df)
         else:
             print("Warning: Missing columns for Schuckers CDF building")
     
-    # Arena-adjusted coordinates (using Schuckers/Curro method)
+    # Arena-adjusted coordinates (using Schuckers/Curro method), whole frame at once
     if 'shot_x' in df.columns and 'shot_y' in df.columns:
-        # Determine rink key for each shot
-        def get_rink_key(row):
-            """Determine rink key for Schuckers adjustment."""
-            if 'shot_type' not in row or pd.isna(row.get('shot_type')):
-                shot_type = 'unknown'
-            else:
-                shot_type = str(row['shot_type']).lower()
-            
-            # For away shots, rink is the home team
-            # For home shots, rink is the shooting team
-            if 'is_home_team' in row and row.get('is_home_team') == 1:
-                # Home team shooting - rink is their arena
-                if 'team_code' in row and pd.notna(row.get('team_code')):
-                    return f"{row['team_code']}_{shot_type}"
-            else:
-                # Away team shooting - rink is the home team's arena
-                # We need to infer home team from game context
-                # For now, use shooting team as proxy (will be corrected in full implementation)
-                if 'team_code' in row and pd.notna(row.get('team_code')):
-                    return f"{row['team_code']}_{shot_type}"
-            return None
+        x = pd.to_numeric(df['shot_x'], errors='coerce').to_numpy(dtype=float)
+        y = pd.to_numeric(df['shot_y'], errors='coerce').to_numpy(dtype=float)
+        table = get_arena_adjustment_table()
         
-        df['_rink_key'] = df.apply(get_rink_key, axis=1)
+        if table is not None and 'shot_type' in df.columns and 'is_home_team' in df.columns:
+            # Rink = home team's arena (for home and away shots alike); the
+            # shooting team stands in when the home team is not known
+            rink_teams = df['team_code'] if 'team_code' in df.columns else pd.Series(None, index=df.index, dtype=object)
+            if 'home_team_abbrev' in df.columns:
+                rink_teams = df['home_team_abbrev'].where(df['home_team_abbrev'].notna(), rink_teams)
+            rink_keys = rink_key_series(rink_teams, df['shot_type'])
+            adjusted_x, adjusted_y, _ = table.adjust(x, y, rink_keys)
+        else:
+            adjusted_x, adjusted_y = x, y
         
-        adjusted_coords = df.apply(
-            lambda row: calculate_arena_adjusted_coordinates(
-                row['shot_x'], row['shot_y'],
-                team_abbrev=row.get('team_code'),
-                shot_type=row.get('shot_type'),
-                is_home_team=row.get('is_home_team'),
-                rink_key=row.get('_rink_key')
-            ),
-            axis=1
-        )
-        df['arena_adjusted_x'] = [c[0] for c in adjusted_coords]
-        df['arena_adjusted_y'] = [c[1] for c in adjusted_coords]
-        df['arena_adjusted_x_abs'] = [c[2] for c in adjusted_coords]
-        df['arena_adjusted_y_abs'] = [c[3] for c in adjusted_coords]
+        df['arena_adjusted_x'] = adjusted_x
+        df['arena_adjusted_y'] = adjusted_y
+        df['arena_adjusted_x_abs'] = np.abs(adjusted_x)
+        df['arena_adjusted_y_abs'] = np.abs(adjusted_y)
         
         # Arena-adjusted distance (recalculate from adjusted coordinates)
-        df['arena_adjusted_shot_distance'] = df.apply(
-            lambda row: calculate_arena_adjusted_distance(
-                row['shot_x'], row['shot_y'],
-                row['arena_adjusted_x'], row['arena_adjusted_y']
-            ),
-            axis=1
-        )
-        
-        # Drop temporary column
-        if '_rink_key' in df.columns:
-            df = df.drop(columns=['_rink_key'])
+        df['arena_adjusted_shot_distance'] = np.sqrt((NET_X - adjusted_x)**2 + (NET_Y - adjusted_y)**2)
     
-    # Shot angle plus rebound
+    # Shot angle plus rebound (rebounds: angle x 0.9, see calculate_shot_angle_plus_rebound)
     if 'angle' in df.columns and 'is_rebound' in df.columns:
-        angle_metrics = df.apply(
-            lambda row: calculate_shot_angle_plus_rebound(
-                row['angle'], row['is_rebound']
-            ),
-            axis=1
-        )
-        df['shot_angle_plus_rebound'] = [m[0] for m in angle_metrics]
-        df['shot_angle_plus_rebound_speed'] = [m[1] for m in angle_metrics]
+        rebound = df['is_rebound'].astype(bool).to_numpy()
+        angle = df['angle'].to_numpy()
+        df['shot_angle_plus_rebound'] = np.where(rebound, angle * 0.9, angle)
+        df['shot_angle_plus_rebound_speed'] = df['shot_angle_plus_rebound']
     
     # Off-wing (if we have shooter handedness)
     if 'shot_x' in df.columns and 'shot_y' in df.columns:
@@ -451,7 +605,68 @@ def apply_calculated_features_to_dataframe(df, build_schuckers_cdfs=False):
     return df
 
 
-def calculate_flurry_adjusted_xg(df_shots, xg_column='xG_Value', game_id_col='game_id', 
+def parse_period_clock_seconds(times):
+    """
+    Convert a column of period clock strings (MM:SS) to total seconds.
+
+    Each distinct value is parsed once; missing or malformed values give 0.
+
+    Args:
+        times: Series of time strings
+
+    Returns:
+        numpy int array of seconds (same length as times)
+    """
+    def parse_time_to_seconds(time_str):
+        """Convert time string (MM:SS) to total seconds."""
+        if pd.isna(time_str) or not time_str or ':' not in str(time_str):
+            return 0
+        try:
+            parts = str(time_str).split(':')
+            minutes = int(parts[0])
+            seconds = int(parts[1])
+            return minutes * 60 + seconds
+        except (ValueError, IndexError):
+            return 0
+
+    codes, uniques = pd.factorize(times)
+    parsed = np.array([parse_time_to_seconds(t) for t in uniques] + [0], dtype=np.int64)
+    # factorize marks missing values with -1, which picks the trailing 0
+    return parsed[codes]
+
+
+def flurry_segments(group_codes, seconds, time_since_last=None, max_gap=3.0):
+    """
+    Split shots into flurries: consecutive shots of a group within max_gap seconds.
+
+    Args:
+        group_codes: Group id per shot (e.g. game/team/period), rows sorted by group then time
+        seconds: Period clock seconds per shot
+        time_since_last: Optional time since last event per shot; when positive it
+                         replaces the clock gap if that is 0, else caps it
+        max_gap: Largest gap (seconds) that continues a flurry
+
+    Returns:
+        (segment id per shot, 0-based position of the shot within its flurry)
+    """
+    n = len(seconds)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    same_group = np.r_[False, group_codes[1:] == group_codes[:-1]]
+    gap = np.r_[0.0, np.diff(seconds).astype(float)]
+    if time_since_last is not None:
+        usable = ~np.isnan(time_since_last) & (time_since_last > 0)
+        gap = np.where(usable, np.where(gap > 0, np.minimum(gap, time_since_last), time_since_last), gap)
+
+    continues = same_group & (gap > 0) & (gap <= max_gap)
+    starts = np.flatnonzero(~continues)
+    segment = np.cumsum(~continues) - 1
+    position = np.arange(n) - starts[segment]
+    return segment, position
+
+
+def calculate_flurry_adjusted_xg(df_shots, xg_column='xG_Value', game_id_col='game_id',
                                   team_code_col='team_code', period_col='period',
                                   time_in_period_col='time_in_period', 
                                   time_since_last_event_col='time_since_last_event'):
@@ -470,7 +685,10 @@ def calculate_flurry_adjusted_xg(df_shots, xg_column='xG_Value', game_id_col='ga
     
     This reduces total xG in flurries, which improves calibration and aligns with MoneyPuck's
     methodology that flurries should not have inflated total xG values.
-    
+
+    All games are processed in one pass: shots are sorted once by (game, team, period, time),
+    split into flurry segments, and discounted with a group-wise cumulative product.
+
     Args:
         df_shots: DataFrame with shot data including xG values
         xg_column: Column name for regular xG values
@@ -514,21 +732,7 @@ def calculate_flurry_adjusted_xg(df_shots, xg_column='xG_Value', game_id_col='ga
     if missing_xg > 0:
         print(f"⚠️  Warning: {missing_xg} shots missing {xg_column} - will use 0.0 for these")
     
-    # Parse time_in_period to seconds for sorting
-    def parse_time_to_seconds(time_str):
-        """Convert time string (MM:SS) to total seconds."""
-        if pd.isna(time_str) or not time_str or ':' not in str(time_str):
-            return 0
-        try:
-            parts = str(time_str).split(':')
-            minutes = int(parts[0])
-            seconds = int(parts[1])
-            return minutes * 60 + seconds
-        except (ValueError, IndexError):
-            return 0
-    
-    # Add parsed time column for sorting
-    df['_time_seconds'] = df[time_in_period_col].apply(parse_time_to_seconds)
+    df['_time_seconds'] = parse_period_clock_seconds(df[time_in_period_col])
     
     # Initialize flurry adjusted xG column (start with regular xG)
     df['flurry_adjusted_xg'] = pd.to_numeric(df[xg_column], errors='coerce').fillna(0.0)
@@ -536,110 +740,28 @@ def calculate_flurry_adjusted_xg(df_shots, xg_column='xG_Value', game_id_col='ga
     # Bounds check: Ensure xG values are between 0 and 1
     df['flurry_adjusted_xg'] = df['flurry_adjusted_xg'].clip(lower=0.0, upper=1.0)
     
-    # Group by game, team, and period to detect flurries
-    # Process all groups, skip invalid rows within each group
-    for (game_id, team_code, period), group in df.groupby([game_id_col, team_code_col, period_col]):
-        # Filter out invalid rows within this group
-        group_valid = group[
-            group[game_id_col].notna() & 
-            group[team_code_col].notna() & 
-            group[period_col].notna() &
-            (group['_time_seconds'] > 0)
-        ].copy()
-        
-        if len(group_valid) < 2:
-            continue  # Need at least 2 valid shots for a flurry
-        
-        # Sort by time within period
-        group_sorted = group_valid.sort_values('_time_seconds')
-        
-        # Store original indices for updating df later
-        original_indices = group_sorted.index.values
-        
-        # Identify flurry sequences (consecutive shots within 3 seconds, same team)
-        flurry_sequence = []
-        
-        for i in range(len(group_sorted)):
-            # Access by position in sorted group
-            current_idx = original_indices[i]  # Original index in df
-            current_row = group_sorted.iloc[i]
-            current_time = current_row['_time_seconds']
-            current_xg = current_row[xg_column]
-            
-            if pd.isna(current_xg) or current_xg <= 0:
-                continue  # Skip invalid xG values
-            
-            if not flurry_sequence:
-                # Start new potential flurry
-                flurry_sequence = [{
-                    'idx': current_idx,
-                    'time': current_time,
-                    'xg': current_xg
-                }]
-                continue
-            
-            last_shot = flurry_sequence[-1]
-            time_diff = current_time - last_shot['time']
-            
-            # Also check time_since_last_event as backup (if available)
-            # Use time_since_last_event if it's smaller and valid (more accurate)
-            if time_since_last_event_col in group_sorted.columns:
-                try:
-                    time_since_last = current_row[time_since_last_event_col]
-                    if pd.notna(time_since_last) and time_since_last > 0:
-                        # Use the smaller of the two (more conservative)
-                        time_diff = min(time_diff, time_since_last) if time_diff > 0 else time_since_last
-                except (KeyError, IndexError):
-                    pass  # Column might not be accessible, use time_diff from period time
-            
-            if 0 < time_diff <= 3.0:  # Within 3 seconds = flurry continues
-                flurry_sequence.append({
-                    'idx': current_idx,
-                    'time': current_time,
-                    'xg': current_xg
-                })
-            else:  # Flurry ended, process it
-                if len(flurry_sequence) > 1:  # Actual flurry (2+ shots)
-                    # Apply MoneyPuck discounting: each subsequent shot discounted by cumulative failure probability
-                    for j, shot in enumerate(flurry_sequence):
-                        if j > 0:  # Discount subsequent shots (not the first one)
-                            # Calculate cumulative failure probability of all prior shots
-                            cumulative_failure_prob = 1.0
-                            for k in range(j):  # For all shots before this one
-                                prior_xg = flurry_sequence[k]['xg']
-                                cumulative_failure_prob *= (1.0 - prior_xg)
-                            
-                            # Discount this shot's xG by cumulative failure probability
-                            discounted_xg = shot['xg'] * cumulative_failure_prob
-                            # Ensure value stays within [0, 1] bounds
-                            discounted_xg = max(0.0, min(discounted_xg, 1.0))
-                            # Update using original index
-                            df.at[shot['idx'], 'flurry_adjusted_xg'] = discounted_xg
-                        # First shot in flurry remains unchanged (already set to regular xG)
-                
-                # Start new potential flurry
-                flurry_sequence = [{
-                    'idx': current_idx,
-                    'time': current_time,
-                    'xg': current_xg
-                }]
-        
-        # Process last flurry if exists
-        if len(flurry_sequence) > 1:
-            for j, shot in enumerate(flurry_sequence):
-                if j > 0:  # Discount subsequent shots
-                    # Calculate cumulative failure probability of all prior shots
-                    cumulative_failure_prob = 1.0
-                    for k in range(j):  # For all shots before this one
-                        prior_xg = flurry_sequence[k]['xg']
-                        cumulative_failure_prob *= (1.0 - prior_xg)
-                    
-                    # Discount this shot's xG by cumulative failure probability
-                    discounted_xg = shot['xg'] * cumulative_failure_prob
-                    # Ensure value stays within [0, 1] bounds
-                    discounted_xg = max(0.0, min(discounted_xg, 1.0))
-                    # Update using original index
-                    df.at[shot['idx'], 'flurry_adjusted_xg'] = discounted_xg
+    # Candidate shots: complete (game, team, period) key, a clock time and a positive xG
+    group_codes = df.groupby([game_id_col, team_code_col, period_col], sort=False).ngroup().to_numpy()
+    xg = pd.to_numeric(df[xg_column], errors='coerce').to_numpy(dtype=float)
+    seconds = df['_time_seconds'].to_numpy()
+    candidate = (group_codes >= 0) & (seconds > 0) & (xg > 0)
+    
+    rows = np.flatnonzero(candidate)
+    # Sort once by group then time (stable, so equal clock times keep input order)
+    rows = rows[np.lexsort((seconds[rows], group_codes[rows]))]
+    
+    time_since_last = None
+    if time_since_last_event_col in df.columns:
+        time_since_last = pd.to_numeric(df[time_since_last_event_col], errors='coerce').to_numpy(dtype=float)[rows]
+    
+    segment, position = flurry_segments(group_codes[rows], seconds[rows], time_since_last)
+    
+    # Nth shot in a flurry: xG_N * prod(1 - xG_i) over the earlier shots of the flurry
+    failure = pd.Series(1.0 - xg[rows])
+    prior_failure = failure.groupby(segment).cumprod().shift(1).to_numpy()
+    discounted = position > 0
+    adjusted = np.clip(xg[rows][discounted] * prior_failure[discounted], 0.0, 1.0)
+    df.iloc[rows[discounted], df.columns.get_loc('flurry_adjusted_xg')] = adjusted
     
     # Final bounds check: Ensure all values are between 0 and 1
     df['flurry_adjusted_xg'] = df['flurry_adjusted_xg'].clip(lower=0.0, upper=1.0)
@@ -788,3 +910,12 @@ def calculate_created_expected_goals(df_shots, xg_col='xG_Value', is_rebound_col
     
     return df
 
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Build and persist the Schuckers/Curro arena-adjustment table")
+    parser.add_argument("--seasons", type=int, nargs="*", help="Seasons to build from (default: all in the snapshot)")
+    parser.add_argument("--output", default=ARENA_ADJUSTMENT_PATH)
+    args = parser.parse_args()
+    build_arena_adjustment_table(seasons=args.seasons, path=args.output)
@@ -5,18 +5,21 @@ Convenience script to populate the raw_shots table with shot data.
 
 Usage:
     python populate_raw_shots.py [date]
+    python populate_raw_shots.py --season 2025
     
     date: Date to process (format: YYYY-MM-DD). Defaults to '2025-12-07' if not provided.
+    --season: Backfill every finished game of a season in one pipelined run.
     
 Examples:
     python populate_raw_shots.py                    # Process default date (2025-12-07)
     python populate_raw_shots.py 2025-12-07         # Process specific date
     python populate_raw_shots.py 2025-01-15         # Process different date
+    python populate_raw_shots.py --season 2025      # Backfill the 2025-26 season
 """
 
 import sys
 import datetime
-from data_acquisition import scrape_pbp_and_process
+from data_acquisition import scrape_pbp_and_process, get_finished_game_ids_for_season
 
 def main():
     """Main function to populate raw_shots table."""
@@ -25,8 +28,20 @@ def main():
     print("=" * 60)
     print()
     
+    # Season backfill: every finished game in one run (one batched model pass)
+    game_ids = None
+    if len(sys.argv) > 2 and sys.argv[1] == '--season':
+        try:
+            season = int(sys.argv[2])
+        except ValueError:
+            print(f"❌ Error: Invalid season '{sys.argv[2]}'. Use the start year, e.g. 2025.")
+            sys.exit(1)
+        game_ids = get_finished_game_ids_for_season(season)
+        date_str = f"season {season}"
+        print(f"📅 Backfilling {len(game_ids)} finished games for {date_str}")
+        print()
     # Get date from command line or use default
-    if len(sys.argv) > 1:
+    elif len(sys.argv) > 1:
         date_str = sys.argv[1]
         # Validate date format
         try:
@@ -41,12 +56,13 @@ def main():
         print("   (To specify a date, run: python populate_raw_shots.py YYYY-MM-DD)")
         print()
     
-    print(f"📅 Processing games for date: {date_str}")
-    print()
+    if game_ids is None:
+        print(f"📅 Processing games for date: {date_str}")
+        print()
     
     # Process the games
     try:
-        final_stats_df = scrape_pbp_and_process(date_str=date_str)
+        final_stats_df = scrape_pbp_and_process(date_str=date_str, game_ids=game_ids)
         
         if final_stats_df is not None and not final_stats_df.empty:
             print()
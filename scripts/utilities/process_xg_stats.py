@@ -13,6 +13,7 @@ import pandas as pd
 import numpy as np
 import argparse
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 import os
 
@@ -28,14 +29,9 @@ if sys.stdout.encoding != 'utf-8':
 from data_acquisition import (
     _extract_shots_from_game,
     _save_shots_to_database,
-    get_fresh_supabase_client,
-    XG_MODEL,
-    MODEL_FEATURES,
-    USE_MONEYPUCK_MODEL,
-    XA_MODEL,
-    XA_MODEL_FEATURES,
-    LAST_EVENT_CATEGORY_ENCODER
+    get_fresh_supabase_client
 )
+from xg_inference import get_inference_service, get_shot_models
 
 # Load Supabase client using SupabaseRest (works with new sb_secret_ keys)
 load_dotenv()
@@ -148,6 +144,7 @@ supabase = SupabaseRestWrapper(supabase_rest)
 
 # Constants
 DEFAULT_BATCH_SIZE = 10
+DEFAULT_WORKERS = int(os.getenv("CITRUS_XG_WORKERS", "4"))
 
 
 def get_unprocessed_games_batch(limit=10, offset=0):
@@ -237,11 +234,12 @@ def process_single_game_json(raw_json, game_id):
             print(f"  Game {game_id}: Warning - error applying calculated features: {e}")
         
         # 5. Prepare features for xG prediction
-        if USE_MONEYPUCK_MODEL and 'last_event_category_encoded' in MODEL_FEATURES:
+        models = get_shot_models()
+        if models.use_moneypuck and 'last_event_category_encoded' in models.xg_features:
             if 'last_event_category' in df_shots.columns and 'last_event_category_encoded' not in df_shots.columns:
                 from sklearn.preprocessing import LabelEncoder
-                if LAST_EVENT_CATEGORY_ENCODER is not None:
-                    df_shots['last_event_category_encoded'] = LAST_EVENT_CATEGORY_ENCODER.transform(
+                if models.last_event_category_encoder is not None:
+                    df_shots['last_event_category_encoded'] = models.last_event_category_encoder.transform(
                         df_shots['last_event_category'].fillna('unknown').astype(str)
                     )
                 else:
@@ -259,7 +257,7 @@ def process_single_game_json(raw_json, game_id):
             df_shots['speed_from_last_event_log'] = np.log1p(speed_series)
         
         # Ensure all required features exist
-        for feature in MODEL_FEATURES:
+        for feature in models.xg_features:
             if feature not in df_shots.columns:
                 if feature in ['home_empty_net', 'away_empty_net', 'is_empty_net', 
                               'has_pass_before_shot', 'is_rebound', 'is_slot_shot', 'is_power_play']:
@@ -282,10 +280,10 @@ def process_single_game_json(raw_json, game_id):
                     df_shots[feature] = 0
         
         # Select features and predict xG
-        X_predict = df_shots[MODEL_FEATURES].copy()
+        X_predict = df_shots[models.xg_features].copy()
         
         # Fill missing values
-        for feature in MODEL_FEATURES:
+        for feature in models.xg_features:
             if feature in X_predict.columns and X_predict[feature].isna().any():
                 if feature in ['pass_lateral_distance', 'pass_to_net_distance', 'pass_immediacy_score', 
                               'goalie_movement_score', 'pass_quality_score', 'pass_zone_encoded',
@@ -309,32 +307,20 @@ def process_single_game_json(raw_json, game_id):
                     median_val = pd.to_numeric(X_predict[feature], errors='coerce').median()
                     X_predict[feature] = pd.to_numeric(X_predict[feature], errors='coerce').fillna(median_val)
         
-        # 6. Predict xG
-        if USE_MONEYPUCK_MODEL:
-            df_shots['xG_Value'] = XG_MODEL.predict(X_predict)
-            df_shots['xG_Value'] = df_shots['xG_Value'].clip(lower=0.0, upper=0.6)
-        else:
-            raw_xg = XG_MODEL.predict_proba(X_predict)[:, 1]
-            CALIBRATION_FACTOR = 3.5
-            df_shots['xG_Value'] = np.power(raw_xg, CALIBRATION_FACTOR)
-            df_shots['xG_Value'] = df_shots['xG_Value'].clip(upper=0.50)
-            SCALE_FACTOR = 0.19
-            df_shots['xG_Value'] = df_shots['xG_Value'] * SCALE_FACTOR
+        # 6-7. Predict xG and xA (if model available) through the shared inference
+        # service, which batches this game's rows with any other game in flight
+        passes_mask = None
+        X_xa_predict = None
+        if models.xa_model and models.xa_features:
+            passes_mask = df_shots['has_pass_before_shot'] == 1
+            if passes_mask.any():
+                X_xa_predict = df_shots.loc[passes_mask, models.xa_features]
         
-        # 7. Predict xA (if model available)
+        scores = get_inference_service().predict(xg_features=X_predict, xa_features=X_xa_predict)
+        df_shots['xG_Value'] = scores['xg']
         df_shots['xA_Value'] = 0.0
-        if XA_MODEL and XA_MODEL_FEATURES:
-            passes_mask = df_shots['has_pass_before_shot'] == 1
-            df_passes = df_shots[passes_mask].copy()
-            if len(df_passes) > 0:
-                X_xa_predict = df_passes[XA_MODEL_FEATURES]
-                raw_xa = XA_MODEL.predict_proba(X_xa_predict)[:, 1]
-                CALIBRATION_FACTOR_XA = 3.5
-                df_passes['xA_Value'] = np.power(raw_xa, CALIBRATION_FACTOR_XA)
-                df_passes['xA_Value'] = df_passes['xA_Value'].clip(upper=0.50)
-                SCALE_FACTOR_XA = 0.15
-                df_passes['xA_Value'] = df_passes['xA_Value'] * SCALE_FACTOR_XA
-                df_shots.loc[passes_mask, 'xA_Value'] = df_passes['xA_Value'].values
+        if scores['xa'] is not None:
+            df_shots.loc[passes_mask, 'xA_Value'] = scores['xa']
         
         # 8. Apply flurry adjustment
         try:
@@ -389,16 +375,18 @@ def process_single_game_json(raw_json, game_id):
         return None
 
 
-def process_games_batch(batch_size=10):
+def process_games_batch(batch_size=10, workers=None):
     """
     Process games in batches for memory efficiency.
     
     Args:
         batch_size: Number of games to process per batch
+        workers: Games processed concurrently within a batch (default: DEFAULT_WORKERS)
     
     Returns:
         dict: Summary with processed and failed counts
     """
+    workers = workers or DEFAULT_WORKERS
     total_unprocessed = count_unprocessed_games()
     
     if total_unprocessed == 0:
@@ -443,31 +431,32 @@ def process_games_batch(batch_size=10):
             print(f"Processing batch #{batch_num}: {len(games)} games (total unprocessed: {total_unprocessed:,})")
             print()
             
-            for idx, game in enumerate(games, 1):
-                game_id = game['game_id']
-                print(f"[{idx}/{len(games)}] Processing game {game_id}...")
-                game_id = game['game_id']
-                raw_json = game['raw_json']
+            # Games in a batch run concurrently: DB I/O overlaps and their
+            # model calls are coalesced by the shared inference service
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(games)))) as executor:
+                futures = {}
+                for idx, game in enumerate(games, 1):
+                    print(f"[{idx}/{len(games)}] Processing game {game['game_id']}...")
+                    futures[executor.submit(process_single_game_json, game['raw_json'], game['game_id'])] = game['game_id']
                 
-                try:
-                    result = process_single_game_json(raw_json, game_id)
-                    
-                    if result is not None:
-                        processed_count += 1
-                        print(f"  [OK] Game {game_id} processed successfully ({len(result)} shots)")
-                    else:
+                for future in as_completed(futures):
+                    game_id = futures[future]
+                    try:
+                        result = future.result()
+                        
+                        if result is not None:
+                            processed_count += 1
+                            print(f"  [OK] Game {game_id} processed successfully ({len(result)} shots)")
+                        else:
+                            failed_count += 1
+                            print(f"  [FAILED] Game {game_id} returned None")
+                    except Exception as e:
                         failed_count += 1
-                        print(f"  [FAILED] Game {game_id} returned None")
-                except KeyboardInterrupt:
-                    print("\n[INTERRUPTED] User stopped processing")
-                    raise
-                except Exception as e:
-                    failed_count += 1
-                    print(f"  [ERROR] Game {game_id} crashed: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    # Continue with next game instead of stopping
-                    continue
+                        print(f"  [ERROR] Game {game_id} crashed: {e}")
+                        import traceback
+                        traceback.print_exc()
+                        # Continue with next game instead of stopping
+                        continue
             
             # Progress update (recalculate remaining after processing)
             total_unprocessed = count_unprocessed_games()
@@ -529,6 +518,8 @@ def main():
     parser = argparse.ArgumentParser(description='Phase 2: Process raw NHL data and calculate xG/xA')
     parser.add_argument('--batch-size', '-b', type=int, default=DEFAULT_BATCH_SIZE,
                        help=f'Number of games to process per batch (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                       help=f'Games processed concurrently per batch (default: {DEFAULT_WORKERS})')
     parser.add_argument('--game-id', type=int, default=None,
                        help='Process a specific game ID (overrides batch processing)')
     parser.add_argument('--skip-verify', action='store_true',
@@ -576,7 +567,7 @@ def main():
             print(f"[ERROR] Game {args.game_id} processing failed")
     else:
         # Process in batches
-        summary = process_games_batch(batch_size=args.batch_size)
+        summary = process_games_batch(batch_size=args.batch_size, workers=args.workers)
         print(f"\n[OK] Processing complete. {summary['processed']:,} games processed.")
 
 
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+shift_toi.py
+
+Time on ice by situation from official shift charts.
+
+calculate_player_toi.process_game_shifts infers shifts from event participation
+(60-second gap heuristics), so anyone on the ice without touching the puck
+loses time. player_shifts_official has the real on-ice intervals; this module
+intersects them with the game's situation timeline from play-by-play.
+
+For each game the situation is a step function of game time: every event's
+situationCode holds until the next event (unknown codes carry the last known
+state; the first event of a period is moved back to the period start). From it
+we build, for each team perspective, the cumulative seconds spent in each
+situation up to every step. A shift's time in situation c is then
+F_c(end) - F_c(start), with F_c found by one np.searchsorted over all shifts of
+all games at once (games are laid end to end on one timeline).
+
+Situations (from the shift's team's point of view):
+    EN   either net empty (goalie digit 0)
+    PP   more skaters than the opponent
+    PK   fewer skaters than the opponent
+    5v5  equal strength (4v4 / 3v3 included, as calculate_player_toi does)
+
+Skater counts are read the way calculate_player_toi.situation_skaters and the
+raw_shots extractor read them (second situationCode digit as "home"), so every
+writer of player_toi_by_situation and the shots GAR divides by agree on which
+side is PP. `--check-game` compares the two TOI writers' PP/PK labels for one game.
+
+Every second of a shift lands in exactly one situation, so the per-player sum
+equals the plain shift-duration total extractor_job uses.
+
+Usage (season backfill of player_toi_by_situation for the GAR components):
+    python shift_toi.py [--season 2025] [--limit N] [--batch 50]
+    python shift_toi.py --check-game 2025020001
+"""
+
+import os
+import sys
+import time
+import argparse
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+import numpy as np
+import pandas as pd
+
+from pbp_events import PbpEvents, PERIOD_SECONDS, decode_game
+
+
+SITUATION_5V5 = "5v5"
+SITUATION_PP = "PP"
+SITUATION_PK = "PK"
+SITUATION_EN = "EN"
+SITUATIONS = (SITUATION_5V5, SITUATION_PP, SITUATION_PK, SITUATION_EN)
+
+GAME_SPAN_SECONDS = 1_000_000.0  # Spacing of games on the shared timeline (> any game length)
+SHIFT_GAME_CHUNK = 50  # game_ids per player_shifts_official "in" query
+SHIFT_TOI_BATCH = int(os.getenv("CITRUS_SHIFT_TOI_BATCH", "50"))  # Games per backfill batch
+
+SHIFT_COLUMNS = "shift_id,game_id,player_id,team_id,period,shift_start_time_seconds,shift_end_time_seconds"
+
+
+def load_official_shifts(db: Any, game_ids: Iterable[int]) -> pd.DataFrame:
+    """
+    Load player_shifts_official for a set of games.
+
+    Args:
+        db: SupabaseRest client
+        game_ids: NHL game IDs
+
+    Returns:
+        DataFrame with one row per shift (SHIFT_COLUMNS); empty if none
+    """
+    game_ids = sorted({int(g) for g in game_ids})
+    rows: List[dict] = []
+    for i in range(0, len(game_ids), SHIFT_GAME_CHUNK):
+        chunk = game_ids[i:i + SHIFT_GAME_CHUNK]
+        for page in db.iter_select(
+            "player_shifts_official", select=SHIFT_COLUMNS,
+            filters=[("game_id", "in", chunk)], key="shift_id"
+        ):
+            rows.extend(page)
+    if not rows:
+        return pd.DataFrame(columns=SHIFT_COLUMNS.split(","))
+    return pd.DataFrame(rows)
+
+
+def situation_timeline(events: PbpEvents) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Situation step function of a game.
+
+    Args:
+        events: Decoded play-by-play table
+
+    Returns:
+        (step start in game seconds, home situation index, away situation index),
+        sorted by time; indexes are into SITUATIONS. Empty arrays if no events.
+    """
+    keep = ~events.is_shootout
+    period = events.period[keep].astype(np.int64)
+    seconds = events.game_seconds[keep]
+    order = np.lexsort((seconds, period))
+    period, seconds = period[order], seconds[order]
+    if len(period) == 0:
+        return np.zeros(0), np.zeros(0, dtype=np.int8), np.zeros(0, dtype=np.int8)
+
+    # A period's state holds from its start; the game's from 0
+    first_of_period = np.r_[True, period[1:] != period[:-1]]
+    starts = np.where(first_of_period, (period - 1) * PERIOD_SECONDS, seconds)
+    starts[0] = 0.0
+
+    # Carry the last known situationCode forward (1551 before the first one)
+    known = (events.situation_code[keep] >= 0)[order]
+    last_known = np.maximum.accumulate(np.where(known, np.arange(len(known)), -1))
+    has_state = last_known >= 0
+    pick = np.maximum(last_known, 0)
+
+    def column(values: np.ndarray, default: int) -> np.ndarray:
+        return np.where(has_state, values[keep][order][pick].astype(np.int64), default)
+
+    # Same digit order as calculate_player_toi.situation_skaters and raw_shots
+    # home/away_skaters_on_ice, so PP/PK TOI lines up with the shots GAR labels
+    home_skaters = column(events.away_skaters, 5)
+    away_skaters = column(events.home_skaters, 5)
+    empty_net = (column(events.home_goalie, 1) == 0) | (column(events.away_goalie, 1) == 0)
+
+    def perspective(own: np.ndarray, opp: np.ndarray) -> np.ndarray:
+        return np.select(
+            [empty_net, own > opp, own < opp],
+            [SITUATIONS.index(SITUATION_EN), SITUATIONS.index(SITUATION_PP), SITUATIONS.index(SITUATION_PK)],
+            default=SITUATIONS.index(SITUATION_5V5)
+        ).astype(np.int8)
+
+    return starts, perspective(home_skaters, away_skaters), perspective(away_skaters, home_skaters)
+
+
+def compute_situation_toi(shifts: pd.DataFrame, events_by_game: Mapping[int, PbpEvents]) -> pd.DataFrame:
+    """
+    TOI by situation for every player in a batch of games.
+
+    Args:
+        shifts: Official shifts (load_official_shifts) for the games
+        events_by_game: {game_id: decoded play-by-play}; games without events are skipped
+
+    Returns:
+        DataFrame with game_id, player_id, team_id, situation, toi_seconds
+        (one row per player, game and situation, zeros included)
+    """
+    out_columns = ["game_id", "player_id", "team_id", "situation", "toi_seconds"]
+    if shifts.empty:
+        return pd.DataFrame(columns=out_columns)
+
+    shifts = shifts.dropna(subset=["game_id", "player_id", "period"])
+    game_ids = [g for g in pd.unique(shifts["game_id"].astype(np.int64)) if int(g) in events_by_game]
+    shifts = shifts[shifts["game_id"].astype(np.int64).isin(game_ids)]
+    if shifts.empty:
+        return pd.DataFrame(columns=out_columns)
+
+    # Lay every game's situation steps on one timeline
+    boundaries, home_cats, away_cats, offsets = [], [], [], {}
+    home_team, away_team = {}, {}
+    for i, game_id in enumerate(game_ids):
+        events = events_by_game[int(game_id)]
+        starts, home_cat, away_cat = situation_timeline(events)
+        if len(starts) == 0:
+            starts, home_cat, away_cat = np.zeros(1), np.zeros(1, dtype=np.int8), np.zeros(1, dtype=np.int8)
+        offsets[int(game_id)] = i * GAME_SPAN_SECONDS
+        boundaries.append(starts + i * GAME_SPAN_SECONDS)
+        home_cats.append(home_cat)
+        away_cats.append(away_cat)
+        home_team[int(game_id)] = events.home_team_id
+        away_team[int(game_id)] = events.away_team_id
+    bounds = np.concatenate(boundaries)
+    lengths = np.diff(np.r_[bounds, bounds[-1] + GAME_SPAN_SECONDS])
+
+    def cumulative(cats: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        onehot = cats[:, None] == np.arange(len(SITUATIONS))[None, :]
+        before = np.vstack([np.zeros(len(SITUATIONS)), np.cumsum(onehot * lengths[:, None], axis=0)[:-1]])
+        return before, onehot
+
+    home_before, home_onehot = cumulative(np.concatenate(home_cats))
+    away_before, away_onehot = cumulative(np.concatenate(away_cats))
+
+    game = shifts["game_id"].astype(np.int64).to_numpy()
+    team = pd.to_numeric(shifts["team_id"], errors="coerce").fillna(0).astype(np.int64).to_numpy()
+    period_start = (shifts["period"].astype(np.int64).to_numpy() - 1) * PERIOD_SECONDS
+    offset = np.array([offsets[int(g)] for g in game])
+    start = pd.to_numeric(shifts["shift_start_time_seconds"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    end = pd.to_numeric(shifts["shift_end_time_seconds"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    t0 = offset + period_start + start
+    t1 = offset + period_start + np.maximum(start, end)
+
+    is_home = team == np.array([home_team[int(g)] for g in game])
+
+    def situation_seconds(t: np.ndarray) -> np.ndarray:
+        k = np.searchsorted(bounds, t, side="right") - 1
+        elapsed = (t - bounds[k])[:, None]
+        home = home_before[k] + elapsed * home_onehot[k]
+        away = away_before[k] + elapsed * away_onehot[k]
+        return np.where(is_home[:, None], home, away)
+
+    per_shift = situation_seconds(t1) - situation_seconds(t0)
+
+    toi = pd.DataFrame(per_shift, columns=list(SITUATIONS))
+    toi["game_id"] = game
+    toi["player_id"] = shifts["player_id"].astype(np.int64).to_numpy()
+    toi["team_id"] = team
+    toi = toi.groupby(["game_id", "player_id", "team_id"], as_index=False)[list(SITUATIONS)].sum()
+    toi = toi.melt(id_vars=["game_id", "player_id", "team_id"], var_name="situation", value_name="toi_seconds")
+    toi["toi_seconds"] = toi["toi_seconds"].round(2)
+    return toi[out_columns].sort_values(["game_id", "player_id", "situation"]).reset_index(drop=True)
+
+
+def shift_toi_totals(shifts: pd.DataFrame) -> Dict[int, Dict[int, int]]:
+    """
+    Total TOI per player per game from shift durations.
+
+    Args:
+        shifts: Official shifts (load_official_shifts)
+
+    Returns:
+        {game_id: {player_id: icetime_seconds}}
+    """
+    if shifts.empty:
+        return {}
+    shifts = shifts.dropna(subset=["game_id", "player_id", "shift_start_time_seconds", "shift_end_time_seconds"])
+    shifts = shifts[shifts["player_id"].astype(np.int64) != 0]
+    duration = (
+        pd.to_numeric(shifts["shift_end_time_seconds"]) - pd.to_numeric(shifts["shift_start_time_seconds"])
+    ).clip(lower=0).astype(np.int64)
+    totals = duration.groupby([shifts["game_id"].astype(np.int64), shifts["player_id"].astype(np.int64)]).sum()
+    result: Dict[int, Dict[int, int]] = {}
+    for (game_id, player_id), seconds in totals.items():
+        result.setdefault(int(game_id), {})[int(player_id)] = int(seconds)
+    return result
+
+
+def toi_records(toi: pd.DataFrame) -> List[dict]:
+    """player_toi_by_situation rows (upsert on player_id,game_id,situation)."""
+    return [
+        {
+            "player_id": int(r.player_id),
+            "game_id": int(r.game_id),
+            "situation": r.situation,
+            "toi_seconds": float(r.toi_seconds),
+        }
+        for r in toi.itertuples(index=False)
+    ]
+
+
+def event_situations(events: PbpEvents) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The home and away situation (SITUATIONS index) in force at every event.
+
+    Args:
+        events: Decoded play-by-play table
+
+    Returns:
+        (home situation index, away situation index), one entry per event
+        (shootout events count as 5v5)
+    """
+    _, home_steps, away_steps = situation_timeline(events)
+    # Step k of the timeline is the k-th non-shootout event in (period, seconds) order
+    kept = np.flatnonzero(~events.is_shootout)
+    kept = kept[np.lexsort((events.game_seconds[kept], events.period[kept].astype(np.int64)))]
+    home_sit = np.full(len(events.period), SITUATIONS.index(SITUATION_5V5), dtype=np.int8)
+    away_sit = home_sit.copy()
+    home_sit[kept] = home_steps
+    away_sit[kept] = away_steps
+    return home_sit, away_sit
+
+
+def check_situation_split(events: PbpEvents, home_team_id: int) -> Dict[str, int]:
+    """
+    Compare the home team's PP/PK labels with calculate_player_toi's, event by event.
+
+    calculate_player_toi counts empty-net and unknown-code events as 5v5, so only
+    events both writers call PP or PK are compared.
+
+    Args:
+        events: Decoded play-by-play table
+        home_team_id: Home team ID
+
+    Returns:
+        {"pp": events both label home PP, "pk": events both label home PK,
+         "flipped": events one labels PP and the other PK}
+    """
+    utilities = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts", "utilities")
+    if utilities not in sys.path:
+        sys.path.insert(0, utilities)
+    from calculate_player_toi import identify_situation, situation_skaters
+
+    home_sit, _ = event_situations(events)
+    ours = np.array(SITUATIONS)[home_sit]
+    home_skaters, away_skaters, is_empty_net = situation_skaters(events)
+    theirs = np.array([
+        identify_situation(home, away, empty_net, home_team_id, home_team_id)
+        for home, away, empty_net in zip(home_skaters.tolist(), away_skaters.tolist(), is_empty_net.tolist())
+    ])
+    special = ~events.is_shootout & np.isin(ours, (SITUATION_PP, SITUATION_PK)) & np.isin(theirs, (SITUATION_PP, SITUATION_PK))
+    return {
+        "pp": int((special & (ours == SITUATION_PP) & (theirs == SITUATION_PP)).sum()),
+        "pk": int((special & (ours == SITUATION_PK) & (theirs == SITUATION_PK)).sum()),
+        "flipped": int((special & (ours != theirs)).sum()),
+    }
+
+
+def _iter_season_games(db: Any, season: int, batch: int) -> Iterable[List[Tuple[int, dict]]]:
+    pending: List[Tuple[int, dict]] = []
+    for page in db.iter_select(
+        "raw_nhl_data", select="game_id,raw_json",
+        filters=[("game_id", "gte", int(f"{season}000000")), ("game_id", "lt", int(f"{season + 1}000000"))],
+        key="game_id", page_size=batch
+    ):
+        pending.extend((int(r["game_id"]), r["raw_json"]) for r in page if r.get("raw_json"))
+        while len(pending) >= batch:
+            yield pending[:batch]
+            pending = pending[batch:]
+    if pending:
+        yield pending
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shift-chart TOI by situation -> player_toi_by_situation")
+    parser.add_argument("--season", type=int, default=int(os.getenv("CITRUS_DEFAULT_SEASON", "2025")))
+    parser.add_argument("--limit", type=int, default=0, help="Max games (default: whole season)")
+    parser.add_argument("--batch", type=int, default=SHIFT_TOI_BATCH, help="Games per batch")
+    parser.add_argument("--check-game", type=int, default=0,
+                        help="Compare this game's PP/PK labels with calculate_player_toi and exit")
+    args = parser.parse_args()
+
+    from supabase_rest import SupabaseRest
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    db = SupabaseRest(os.getenv("VITE_SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY"))
+
+    if args.check_game:
+        rows = db.select("raw_nhl_data", select="raw_json", filters=[("game_id", "eq", args.check_game)], limit=1)
+        if not rows or not rows[0].get("raw_json"):
+            print(f"ERROR: No raw_nhl_data for game {args.check_game}")
+            sys.exit(1)
+        raw_json = rows[0]["raw_json"]
+        split = check_situation_split(decode_game(raw_json, args.check_game), raw_json.get("homeTeam", {}).get("id"))
+        print(f"Game {args.check_game}: home PP {split['pp']} events, home PK {split['pk']} events, "
+              f"{split['flipped']} PP/PK labels flipped vs calculate_player_toi")
+        sys.exit(1 if split["flipped"] else 0)
+
+    print("=" * 80)
+    print("SHIFT-CHART TOI BY SITUATION")
+    print("=" * 80)
+    print(f"Season: {args.season}")
+    print()
+
+    start = time.time()
+    total_games = total_records = 0
+    for games in _iter_season_games(db, args.season, args.batch):
+        if args.limit:
+            games = games[:max(0, args.limit - total_games)]
+            if not games:
+                break
+        events_by_game = {game_id: decode_game(raw_json, game_id) for game_id, raw_json in games}
+        shifts = load_official_shifts(db, events_by_game)
+        records = toi_records(compute_situation_toi(shifts, events_by_game))
+        for i in range(0, len(records), 1000):
+            db.upsert("player_toi_by_situation", records[i:i + 1000], on_conflict="player_id,game_id,situation")
+
+        missing = len(events_by_game) - len(set(shifts["game_id"].astype(np.int64))) if not shifts.empty else len(events_by_game)
+        total_games += len(games)
+        total_records += len(records)
+        print(f"  [OK] {total_games} games, {total_records} TOI records ({missing} games in batch without shifts)")
+        sys.stdout.flush()
+
+    print()
+    print(f"Done: {total_games} games, {total_records} TOI records in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+shot_features.py
+
+Batch (array) shot feature builder for the xG pipeline.
+
+data_acquisition._extract_shots_from_game() computes shot features one shot
+at a time: a Python loop over every play with dict lookups, a running
+last-event state, a 15-shot lookback for the "pass before shot", and per-shot
+calls to calculate_time_difference / classify_pass_zone / the pass scores.
+That is fine for one live game but makes featurizing a season (retraining,
+backfills) take far too long.
+
+build_shot_features() computes the same model inputs for every shot in a set
+of games with array operations over the decoded event table
+(pbp_events.decode_game):
+
+    - last event      -> forward-filled index of the last state-updating event
+    - rebound         -> lag-1 over the processed shots of a game
+    - pass            -> windowed search over the previous 15 processed shots
+    - PP start time   -> first PP shot per (game, period, goal segment, team)
+    - pass zone/score -> np.select / vectorized formulas
+
+It mirrors the scalar path's semantics (including its quirks: "passes" are
+earlier shots of the same team, the skater-count orientation, 0:00 clocks)
+and returns one DataFrame row per shot that the scalar path would emit.
+Parity is checked with verify_parity() / verify_shot_features.py.
+
+Derived columns added later by process_xg_stats (distance_angle_interaction,
+speed_from_last_event_log) are included; apply_calculated_features_to_dataframe
+(arena adjustment, shot_angle_plus_rebound) still runs downstream as before.
+The TOI proxy columns are not model inputs and are not built here.
+"""
+
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from pbp_events import PbpEvents, decode_game, SHOT_ATTEMPT_TYPE_CODES
+
+
+NET_X, NET_Y = 89, 0
+
+PASS_LOOKBACK_SHOTS = 15  # find_pass_before_shot() scans the last 15 processed shots
+PASS_WINDOW_SECONDS = 3.0
+REBOUND_WINDOW_SECONDS = 3.0
+
+SHOT_TYPE_MAPPING = {
+    'wrist': 'wrist', 'snap': 'snap', 'slap': 'slap', 'backhand': 'backhand',
+    'tip-in': 'tip-in', 'tip': 'tip-in', 'deflected': 'deflected', 'deflection': 'deflected',
+    'wrap-around': 'wrap-around', 'wrap': 'wrap-around', 'between-legs': 'between-legs',
+    'bat': 'bat', 'poke': 'poke'
+}
+
+LAST_EVENT_CATEGORIES = {
+    505: 'GOAL', 506: 'SHOT', 507: 'MISS', 503: 'FAC', 504: 'HIT',
+    509: 'BLOCK', 516: 'PENL', 517: 'STOP', 520: 'GIVE', 521: 'TAKE',
+    502: 'TAKE', 518: 'CHL', 519: 'GIVE'
+}
+
+PASS_ZONE_WEIGHTS = {
+    'crease': 1.0, 'slot_low_angle': 0.9, 'slot_high_angle': 0.7,
+    'high_slot_low_angle': 0.6, 'high_slot_high_angle': 0.5,
+    'blue_line_low_angle': 0.4, 'blue_line_high_angle': 0.3, 'deep': 0.2, 'no_pass': 0.0
+}
+PASS_ZONE_LATERAL_FACTORS = {
+    'crease': 2.0, 'slot_low_angle': 1.8, 'slot_high_angle': 1.6,
+    'high_slot_low_angle': 1.3, 'high_slot_high_angle': 1.1,
+    'blue_line_low_angle': 0.8, 'blue_line_high_angle': 0.6, 'deep': 0.4
+}
+PASS_ZONE_DEPTHS = {
+    'crease': (0, 10), 'slot_low_angle': (10, 20), 'slot_high_angle': (10, 20),
+    'high_slot_low_angle': (20, 35), 'high_slot_high_angle': (20, 35),
+    'blue_line_low_angle': (35, 60), 'blue_line_high_angle': (35, 60), 'deep': (60, 100)
+}
+
+# Columns compared by verify_parity() (everything the models read, plus the
+# intermediate pass / last-event fields they are derived from)
+FEATURE_COLUMNS = [
+    'playerId', 'shot_x', 'shot_y', 'shot_type_code', 'is_goal', 'shot_type',
+    'distance', 'angle', 'shot_angle_adjusted', 'is_slot_shot', 'is_rebound', 'shot_type_encoded',
+    'is_power_play', 'time_since_powerplay_started', 'score_differential',
+    'home_skaters_on_ice', 'away_skaters_on_ice', 'defending_team_skaters_on_ice',
+    'is_empty_net', 'home_empty_net', 'away_empty_net',
+    'has_pass_before_shot', 'passer_id', 'pass_x', 'pass_y', 'pass_lateral_distance',
+    'pass_to_net_distance', 'pass_distance_to_net', 'pass_angle', 'time_before_shot', 'pass_zone',
+    'pass_zone_encoded', 'pass_immediacy_score', 'goalie_movement_score', 'pass_quality_score',
+    'normalized_lateral_distance', 'zone_relative_distance',
+    'last_event_category', 'last_event_x', 'last_event_y',
+    'east_west_location_of_shot', 'east_west_location_of_last_event', 'north_south_location_of_shot',
+    'distance_from_last_event', 'time_since_last_event', 'speed_from_last_event',
+    'last_event_shot_angle', 'last_event_shot_distance', 'angle_change_from_last_event',
+    'angle_change_squared', 'distance_change_from_last_event', 'shot_angle_plus_rebound_speed',
+]
+
+
+def _net_distance_angle(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Distance and clipped angle (degrees) from the net, as in the scalar helpers."""
+    distance = np.sqrt((NET_X - x) ** 2 + (NET_Y - y) ** 2)
+    dx = np.abs(NET_X - x)
+    dy = np.abs(y - NET_Y)
+    angle = np.where(dx == 0, 90.0, np.degrees(np.arctan2(dy, dx)))
+    return distance, np.clip(angle, 0.0, 90.0)
+
+
+def _encode(encoder: Any, values: np.ndarray, fallback: str) -> np.ndarray:
+    """LabelEncoder.transform with the scalar path's fallback label / 0."""
+    if encoder is None:
+        return np.zeros(len(values), dtype=np.int64)
+    classes = {label: i for i, label in enumerate(encoder.classes_)}
+    default = classes.get(fallback, 0)
+    return np.array([classes.get(v, default) for v in values], dtype=np.int64)
+
+
+def classify_pass_zones(pass_x: np.ndarray, pass_y: np.ndarray) -> np.ndarray:
+    """Vectorized data_acquisition.classify_pass_zone()."""
+    flip = pass_x < 0
+    pass_x = np.where(flip, -pass_x, pass_x)
+    pass_y = np.where(flip, -pass_y, pass_y)
+    distance, angle = _net_distance_angle(pass_x, pass_y)
+    return np.select(
+        [
+            distance < 10,
+            (distance < 20) & (angle < 30), distance < 20,
+            (distance < 35) & (angle < 30), distance < 35,
+            (distance < 60) & (angle < 45), distance < 60,
+            distance >= 60,
+        ],
+        [
+            'crease',
+            'slot_low_angle', 'slot_high_angle',
+            'high_slot_low_angle', 'high_slot_high_angle',
+            'blue_line_low_angle', 'blue_line_high_angle',
+            'deep',
+        ],
+        default='no_pass'
+    ).astype(object)
+
+
+def _game_event_table(games: Iterable[Tuple[int, Dict[str, Any]]]) -> Tuple[Dict[str, np.ndarray], List[PbpEvents]]:
+    """Concatenate the decoded events of every game, with per-event game columns."""
+    decoded = []
+    for game_id, raw_data in games:
+        events = decode_game(raw_data, game_id)
+        if len(events):
+            decoded.append((int(game_id), raw_data, events))
+
+    def cat(get) -> np.ndarray:
+        return np.concatenate([get(e) for _, _, e in decoded]) if decoded else np.array([])
+
+    table = {
+        'game_id': cat(lambda e: np.full(len(e), e.game_id, dtype=np.int64)),
+        'game_start': np.concatenate([
+            np.full(len(e), offset, dtype=np.int64)
+            for (_, _, e), offset in zip(decoded, np.cumsum([0] + [len(e) for _, _, e in decoded[:-1]]))
+        ]) if decoded else np.array([], dtype=np.int64),
+        'home_team_id': cat(lambda e: np.full(len(e), e.home_team_id, dtype=np.int64)),
+        'event_id': cat(lambda e: e.event_id),
+        'period': cat(lambda e: e.period.astype(np.int64)),
+        'seconds': cat(lambda e: e.seconds.astype(np.int64)),
+        'type_code': cat(lambda e: e.type_code),
+        'x': cat(lambda e: e.x),
+        'y': cat(lambda e: e.y),
+        'owner': cat(lambda e: e.owner_team_id),
+        'has_details': cat(lambda e: e.has_details),
+        'scorer': cat(lambda e: e.players['scoringPlayerId']),
+        'shooter': cat(lambda e: e.players['shootingPlayerId']),
+        'actor': cat(lambda e: e.players['playerId']),
+        'home_score': cat(lambda e: e.home_score),
+        'away_score': cat(lambda e: e.away_score),
+        'shot_type': cat(lambda e: e.shot_type),
+        'situation_known': cat(lambda e: e.situation_code >= 0),
+        'away_skaters': cat(lambda e: e.away_skaters.astype(np.int64)),
+        'home_skaters': cat(lambda e: e.home_skaters.astype(np.int64)),
+    }
+    return table, [e for _, _, e in decoded]
+
+
+def build_shot_features(
+    games: Iterable[Tuple[int, Dict[str, Any]]],
+    shot_type_encoder: Any = None,
+    pass_zone_encoder: Any = None
+) -> pd.DataFrame:
+    """
+    Featurize every shot in a set of games.
+
+    Args:
+        games: (game_id, raw play-by-play JSON) pairs
+        shot_type_encoder: LabelEncoder for shot_type (data_acquisition.SHOT_TYPE_ENCODER)
+        pass_zone_encoder: LabelEncoder for pass_zone (data_acquisition.PASS_ZONE_ENCODER)
+
+    Returns:
+        DataFrame with one row per shot the scalar extractor emits (same
+        order), keyed by game_id/event_id, with FEATURE_COLUMNS plus
+        distance_angle_interaction and speed_from_last_event_log. Missing
+        values are NaN where the scalar path uses None.
+    """
+    t, _ = _game_event_table(games)
+    n = len(t['type_code'])
+    if n == 0:
+        return pd.DataFrame(columns=['game_id', 'event_id'] + FEATURE_COLUMNS)
+
+    idx = np.arange(n)
+    is_shot_event = np.isin(t['type_code'], SHOT_ATTEMPT_TYPE_CODES)
+    is_goal_event = t['type_code'] == 505
+    player = np.where(is_goal_event, t['scorer'], t['shooter'])
+    raw_x = np.nan_to_num(t['x'], nan=0.0)
+    raw_y = np.nan_to_num(t['y'], nan=0.0)
+
+    # Shots the scalar loop processes: details, a shooter and a non-zero x
+    processed = is_shot_event & t['has_details'] & (player != 0) & (raw_x != 0)
+
+    # --- last-event state -------------------------------------------------
+    # Updated by non-shot events with both coordinates and by processed shots.
+    # Non-shot coordinates are flipped to the attacking side; a flipped y of 0
+    # is stored as missing, which voids the state. A goal at 0:00 stores no time.
+    has_coords = ~np.isnan(t['x']) & ~np.isnan(t['y'])
+    updates_state = (~is_shot_event & has_coords) | processed
+    flip = raw_x < 0
+    state_x = np.where(flip, -raw_x, raw_x)
+    state_y = np.where(flip, -raw_y, raw_y)
+    state_valid = ~(~is_shot_event & flip & (raw_y == 0)) & ~(processed & is_goal_event & (t['seconds'] == 0))
+
+    last_state = np.maximum.accumulate(np.where(updates_state, idx, -1))
+    prev_state = np.concatenate(([-1], last_state[:-1]))
+    prev_state[prev_state < t['game_start']] = -1
+
+    # --- processed shots --------------------------------------------------
+    s = np.flatnonzero(processed)
+    m = len(s)
+    game = t['game_id'][s]
+    period = t['period'][s]
+    secs = t['seconds'][s]
+    owner = t['owner'][s]
+    type_code = t['type_code'][s]
+    home_team_id = t['home_team_id'][s]
+    shot_x, shot_y = state_x[s], state_y[s]
+
+    distance, angle = _net_distance_angle(shot_x, shot_y)
+    slot = (distance < 25) & (np.abs(shot_y) < 15)
+    is_slot_shot = np.where(
+        slot,
+        np.maximum(0.0, 1.0 - distance / 25.0) * 0.6 + np.maximum(0.0, 1.0 - np.abs(shot_y) / 15.0) * 0.4,
+        0.0
+    )
+
+    def lag(k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of the processed shot k earlier in the same game, and its validity."""
+        j = np.arange(m) - k
+        ok = j >= 0
+        j = np.where(ok, j, 0)
+        return j, ok & (game[j] == game)
+
+    # Rebound: previous processed shot was a same-team SOG < 3s earlier in the period
+    j, ok = lag(1)
+    diff = secs - secs[j]
+    is_rebound = (
+        ok & (type_code[j] == 506) & (owner != 0) & (owner[j] == owner) & (period[j] == period)
+        & (secs[j] != 0) & (secs != 0) & (diff >= 0) & (diff < REBOUND_WINDOW_SECONDS)
+    ).astype(np.int64)
+
+    # "Pass": most recent of the last 15 processed shots by the same team in the
+    # same period, 0 < dt <= 3s
+    pass_pos = np.full(m, -1, dtype=np.int64)
+    for k in range(1, PASS_LOOKBACK_SHOTS + 1):
+        j, ok = lag(k)
+        dt = secs - secs[j]
+        hit = (
+            ok & (pass_pos < 0) & (owner != 0) & (owner[j] == owner) & (period[j] == period)
+            & (dt > 0) & (dt <= PASS_WINDOW_SECONDS)
+        )
+        pass_pos[hit] = j[hit]
+
+    has_pass = pass_pos >= 0
+    p = s[np.where(has_pass, pass_pos, 0)]
+    pass_x = np.where(has_pass, state_x[p], np.nan)
+    pass_y = np.where(has_pass, state_y[p], np.nan)
+    passer = np.where(t['actor'][p] != 0, t['actor'][p], t['owner'][p])
+    pass_secs = t['seconds'][p]
+
+    pass_lateral = np.where(has_pass, np.abs(shot_y - pass_y), 0.0)
+    pass_to_net, pass_angle = _net_distance_angle(pass_x, pass_y)
+    pass_to_net = np.where(has_pass, pass_to_net, 0.0)
+    pass_angle = np.where(has_pass, pass_angle, 0.0)
+    time_before_shot = np.where(has_pass & (pass_secs != 0) & (secs != 0), secs - pass_secs, 0).astype(np.float64)
+
+    pass_zone = np.where(has_pass, classify_pass_zones(np.nan_to_num(pass_x), np.nan_to_num(pass_y)), 'no_pass').astype(object)
+    immediacy = np.where(has_pass, np.maximum(0.0, 1.0 - time_before_shot / 3.0), 0.0)
+    goalie_movement = np.where(has_pass, np.minimum(1.0, np.minimum(1.0, pass_lateral / 50.0) * immediacy), 0.0)
+    zone_weight = np.array([PASS_ZONE_WEIGHTS.get(z, 0.0) for z in pass_zone])
+    quality = np.clip(
+        zone_weight * 0.4 + immediacy * 0.3 + goalie_movement * 0.2
+        + np.maximum(0.0, 1.0 - pass_to_net / 100.0) * 0.1,
+        0.0, 1.0
+    )
+    quality = np.where(has_pass, quality, 0.0)
+    lateral_factor = np.array([PASS_ZONE_LATERAL_FACTORS.get(z, 1.0) for z in pass_zone])
+    normalized_lateral = np.where(has_pass & (pass_zone != 'no_pass'), np.minimum(1.0, pass_lateral * lateral_factor / 85.0), 0.0)
+    zone_min = np.array([PASS_ZONE_DEPTHS.get(z, (0, 0))[0] for z in pass_zone], dtype=np.float64)
+    zone_max = np.array([PASS_ZONE_DEPTHS.get(z, (0, 0))[1] for z in pass_zone], dtype=np.float64)
+    in_zone = np.array([z in PASS_ZONE_DEPTHS for z in pass_zone])
+    zone_relative = np.select(
+        [~has_pass | ~in_zone, pass_to_net < zone_min, pass_to_net > zone_max],
+        [1.0, 0.0, 1.0],
+        default=(pass_to_net - zone_min) / np.where(zone_max > zone_min, zone_max - zone_min, 1.0)
+    )
+
+    # --- situation (scalar orientation: 2nd digit "home", 3rd "away") --------
+    known = t['situation_known'][s]
+    home_skaters = np.where(known, t['away_skaters'][s], 5)
+    away_skaters = np.where(known, t['home_skaters'][s], 5)
+    home_empty_net = home_skaters == 6
+    away_empty_net = ~home_empty_net & (away_skaters == 6)
+
+    home_shooting = (owner != 0) & (home_team_id != 0) & (owner == home_team_id)
+    shooting_known = (owner != 0) & (home_team_id != 0)
+    is_power_play = np.where(
+        shooting_known,
+        np.where(home_shooting, home_skaters > away_skaters, away_skaters > home_skaters),
+        False
+    )
+    is_home_team = owner == home_team_id
+    defending_skaters = np.where(owner != 0, np.where(is_home_team, away_skaters, home_skaters), 5)
+
+    # Time since the team's first PP shot of the period (reset by every processed goal)
+    goal = (type_code == 505).astype(np.int64)
+    period_key = pd.Series(list(zip(game, period)))
+    goals_before = pd.Series(goal).groupby(period_key.values).cumsum().values - goal
+    pp_rows = is_power_play & (owner != 0)
+    pp_start = pd.Series(np.where(pp_rows, secs, 0)).groupby(
+        [game, period, goals_before, owner, pp_rows]
+    ).transform('first').values
+    time_since_pp = np.where(pp_rows, np.maximum(0, secs - pp_start), 0).astype(np.float64)
+
+    home_score = t['home_score'][s]
+    away_score = t['away_score'][s]
+    score_differential = np.where(owner == home_team_id, home_score - away_score, away_score - home_score)
+
+    # --- last event -------------------------------------------------------
+    ps = prev_state[s]
+    q = np.where(ps >= 0, ps, 0)
+    has_last = (ps >= 0) & state_valid[q]
+    last_x = np.where(has_last, state_x[q], np.nan)
+    last_y = np.where(has_last, state_y[q], np.nan)
+    last_type = t['type_code'][q]
+    last_category = np.array(
+        [LAST_EVENT_CATEGORIES.get(c, 'OTHER') if h else None for c, h in zip(last_type.tolist(), has_last.tolist())],
+        dtype=object
+    )
+    distance_from_last = np.where(has_last, np.sqrt((shot_x - last_x) ** 2 + (shot_y - last_y) ** 2), 0.0)
+    last_secs = t['seconds'][q]
+    time_since_last = np.where(
+        has_last & (t['period'][q] == period) & (secs >= last_secs), secs - last_secs, 0
+    ).astype(np.float64)
+    speed = np.where(time_since_last > 0, distance_from_last / np.where(time_since_last > 0, time_since_last, 1.0), 0.0)
+
+    last_was_shot = has_last & np.isin(last_type, SHOT_ATTEMPT_TYPE_CODES) & (np.nan_to_num(last_x) != 0) & (np.nan_to_num(last_y) != 0)
+    last_shot_distance, last_shot_angle = _net_distance_angle(np.nan_to_num(last_x), np.nan_to_num(last_y))
+    last_shot_angle = np.where(last_was_shot, last_shot_angle, np.nan)
+    last_shot_distance = np.where(last_was_shot, last_shot_distance, np.nan)
+    angle_change = np.abs(angle - last_shot_angle)
+    angle_change_squared = np.where(angle_change != 0, angle_change ** 2, np.nan)
+    distance_change = np.abs(distance - last_shot_distance)
+    rebound_speed = np.where(
+        (is_rebound == 1) & ~np.isnan(angle_change) & (time_since_last > 0),
+        np.nan_to_num(angle_change) / np.where(time_since_last > 0, time_since_last, 1.0),
+        0.0
+    )
+
+    # --- shot type ----------------------------------------------------------
+    shot_type = np.array(
+        [SHOT_TYPE_MAPPING.get(str(v).lower() if v else '', 'wrist') for v in t['shot_type'][s]],
+        dtype=object
+    )
+
+    df = pd.DataFrame({
+        'game_id': game,
+        'event_id': t['event_id'][s],
+        'playerId': player[s],
+        'shot_x': shot_x,
+        'shot_y': shot_y,
+        'shot_type_code': type_code,
+        'is_goal': goal,
+        'shot_type': shot_type,
+        'distance': distance,
+        'angle': angle,
+        'shot_angle_adjusted': np.abs(angle),
+        'is_slot_shot': is_slot_shot,
+        'is_rebound': is_rebound,
+        'shot_type_encoded': _encode(shot_type_encoder, shot_type, 'wrist'),
+        'is_power_play': is_power_play.astype(np.int64),
+        'time_since_powerplay_started': time_since_pp,
+        'score_differential': score_differential,
+        'home_skaters_on_ice': home_skaters,
+        'away_skaters_on_ice': away_skaters,
+        'defending_team_skaters_on_ice': defending_skaters,
+        'is_empty_net': (home_empty_net | away_empty_net).astype(np.int64),
+        'home_empty_net': home_empty_net.astype(np.int64),
+        'away_empty_net': away_empty_net.astype(np.int64),
+        'has_pass_before_shot': has_pass.astype(np.int64),
+        'passer_id': np.where(has_pass, passer, np.nan),
+        'pass_x': pass_x,
+        'pass_y': pass_y,
+        'pass_lateral_distance': pass_lateral,
+        'pass_to_net_distance': pass_to_net,
+        'pass_distance_to_net': pass_to_net,
+        'pass_angle': pass_angle,
+        'time_before_shot': time_before_shot,
+        'pass_zone': pass_zone,
+        'pass_zone_encoded': _encode(pass_zone_encoder, pass_zone, 'no_pass'),
+        'pass_immediacy_score': immediacy,
+        'goalie_movement_score': goalie_movement,
+        'pass_quality_score': quality,
+        'normalized_lateral_distance': normalized_lateral,
+        'zone_relative_distance': zone_relative,
+        'last_event_category': last_category,
+        'last_event_x': last_x,
+        'last_event_y': last_y,
+        'east_west_location_of_shot': shot_y,
+        'east_west_location_of_last_event': last_y,
+        'north_south_location_of_shot': shot_x,
+        'distance_from_last_event': distance_from_last,
+        'time_since_last_event': time_since_last,
+        'speed_from_last_event': speed,
+        'last_event_shot_angle': last_shot_angle,
+        'last_event_shot_distance': last_shot_distance,
+        'angle_change_from_last_event': angle_change,
+        'angle_change_squared': angle_change_squared,
+        'distance_change_from_last_event': distance_change,
+        'shot_angle_plus_rebound_speed': rebound_speed,
+    })
+    df['distance_angle_interaction'] = (df['distance'] * df['angle']) / 100
+    df['speed_from_last_event_log'] = np.log1p(df['speed_from_last_event'])
+    return df
+
+
+def _same(a: Any, b: Any, tolerance: float) -> bool:
+    a_missing = a is None or (isinstance(a, float) and np.isnan(a))
+    b_missing = b is None or (isinstance(b, float) and np.isnan(b))
+    if a_missing or b_missing:
+        return a_missing and b_missing
+    if isinstance(a, str) or isinstance(b, str):
+        return a == b
+    return abs(float(a) - float(b)) <= tolerance
+
+
+def verify_parity(
+    games: Sequence[Tuple[int, Dict[str, Any]]],
+    db_client: Any,
+    tolerance: float = 1e-9
+) -> List[str]:
+    """
+    Compare build_shot_features() against the scalar _extract_shots_from_game().
+
+    Args:
+        games: (game_id, raw play-by-play JSON) pairs
+        db_client: Client passed to the scalar extractor (goalie name lookups only)
+
+    Returns:
+        List of mismatch descriptions (empty when the two paths agree)
+    """
+    from data_acquisition import _extract_shots_from_game, SHOT_TYPE_ENCODER, PASS_ZONE_ENCODER
+
+    batch = build_shot_features(games, SHOT_TYPE_ENCODER, PASS_ZONE_ENCODER)
+    by_game = {game_id: rows for game_id, rows in batch.groupby('game_id', sort=False)}
+    mismatches = []
+    for game_id, raw_data in games:
+        scalar = _extract_shots_from_game(raw_data, game_id, db_client)
+        vectorized = by_game.get(int(game_id))
+        vectorized = vectorized.to_dict('records') if vectorized is not None else []
+        if len(scalar) != len(vectorized):
+            mismatches.append(f"game {game_id}: scalar={len(scalar)} shots vectorized={len(vectorized)}")
+            continue
+        for a, b in zip(scalar, vectorized):
+            for key in FEATURE_COLUMNS:
+                if not _same(a.get(key), b.get(key), tolerance):
+                    mismatches.append(f"game {game_id} event {a.get('event_id')} {key}: scalar={a.get(key)!r} vectorized={b.get(key)!r}")
+    return mismatches
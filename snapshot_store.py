@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+snapshot_store.py
+
+Local columnar snapshot of raw_shots and player_game_stats.
+
+The analytics scripts (GSAx, GAR, shooting talent, rebound control, VOPA
+backtests) each need the full shot table. Pulling it through PostgREST on
+every run costs hundreds of requests; this module keeps a Parquet copy on disk
+and only pulls games that are new since the last sync.
+
+Layout (hive-style, one file per game so a re-processed game is a single
+file overwrite):
+
+    data/snapshots/<table>/season=<season>/game_<game_id>.parquet
+    data/snapshots/<table>/_manifest.json     # per-season watermark, change cursor + synced game_ids
+
+Sync:
+    The first sync of a season is a keyset pull of the season's game_id range
+    straight from the table, so games missing from nhl_games are kept too.
+    After that, compares the season's finished games in nhl_games against the
+    manifest and pulls only games not yet on disk, games on/after the last
+    watermark date (late stat corrections land the next morning), and any game
+    with a row created or updated since the previous sync (reprocessed xG,
+    backfilled goalie names, stat corrections to old games). Each sync ends
+    with a local-vs-live row count check; a mismatch re-pulls the season.
+    --full re-pulls everything.
+
+Load:
+    load_shots(columns=[...], season=2025) reads the Parquet files
+    memory-mapped, only the requested columns, and returns a DataFrame.
+    Pass db=... to run the delta sync first.
+
+Usage:
+    python snapshot_store.py [--table raw_shots|player_game_stats|all] [--season 2025] [--full]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from supabase_rest import SupabaseRest
+
+
+SNAPSHOT_DIR = os.getenv(
+    "CITRUS_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "snapshots")
+)
+
+# table -> keyset pagination key (unique within a game)
+SNAPSHOT_TABLES = {
+    "raw_shots": "id",
+    "player_game_stats": ("game_id", "player_id"),
+}
+
+DEFAULT_SEASON = int(os.getenv("CITRUS_DEFAULT_SEASON", "2025"))
+GAME_ID_BATCH_SIZE = 100  # game_ids per `in` filter
+REFRESH_DAYS = 1  # Re-pull games this many days before the watermark / change cursor
+FULL_PULL_STREAMS = 4  # Parallel keyset scans for a full season pull
+
+
+def season_for_game(game_id: int) -> int:
+    """NHL game IDs encode the season start year: 2025020123 -> 2025."""
+    return int(game_id) // 1000000
+
+
+def _table_dir(table: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, table)
+
+
+def _game_path(table: str, season: int, game_id: int) -> str:
+    return os.path.join(_table_dir(table), f"season={season}", f"game_{game_id}.parquet")
+
+
+def load_manifest(table: str) -> Dict[str, Any]:
+    """Per-season sync state: {"seasons": {"2025": {"watermark": "2025-11-01", "changed_since": "<utc iso>", "game_ids": [...]}}}."""
+    path = os.path.join(_table_dir(table), "_manifest.json")
+    if not os.path.exists(path):
+        return {"seasons": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(table: str, manifest: Dict[str, Any]) -> None:
+    os.makedirs(_table_dir(table), exist_ok=True)
+    path = os.path.join(_table_dir(table), "_manifest.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _write_game(table: str, game_id: int, rows: List[Dict[str, Any]]) -> None:
+    path = _game_path(table, season_for_game(game_id), game_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(pa.Table.from_pylist(rows), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _season_filters(season: int) -> List[Tuple[str, str, int]]:
+    """game_id range covering one season (raw_shots has no season column)."""
+    return [("game_id", "gte", season * 1000000), ("game_id", "lt", (season + 1) * 1000000)]
+
+
+def changed_game_ids(db: SupabaseRest, table: str, season: int, since: str) -> Set[int]:
+    """
+    Games in a season with a row created or updated at/after `since`.
+
+    Reprocessing deletes and reinserts a game's rows (new created_at); backfills
+    and corrections update rows in place (updated_at).
+    """
+    key = SNAPSHOT_TABLES[table]
+    changed: Set[int] = set()
+    for column in ("created_at", "updated_at"):
+        filters = _season_filters(season) + [(column, "gte", since)]
+        for page in db.iter_select(table, select="game_id", filters=filters, key=key):
+            changed.update(int(row["game_id"]) for row in page)
+    return changed
+
+
+def games_to_sync(
+    db: SupabaseRest,
+    table: str,
+    season: int,
+    full: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Finished games for a season that are missing locally, on/after the
+    watermark, or changed in the database since the last sync.
+
+    Changed games come from the table itself, so games that are not in
+    nhl_games (raw_shots allows that) are included with game_date None.
+
+    Returns:
+        nhl_games rows (game_id, game_date) to (re)pull
+    """
+    games = db.select_all(
+        "nhl_games",
+        select="game_id,game_date",
+        filters=[("season", "eq", season), ("game_date", "lte", date.today().isoformat())],
+        key="game_id"
+    )
+    if full:
+        return games
+
+    state = load_manifest(table)["seasons"].get(str(season), {})
+    synced = set(state.get("game_ids", []))
+    watermark = state.get("watermark")
+    refresh_from = None
+    if watermark:
+        refresh_from = (datetime.strptime(watermark, "%Y-%m-%d").date() - timedelta(days=REFRESH_DAYS)).isoformat()
+    changed: Set[int] = set()
+    if state.get("changed_since"):
+        # Look back REFRESH_DAYS past the cursor: some writers stamp local rather than UTC time
+        since = datetime.fromisoformat(state["changed_since"]) - timedelta(days=REFRESH_DAYS)
+        changed = changed_game_ids(db, table, season, since.isoformat())
+
+    known = {int(g["game_id"]) for g in games}
+    return [
+        g for g in games
+        if int(g["game_id"]) not in synced
+        or int(g["game_id"]) in changed
+        or (refresh_from is not None and str(g.get("game_date", "")) >= refresh_from)
+    ] + [{"game_id": game_id, "game_date": None} for game_id in sorted(changed - known)]
+
+
+def available_seasons(db: SupabaseRest, table: Optional[str] = None) -> List[int]:
+    """Every season with games in nhl_games or in `table` (first..last game_id)."""
+    first_ids, last_ids = [], []
+    for source in ["nhl_games"] + ([table] if table else []):
+        first = db.select(source, select="game_id", order="game_id.asc", limit=1)
+        last = db.select(source, select="game_id", order="game_id.desc", limit=1)
+        first_ids += [int(r["game_id"]) for r in first]
+        last_ids += [int(r["game_id"]) for r in last]
+    if not first_ids or not last_ids:
+        return [DEFAULT_SEASON]
+    return list(range(season_for_game(min(first_ids)), season_for_game(max(last_ids)) + 1))
+
+
+def local_row_count(table: str, season: int, created_before: Optional[str] = None) -> int:
+    """
+    Rows in the local snapshot for a season, optionally only those created
+    before a UTC ISO timestamp (counts come from the Parquet footers otherwise).
+    """
+    season_dir = os.path.join(_table_dir(table), f"season={season}")
+    if not os.path.isdir(season_dir):
+        return 0
+    paths = [os.path.join(season_dir, name) for name in os.listdir(season_dir) if name.endswith(".parquet")]
+    if created_before is None:
+        return sum(pq.read_metadata(path).num_rows for path in paths)
+    cutoff = pd.Timestamp(created_before)
+    total = 0
+    for path in paths:
+        if "created_at" not in pq.read_schema(path).names:
+            continue
+        created = pd.to_datetime(pq.read_table(path, columns=["created_at"]).column(0).to_pandas(), utc=True)
+        # NULL created_at never matches the live `created_at lt` count either
+        total += int((created < cutoff).sum())
+    return total
+
+
+def _pull_games(db: SupabaseRest, table: str, game_ids: List[int]) -> int:
+    """Re-pull specific games (a game with no rows left is removed locally)."""
+    key = SNAPSHOT_TABLES[table]
+    written = 0
+    for i in range(0, len(game_ids), GAME_ID_BATCH_SIZE):
+        batch_ids = game_ids[i:i + GAME_ID_BATCH_SIZE]
+        by_game: Dict[int, List[Dict[str, Any]]] = {gid: [] for gid in batch_ids}
+        for page in db.iter_select(table, select="*", filters=[("game_id", "in", batch_ids)], key=key):
+            for row in page:
+                by_game.setdefault(int(row["game_id"]), []).append(row)
+        for game_id, rows in by_game.items():
+            if rows:
+                _write_game(table, game_id, rows)
+                written += 1
+            elif os.path.exists(_game_path(table, season_for_game(game_id), game_id)):
+                os.remove(_game_path(table, season_for_game(game_id), game_id))
+    return written
+
+
+def _pull_season(db: SupabaseRest, table: str, season: int) -> Set[int]:
+    """
+    Keyset pull of every row in the season's game_id range, whether or not the
+    game is in nhl_games. Local files for games no longer in the table are removed.
+
+    Returns:
+        game_ids now on disk for the season
+    """
+    key = SNAPSHOT_TABLES[table]
+    # Parallel range scans need an integer leading key (raw_shots.id)
+    streams = FULL_PULL_STREAMS if isinstance(key, str) else 1
+    by_game: Dict[int, List[Dict[str, Any]]] = {}
+    for page in db.iter_select(table, select="*", filters=_season_filters(season), key=key, streams=streams):
+        for row in page:
+            by_game.setdefault(int(row["game_id"]), []).append(row)
+    for game_id, rows in by_game.items():
+        _write_game(table, game_id, rows)
+
+    season_dir = os.path.join(_table_dir(table), f"season={season}")
+    if os.path.isdir(season_dir):
+        for name in os.listdir(season_dir):
+            if name.endswith(".parquet") and int(name[len("game_"):-len(".parquet")]) not in by_game:
+                os.remove(os.path.join(season_dir, name))
+    return set(by_game)
+
+
+def sync_table(
+    db: SupabaseRest,
+    table: str,
+    seasons: Iterable[int],
+    full: bool = False,
+    verbose: bool = True
+) -> int:
+    """
+    Pull new/changed games for each season into the local snapshot.
+
+    The first sync of a season (and --full) is a keyset pull of the whole
+    season from the table itself; later syncs pull the delta. Every sync ends
+    with a parity check of local against live row counts, and a mismatch
+    triggers a full pull of that season.
+
+    Args:
+        db: Supabase client
+        table: "raw_shots" or "player_game_stats"
+        seasons: Seasons to sync
+        full: Re-pull every game instead of the delta
+
+    Returns:
+        Number of games written
+    """
+    manifest = load_manifest(table)
+    written = 0
+
+    for season in seasons:
+        start = time.time()
+        # Taken before reading so rows written mid-sync are caught next time
+        cursor = datetime.now(timezone.utc).isoformat()
+        state = manifest["seasons"].setdefault(str(season), {"watermark": None, "game_ids": []})
+        pull_all = full or not state.get("changed_since")
+        games = games_to_sync(db, table, season, full=pull_all)
+        synced = set(state["game_ids"])
+
+        if pull_all:
+            if verbose:
+                print(f"[snapshot_store] {table} {season}: full pull")
+            synced = _pull_season(db, table, season)
+            written += len(synced)
+        else:
+            if verbose:
+                print(f"[snapshot_store] {table} {season}: {len(games)} games to pull ({len(synced)} already local)")
+            game_ids = [int(g["game_id"]) for g in games]
+            for i in range(0, len(game_ids), GAME_ID_BATCH_SIZE):
+                batch_ids = game_ids[i:i + GAME_ID_BATCH_SIZE]
+                written += _pull_games(db, table, batch_ids)
+                synced.update(batch_ids)
+                # Persist progress per batch so an interrupted sync resumes where it stopped
+                state["game_ids"] = sorted(synced)
+                save_manifest(table, manifest)
+
+        # Parity: rows deleted without a reinsert (or any other drift) leave no
+        # created_at/updated_at trace, so compare counts against the live table.
+        # Only rows created before the cursor are compared; later inserts are
+        # picked up by the next sync.
+        parity_filters = _season_filters(season) + [("created_at", "lt", cursor)]
+        live_rows = db.count(table, parity_filters)
+        local_rows = local_row_count(table, season, created_before=cursor)
+        if live_rows != local_rows and not pull_all:
+            if verbose:
+                print(f"[snapshot_store] {table} {season}: {local_rows} local rows vs {live_rows} live, re-pulling season")
+            synced = _pull_season(db, table, season)
+            written += len(synced)
+            live_rows = db.count(table, parity_filters)
+            local_rows = local_row_count(table, season, created_before=cursor)
+        if live_rows != local_rows:
+            print(f"[snapshot_store] WARNING {table} {season}: {local_rows} local rows vs {live_rows} live")
+
+        state["game_ids"] = sorted(synced)
+        game_dates = [str(g["game_date"]) for g in games if g.get("game_date")]
+        if game_dates:
+            state["watermark"] = max([d for d in [state.get("watermark")] if d] + game_dates)
+        state["changed_since"] = cursor
+        state["synced_at"] = datetime.now().isoformat()
+        save_manifest(table, manifest)
+        if verbose:
+            print(f"[snapshot_store] {table} {season}: synced in {time.time() - start:.1f}s (watermark {state['watermark']})")
+
+    return written
+
+
+def load_table(
+    table: str,
+    columns: Optional[Sequence[str]] = None,
+    season: Optional[int] = None,
+    game_ids: Optional[Iterable[int]] = None,
+    db: Optional[SupabaseRest] = None
+) -> pd.DataFrame:
+    """
+    Read a snapshot table into a DataFrame.
+
+    Files are memory-mapped and only `columns` are decoded. Per-game files may
+    disagree on types for all-null columns; those are promoted on concat.
+
+    Args:
+        table: "raw_shots" or "player_game_stats"
+        columns: Columns to read (None = all)
+        season: Restrict to one season (None = every season on disk)
+        game_ids: Restrict to these games
+        db: If given, run the delta sync for the requested season(s) first
+
+    Returns:
+        DataFrame (empty if nothing is on disk)
+    """
+    if db is not None:
+        seasons = [season] if season is not None else available_seasons(db, table)
+        sync_table(db, table, seasons)
+
+    root = _table_dir(table)
+    if season is not None:
+        season_dirs = [os.path.join(root, f"season={season}")]
+    elif os.path.isdir(root):
+        season_dirs = [os.path.join(root, d) for d in sorted(os.listdir(root)) if d.startswith("season=")]
+    else:
+        season_dirs = []
+
+    wanted = {int(g) for g in game_ids} if game_ids is not None else None
+    paths = []
+    for season_dir in season_dirs:
+        if not os.path.isdir(season_dir):
+            continue
+        for name in sorted(os.listdir(season_dir)):
+            if not name.endswith(".parquet"):
+                continue
+            if wanted is not None and int(name[len("game_"):-len(".parquet")]) not in wanted:
+                continue
+            paths.append(os.path.join(season_dir, name))
+
+    if not paths:
+        return pd.DataFrame(columns=list(columns) if columns else None)
+
+    tables = []
+    for path in paths:
+        file_columns = None
+        if columns:
+            available = set(pq.read_schema(path).names)
+            file_columns = [c for c in columns if c in available]
+        tables.append(pq.read_table(path, columns=file_columns, memory_map=True))
+    combined = pa.concat_tables(tables, promote_options="permissive")
+    df = combined.to_pandas()
+    if columns:
+        df = df.reindex(columns=list(columns))
+    return df
+
+
+def load_shots(
+    columns: Optional[Sequence[str]] = None,
+    season: Optional[int] = None,
+    game_ids: Optional[Iterable[int]] = None,
+    db: Optional[SupabaseRest] = None
+) -> pd.DataFrame:
+    """raw_shots from the local snapshot (see load_table)."""
+    return load_table("raw_shots", columns=columns, season=season, game_ids=game_ids, db=db)
+
+
+def load_player_game_stats(
+    columns: Optional[Sequence[str]] = None,
+    season: Optional[int] = None,
+    game_ids: Optional[Iterable[int]] = None,
+    db: Optional[SupabaseRest] = None
+) -> pd.DataFrame:
+    """player_game_stats from the local snapshot (see load_table)."""
+    return load_table("player_game_stats", columns=columns, season=season, game_ids=game_ids, db=db)
+
+
+def main() -> int:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Sync raw_shots / player_game_stats into the local Parquet snapshot")
+    parser.add_argument("--table", choices=list(SNAPSHOT_TABLES) + ["all"], default="all")
+    parser.add_argument("--season", type=int, action="append",
+                        help="Season to sync (repeatable, default: CITRUS_DEFAULT_SEASON)")
+    parser.add_argument("--full", action="store_true", help="Re-pull every finished game")
+    args = parser.parse_args()
+
+    supabase_url = os.getenv("VITE_SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not supabase_url or not supabase_key:
+        print("ERROR: Supabase credentials not found in .env file")
+        return 1
+    db = SupabaseRest(supabase_url, supabase_key)
+
+    seasons = args.season or [DEFAULT_SEASON]
+    tables = list(SNAPSHOT_TABLES) if args.table == "all" else [args.table]
+    for table in tables:
+        written = sync_table(db, table, seasons, full=args.full)
+        print(f"[snapshot_store] {table}: wrote {written} game files")
+    print(f"[snapshot_store] {db.request_count} requests")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,11 +5,12 @@ citrus_request.py - Resilient HTTP Request Wrapper with Proxy Rotation
 The "Big Dog" request handler that never gets rate limited.
 
 Features:
-- Automatic proxy rotation on every request
+- Automatic proxy rotation on every request, weighted by proxy health
 - Exponential backoff with jitter on 429 errors
 - Circuit breaker to protect proxy pool
 - Random User-Agent per request
 - Comprehensive logging with proxy IP tracking
+- Disk-backed response cache for NHL game/player endpoints (response_cache.py)
 - Drop-in replacement for requests.get() and requests.post()
 
 Usage:
@@ -20,6 +21,9 @@ Usage:
     
     # All kwargs supported
     response = citrus_request(url, timeout=30, params={"season": "2025"})
+    
+    # Always hit the network (skip the response cache)
+    response = citrus_request(url, cache=False)
 """
 
 import os
@@ -36,6 +40,7 @@ from dotenv import load_dotenv
 
 from src.utils.proxy_manager import get_proxy_manager, get_realistic_headers
 from src.utils.proxy_health import get_health_monitor
+from src.utils.response_cache import get_response_cache, cache_policy, cache_key
 
 load_dotenv()
 
@@ -192,11 +197,14 @@ def citrus_request(
     - Health monitoring and metrics
     - Comprehensive audit logging
     - URL validation
+    - Response cache: fresh GETs served from disk, stale ones revalidated
+      with ETag / Last-Modified (see response_cache.CACHE_POLICIES)
     
     Args:
         url: Target URL to request
         method: HTTP method (GET, POST, PUT, etc.)
         max_retries: Override default retry count (default from env)
+        cache: Set False to bypass the response cache for this call
         **kwargs: All standard requests kwargs (timeout, headers, params, etc.)
     
     Returns:
@@ -214,6 +222,21 @@ def citrus_request(
     if not _validate_url(url):
         raise ValueError(f"Invalid URL: {url}")
     
+    # Response cache (GET only, endpoints with a cache policy)
+    use_cache = kwargs.pop("cache", True)
+    response_cache = None
+    cached = None
+    ttl_policy = cache_policy(url) if use_cache and method.upper() == "GET" else None
+    if ttl_policy is not None:
+        response_cache = get_response_cache()
+    if response_cache is not None:
+        key = cache_key(url, kwargs.get("params"))
+        cached = response_cache.get(key)
+        if cached is not None and cached.is_fresh:
+            response_cache.record("hit", cached)
+            logger.info(f"[Citrus-Cache] HIT {key if len(key) <= 60 else '...' + key[-57:]}")
+            return cached.to_response("HIT")
+    
     proxy_manager = get_proxy_manager()
     health_monitor = get_health_monitor()
     retries = max_retries if max_retries is not None else MAX_RETRIES
@@ -223,8 +246,11 @@ def citrus_request(
     default_headers = get_realistic_headers()
     user_headers = kwargs.pop("headers", {})
     merged_headers = {**default_headers, **user_headers}
+    if cached is not None:
+        merged_headers.update(cached.validators())
     
     last_exception = None
+    proxy_url = None
     
     for attempt in range(retries):
         # Check circuit breaker before attempting request
@@ -238,8 +264,8 @@ def citrus_request(
             _reset_circuit_breaker()
             logger.info("[Circuit-Breaker] Cooldown complete, resuming operations")
         
-        # Get next proxy in rotation
-        proxy_url = proxy_manager.get_next_proxy()
+        # Get next proxy (a different one than the attempt that just failed)
+        proxy_url = proxy_manager.get_next_proxy(exclude=proxy_url)
         proxy_ip = _extract_ip_from_proxy(proxy_url)
         
         # Setup proxies for requests
@@ -268,6 +294,16 @@ def citrus_request(
             
             request_duration = time.time() - request_start
             
+            # Stale cache entry still current (conditional request)
+            if response.status_code == 304 and cached is not None:
+                health_monitor.record_request(proxy_ip, success=True, response_time=request_duration, status_code=304)
+                proxy_manager.record_result(proxy_url, True, request_duration, 304)
+                _reset_circuit_breaker()
+                response_cache.refresh(cached, ttl_policy(cached.body))
+                response_cache.record("revalidated", cached)
+                logger.info(f"[Citrus-Cache] REVALIDATED (304, {request_duration:.2f}s)")
+                return cached.to_response("REVALIDATED")
+            
             # Record metrics
             health_monitor.record_request(
                 proxy_ip=proxy_ip,
@@ -275,6 +311,13 @@ def citrus_request(
                 response_time=request_duration,
                 status_code=response.status_code
             )
+            # A 404 is not the proxy's fault; blocks, rate limits and 5xx count against it
+            proxy_manager.record_result(
+                proxy_url,
+                success=(response.status_code < 500 and response.status_code not in (403, 407, 429)),
+                response_time=request_duration,
+                status_code=response.status_code
+            )
             
             # Handle rate limiting (429)
             if response.status_code == 429:
@@ -322,6 +365,11 @@ def citrus_request(
                 f"[Citrus-IP-Rotator] OK ({response.status_code}, {request_duration:.2f}s)"
             )
             
+            if response_cache is not None:
+                response_cache.record("miss")
+                if response.status_code == 200:
+                    response_cache.put(key, response, ttl_policy(response.content))
+            
             return response
         
         except requests.exceptions.Timeout as e:
@@ -330,6 +378,7 @@ def citrus_request(
                 f"[Citrus-IP-Rotator] TIMEOUT after {request_duration:.1f}s via {proxy_ip}, rotating proxy..."
             )
             health_monitor.record_request(proxy_ip, success=False, response_time=request_duration)
+            proxy_manager.record_result(proxy_url, False, request_duration)
             _increment_circuit_breaker()
             last_exception = e
             time.sleep(1)
@@ -350,6 +399,7 @@ def citrus_request(
                 )
             
             health_monitor.record_request(proxy_ip, success=False, response_time=request_duration)
+            proxy_manager.record_result(proxy_url, False, request_duration)
             _increment_circuit_breaker()
             last_exception = e
             continue
@@ -360,6 +410,7 @@ def citrus_request(
                 f"[Citrus-IP-Rotator] Connection error via {proxy_ip}, rotating proxy..."
             )
             health_monitor.record_request(proxy_ip, success=False, response_time=request_duration)
+            proxy_manager.record_result(proxy_url, False, request_duration)
             _increment_circuit_breaker()
             last_exception = e
             time.sleep(1)
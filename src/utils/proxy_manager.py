@@ -4,7 +4,8 @@ proxy_manager.py - Enterprise-Grade Proxy Management for Citrus Scraping
 
 Features:
 - Fetches 100 IPs from Webshare proxy service once on startup
-- Infinite sequential rotation using itertools.cycle
+- Health-weighted selection with 429 cooldown and quarantine (proxy_selector.py);
+  CITRUS_PROXY_STRATEGY=round_robin keeps the plain itertools.cycle rotation
 - Thread-safe proxy selection
 - Auto-refresh only on authentication failures (never expires on its own)
 - No TTL - cycles forever through the same 100 IPs
@@ -19,6 +20,8 @@ from typing import Optional, List, Dict
 from dotenv import load_dotenv
 import requests
 
+from src.utils.proxy_selector import get_proxy_selector, STRATEGY
+
 load_dotenv()
 
 logger = logging.getLogger("CitrusProxyManager")
@@ -30,7 +33,7 @@ class ProxyManager:
     
     Architecture:
     - Fetches 100 proxies from Webshare API once on initialization
-    - Cycles through them infinitely using itertools.cycle (never expires!)
+    - Picks by health (ProxySelector) or cycles with itertools.cycle (never expires!)
     - Only refreshes on auth errors (via force_refresh)
     - Thread-safe via threading.Lock
     """
@@ -54,6 +57,7 @@ class ProxyManager:
         self.cache_ttl: int = 3600  # 1 hour in seconds
         self.lock = threading.Lock()
         self.enabled = os.getenv("CITRUS_PROXY_ENABLED", "true").lower() == "true"
+        self.selector = get_proxy_selector() if STRATEGY == "weighted" else None
         
         # Initialize proxy list
         if self.enabled:
@@ -156,6 +160,8 @@ class ProxyManager:
             self.proxy_list = formatted_proxies
             self.proxy_cycle = itertools.cycle(self.proxy_list)
             self.cache_time = time.time()
+            if self.selector is not None:
+                self.selector.retain(self.proxy_list)
             
             logger.info(f"[ProxyManager] Proxy cache refreshed: {len(self.proxy_list)} proxies available")
             return True
@@ -164,12 +170,16 @@ class ProxyManager:
         """Check if proxy cache has exceeded TTL."""
         return (time.time() - self.cache_time) > self.cache_ttl
     
-    def get_next_proxy(self) -> Optional[str]:
+    def get_next_proxy(self, exclude: Optional[str] = None) -> Optional[str]:
         """
-        Get the next proxy in rotation sequence.
-        Thread-safe. Cycles through 100 IPs infinitely.
+        Get the next proxy to use.
+        Thread-safe. Health-weighted choice over the pool (round-robin when
+        CITRUS_PROXY_STRATEGY=round_robin).
         Only refreshes if list is empty (startup) or via force_refresh() on auth errors.
         
+        Args:
+            exclude: Proxy to avoid if any other is available (e.g. one that just failed)
+        
         Returns:
             Proxy URL string or None if proxies disabled/unavailable
         """
@@ -183,6 +193,9 @@ class ProxyManager:
                 logger.info("[ProxyManager] Proxy list empty, fetching from API...")
                 self._refresh_proxy_list()
             
+            if self.selector is not None:
+                return self.selector.choose(self.proxy_list, exclude=exclude)
+            
             # Return next proxy in cycle (loops infinitely)
             if self.proxy_cycle:
                 try:
@@ -196,6 +209,34 @@ class ProxyManager:
             
             return None
     
+    def record_result(self, proxy_url: Optional[str], success: bool, response_time: float,
+                      status_code: Optional[int] = None):
+        """
+        Report a request outcome so selection can favour healthy proxies.
+        
+        Args:
+            proxy_url: Proxy the request went through (None = direct)
+            success: True if the request succeeded
+            response_time: Time in seconds
+            status_code: HTTP status code (optional; 429 puts the proxy on cooldown)
+        """
+        if self.selector is not None:
+            self.selector.record(proxy_url, success, response_time, status_code)
+    
+    def seconds_until_available(self, proxy_url: Optional[str]) -> float:
+        """
+        Seconds until a proxy leaves its 429 cooldown or quarantine.
+        
+        Args:
+            proxy_url: Proxy to check
+        
+        Returns:
+            Remaining wait in seconds (always 0.0 with round-robin selection)
+        """
+        if self.selector is None:
+            return 0.0
+        return self.selector.seconds_until_available(proxy_url)
+    
     def force_refresh(self) -> bool:
         """
         Force an immediate refresh of the proxy list.
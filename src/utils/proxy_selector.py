@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+proxy_selector.py - Health-weighted proxy selection
+
+ProxyManager used to hand out proxies strictly round-robin, so an IP that had
+just been rate limited or was timing out got its turn again 100 requests later
+like any other. ProxySelector keeps a small per-proxy state fed back by every
+request and picks the next proxy by weighted random choice:
+
+- weight = recent success rate (EWMA) squared / (recent latency EWMA + 0.25s)
+- 429 -> proxy cools down for CITRUS_PROXY_COOLDOWN seconds (not selectable)
+- CITRUS_PROXY_QUARANTINE_FAILURES consecutive failures -> quarantined for
+  CITRUS_PROXY_QUARANTINE seconds (doubling per relapse, capped at 16x)
+- after quarantine a proxy is on probation: selectable at PROBATION_WEIGHT
+  until its first success; a failure on probation re-quarantines it
+
+If every proxy is cooling down or quarantined, the one that becomes available
+first is returned, so selection never stalls. CITRUS_PROXY_STRATEGY=round_robin
+restores the old behaviour in ProxyManager.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("CitrusProxyManager")
+
+STRATEGY = os.getenv("CITRUS_PROXY_STRATEGY", "weighted").lower()
+COOLDOWN_SECONDS = float(os.getenv("CITRUS_PROXY_COOLDOWN", "30"))
+QUARANTINE_FAILURES = int(os.getenv("CITRUS_PROXY_QUARANTINE_FAILURES", "3"))
+QUARANTINE_SECONDS = float(os.getenv("CITRUS_PROXY_QUARANTINE", "300"))
+MAX_QUARANTINE_MULTIPLIER = 16
+PROBATION_WEIGHT = 0.05
+EWMA_ALPHA = 0.2  # Weight of the newest observation
+LATENCY_FLOOR = 0.25  # Seconds added to latency so fast proxies don't dominate
+
+
+@dataclass
+class ProxyState:
+    """Selection state for one proxy."""
+    success_ewma: float = 1.0  # Optimistic for new proxies
+    latency_ewma: float = 1.0
+    consecutive_failures: int = 0
+    cooldown_until: float = 0.0
+    quarantined_until: float = 0.0
+    quarantine_count: int = 0
+    probation: bool = False
+
+    def available_at(self) -> float:
+        return max(self.cooldown_until, self.quarantined_until)
+
+    @property
+    def weight(self) -> float:
+        if self.probation:
+            return PROBATION_WEIGHT
+        return (self.success_ewma ** 2) / (self.latency_ewma + LATENCY_FLOOR)
+
+
+def _mask(proxy_url: str) -> str:
+    """Proxy host with the last octet masked, for logs."""
+    host = proxy_url.split("://")[-1].split("@")[-1].split(":")[0]
+    octets = host.split(".")
+    return f"{octets[0]}.{octets[1]}.{octets[2]}.xxx" if len(octets) == 4 else "unknown"
+
+
+class ProxySelector:
+    """
+    Thread-safe weighted proxy chooser.
+
+    Callers pick with choose(candidates) and report every outcome with
+    record(proxy_url, success, response_time, status_code).
+    """
+
+    def __init__(self, rng: Optional[random.Random] = None):
+        self.states: Dict[str, ProxyState] = {}
+        self.lock = threading.Lock()
+        self.rng = rng or random.Random()
+
+    def _state(self, proxy_url: str) -> ProxyState:
+        state = self.states.get(proxy_url)
+        if state is None:
+            state = self.states[proxy_url] = ProxyState()
+        return state
+
+    def choose(self, candidates: List[str], exclude: Optional[str] = None) -> Optional[str]:
+        """
+        Pick a proxy from candidates.
+
+        Args:
+            candidates: Proxy URLs to choose from
+            exclude: Proxy to avoid (e.g. the one that just failed) when others are available
+
+        Returns:
+            Proxy URL, or None if candidates is empty
+        """
+        if not candidates:
+            return None
+
+        now = time.time()
+        with self.lock:
+            states = [(url, self._state(url)) for url in candidates]
+
+            # Quarantine over -> probation
+            for url, state in states:
+                if state.quarantined_until and state.quarantined_until <= now:
+                    state.quarantined_until = 0.0
+                    state.probation = True
+                    logger.info(f"[ProxySelector] {_mask(url)} released from quarantine (probation)")
+
+            ready = [(url, s) for url, s in states if s.available_at() <= now and url != exclude]
+            if not ready:
+                ready = [(url, s) for url, s in states if s.available_at() <= now]
+            if not ready:
+                # Everything cooling down / quarantined: the earliest to recover
+                return min(states, key=lambda item: item[1].available_at())[0]
+
+            weights = [s.weight for _, s in ready]
+            return self.rng.choices([url for url, _ in ready], weights=weights, k=1)[0]
+
+    def seconds_until_available(self, proxy_url: Optional[str]) -> float:
+        """Seconds until proxy_url is out of cooldown/quarantine (0.0 if selectable now)."""
+        if not proxy_url:
+            return 0.0
+        with self.lock:
+            state = self.states.get(proxy_url)
+            return max(0.0, state.available_at() - time.time()) if state else 0.0
+
+    def record(self, proxy_url: Optional[str], success: bool, response_time: float,
+               status_code: Optional[int] = None):
+        """
+        Feed a request outcome back into the proxy's state.
+
+        Args:
+            proxy_url: Proxy used (None for direct requests, ignored)
+            success: True if the request succeeded
+            response_time: Time in seconds
+            status_code: HTTP status code (optional; 429 starts a cooldown)
+        """
+        if not proxy_url:
+            return
+
+        now = time.time()
+        with self.lock:
+            state = self._state(proxy_url)
+            state.success_ewma += EWMA_ALPHA * ((1.0 if success else 0.0) - state.success_ewma)
+            state.latency_ewma += EWMA_ALPHA * (response_time - state.latency_ewma)
+
+            if success:
+                state.consecutive_failures = 0
+                if state.probation:
+                    state.probation = False
+                    state.quarantine_count = 0
+                return
+
+            state.consecutive_failures += 1
+            if status_code == 429:
+                state.cooldown_until = now + COOLDOWN_SECONDS
+
+            if state.probation or state.consecutive_failures >= QUARANTINE_FAILURES:
+                multiplier = min(2 ** state.quarantine_count, MAX_QUARANTINE_MULTIPLIER)
+                state.quarantined_until = now + QUARANTINE_SECONDS * multiplier
+                state.quarantine_count += 1
+                state.probation = False
+                state.consecutive_failures = 0
+                logger.warning(
+                    f"[ProxySelector] Quarantined {_mask(proxy_url)} for {QUARANTINE_SECONDS * multiplier:.0f}s"
+                )
+
+    def retain(self, proxy_urls: List[str]):
+        """Drop state for proxies no longer in the pool (after a refresh)."""
+        keep = set(proxy_urls)
+        with self.lock:
+            for url in [url for url in self.states if url not in keep]:
+                del self.states[url]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Counts of proxies by selection status."""
+        now = time.time()
+        with self.lock:
+            return {
+                'tracked': len(self.states),
+                'cooling_down': sum(1 for s in self.states.values() if s.cooldown_until > now),
+                'quarantined': sum(1 for s in self.states.values() if s.quarantined_until > now),
+                'probation': sum(1 for s in self.states.values() if s.probation),
+            }
+
+
+# Global singleton instance
+_selector_instance: Optional[ProxySelector] = None
+_selector_lock = threading.Lock()
+
+
+def get_proxy_selector() -> ProxySelector:
+    """
+    Get or create the global ProxySelector singleton.
+    Thread-safe initialization.
+
+    Returns:
+        Global ProxySelector instance
+    """
+    global _selector_instance
+
+    if _selector_instance is None:
+        with _selector_lock:
+            # Double-check locking pattern
+            if _selector_instance is None:
+                _selector_instance = ProxySelector()
+
+    return _selector_instance
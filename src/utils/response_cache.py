@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+response_cache.py - Disk-backed HTTP response cache for NHL API endpoints
+
+Boxscores, play-by-play and shift charts of finished games never change, yet
+every scraper run re-downloaded them through the proxy pool. citrus_request()
+consults this cache for GET requests to the endpoints in CACHE_POLICIES:
+
+- Fresh entry           -> served from disk, no request at all
+- Stale entry w/ ETag / -> conditional request (If-None-Match /
+  Last-Modified            If-Modified-Since); a 304 refreshes the entry
+- Otherwise             -> normal request, 200 responses are stored
+
+TTL is per endpoint: gamecenter payloads whose gameState is OFF are kept
+forever, live and FINAL ones (games go FINAL -> OFF, and stat corrections land
+in between) for a few seconds; player landing / game-log pages and
+shift charts for minutes to hours (empty shift charts, served before a game's
+charts are published, are not stored). Storage is one SQLite file (bodies as
+BLOBs), bounded by size with least-recently-used eviction. Hit-rate metrics
+are kept per process (get_response_cache().get_stats()).
+
+Configuration (environment):
+    CITRUS_HTTP_CACHE=0                 disable
+    CITRUS_HTTP_CACHE_DIR               default data/http_cache
+    CITRUS_HTTP_CACHE_MAX_MB            default 1024
+    CITRUS_HTTP_CACHE_LIVE_TTL          seconds for live games (default 5)
+    CITRUS_HTTP_CACHE_PLAYER_TTL        seconds for player pages (default 900)
+    CITRUS_HTTP_CACHE_SHIFTCHART_TTL    seconds for shift charts (default 21600)
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger("CitrusIPRotator")
+
+CACHE_ENABLED = os.getenv("CITRUS_HTTP_CACHE", "1") != "0"
+CACHE_DIR = os.getenv(
+    "CITRUS_HTTP_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "http_cache")
+)
+CACHE_MAX_BYTES = int(float(os.getenv("CITRUS_HTTP_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+LIVE_TTL = float(os.getenv("CITRUS_HTTP_CACHE_LIVE_TTL", "5"))
+PLAYER_TTL = float(os.getenv("CITRUS_HTTP_CACHE_PLAYER_TTL", "900"))
+SHIFTCHART_TTL = float(os.getenv("CITRUS_HTTP_CACHE_SHIFTCHART_TTL", "21600"))
+
+FINAL_GAME_STATES = {"OFF"}  # FINAL is not final yet: it still moves to OFF
+FOREVER = None  # TTL value for immutable responses
+NO_STORE = 0  # TTL value for responses that must not be cached
+
+# Response headers kept with a cached body
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control")
+
+
+def _game_ttl(body: bytes) -> Optional[float]:
+    """Gamecenter payloads: forever once the game is OFF, LIVE_TTL before."""
+    try:
+        state = json.loads(body).get("gameState")
+    except (ValueError, AttributeError):
+        return LIVE_TTL
+    return FOREVER if state in FINAL_GAME_STATES else LIVE_TTL
+
+
+def _shiftchart_ttl(body: bytes) -> Optional[float]:
+    """Shift charts: SHIFTCHART_TTL, not stored while the chart is still empty."""
+    try:
+        data = json.loads(body).get("data")
+    except (ValueError, AttributeError):
+        return NO_STORE
+    return SHIFTCHART_TTL if data else NO_STORE
+
+
+# (URL pattern, TTL function of the response body); first match wins, no match = not cached
+CACHE_POLICIES: List[Tuple["re.Pattern[str]", Callable[[bytes], Optional[float]]]] = [
+    (re.compile(r"api-web\.nhle\.com/v1/gamecenter/\d+/(boxscore|play-by-play|landing|right-rail)"), _game_ttl),
+    (re.compile(r"api-web\.nhle\.com/v1/player/\d+/(landing|game-log/)"), lambda body: PLAYER_TTL),
+    (re.compile(r"api\.nhle\.com/stats/rest/en/shiftcharts"), _shiftchart_ttl),
+    (re.compile(r"statsapi\.web\.nhl\.com/api/v1/people/\d+/stats"), lambda body: PLAYER_TTL),
+]
+
+
+def cache_policy(url: str) -> Optional[Callable[[bytes], Optional[float]]]:
+    """TTL function for a URL, or None if the URL is not cacheable."""
+    for pattern, ttl in CACHE_POLICIES:
+        if pattern.search(url):
+            return ttl
+    return None
+
+
+def cache_key(url: str, params: Any = None) -> str:
+    """Canonical URL (query string included) used as the cache key."""
+    if not params:
+        return url
+    return requests.Request("GET", url, params=params).prepare().url
+
+
+class CachedEntry:
+    """A stored response."""
+
+    def __init__(self, key: str, status: int, headers: Dict[str, str], body: bytes,
+                 stored_at: float, expires_at: Optional[float]):
+        self.key = key
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.expires_at is None or time.time() < self.expires_at
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers for revalidation."""
+        headers = {}
+        if self.headers.get("ETag"):
+            headers["If-None-Match"] = self.headers["ETag"]
+        if self.headers.get("Last-Modified"):
+            headers["If-Modified-Since"] = self.headers["Last-Modified"]
+        return headers
+
+    def to_response(self, source: str) -> requests.Response:
+        """Rebuild a requests.Response (X-Citrus-Cache tells hit from revalidated)."""
+        response = requests.Response()
+        response.status_code = self.status
+        response._content = self.body
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.headers["X-Citrus-Cache"] = source
+        response.url = self.key
+        response.encoding = "utf-8"
+        return response
+
+
+class ResponseCache:
+    """
+    Thread-safe, size-bounded SQLite response store.
+
+    One connection per thread; SQLite's own locking covers several processes
+    sharing the cache directory.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.path = os.path.join(directory, "responses.sqlite3")
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_served = 0
+        os.makedirs(directory, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, status INTEGER NOT NULL, headers TEXT NOT NULL,"
+                " body BLOB NOT NULL, size INTEGER NOT NULL, stored_at REAL NOT NULL,"
+                " expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[CachedEntry]:
+        """Stored entry for key (fresh or stale), or None."""
+        conn = self._conn()
+        try:
+            row = conn.execute(
+                "SELECT status, headers, body, stored_at, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            with conn:
+                conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            logger.warning(f"[Citrus-Cache] Lookup failed, treating as miss: {e}")
+            return None
+        return CachedEntry(key, row[0], json.loads(row[1]), row[2], row[3], row[4])
+
+    def put(self, key: str, response: requests.Response, ttl: Optional[float]) -> None:
+        """Store a 200 response with the given TTL (None = forever, NO_STORE = skip)."""
+        if ttl is not FOREVER and ttl <= NO_STORE:
+            return
+        now = time.time()
+        body = response.content
+        headers = {h: response.headers[h] for h in STORED_HEADERS if h in response.headers}
+        expires_at = None if ttl is FOREVER else now + ttl
+        conn = self._conn()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, status, headers, body, size, stored_at, expires_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, response.status_code, json.dumps(headers), body, len(body), now, expires_at, now)
+                )
+            self._evict()
+        except sqlite3.Error as e:
+            logger.warning(f"[Citrus-Cache] Store failed for {key}: {e}")
+            return
+        with self.lock:
+            self.stores += 1
+
+    def refresh(self, entry: CachedEntry, ttl: Optional[float]) -> None:
+        """Extend a revalidated (304) entry."""
+        now = time.time()
+        try:
+            with self._conn() as conn:
+                conn.execute(
+                    "UPDATE responses SET expires_at = ?, accessed_at = ? WHERE key = ?",
+                    (None if ttl is FOREVER else now + ttl, now, entry.key)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"[Citrus-Cache] Refresh failed for {entry.key}: {e}")
+        entry.expires_at = None if ttl is FOREVER else now + ttl
+
+    def _evict(self) -> None:
+        """Drop least-recently-used entries until the store is under 90% of max_bytes."""
+        conn = self._conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        with conn:
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+                if total <= target:
+                    break
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+        with self.lock:
+            self.evictions += evicted
+
+    def record(self, outcome: str, entry: Optional[CachedEntry] = None) -> None:
+        """Count a hit / miss / revalidated outcome."""
+        with self.lock:
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "revalidated":
+                self.revalidated += 1
+            else:
+                self.misses += 1
+            if entry is not None:
+                self.bytes_served += len(entry.body)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit-rate metrics for this process."""
+        with self.lock:
+            lookups = self.hits + self.revalidated + self.misses
+            return {
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.revalidated) / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "bytes_served": self.bytes_served,
+            }
+
+    def print_stats(self):
+        """Print a metrics summary."""
+        stats = self.get_stats()
+        print("\n" + "=" * 60)
+        print("HTTP RESPONSE CACHE")
+        print("=" * 60)
+        print(f"Hits: {stats['hits']} | Revalidated (304): {stats['revalidated']} | Misses: {stats['misses']}")
+        print(f"Hit rate: {stats['hit_rate'] * 100:.1f}%")
+        print(f"Stored: {stats['stores']} | Evicted: {stats['evictions']} | "
+              f"Served from cache: {stats['bytes_served'] / (1024 * 1024):.1f} MB")
+        print("=" * 60 + "\n")
+
+    def clear(self) -> None:
+        """Delete every stored response."""
+        with self._conn() as conn:
+            conn.execute("DELETE FROM responses")
+
+
+# Global singleton instance
+_cache_instance: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Get the process-wide response cache (None when disabled or unavailable).
+
+    Returns:
+        ResponseCache instance or None
+    """
+    global _cache_instance, CACHE_ENABLED
+
+    if not CACHE_ENABLED:
+        return None
+    if _cache_instance is None:
+        with _cache_lock:
+            if _cache_instance is None:
+                try:
+                    _cache_instance = ResponseCache()
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning(f"[Citrus-Cache] Disabled, could not open {CACHE_DIR}: {e}")
+                    CACHE_ENABLED = False
+                    return None
+    return _cache_instance
@@ -0,0 +1,42 @@
+-- ============================================================================
+-- CREATE LEAGUE PROJECTED POINTS TABLE
+-- ============================================================================
+-- Layer 2 output per league. player_projected_stats holds one row per
+-- player-game (physical stats + points under a single scoring setup); this
+-- table holds the fantasy total for that player-game under every league's
+-- scoring settings, computed in one matrix product by run_daily_projections.py.
+-- Adding a league adds rows here without re-running Layer 1.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS public.league_projected_points (
+    league_id UUID NOT NULL REFERENCES public.leagues(id) ON DELETE CASCADE,
+    player_id INTEGER NOT NULL,
+    game_id INTEGER NOT NULL REFERENCES public.nhl_games(game_id) ON DELETE CASCADE,
+    projection_date DATE NOT NULL,
+    season INTEGER,
+    is_goalie BOOLEAN NOT NULL DEFAULT FALSE,
+    total_projected_points NUMERIC(6,3) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+    CONSTRAINT league_projected_points_pkey PRIMARY KEY (league_id, player_id, game_id, projection_date)
+);
+
+-- League views read a whole slate for one league
+CREATE INDEX IF NOT EXISTS idx_league_projected_points_league_date
+    ON public.league_projected_points(league_id, projection_date);
+
+CREATE INDEX IF NOT EXISTS idx_league_projected_points_player_date
+    ON public.league_projected_points(player_id, projection_date);
+
+-- Enable RLS
+ALTER TABLE public.league_projected_points ENABLE ROW LEVEL SECURITY;
+
+-- RLS Policy: Public can view projections (same as player_projected_stats);
+-- writes come from the batch job using the service role
+CREATE POLICY "Public can view league projected points"
+ON public.league_projected_points
+FOR SELECT
+USING (true);
+
+COMMENT ON TABLE public.league_projected_points IS 'Per-league fantasy point totals derived from player_projected_stats physical projections (Layer 2 fan-out).';
+COMMENT ON COLUMN public.league_projected_points.total_projected_points IS 'Projected fantasy points under this league''s scoring_settings';
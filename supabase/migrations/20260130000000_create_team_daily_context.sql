@@ -0,0 +1,46 @@
+-- ============================================================================
+-- CREATE TEAM DAILY CONTEXT TABLE
+-- ============================================================================
+-- Per-slate team context written by team_context.py. The opponent
+-- adjustments used by the daily projections (DDR = team xGA x goalie SV% x
+-- offense, plus the back-to-back penalty) depend only on team and date, so
+-- they are computed once per team per slate and stored here instead of being
+-- recomputed for every player.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS public.team_daily_context (
+    team_abbrev TEXT NOT NULL,
+    context_date DATE NOT NULL,
+    season INTEGER NOT NULL,
+
+    -- Raw components (NULL = not enough data; the multiplier is then 1.0)
+    xga_per_60 NUMERIC(6,3),
+    goalie_sv_pct NUMERIC(5,4),
+    shots_for_per_60 NUMERIC(6,3),
+
+    team_multiplier NUMERIC(6,4) NOT NULL DEFAULT 1,
+    goalie_multiplier NUMERIC(6,4) NOT NULL DEFAULT 1,
+    offense_multiplier NUMERIC(6,4) NOT NULL DEFAULT 1,
+    ddr NUMERIC(6,4) NOT NULL DEFAULT 1,
+    b2b_penalty NUMERIC(4,3) NOT NULL DEFAULT 1,
+
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+    CONSTRAINT team_daily_context_pkey PRIMARY KEY (team_abbrev, context_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_team_daily_context_date
+    ON public.team_daily_context(context_date, season);
+
+-- Enable RLS
+ALTER TABLE public.team_daily_context ENABLE ROW LEVEL SECURITY;
+
+-- RLS Policy: Public can view (same as projections); writes come from the
+-- batch job using the service role
+CREATE POLICY "Public can view team daily context"
+ON public.team_daily_context
+FOR SELECT
+USING (true);
+
+COMMENT ON TABLE public.team_daily_context IS 'Per-slate team DDR components, DDR and B2B penalty, computed once per team by team_context.py.';
+COMMENT ON COLUMN public.team_daily_context.ddr IS 'Defensive Difficulty Rating (team x goalie x offense, capped to [0.7, 1.3])';
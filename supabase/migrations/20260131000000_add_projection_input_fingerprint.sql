@@ -0,0 +1,14 @@
+-- ============================================================================
+-- ADD INPUT FINGERPRINT TO PLAYER PROJECTED STATS
+-- ============================================================================
+-- scripts/nightly_projection_batch.py stores a hash of each projection's
+-- inputs (player season stats, opponent team / goalie context, scoring
+-- settings, injury status). The next night only projections whose inputs
+-- hash differs are recomputed, instead of skipping every existing row or
+-- wiping and rebuilding the whole remaining schedule.
+-- ============================================================================
+
+ALTER TABLE public.player_projected_stats
+ADD COLUMN IF NOT EXISTS input_fingerprint TEXT;
+
+COMMENT ON COLUMN public.player_projected_stats.input_fingerprint IS 'Hash of the projection inputs (nightly_projection_batch.py); NULL = computed before fingerprinting, recomputed on the next run';
@@ -13,7 +13,10 @@ Auth headers:
 from __future__ import annotations
 
 import json
-from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 from urllib.parse import urlencode
 
 import requests
@@ -23,6 +26,16 @@ from urllib3.util.retry import Retry
 
 Filter = Tuple[str, str, Any]  # (col, op, value) where op in {"eq","neq","gte","gt","lte","lt","in"}
 
+PAGE_SIZE = 1000  # PostgREST max rows per response
+
+
+def _fmt_value(val: Any) -> str:
+  # Quote values containing PostgREST reserved characters (used inside or=(...))
+  text = str(val)
+  if any(c in text for c in ',()."\\ '):
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+  return text
+
 
 class SupabaseRest:
   def __init__(self, supabase_url: str, supabase_key: str, schema: str = "public", timeout_seconds: int = 60):
@@ -32,6 +45,8 @@ class SupabaseRest:
     self.key = supabase_key
     self.schema = schema
     self.timeout_seconds = timeout_seconds
+    # Number of HTTP round-trips issued by this client (retries not counted)
+    self.request_count = 0
     
     # Create a session with connection pooling to prevent socket exhaustion
     self.session = requests.Session()
@@ -99,7 +114,12 @@ class SupabaseRest:
     if filters:
       for col, op, val in filters:
         k, v = self._fmt_filter(col, op, val)
-        params[k] = v
+        # Repeated columns (e.g. gte + lt range bounds) must all be sent
+        if k in params:
+          prev = params[k]
+          params[k] = (prev if isinstance(prev, list) else [prev]) + [v]
+        else:
+          params[k] = v
     return urlencode(params, doseq=True)
 
   def select(self, table: str, select: str = "*", filters: Optional[List[Filter]] = None, order: Optional[str] = None,
@@ -109,11 +129,25 @@ class SupabaseRest:
     if qs:
       url = f"{url}?{qs}"
     # Use session.get() instead of requests.get() for connection pooling
+    self.request_count += 1
     r = self.session.get(url, headers=self._headers(), timeout=self.timeout_seconds)
     if r.status_code >= 400:
       raise RuntimeError(f"Supabase select failed ({table}): {r.status_code} {r.text}")
     return r.json() if r.text else []
 
+  def count(self, table: str, filters: Optional[List[Filter]] = None) -> int:
+    """Exact number of matching rows (HEAD request, Prefer: count=exact)."""
+    qs = self._build_query(filters=filters)
+    url = f"{self.rest_base}/{table}"
+    if qs:
+      url = f"{url}?{qs}"
+    self.request_count += 1
+    r = self.session.head(url, headers=self._headers({"Prefer": "count=exact"}), timeout=self.timeout_seconds)
+    if r.status_code >= 400:
+      raise RuntimeError(f"Supabase count failed ({table}): {r.status_code}")
+    # Content-Range: 0-999/12345 (or */0 when nothing matches)
+    return int(r.headers.get("Content-Range", "*/0").rsplit("/", 1)[-1])
+
   def upsert(self, table: str, rows: Union[dict, List[dict]], on_conflict: str) -> None:
     """
     Upsert rows with merge-duplicates resolution.
@@ -134,6 +168,7 @@ class SupabaseRest:
     )
     body = rows if isinstance(rows, list) else [rows]
     # Use session.post() instead of requests.post() for connection pooling
+    self.request_count += 1
     r = self.session.post(url, headers=hdr, data=json.dumps(body), timeout=self.timeout_seconds)
     if r.status_code >= 400:
       raise RuntimeError(f"Supabase upsert failed ({table}): {r.status_code} {r.text}")
@@ -143,6 +178,7 @@ class SupabaseRest:
     url = f"{self.rest_base}/{table}?{qs}"
     hdr = self._headers({"Prefer": "return=minimal"})
     # Use session.patch() instead of requests.patch() for connection pooling
+    self.request_count += 1
     r = self.session.patch(url, headers=hdr, data=json.dumps(values), timeout=self.timeout_seconds)
     if r.status_code >= 400:
       raise RuntimeError(f"Supabase update failed ({table}): {r.status_code} {r.text}")
@@ -152,6 +188,7 @@ class SupabaseRest:
     url = f"{self.rest_base}/{table}?{qs}"
     hdr = self._headers({"Prefer": "return=minimal"})
     # Use session.delete() instead of requests.delete() for connection pooling
+    self.request_count += 1
     r = self.session.delete(url, headers=hdr, timeout=self.timeout_seconds)
     if r.status_code >= 400:
       raise RuntimeError(f"Supabase delete failed ({table}): {r.status_code} {r.text}")
@@ -159,9 +196,132 @@ class SupabaseRest:
   def rpc(self, fn: str, payload: dict) -> Any:
     url = f"{self.rest_base}/rpc/{fn}"
     # Use session.post() instead of requests.post() for connection pooling
+    self.request_count += 1
     r = self.session.post(url, headers=self._headers(), data=json.dumps(payload), timeout=self.timeout_seconds)
     if r.status_code >= 400:
       raise RuntimeError(f"Supabase rpc failed ({fn}): {r.status_code} {r.text}")
     return r.json() if r.text else None
 
 
+
+  def iter_select(self, table: str, select: str = "*", filters: Optional[List[Filter]] = None,
+                  key: Union[str, Sequence[str]] = "id", page_size: int = PAGE_SIZE,
+                  streams: int = 1) -> Iterator[List[dict]]:
+    """
+    Yield every matching row, one page at a time, using keyset pagination.
+    
+    Each page is `key > last key seen` ordered by key, so the database seeks on
+    the index instead of re-scanning `offset` rows (limit/offset is O(n^2) over
+    a full table). Pages are yielded as they arrive so callers can stream.
+    
+    Args:
+      key: Column (or columns) that are unique together and indexed - usually
+           the primary key, e.g. "id" for raw_shots or ("game_id", "player_id")
+           for player_game_stats. Key columns are added to `select` if missing.
+      streams: Split the key range into this many parallel scans over the
+               pooled session. Requires an integer leading key column; pages
+               from different streams arrive interleaved, not in key order.
+    """
+    keys = [key] if isinstance(key, str) else list(key)
+    if select != "*":
+      cols = [c.strip() for c in select.split(",")]
+      select = ",".join(cols + [k for k in keys if k not in cols])
+    filters = list(filters or [])
+    
+    ranges = self._key_ranges(table, filters, keys[0], streams) if streams > 1 else None
+    if not ranges:
+      yield from self._keyset_pages(table, select, filters, keys, page_size)
+      return
+    
+    # Parallel range scans: workers push pages onto a queue, we yield them in arrival order
+    pages: "queue.Queue" = queue.Queue(maxsize=streams * 4)
+    stop = threading.Event()
+    done = object()
+    
+    def scan(lo: int, hi: int) -> None:
+      try:
+        bounded = filters + [(keys[0], "gte", lo), (keys[0], "lt", hi)]
+        for page in self._keyset_pages(table, select, bounded, keys, page_size):
+          if stop.is_set():
+            return
+          pages.put(page)
+      except Exception as e:
+        pages.put(e)
+      finally:
+        pages.put(done)
+    
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+      for lo, hi in ranges:
+        pool.submit(scan, lo, hi)
+      remaining = len(ranges)
+      try:
+        while remaining:
+          item = pages.get()
+          if item is done:
+            remaining -= 1
+          elif isinstance(item, Exception):
+            raise item
+          else:
+            yield item
+      finally:
+        # Unblock workers if the caller stopped early (or a stream failed)
+        stop.set()
+        while remaining:
+          if pages.get() is done:
+            remaining -= 1
+
+  def select_all(self, table: str, select: str = "*", filters: Optional[List[Filter]] = None,
+                 key: Union[str, Sequence[str]] = "id", page_size: int = PAGE_SIZE,
+                 streams: int = 1) -> List[dict]:
+    """iter_select() materialized into a single list."""
+    rows: List[dict] = []
+    for page in self.iter_select(table, select=select, filters=filters, key=key, page_size=page_size, streams=streams):
+      rows.extend(page)
+    return rows
+
+  def _keyset_pages(self, table: str, select: str, filters: List[Filter], keys: List[str],
+                    page_size: int) -> Iterator[List[dict]]:
+    order = ",".join(f"{k}.asc" for k in keys)
+    last: Optional[dict] = None
+    while True:
+      page_filters = list(filters)
+      extra: Dict[str, str] = {}
+      if last is not None:
+        if len(keys) == 1:
+          page_filters.append((keys[0], "gt", last[keys[0]]))
+        else:
+          # (a, b) > (x, y)  ==  a > x OR (a = x AND b > y), generalized to N columns
+          terms = []
+          for i, k in enumerate(keys):
+            eqs = [f"{p}.eq.{_fmt_value(last[p])}" for p in keys[:i]]
+            gt = f"{k}.gt.{_fmt_value(last[k])}"
+            terms.append(f"and({','.join(eqs + [gt])})" if eqs else gt)
+          extra["or"] = f"({','.join(terms)})"
+      qs = self._build_query(select=select, filters=page_filters, order=order, limit=page_size)
+      if extra:
+        qs = f"{qs}&{urlencode(extra)}"
+      url = f"{self.rest_base}/{table}?{qs}"
+      self.request_count += 1
+      r = self.session.get(url, headers=self._headers(), timeout=self.timeout_seconds)
+      if r.status_code >= 400:
+        raise RuntimeError(f"Supabase select failed ({table}): {r.status_code} {r.text}")
+      page = r.json() if r.text else []
+      if not page:
+        return
+      yield page
+      if len(page) < page_size:
+        return
+      last = page[-1]
+
+  def _key_ranges(self, table: str, filters: List[Filter], key: str, streams: int) -> Optional[List[Tuple[int, int]]]:
+    # [lo, hi) integer ranges covering min..max of the leading key column
+    lo_row = self.select(table, select=key, filters=filters, order=f"{key}.asc", limit=1)
+    hi_row = self.select(table, select=key, filters=filters, order=f"{key}.desc", limit=1)
+    if not lo_row or not hi_row:
+      return None
+    try:
+      lo, hi = int(lo_row[0][key]), int(hi_row[0][key]) + 1
+    except (TypeError, ValueError):
+      return None  # Non-integer key: fall back to a single stream
+    step = max(1, -(-(hi - lo) // streams))
+    return [(start, min(start + step, hi)) for start in range(lo, hi, step)]
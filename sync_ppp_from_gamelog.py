@@ -5,7 +5,8 @@ sync_ppp_from_gamelog.py
 # ╔═══════════════════════════════════════════════════════════════════════════╗
 # ║  ⭐ PPP/SHP SOURCE OF TRUTH (Per-Game)                                    ║
 # ╠═══════════════════════════════════════════════════════════════════════════╣
-# ║  This script syncs per-game PPP/SHP from NHL Game-Log API.                ║
+# ║  This script syncs per-game PPP/SHP from play-by-play, falling back to    ║
+# ║  the NHL Game-Log API only where PBP and the boxscore disagree.           ║
 # ║  Called automatically by data_scraping_service.py after games finish.    ║
 # ║                                                                           ║
 # ║  WHY: Boxscore API only has powerPlayGoals, NOT powerPlayPoints.          ║
@@ -14,16 +15,24 @@ sync_ppp_from_gamelog.py
 # ║  DO NOT try to calculate PPP in scrape_per_game_nhl_stats.py!            ║
 # ╚═══════════════════════════════════════════════════════════════════════════╝
 
-Syncs Power Play Points (PPP) and Shorthanded Points (SHP) from NHL game-log API
-to player_game_stats. This is necessary because the boxscore API only provides
-powerPlayGoals, NOT powerPlayPoints (which includes assists).
+Syncs Power Play Points (PPP) and Shorthanded Points (SHP) to player_game_stats.
+This is necessary because the boxscore API only provides powerPlayGoals, NOT
+powerPlayPoints (which includes assists).
 
-The game-log endpoint provides per-game PPP/SHP accurately.
+PPP/SHP are derived from each game's play-by-play (raw_nhl_data): every goal's
+scorer and assisters are credited by the manpower state in its situationCode
+(pbp_events.PbpEvents.strength_state). A player's derived numbers are used when
+the PBP goals, points, PP goals and SH goals match the boxscore columns
+(nhl_goals, nhl_points, nhl_ppg, nhl_shg); only the players that disagree (or
+whose game has no PBP yet) are looked up in the game-log endpoint, which
+provides per-game PPP/SHP accurately. Changed rows are written in one bulk
+upsert per game.
 
 Usage:
     python sync_ppp_from_gamelog.py                    # Sync today's games
     python sync_ppp_from_gamelog.py --date 2026-01-05  # Sync specific date
     python sync_ppp_from_gamelog.py --days 7           # Sync last 7 days
+    python sync_ppp_from_gamelog.py --gamelog-only     # Skip PBP, game-log for every player
 """
 
 import os
@@ -33,11 +42,13 @@ import argparse
 from datetime import date, timedelta
 from typing import Dict, List, Optional, Set
 
+import numpy as np
 import requests
 from dotenv import load_dotenv
 
 from supabase_rest import SupabaseRest
 from src.utils.citrus_request import citrus_request
+from pbp_events import decode_game
 
 load_dotenv()
 
@@ -59,7 +70,7 @@ def get_players_who_played(db: SupabaseRest, game_date: str) -> List[Dict]:
     while True:
         batch = db.select(
             "player_game_stats",
-            select="player_id,game_id,nhl_ppp,nhl_shp",
+            select="player_id,game_id,nhl_ppp,nhl_shp,nhl_goals,nhl_points,nhl_ppg,nhl_shg",
             filters=[("game_date", "eq", game_date)],
             limit=limit,
             offset=offset
@@ -92,7 +103,75 @@ def fetch_player_gamelog(player_id: int, season: str = SEASON_STRING) -> Optiona
         return None
 
 
-def sync_ppp_for_date(db: SupabaseRest, target_date: str, dry_run: bool = False) -> Dict:
+def derive_ppp_from_pbp(pbp: Dict) -> Dict[int, Dict[str, int]]:
+    """
+    Per-player goals / points / PPP / SHP / PPG / SHG from one game's play-by-play.
+
+    A goal is a power-play goal when the scoring team had the manpower advantage
+    at the goal (situationCode, empty-net extra attacker not counted) and
+    shorthanded when it had fewer skaters; shootout goals are skipped.
+
+    Args:
+        pbp: gamecenter play-by-play payload (raw_nhl_data.raw_json)
+
+    Returns:
+        {player_id: {"goals", "points", "ppg", "shg", "ppp", "shp"}}
+    """
+    events = decode_game(pbp)
+    derived: Dict[int, Dict[str, int]] = {}
+    goals = np.flatnonzero(events.is_goal & ~events.is_shootout)
+    if len(goals) == 0:
+        return derived
+
+    strength = events.strength_state()[goals]
+    scoring_side = np.where(events.owner_is_home[goals] == 1, 1, np.where(events.owner_is_home[goals] == 0, -1, 0))
+    is_pp = (scoring_side != 0) & (strength == scoring_side)
+    is_sh = (scoring_side != 0) & (strength == -scoring_side)
+
+    def credit(pid: int, i: int, goal: bool) -> None:
+        if not pid:
+            return
+        row = derived.setdefault(pid, {"goals": 0, "points": 0, "ppg": 0, "shg": 0, "ppp": 0, "shp": 0})
+        row["points"] += 1
+        row["ppp"] += int(is_pp[i])
+        row["shp"] += int(is_sh[i])
+        if goal:
+            row["goals"] += 1
+            row["ppg"] += int(is_pp[i])
+            row["shg"] += int(is_sh[i])
+
+    for i, event in enumerate(goals.tolist()):
+        credit(int(events.players["scoringPlayerId"][event]), i, True)
+        credit(int(events.players["assist1PlayerId"][event]), i, False)
+        credit(int(events.players["assist2PlayerId"][event]), i, False)
+    return derived
+
+
+def load_game_pbp(db: SupabaseRest, game_ids: Set[int]) -> Dict[int, Dict]:
+    """raw_json per game_id from raw_nhl_data (games without PBP are absent)."""
+    pbp_by_game: Dict[int, Dict] = {}
+    ids = sorted(game_ids)
+    for i in range(0, len(ids), 50):
+        rows = db.select(
+            "raw_nhl_data",
+            select="game_id,raw_json",
+            filters=[("game_id", "in", ids[i:i + 50])]
+        )
+        for row in rows or []:
+            if row.get("raw_json"):
+                pbp_by_game[int(row["game_id"])] = row["raw_json"]
+    return pbp_by_game
+
+
+def boxscore_agrees(pg: Dict, derived: Dict[str, int]) -> bool:
+    """Do a player's PBP goals / points / PPG / SHG match the boxscore columns?"""
+    return all(
+        int(pg.get(column) or 0) == derived.get(key, 0)
+        for column, key in (("nhl_goals", "goals"), ("nhl_points", "points"), ("nhl_ppg", "ppg"), ("nhl_shg", "shg"))
+    )
+
+
+def sync_ppp_for_date(db: SupabaseRest, target_date: str, dry_run: bool = False, use_pbp: bool = True) -> Dict:
     """Sync PPP/SHP for all players who played on target_date."""
     print(f"\n{'='*60}")
     print(f"Syncing PPP/SHP for {target_date}")
@@ -123,9 +202,42 @@ def sync_ppp_for_date(db: SupabaseRest, target_date: str, dry_run: bool = False)
     errors = 0
     updates_to_apply = []
     
-    for i, player_id in enumerate(player_ids, 1):
+    def queue_update(player_id: int, game_id: int, ppp: int, shp: int) -> None:
+        nonlocal skipped
+        current = current_values.get((player_id, game_id))
+        if current and current.get("nhl_ppp") == ppp and current.get("nhl_shp") == shp:
+            skipped += 1
+            return
+        updates_to_apply.append({
+            "player_id": player_id,
+            "game_id": game_id,
+            "game_date": target_date,
+            "nhl_ppp": ppp,
+            "nhl_shp": shp
+        })
+    
+    # Stage 1: derive from play-by-play; collect the players PBP can't vouch for
+    gamelog_players = set(player_ids)
+    if use_pbp:
+        pbp_by_game = load_game_pbp(db, {int(pg["game_id"]) for pg in player_games})
+        derived_by_game = {game_id: derive_ppp_from_pbp(pbp) for game_id, pbp in pbp_by_game.items()}
+        gamelog_players = set()
+        derived_count = 0
+        for pg in player_games:
+            derived_game = derived_by_game.get(int(pg["game_id"]))
+            derived = derived_game.get(int(pg["player_id"]), {}) if derived_game is not None else None
+            if derived is None or not boxscore_agrees(pg, derived):
+                gamelog_players.add(pg["player_id"])
+                continue
+            queue_update(pg["player_id"], pg["game_id"], derived.get("ppp", 0), derived.get("shp", 0))
+            derived_count += 1
+        print(f"Derived PPP/SHP from PBP for {derived_count} player-games "
+              f"({len(pbp_by_game)} games); {len(gamelog_players)} players need the game-log")
+    
+    # Stage 2: game-log API for the rest
+    for i, player_id in enumerate(sorted(gamelog_players), 1):
         if i % 50 == 0:
-            print(f"  [PROGRESS] Fetched {i}/{len(player_ids)} players...")
+            print(f"  [PROGRESS] Fetched {i}/{len(gamelog_players)} players...")
         
         gamelog = fetch_player_gamelog(player_id)
         
@@ -139,24 +251,7 @@ def sync_ppp_for_date(db: SupabaseRest, target_date: str, dry_run: bool = False)
             if game_date != target_date:
                 continue
             
-            game_id = game.get("gameId")
-            ppp = game.get("powerPlayPoints", 0)
-            shp = game.get("shorthandedPoints", 0)
-            
-            # Check if update needed
-            current = current_values.get((player_id, game_id))
-            if current:
-                if current.get("nhl_ppp") == ppp and current.get("nhl_shp") == shp:
-                    skipped += 1
-                    continue
-            
-            updates_to_apply.append({
-                "player_id": player_id,
-                "game_id": game_id,
-                "game_date": target_date,
-                "nhl_ppp": ppp,
-                "nhl_shp": shp
-            })
+            queue_update(player_id, game.get("gameId"), game.get("powerPlayPoints", 0), game.get("shorthandedPoints", 0))
         
         time.sleep(REQUEST_DELAY)
     
@@ -168,25 +263,28 @@ def sync_ppp_for_date(db: SupabaseRest, target_date: str, dry_run: bool = False)
             print(f"  Player {u['player_id']}: PPP={u['nhl_ppp']}, SHP={u['nhl_shp']}")
         if len(updates_to_apply) > 10:
             print(f"  ... and {len(updates_to_apply) - 10} more")
-        return {"updated": 0, "would_update": len(updates_to_apply), "skipped": skipped, "errors": errors}
-    
-    # Apply updates in batches
-    if updates_to_apply:
-        for update in updates_to_apply:
-            try:
-                db.upsert(
-                    "player_game_stats",
-                    [update],
-                    on_conflict="player_id,game_id"
-                )
-                updated += 1
-            except Exception as e:
-                print(f"  [ERROR] Failed to update {update['player_id']}: {e}")
-                errors += 1
+        return {"updated": 0, "would_update": len(updates_to_apply), "skipped": skipped, "errors": errors,
+                "gamelog_players": len(gamelog_players)}
+    
+    # Apply updates: one bulk upsert per game
+    by_game: Dict[int, List[Dict]] = {}
+    for update in updates_to_apply:
+        by_game.setdefault(update["game_id"], []).append(update)
+    for game_id, rows in by_game.items():
+        try:
+            db.upsert(
+                "player_game_stats",
+                rows,
+                on_conflict="player_id,game_id"
+            )
+            updated += len(rows)
+        except Exception as e:
+            print(f"  [ERROR] Failed to update game {game_id} ({len(rows)} players): {e}")
+            errors += len(rows)
     
     print(f"\nResults: {updated} updated, {skipped} skipped, {errors} errors")
     
-    return {"updated": updated, "skipped": skipped, "errors": errors}
+    return {"updated": updated, "skipped": skipped, "errors": errors, "gamelog_players": len(gamelog_players)}
 
 
 def main():
@@ -194,6 +292,7 @@ def main():
     parser.add_argument("--date", type=str, help="Specific date (YYYY-MM-DD)")
     parser.add_argument("--days", type=int, default=1, help="Number of days to sync (default: 1 = today)")
     parser.add_argument("--dry-run", action="store_true", help="Show what would be updated without applying")
+    parser.add_argument("--gamelog-only", action="store_true", help="Skip the PBP derivation and use the game-log API for every player")
     
     args = parser.parse_args()
     
@@ -218,7 +317,7 @@ def main():
     total_errors = 0
     
     for target_date in dates:
-        result = sync_ppp_for_date(db, target_date, dry_run=args.dry_run)
+        result = sync_ppp_for_date(db, target_date, dry_run=args.dry_run, use_pbp=not args.gamelog_only)
         total_updated += result.get("updated", 0)
         total_errors += result.get("errors", 0)
     
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+team_context.py
+
+Per-slate team context for the daily projection engine.
+
+The opponent adjustments in calculate_daily_projections (DDR = team xGA x
+goalie SV% x offense, plus the back-to-back penalty) depend only on the team,
+the date and the season, yet get_opponent_strength() and friends were evaluated
+once per *player*: ~25 identical DDR computations per team per slate, each
+pulling the league's 100 most recent nhl_games and a 1000-row
+player_season_stats scan.
+
+build_team_context() computes every team's numbers in one pass from a handful
+of bulk reads (the same recent-games windows, one raw_shots and one
+player_game_stats fetch for the union of those games, one goalie scan), with
+the helpers' exact selection rules so results are identical. The table is:
+
+    - registered in-process (calculate_daily_projections.set_team_context),
+      so get_opponent_strength / get_team_xga_per_60 /
+      get_opposing_goalie_save_pct / get_opponent_shots_for_per_60 /
+      check_back_to_back answer from it
+    - stored in team_daily_context (one row per team and date) for later
+      runs and for inspection
+
+Teams the table does not cover (e.g. an aliased ARI/UTA code) fall through to
+the original per-call helpers.
+
+Usage:
+    python team_context.py [--date YYYY-MM-DD] [--season 2025]
+"""
+
+import argparse
+import sys
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from supabase_rest import SupabaseRest
+from projection_context import fetch_all_in
+from calculate_daily_projections import (
+    DEFAULT_SEASON,
+    TEAM_CONTEXT_LAST_N_GAMES,
+    check_back_to_back,
+    combine_ddr,
+    get_canonical_team_code,
+    get_latest_baselines,
+    set_team_context,
+    supabase_client,
+)
+
+
+TEAM_CONTEXT_TABLE = "team_daily_context"
+RECENT_GAMES_LIMIT = 100  # League-wide recent-games window the DDR helpers scan
+GOALIE_SCAN_LIMIT = 1000  # player_season_stats rows the goalie SV% helper scans
+
+GAME_COLUMNS = "game_id,game_date,home_team,away_team"
+SHOT_COLUMNS = "game_id,team_code,is_home_team,home_team_abbrev,away_team_abbrev,xg_value,shooting_talent_adjusted_xg,flurry_adjusted_xg"
+PGS_COLUMNS = "game_id,team_abbrev,is_goalie,shots_on_goal,icetime_seconds"
+
+
+def _team_xga_per_60(
+    team: str,
+    game_ids: List[int],
+    game_info: Dict[int, Dict[str, Any]],
+    shots_by_game: Dict[int, List[Dict[str, Any]]],
+    pgs_by_game: Dict[int, List[Dict[str, Any]]]
+) -> Optional[float]:
+    """get_team_xga_per_60() over preloaded rows (same accumulation order)."""
+    if not game_ids or not any(shots_by_game.get(gid) for gid in game_ids):
+        return None
+
+    total_xga = 0.0
+    total_toi = 0
+    for game_id in game_ids:
+        info = game_info.get(game_id)
+        if not info:
+            continue
+        opponent = info["away_team"] if info["home_team"] == team else info["home_team"]
+        total_toi += sum(int(s.get("icetime_seconds", 0)) for s in pgs_by_game.get(game_id, []) if s.get("team_abbrev") == team)
+
+        for shot in shots_by_game.get(game_id, []):
+            is_home = shot.get("is_home_team")
+            if is_home is not None:
+                shot_team = info["home_team"] if is_home else info["away_team"]
+            elif shot.get("team_code"):
+                continue
+            elif shot.get("home_team_abbrev") == opponent or shot.get("away_team_abbrev") == opponent:
+                shot_team = opponent
+            else:
+                continue
+            if shot_team == opponent:
+                total_xga += (
+                    float(shot.get("shooting_talent_adjusted_xg", 0)) or
+                    float(shot.get("flurry_adjusted_xg", 0)) or
+                    float(shot.get("xg_value", 0)) or
+                    0.0
+                )
+
+    if total_toi > 0:
+        return (total_xga / total_toi) * 3600
+    return None
+
+
+def _team_shots_for_per_60(
+    team: str,
+    game_ids: List[int],
+    pgs_by_game: Dict[int, List[Dict[str, Any]]]
+) -> Optional[float]:
+    """get_opponent_shots_for_per_60() over preloaded rows (skaters only)."""
+    if not game_ids:
+        return None
+    total_shots = 0
+    total_toi = 0
+    for game_id in game_ids:
+        skaters = [
+            s for s in pgs_by_game.get(game_id, [])
+            if s.get("team_abbrev") == team and s.get("is_goalie") is False
+        ]
+        total_shots += sum(int(s.get("shots_on_goal", 0)) for s in skaters)
+        total_toi += sum(int(s.get("icetime_seconds", 0)) for s in skaters)
+    if total_toi > 0:
+        return (total_shots / total_toi) * 3600
+    return None
+
+
+def _team_goalie_sv_pct(db: SupabaseRest, season: int, teams: Iterable[str]) -> Dict[str, Optional[float]]:
+    """get_opposing_goalie_save_pct() for every team from one goalie scan (avg SV% of the top 2 by GP)."""
+    result: Dict[str, Optional[float]] = {team: None for team in teams}
+    try:
+        goalie_season_stats = db.select(
+            "player_season_stats",
+            select="player_id,save_pct,goalie_gp",
+            filters=[("season", "eq", season)],
+            limit=GOALIE_SCAN_LIMIT
+        )
+        if not goalie_season_stats:
+            return result
+        all_goalie_ids = [int(gss.get("player_id", 0)) for gss in goalie_season_stats if gss.get("player_id")]
+        if not all_goalie_ids:
+            return result
+        goalie_dirs = fetch_all_in(
+            db, "player_directory", "player_id", all_goalie_ids,
+            select="player_id,team_abbrev,is_goalie",
+            filters=[("season", "eq", season), ("is_goalie", "eq", True)]
+        )
+
+        goalie_stats_map = {}
+        for gss in goalie_season_stats:
+            pid = int(gss.get("player_id", 0))
+            goalie_stats_map[pid] = {
+                "save_pct": float(gss.get("save_pct", 0)) if gss.get("save_pct") else 0,
+                "goalie_gp": int(gss.get("goalie_gp", 0))
+            }
+
+        by_team: Dict[str, List[Dict[str, Any]]] = {}
+        for gd in goalie_dirs:
+            stats = goalie_stats_map.get(int(gd.get("player_id", 0)))
+            if stats and stats["goalie_gp"] > 0 and stats["save_pct"] > 0:
+                by_team.setdefault(gd.get("team_abbrev"), []).append(stats)
+
+        for team in result:
+            team_goalies = by_team.get(team)
+            if team_goalies:
+                team_goalies.sort(key=lambda x: x["goalie_gp"], reverse=True)
+                top_2 = team_goalies[:2]
+                result[team] = sum(g["save_pct"] for g in top_2) / len(top_2)
+    except Exception as e:
+        print(f"⚠️  Warning: Could not get goalie save percentages: {e}")
+    return result
+
+
+def build_team_context(
+    db: SupabaseRest,
+    target_date: date,
+    season: int,
+    teams: Optional[Iterable[str]] = None,
+    verbose: bool = True
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Compute DDR components, DDR and B2B for every team in one pass.
+
+    Args:
+        db: Supabase client (or a preloaded ProjectionContext)
+        target_date: Slate date (B2B is evaluated for this date)
+        season: Season year
+        teams: Teams to include (default: every team in the recent-games
+               windows plus the slate)
+
+    Returns:
+        {team_abbrev: row} with xga_per_60, goalie_sv_pct, shots_for_per_60,
+        the three multipliers, ddr and b2b_penalty
+    """
+    today = date.today().isoformat()
+    # Same windows as get_team_xga_per_60 (up to today) and
+    # get_opponent_shots_for_per_60 (no date bound)
+    xga_games = db.select(
+        "nhl_games", select=GAME_COLUMNS,
+        filters=[("season", "eq", season), ("game_date", "lte", today)],
+        order="game_date.desc", limit=RECENT_GAMES_LIMIT
+    ) or []
+    sf_games = db.select(
+        "nhl_games", select=GAME_COLUMNS,
+        filters=[("season", "eq", season)],
+        order="game_date.desc", limit=RECENT_GAMES_LIMIT
+    ) or []
+
+    if teams is None:
+        slate = db.select(
+            "nhl_games", select="home_team,away_team",
+            filters=[("season", "eq", season), ("game_date", "eq", target_date.isoformat())]
+        ) or []
+        team_set = set()
+        for game in xga_games + sf_games + slate:
+            team_set.update(t for t in (game.get("home_team"), game.get("away_team")) if t)
+        teams = sorted(team_set)
+    teams = list(teams)
+
+    # Each team's last N games inside the windows
+    canonical = {}
+    for game in xga_games:
+        for t in (game.get("home_team"), game.get("away_team")):
+            if t and t not in canonical:
+                canonical[t] = get_canonical_team_code(db, t)
+    xga_ids: Dict[str, List[int]] = {}
+    sf_ids: Dict[str, List[int]] = {}
+    for team in teams:
+        canonical_team = get_canonical_team_code(db, team)
+        ids = []
+        for game in xga_games:
+            home, away = game.get("home_team"), game.get("away_team")
+            if (canonical.get(home) == canonical_team or canonical.get(away) == canonical_team or
+                    home == team or away == team):
+                ids.append(int(game.get("game_id")))
+                if len(ids) >= TEAM_CONTEXT_LAST_N_GAMES:
+                    break
+        xga_ids[team] = ids
+        sf_ids[team] = [
+            int(g.get("game_id")) for g in sf_games
+            if g.get("home_team") == team or g.get("away_team") == team
+        ][:TEAM_CONTEXT_LAST_N_GAMES]
+
+    shot_game_ids = sorted({gid for ids in xga_ids.values() for gid in ids})
+    stat_game_ids = sorted(set(shot_game_ids) | {gid for ids in sf_ids.values() for gid in ids})
+    shots_by_game: Dict[int, List[Dict[str, Any]]] = {}
+    for shot in fetch_all_in(db, "raw_shots", "game_id", shot_game_ids, select=SHOT_COLUMNS) if shot_game_ids else []:
+        shots_by_game.setdefault(int(shot.get("game_id", 0)), []).append(shot)
+    pgs_by_game: Dict[int, List[Dict[str, Any]]] = {}
+    for row in fetch_all_in(db, "player_game_stats", "game_id", stat_game_ids, select=PGS_COLUMNS) if stat_game_ids else []:
+        pgs_by_game.setdefault(int(row.get("game_id", 0)), []).append(row)
+
+    game_info = {int(g["game_id"]): g for g in xga_games if g.get("game_id")}
+    goalie_sv = _team_goalie_sv_pct(db, season, teams)
+    baselines = get_latest_baselines(db, season)
+
+    context: Dict[str, Dict[str, Any]] = {}
+    for team in teams:
+        try:
+            xga = _team_xga_per_60(team, xga_ids[team], game_info, shots_by_game, pgs_by_game)
+        except Exception as e:
+            print(f"⚠️  Warning: Could not calculate team xGA/60 for {team}: {e}")
+            xga = None
+        try:
+            shots_for = _team_shots_for_per_60(team, sf_ids[team], pgs_by_game)
+        except Exception as e:
+            print(f"⚠️  Warning: Could not calculate shots for/60 for {team}: {e}")
+            shots_for = None
+        ddr, team_mult, goalie_mult, offense_mult = combine_ddr(
+            xga, goalie_sv[team], shots_for,
+            baselines["league_avg_xga_per_60"], baselines["league_avg_sv_pct"],
+            baselines.get("league_avg_shots_for_per_60", 30.0)
+        )
+        context[team] = {
+            "team_abbrev": team,
+            "context_date": target_date.isoformat(),
+            "season": season,
+            "xga_per_60": xga,
+            "goalie_sv_pct": goalie_sv[team],
+            "shots_for_per_60": shots_for,
+            "team_multiplier": team_mult,
+            "goalie_multiplier": goalie_mult,
+            "offense_multiplier": offense_mult,
+            "ddr": ddr,
+            "b2b_penalty": check_back_to_back(db, team, target_date, season),
+        }
+
+    if verbose:
+        print(f"   Team context: {len(context)} teams ({len(shot_game_ids)} xGA games, {len(stat_game_ids)} stat games)")
+    return context
+
+
+def save_team_context(db: SupabaseRest, context: Dict[str, Dict[str, Any]]) -> int:
+    """
+    Upsert the team context rows into team_daily_context.
+
+    Returns:
+        Number of rows written (0 if the write failed)
+    """
+    if not context:
+        return 0
+    now = datetime.now().isoformat()
+    rows = [{**row, "updated_at": now} for row in context.values()]
+    try:
+        db.upsert(TEAM_CONTEXT_TABLE, rows, on_conflict="team_abbrev,context_date")
+        return len(rows)
+    except Exception as e:
+        print(f"⚠️  Warning: Could not store team context: {e}")
+        return 0
+
+
+def load_team_context(db: SupabaseRest, target_date: date, season: int) -> Dict[str, Dict[str, Any]]:
+    """Stored team context rows for a date (empty if none were saved)."""
+    rows = db.select(
+        TEAM_CONTEXT_TABLE,
+        select="*",
+        filters=[("context_date", "eq", target_date.isoformat()), ("season", "eq", season)]
+    ) or []
+    context = {}
+    for row in rows:
+        for key in ("xga_per_60", "goalie_sv_pct", "shots_for_per_60", "ddr", "b2b_penalty"):
+            if row.get(key) is not None:
+                row[key] = float(row[key])
+        context[row["team_abbrev"]] = row
+    return context
+
+
+def prepare_team_context(
+    db: SupabaseRest,
+    target_date: date,
+    season: int,
+    store_db: Optional[SupabaseRest] = None,
+    verbose: bool = True
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Build the team context for a slate, register it for the projection
+    helpers and store it.
+
+    Args:
+        db: Client used for the reads (ideally a preloaded ProjectionContext)
+        target_date: Slate date
+        season: Season year
+        store_db: Client used for the team_daily_context write (default: db)
+
+    Returns:
+        {team_abbrev: row}
+    """
+    context = build_team_context(db, target_date, season, verbose=verbose)
+    set_team_context(season, context)
+    written = save_team_context(store_db or db, context)
+    if verbose and written:
+        print(f"   Stored {written} team_daily_context rows")
+    return context
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the per-slate team DDR / B2B context")
+    parser.add_argument("--date", help="Slate date (YYYY-MM-DD, default: today)")
+    parser.add_argument("--season", type=int, default=DEFAULT_SEASON)
+    args = parser.parse_args()
+
+    target_date = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else date.today()
+    db = supabase_client()
+    context = prepare_team_context(db, target_date, args.season)
+    for team, row in sorted(context.items()):
+        print(f"   {team}: DDR {row['ddr']:.3f} (xGA/60 {row['xga_per_60'] or 0:.2f}, "
+              f"SV% {row['goalie_sv_pct'] or 0:.3f}, SF/60 {row['shots_for_per_60'] or 0:.1f}, B2B {row['b2b_penalty']})")
+    print(f"   {db.request_count} requests")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
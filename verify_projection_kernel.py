@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Verify the vectorized projection kernel against the scalar projection path.
+
+Builds the slate for a date (every player on a team that plays), projects it
+with projection_kernel.project_slate() and with calculate_daily_projection()
+one player at a time, and reports any field that differs.
+
+Usage:
+    python verify_projection_kernel.py [--date YYYY-MM-DD] [--season 2025] [--limit N]
+"""
+import sys
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+
+import argparse
+import time
+from datetime import date, datetime
+
+from calculate_daily_projections import supabase_client, DEFAULT_SEASON
+from projection_context import ProjectionContext, fetch_all, fetch_all_in
+from projection_kernel import verify_parity
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized vs scalar projection parity check")
+    parser.add_argument("--date", type=str, help="Target date (YYYY-MM-DD), default: today")
+    parser.add_argument("--season", type=int, default=DEFAULT_SEASON)
+    parser.add_argument("--limit", type=int, default=200, help="Max player-games to compare (default: 200)")
+    args = parser.parse_args()
+
+    target_date = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else date.today()
+
+    print("=" * 80)
+    print("CITRUS PROJECTION KERNEL PARITY CHECK")
+    print("=" * 80)
+    print(f"Target Date: {target_date}")
+    print()
+
+    db = supabase_client()
+
+    print("[Step 1] Building slate...")
+    games = fetch_all(
+        db, "nhl_games", "game_id,home_team,away_team",
+        [("game_date", "eq", target_date.isoformat()), ("season", "eq", args.season)]
+    )
+    team_games = {}
+    for game in games:
+        team_games[game["home_team"]] = game["game_id"]
+        team_games[game["away_team"]] = game["game_id"]
+    players = fetch_all_in(
+        db, "player_directory", "team_abbrev", list(team_games),
+        "player_id,team_abbrev", [("season", "eq", args.season)]
+    )
+    tasks = [
+        (int(p["player_id"]), int(team_games[p["team_abbrev"]]), target_date)
+        for p in players
+    ][:args.limit]
+    print(f"   {len(games)} games, {len(tasks)} player-games")
+    if not tasks:
+        print("   [WARN] Nothing to compare")
+        return
+
+    print("[Step 2] Preloading context...")
+    ctx = ProjectionContext.load(db, target_date, args.season, player_ids=[t[0] for t in tasks])
+
+    print("[Step 3] Comparing vectorized vs scalar...")
+    scoring_settings = {
+        "skater": {"goals": 3, "assists": 2, "shots_on_goal": 0.4, "blocks": 0.5},
+        "goalie": {"wins": 4, "shutouts": 3, "saves": 0.2, "goals_against": -1}
+    }
+    start = time.time()
+    mismatches = verify_parity(ctx, tasks, args.season, scoring_settings)
+    print(f"   Compared {len(tasks)} player-games in {time.time() - start:.1f}s")
+    print()
+
+    if mismatches:
+        print(f"[FAIL] {len(mismatches)} mismatches")
+        for line in mismatches[:25]:
+            print(f"   {line}")
+        sys.exit(1)
+    print("[OK] Vectorized kernel matches scalar path")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Verify the batch shot feature builder against the scalar extractor.
+
+Loads recorded play-by-play from raw_nhl_data for a season, featurizes it with
+shot_features.build_shot_features() and with
+data_acquisition._extract_shots_from_game() one game at a time, and reports
+any feature that differs.
+
+Usage:
+    python verify_shot_features.py [--season 2025] [--limit N]
+"""
+import sys
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+
+import argparse
+import time
+
+from data_acquisition import get_fresh_supabase_client, SHOT_TYPE_ENCODER, PASS_ZONE_ENCODER
+from shot_features import build_shot_features, verify_parity
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch vs scalar shot feature parity check")
+    parser.add_argument("--season", type=int, default=2025)
+    parser.add_argument("--limit", type=int, default=0, help="Max games to compare (default: whole season)")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("CITRUS SHOT FEATURE PARITY CHECK")
+    print("=" * 80)
+    print(f"Season: {args.season}")
+    print()
+
+    db = get_fresh_supabase_client()
+
+    print("[Step 1] Loading recorded play-by-play...")
+    games = []
+    for page in db.iter_select(
+        "raw_nhl_data", select="game_id,raw_json",
+        filters=[("game_id", "gte", int(f"{args.season}000000")), ("game_id", "lt", int(f"{args.season + 1}000000"))],
+        key="game_id", page_size=100
+    ):
+        games.extend((int(r["game_id"]), r["raw_json"]) for r in page if r.get("raw_json"))
+        if args.limit and len(games) >= args.limit:
+            break
+    if args.limit:
+        games = games[:args.limit]
+    print(f"   {len(games)} games")
+    if not games:
+        print("   [WARN] Nothing to compare")
+        return
+
+    print("[Step 2] Batch featurization...")
+    start = time.time()
+    shots = build_shot_features(games, SHOT_TYPE_ENCODER, PASS_ZONE_ENCODER)
+    print(f"   {len(shots)} shots in {time.time() - start:.1f}s")
+
+    print("[Step 3] Comparing batch vs scalar...")
+    start = time.time()
+    mismatches = verify_parity(games, db)
+    print(f"   Compared {len(games)} games in {time.time() - start:.1f}s")
+    print()
+
+    if mismatches:
+        print(f"[FAIL] {len(mismatches)} mismatches")
+        for line in mismatches[:25]:
+            print(f"   {line}")
+        sys.exit(1)
+    print("[OK] Batch shot features match scalar path")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+xg_inference.py
+
+Long-lived xG / xA / rebound inference with warm models and micro-batching.
+
+Each producer used to run predict() on one game's ~60-shot DataFrame. Tree
+ensembles have a large fixed cost per predict() call, so most of that time is
+overhead, not scoring.
+
+ShotInferenceService owns the models: they are loaded once per process, on
+first use (importing data_acquisition no longer loads anything). A background
+worker coalesces requests from any number of producer threads
+(data_acquisition.scrape_pbp_and_process / process_single_game,
+process_xg_stats) into one predict() per model, then hands each caller back
+its own slice.
+
+Feature preparation (encoding, NaN fills) stays with the producer so results
+are identical to scoring each game on its own; only the model call is shared.
+
+Usage:
+    from xg_inference import get_inference_service, get_shot_models
+
+    result = get_inference_service().predict(xg_features=X_xg, xa_features=X_xa)
+    result["xg"], result["xa"], result["rebound"]
+
+    get_shot_models().xg_features   # feature lists / encoders for preparing frames
+
+Benchmark:
+    python xg_inference.py [--games 300] [--shots-per-game 60] [--producers 8]
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+MAX_BATCH_SHOTS = int(os.getenv("CITRUS_XG_MAX_BATCH_SHOTS", "8192"))  # Shots per coalesced predict()
+MAX_WAIT_MS = float(os.getenv("CITRUS_XG_MAX_WAIT_MS", "10"))  # How long the worker waits to fill a batch
+
+# Calibration applied on top of the raw model output
+XG_CALIBRATION_FACTOR = 3.5
+XG_CLIP_UPPER = 0.50
+XG_SCALE_FACTOR = 0.19
+MONEYPUCK_XG_CLIP = (0.0, 0.6)
+XA_CALIBRATION_FACTOR = 3.5
+XA_CLIP_UPPER = 0.50
+XA_SCALE_FACTOR = 0.15
+
+# Feature list for the old xG model when model_features.joblib is missing
+DEFAULT_XG_FEATURES = [
+    'distance', 'angle', 'is_rebound', 'shot_type_encoded', 'is_power_play', 'score_differential',
+    'is_slot_shot',
+    'has_pass_before_shot', 'pass_lateral_distance', 'pass_to_net_distance',
+    'pass_zone_encoded', 'pass_immediacy_score', 'goalie_movement_score', 'pass_quality_score'
+]
+
+
+class ShotModels:
+    """The fitted models, their feature lists and the feature encoders, loaded once."""
+
+    def __init__(
+        self,
+        xg_model: Any,
+        xg_features: List[str],
+        use_moneypuck: bool,
+        xa_model: Any = None,
+        xa_features: Optional[List[str]] = None,
+        rebound_model: Any = None,
+        rebound_features: Optional[List[str]] = None,
+        last_event_category_encoder: Any = None,
+        shot_type_encoder: Any = None,
+        pass_zone_encoder: Any = None
+    ):
+        self.xg_model = xg_model
+        self.xg_features = list(xg_features)
+        self.use_moneypuck = use_moneypuck
+        self.xa_model = xa_model
+        self.xa_features = list(xa_features) if xa_features else None
+        self.rebound_model = rebound_model
+        self.rebound_features = list(rebound_features) if rebound_features else None
+        self.last_event_category_encoder = last_event_category_encoder
+        self.shot_type_encoder = shot_type_encoder
+        self.pass_zone_encoder = pass_zone_encoder
+
+    @classmethod
+    def load(cls, model_dir: str = MODEL_DIR) -> "ShotModels":
+        """
+        Load models and encoders from disk (MoneyPuck-aligned xG model first,
+        the old classifier as fallback; xA / rebound models and encoders optional).
+
+        Raises:
+            FileNotFoundError: If neither xG model is present
+        """
+        def path(name: str) -> str:
+            return os.path.join(model_dir, name)
+
+        def optional(name: str, warning: str) -> Any:
+            try:
+                return joblib.load(path(name))
+            except FileNotFoundError:
+                print(f"[xg_inference] WARNING: {name} not found. {warning}")
+                return None
+
+        # Models saved with an older sklearn version
+        warnings.filterwarnings('ignore', message='.*Trying to unpickle.*', category=UserWarning)
+
+        if os.path.exists(path("xg_model_moneypuck.joblib")):
+            xg_model = joblib.load(path("xg_model_moneypuck.joblib"))
+            xg_features = joblib.load(path("model_features_moneypuck.joblib"))
+            use_moneypuck = True
+            print("[xg_inference] Loaded MoneyPuck-aligned xG model")
+        elif os.path.exists(path("xg_model.joblib")):
+            xg_model = joblib.load(path("xg_model.joblib"))
+            xg_features = optional("model_features.joblib", "Using the default feature list.") or DEFAULT_XG_FEATURES
+            use_moneypuck = False
+            print("[xg_inference] WARNING: Using old xG model. Consider retraining with MoneyPuck targets.")
+        else:
+            raise FileNotFoundError(
+                f"No xG model found in {model_dir} (xg_model_moneypuck.joblib or xg_model.joblib). "
+                "Please run retrain_xg_with_moneypuck.py first!"
+            )
+
+        xa_model = xa_features = None
+        if os.path.exists(path("xa_model.joblib")):
+            xa_model = joblib.load(path("xa_model.joblib"))
+            xa_features = joblib.load(path("xa_model_features.joblib"))
+        else:
+            print("[xg_inference] WARNING: xa_model.joblib not found. xA will be skipped.")
+
+        rebound_model = rebound_features = None
+        if os.path.exists(path("rebound_model.joblib")):
+            rebound_model = joblib.load(path("rebound_model.joblib"))
+            rebound_features = joblib.load(path("rebound_model_features.joblib"))
+        else:
+            print("[xg_inference] WARNING: rebound_model.joblib not found. Rebounds will be skipped.")
+
+        return cls(
+            xg_model, xg_features, use_moneypuck, xa_model, xa_features, rebound_model, rebound_features,
+            last_event_category_encoder=optional("last_event_category_encoder.joblib", "Will encode on-the-fly if needed."),
+            shot_type_encoder=optional("shot_type_encoder.joblib", "Shot type encoding may fail."),
+            pass_zone_encoder=optional("pass_zone_encoder.joblib", "Pass zone encoding may fail.")
+        )
+
+
+def score_xg(models: ShotModels, X: pd.DataFrame) -> np.ndarray:
+    """Calibrated xG for prepared xG feature rows."""
+    if models.use_moneypuck:
+        return np.clip(models.xg_model.predict(X), *MONEYPUCK_XG_CLIP)
+    raw_xg = models.xg_model.predict_proba(X)[:, 1]
+    return np.clip(np.power(raw_xg, XG_CALIBRATION_FACTOR), None, XG_CLIP_UPPER) * XG_SCALE_FACTOR
+
+
+def score_xa(models: ShotModels, X: pd.DataFrame) -> np.ndarray:
+    """Calibrated xA for prepared pass feature rows."""
+    raw_xa = models.xa_model.predict_proba(X)[:, 1]
+    return np.clip(np.power(raw_xa, XA_CALIBRATION_FACTOR), None, XA_CLIP_UPPER) * XA_SCALE_FACTOR
+
+
+def score_rebound(models: ShotModels, X: pd.DataFrame) -> np.ndarray:
+    """Rebound probability for prepared shot-on-goal feature rows."""
+    return models.rebound_model.predict_proba(X)[:, 1]
+
+
+# kind -> (scoring function, model attribute, feature list attribute)
+_SCORERS = {
+    "xg": (score_xg, "xg_model", "xg_features"),
+    "xa": (score_xa, "xa_model", "xa_features"),
+    "rebound": (score_rebound, "rebound_model", "rebound_features"),
+}
+
+
+class _Request:
+    __slots__ = ("frames", "future", "size")
+
+    def __init__(self, frames: Dict[str, pd.DataFrame], future: Future):
+        self.frames = frames
+        self.future = future
+        self.size = max((len(f) for f in frames.values()), default=0)
+
+
+class ShotInferenceService:
+    """
+    Micro-batching model server for one process.
+
+    Models are loaded on first access of .models (unless passed in).
+    Producers call submit()/predict() from any thread. A single worker thread
+    takes the first waiting request, keeps draining the queue until it has
+    max_batch_shots rows or max_wait_ms has passed, scores each model once
+    over the concatenated rows and resolves every request's Future with its
+    own slice.
+    """
+
+    def __init__(
+        self,
+        models: Optional[ShotModels] = None,
+        max_batch_shots: int = MAX_BATCH_SHOTS,
+        max_wait_ms: float = MAX_WAIT_MS
+    ):
+        self._models = models
+        self._models_lock = threading.Lock()
+        self.max_batch_shots = max_batch_shots
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches_run = 0
+        self.shots_scored = 0
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="xg-inference", daemon=True)
+        self._worker.start()
+
+    @property
+    def models(self) -> ShotModels:
+        """The served models, loaded from models/ on first access."""
+        if self._models is None:
+            with self._models_lock:
+                if self._models is None:
+                    self._models = ShotModels.load()
+        return self._models
+
+    def submit(
+        self,
+        xg_features: Optional[pd.DataFrame] = None,
+        xa_features: Optional[pd.DataFrame] = None,
+        rebound_features: Optional[pd.DataFrame] = None
+    ) -> Future:
+        """
+        Queue prepared feature rows for scoring.
+
+        Frames for models that are not loaded are ignored (their result is None).
+
+        Returns:
+            Future resolving to {"xg": ndarray|None, "xa": ndarray|None, "rebound": ndarray|None}
+        """
+        frames = {}
+        for kind, frame in (("xg", xg_features), ("xa", xa_features), ("rebound", rebound_features)):
+            _, model_attr, _ = _SCORERS[kind]
+            if frame is not None and len(frame) > 0 and getattr(self.models, model_attr) is not None:
+                frames[kind] = frame
+        future: Future = Future()
+        if not frames:
+            future.set_result({"xg": None, "xa": None, "rebound": None})
+            return future
+        self._queue.put(_Request(frames, future))
+        return future
+
+    def predict(
+        self,
+        xg_features: Optional[pd.DataFrame] = None,
+        xa_features: Optional[pd.DataFrame] = None,
+        rebound_features: Optional[pd.DataFrame] = None
+    ) -> Dict[str, Optional[np.ndarray]]:
+        """submit() and wait for the result."""
+        return self.submit(xg_features, xa_features, rebound_features).result()
+
+    def close(self) -> None:
+        """Stop the worker after the queued requests are scored."""
+        self._queue.put(None)
+        self._worker.join()
+
+    def __enter__(self) -> "ShotInferenceService":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            rows = first.size
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while rows < self.max_batch_shots:
+                remaining = deadline - time.monotonic()
+                try:
+                    request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+                rows += request.size
+            self._score_batch(batch)
+            if stop:
+                return
+
+    def _score_batch(self, batch: List[_Request]) -> None:
+        results: List[Dict[str, Optional[np.ndarray]]] = [
+            {"xg": None, "xa": None, "rebound": None} for _ in batch
+        ]
+        try:
+            for kind, (scorer, _, features_attr) in _SCORERS.items():
+                members = [i for i, request in enumerate(batch) if kind in request.frames]
+                if not members:
+                    continue
+                features = getattr(self.models, features_attr)
+                frames = [batch[i].frames[kind][features] for i in members]
+                X = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+                scores = np.asarray(scorer(self.models, X), dtype=float)
+                offsets = np.cumsum([0] + [len(f) for f in frames])
+                for j, i in enumerate(members):
+                    results[i][kind] = scores[offsets[j]:offsets[j + 1]]
+            self.batches_run += 1
+            self.shots_scored += sum(request.size for request in batch)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
+
+
+_service: Optional[ShotInferenceService] = None
+_service_lock = threading.Lock()
+
+
+def get_inference_service() -> ShotInferenceService:
+    """Process-wide service, created on first use (models load on first predict / .models access)."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = ShotInferenceService()
+    return _service
+
+
+def get_shot_models() -> ShotModels:
+    """The process-wide service's models (feature lists and encoders for producers)."""
+    return get_inference_service().models
+
+
+def _synthetic_frames(features: List[str], n_rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    return pd.DataFrame(rng.random((n_rows, len(features))), columns=features)
+
+
+def run_benchmark(games: int, shots_per_game: int, producers: int) -> Dict[str, float]:
+    """
+    Shots/second for per-game predict() vs the micro-batched service.
+
+    Returns:
+        {"per_game": shots/s, "service": shots/s, "batches": service batch count}
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    models = ShotModels.load()
+    rng = np.random.default_rng(7)
+    game_frames = []
+    for _ in range(games):
+        game = {"xg": _synthetic_frames(models.xg_features, shots_per_game, rng)}
+        if models.xa_model is not None:
+            game["xa"] = _synthetic_frames(models.xa_features, max(shots_per_game // 4, 1), rng)
+        if models.rebound_model is not None:
+            game["rebound"] = _synthetic_frames(models.rebound_features, max(shots_per_game // 2, 1), rng)
+        game_frames.append(game)
+    total_shots = games * shots_per_game
+
+    # Baseline: each game scored on its own, as process_single_game_json does today
+    start = time.perf_counter()
+    for game in game_frames:
+        for kind, frame in game.items():
+            scorer, _, _ = _SCORERS[kind]
+            scorer(models, frame)
+    per_game = total_shots / (time.perf_counter() - start)
+
+    service = ShotInferenceService(models)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=producers) as pool:
+        list(pool.map(
+            lambda game: service.predict(game.get("xg"), game.get("xa"), game.get("rebound")),
+            game_frames
+        ))
+    batched = total_shots / (time.perf_counter() - start)
+    service.close()
+
+    return {"per_game": per_game, "service": batched, "batches": float(service.batches_run)}
+
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark micro-batched xG/xA/rebound inference")
+    parser.add_argument("--games", type=int, default=300)
+    parser.add_argument("--shots-per-game", type=int, default=60)
+    parser.add_argument("--producers", type=int, default=8, help="Concurrent producer threads")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("CITRUS xG INFERENCE BENCHMARK")
+    print("=" * 80)
+    print(f"{args.games} games x {args.shots_per_game} shots, {args.producers} producers")
+    result = run_benchmark(args.games, args.shots_per_game, args.producers)
+    print(f"   Per-game predict():  {result['per_game']:,.0f} shots/s")
+    print(f"   Micro-batched:       {result['service']:,.0f} shots/s ({int(result['batches'])} batches)")
+    print(f"   Speedup:             {result['service'] / result['per_game']:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())